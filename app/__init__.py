@@ -1 +1,16 @@
-# Archivo para hacer de utils un paquete Python
+# -*- coding: utf-8 -*-
+"""
+Paquete principal de la aplicación de viajes.
+
+Importar este paquete no tiene efectos secundarios: la aplicación se
+construye explícitamente con create_app().
+"""
+
+
+def create_app(config=None):
+    """Crea la aplicación Flask (ver app.factory.create_app)."""
+    from .factory import create_app as _create_app
+    return _create_app(config)
+
+
+__all__ = ['create_app']
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Fábrica de la aplicación Flask.
+
+Construir la app no realiza E/S: no abre conexiones a la base de datos, no
+crea directorios ni imprime mensajes. La base de datos se inicializa en el
+primer acceso (DatabaseService.ensure_initialized) o explícitamente con
+init_db.py.
+"""
+
+import os
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from config.settings import Config
+
+
+# Instancia única de SQLAlchemy: los modelos se declaran una sola vez por proceso
+db = SQLAlchemy()
+
+_models = None
+_servicios_inicializados = False  # Modelos y listeners de la sesión: son los mismos para todas las apps
+
+
+def get_models():
+    """Devuelve el diccionario de modelos, declarándolos la primera vez."""
+    global _models
+    if _models is None:
+        from app.models import init_models
+        _models = init_models(db)
+    return _models
+
+
+def _configuracion_base():
+    """Configuración por defecto leída del entorno."""
+    return {
+        'SECRET_KEY': Config.get_secret_key(),
+        'SQLALCHEMY_DATABASE_URI': Config.get_database_uri(),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': Config.get_sqlalchemy_track_modifications(),
+    }
+
+
+def _init_servicios(app, models):
+    """Inicializa los servicios de negocio con los modelos y la base de datos."""
+    global _servicios_inicializados
+    from app.services import (database_service, viaje_service, gasto_service, actividad_service,
+                              documento_service, transporte_service, alojamiento_service,
+                              vencimiento_service, busqueda_service, geocodificacion_service,
+                              salud_service, exportacion_service, importacion_service,
+                              calendario_service, sincronizacion_service, archivo_service,
+                              instantanea_service)
+    
+    # Cada app guarda su propio estado de inicialización de la base de datos.
+    # El estado que depende de la base de datos en los demás servicios
+    # (backend e índice de búsqueda, caché de calendarios) también es de cada
+    # app, en app.extensions (ver app.utils.estado_app)
+    database_service.init_service(app, db, models)
+    
+    if _servicios_inicializados:
+        return
+    viaje_service.init_service(models, db)
+    gasto_service.init_models(models, db)
+    actividad_service.init_models(models, db)
+    documento_service.init_models(models, db)
+    transporte_service.init_models(models, db)
+    alojamiento_service.init_models(models, db)
+    vencimiento_service.init_models(models, db)
+    busqueda_service.init_models(models, db)
+    geocodificacion_service.init_models(models, db)
+    salud_service.init_models(models, db)
+    exportacion_service.init_models(models, db)
+    importacion_service.init_models(models, db)
+    calendario_service.init_models(models, db)
+    sincronizacion_service.init_models(models, db)
+    archivo_service.init_models(models, db)
+    instantanea_service.init_models(models, db)
+    _servicios_inicializados = True
+
+
+def _init_blueprints(app, models):
+    """Inicializa los blueprints con sus dependencias y los registra en la app."""
+    from app.services import (database_service, gasto_service, actividad_service, documento_service,
+                              transporte_service, alojamiento_service, vencimiento_service,
+                              busqueda_service, salud_service, exportacion_service,
+                              importacion_service, calendario_service, sincronizacion_service,
+                              archivo_service)
+    
+    db_functions = {
+        'ensure_db_initialized': database_service.ensure_initialized,
+        'init_db_auto': database_service.init_database,
+        'get_db_initialized_status': lambda: database_service.is_initialized,
+        'set_db_initialized_status': database_service.set_initialized
+    }
+    
+    from app.routes.main import init_main_routes
+    init_main_routes(models, db_functions, salud_service)
+    
+    from app.routes.viajes import init_viajes_routes
+    init_viajes_routes(models, db)
+    
+    from app.routes.gastos import init_gastos_routes
+    init_gastos_routes(gasto_service)
+    
+    from app.routes.actividades import init_actividades_routes
+    init_actividades_routes(actividad_service)
+    
+    from app.routes.documentos import init_documentos_routes
+    init_documentos_routes(documento_service, vencimiento_service)
+    
+    from app.routes.transportes import init_transportes_routes
+    init_transportes_routes(models, db, {'transporte_service': transporte_service})
+    
+    from app.routes.alojamientos import init_alojamientos_routes
+    init_alojamientos_routes(alojamiento_service)
+    
+    from app.routes.busqueda import init_busqueda_routes
+    init_busqueda_routes(busqueda_service)
+    
+    from app.routes.exportacion import init_exportacion_routes
+    init_exportacion_routes(exportacion_service)
+    
+    from app.routes.importacion import init_importacion_routes
+    init_importacion_routes(importacion_service)
+    
+    from app.routes.calendario import init_calendario_routes
+    init_calendario_routes(calendario_service)
+    
+    from app.routes.sincronizacion import init_sincronizacion_routes
+    init_sincronizacion_routes(sincronizacion_service)
+    
+    from app.routes.archivo import init_archivo_routes
+    init_archivo_routes(archivo_service)
+    
+    from app.routes.monitoreo import init_monitoreo_routes
+    from app.utils.registro_consultas import registro_consultas
+    from app.utils.metricas import metricas
+    from app.utils.perfilado import perfilador
+    init_monitoreo_routes(registro_consultas, metricas, perfilador)
+    
+    from app.routes import register_blueprints
+    register_blueprints(app)
+
+
+def _agregar_headers(response):
+    """Headers de respuesta para desarrollo (CORS y sin caché)."""
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+    # Las rutas que definen su propia política de caché (p.ej. feeds con ETag) la conservan
+    if 'Cache-Control' not in response.headers:
+        response.headers.add('Cache-Control', 'no-cache, no-store, must-revalidate')
+        response.headers.add('Pragma', 'no-cache')
+        response.headers.add('Expires', '0')
+    return response
+
+
+def create_app(config=None):
+    """
+    Crea y configura la aplicación Flask.
+    
+    Args:
+        config (dict): Claves de configuración que reemplazan a las del entorno
+            (p.ej. {'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+    
+    Returns:
+        Flask: Aplicación lista para servir
+    """
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    app = Flask('app', root_path=raiz)
+    
+    app.config.update(_configuracion_base())
+    if config:
+        app.config.update(config)
+    # Las opciones del pool dependen de la URI final (SQLite no admite pool_size)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          Config.get_sqlalchemy_engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    
+    # jsonify y request.get_json con orjson si está instalado (JSON_BACKEND=json para forzar la estándar)
+    from app.utils.serializacion import ProveedorJSON
+    app.json = ProveedorJSON(app)
+    
+    db.init_app(app)
+    models = get_models()
+    
+    _init_servicios(app, models)
+    _init_blueprints(app, models)
+    
+    app.after_request(_agregar_headers)
+    
+    # Conteo de consultas SQL y header Server-Timing por petición
+    from app.utils.monitor_sql import monitor_sql
+    monitor_sql.init_app(app)
+    
+    # Estadísticas por huella de sentencia; volcado a JSONL opcional
+    from app.utils.registro_consultas import registro_consultas
+    registro_consultas.init_app(app)
+    if os.environ.get('REGISTRO_CONSULTAS_ARCHIVO'):
+        registro_consultas.iniciar_volcado(os.environ['REGISTRO_CONSULTAS_ARCHIVO'],
+                                           int(os.environ.get('REGISTRO_CONSULTAS_INTERVALO', 300)))
+    
+    # Métricas Prometheus en /metrics (agregadas entre workers con METRICAS_DIR)
+    from app.utils.metricas import metricas
+    metricas.init_app(app, db)
+    
+    # Perfilado cProfile bajo demanda (header X-Perfilar o /admin/perfilado)
+    from app.utils.perfilado import perfilador
+    perfilador.init_app(app)
+    
+    from app.utils.helpers import porcentaje_presupuesto
+    app.template_filter('porcentaje_presupuesto')(porcentaje_presupuesto)
+    
+    # Con gunicorn las tareas en segundo plano las inicia gunicorn.conf.py en un
+    # solo worker: acá quedarían en el master (preload_app) o en todos los workers
+    if not os.environ.get('TAREAS_EN_WORKER_DESIGNADO'):
+        iniciar_tareas_segundo_plano(app)
+    
+    return app
+
+
+def _activado(app, clave):
+    """
+    Leer una opción booleana de la configuración de la app o, si no está, del entorno.
+    
+    Acepta booleanos (create_app({'ARCHIVADOR_VIAJES': True})) y textos como
+    '1', 'true', 'si' u 'on' (variables de entorno).
+    """
+    valor = app.config.get(clave, os.environ.get(clave))
+    if isinstance(valor, str):
+        return valor.strip().lower() in ('1', 'true', 'yes', 'si', 'sí', 'on')
+    return bool(valor)
+
+
+def iniciar_tareas_segundo_plano(app):
+    """
+    Iniciar los hilos en segundo plano activados por configuración.
+    
+    Cada tarea debe correr en un solo proceso de la instalación.
+    
+    Args:
+        app: Aplicación Flask (para el contexto de base de datos)
+    """
+    # Notificador de vencimientos de documentos
+    if _activado(app, 'NOTIFICADOR_VENCIMIENTOS'):
+        from app.services import vencimiento_service
+        vencimiento_service.iniciar_notificador(app)
+    
+    # Archivado de viajes terminados (también con archivar_viajes.py)
+    if _activado(app, 'ARCHIVADOR_VIAJES'):
+        from app.services import archivo_service
+        archivo_service.iniciar_archivador(app, dias_gracia=int(os.environ.get('ARCHIVO_DIAS_GRACIA', 30)))
@@ -18,6 +18,14 @@ def init_models(database_instance):
     from .documento import Documento
     from .transporte import Transporte
     from .alojamiento import Alojamiento
+    from .geocodificacion import Geocodificacion
+    from .cambio import Cambio
+    from .archivo import ViajeArchivado
+    from .instantanea import InstantaneaViaje
+    
+    # Versión en los UPDATE masivos (los del ORM usan eventos del mapper)
+    from .versionado import registrar_eventos
+    registrar_eventos(database_instance.session)
     
     return {
         'Viaje': Viaje,
@@ -26,7 +34,11 @@ def init_models(database_instance):
         'Actividad': Actividad,
         'Documento': Documento,
         'Transporte': Transporte,
-        'Alojamiento': Alojamiento
+        'Alojamiento': Alojamiento,
+        'Geocodificacion': Geocodificacion,
+        'Cambio': Cambio,
+        'ViajeArchivado': ViajeArchivado,
+        'InstantaneaViaje': InstantaneaViaje
     }
 
 # Exportar para fácil importación
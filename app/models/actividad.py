@@ -5,9 +5,10 @@ Modelo para Actividades.
 
 from datetime import date
 from . import db
+from .versionado import Versionado
 
 
-class Actividad(db.Model):
+class Actividad(Versionado, db.Model):
     """Modelo para representar actividades de un viaje."""
     
     id = db.Column(db.Integer, primary_key=True)
@@ -4,9 +4,10 @@ Modelo para Alojamientos.
 """
 
 from . import db
+from .versionado import Versionado
 
 
-class Alojamiento(db.Model):
+class Alojamiento(Versionado, db.Model):
     """Modelo para representar alojamientos de un viaje."""
     
     id = db.Column(db.Integer, primary_key=True)
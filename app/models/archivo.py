@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Modelo para los viajes pasados movidos al archivo.
+"""
+
+from datetime import datetime
+from . import db
+
+
+class ViajeArchivado(db.Model):
+    """
+    Viaje terminado guardado fuera de las tablas de uso diario.
+    
+    El viaje completo (con paradas, gastos, actividades, documentos,
+    transportes y alojamientos) se guarda como JSON comprimido con zlib en
+    datos; el resto de las columnas es el resumen que muestra la lista de viajes
+    sin descomprimir nada.
+    """
+    
+    id = db.Column(db.Integer, primary_key=True)
+    viaje_id = db.Column(db.Integer, nullable=False, index=True)  # ID original (se conserva al restaurar si está libre)
+    nombre = db.Column(db.String(200), nullable=False)
+    fecha_inicio = db.Column(db.Date, nullable=False, index=True)
+    fecha_fin = db.Column(db.Date, nullable=False)
+    presupuesto_total = db.Column(db.Float, default=0.0)
+    presupuesto_gastado = db.Column(db.Float, default=0.0)
+    destinos = db.Column(db.Text)  # JSON con los destinos de las primeras paradas
+    num_paradas = db.Column(db.Integer, default=0)
+    num_gastos = db.Column(db.Integer, default=0)
+    num_actividades = db.Column(db.Integer, default=0)
+    datos = db.Column(db.LargeBinary, nullable=False)  # Agregado completo en JSON + zlib
+    tamano_original = db.Column(db.Integer)  # Bytes del JSON sin comprimir
+    fecha_archivado = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<ViajeArchivado {self.viaje_id}: {self.nombre}>'
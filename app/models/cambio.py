@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+Modelo para el registro de cambios usado por la sincronización offline.
+"""
+
+from datetime import datetime
+from . import db
+
+
+class Cambio(db.Model):
+    """Una escritura confirmada sobre un elemento de un viaje (el id sirve de cursor)."""
+    
+    id = db.Column(db.Integer, primary_key=True)
+    viaje_id = db.Column(db.Integer, nullable=False)  # Sin FK: las lápidas sobreviven al viaje
+    entidad = db.Column(db.String(20), nullable=False)  # viajes, paradas, gastos, etc.
+    entidad_id = db.Column(db.Integer, nullable=False)
+    operacion = db.Column(db.String(10), nullable=False)  # upsert, calculado, delete o restaurado (del archivo)
+    origen = db.Column(db.String(64))  # id_cliente de la mutación offline que lo produjo
+    fecha = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_cambio_viaje_id_id', 'viaje_id', 'id'),
+        db.Index('ix_cambio_viaje_id_origen', 'viaje_id', 'origen'),
+    )
+    
+    def __repr__(self):
+        return f'<Cambio {self.id}: {self.operacion} {self.entidad} {self.entidad_id}>'
@@ -4,9 +4,10 @@ Modelo para Documentos.
 """
 
 from . import db
+from .versionado import Versionado
 
 
-class Documento(db.Model):
+class Documento(Versionado, db.Model):
     """Modelo para representar documentos de un viaje."""
     
     id = db.Column(db.Integer, primary_key=True)
@@ -14,7 +15,7 @@ class Documento(db.Model):
     tipo = db.Column(db.String(50), nullable=False)  # pasaporte, visa, reserva, etc.
     nombre = db.Column(db.String(200), nullable=False)
     numero = db.Column(db.String(100))
-    fecha_vencimiento = db.Column(db.Date)
+    fecha_vencimiento = db.Column(db.Date, index=True)  # Indexado para búsquedas globales por rango
     notas = db.Column(db.Text)
 
     def __repr__(self):
@@ -5,9 +5,10 @@ Modelo para Gastos.
 
 from datetime import date
 from . import db
+from .versionado import Versionado
 
 
-class Gasto(db.Model):
+class Gasto(Versionado, db.Model):
     """Modelo para representar gastos de un viaje."""
     
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+Modelo para la caché de geocodificación de destinos.
+"""
+
+from datetime import datetime
+from . import db
+from .versionado import Versionado
+
+
+class Geocodificacion(Versionado, db.Model):
+    """Coordenadas resueltas para un destino, compartidas por todos los viajes."""
+    
+    id = db.Column(db.Integer, primary_key=True)
+    destino_normalizado = db.Column(db.String(200), nullable=False, unique=True, index=True)
+    destino = db.Column(db.String(200), nullable=False)  # Texto original de la primera consulta
+    latitud = db.Column(db.Float)  # None si el proveedor no encontró el destino
+    longitud = db.Column(db.Float)
+    proveedor = db.Column(db.String(50), nullable=False)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<Geocodificacion {self.destino}: {self.latitud}, {self.longitud}>'
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+Modelo para las instantáneas serializadas de cada viaje.
+"""
+
+from datetime import datetime
+from . import db
+
+
+class InstantaneaViaje(db.Model):
+    """
+    Viaje completo serializado para mostrarlo sin hidratar objetos del ORM.
+    
+    Es válida mientras version_agregado coincida con la del viaje; si no, se
+    vuelve a generar (ver InstantaneaService).
+    """
+    
+    viaje_id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Sin FK, como cambio
+    version_agregado = db.Column(db.Integer, nullable=False)
+    formato = db.Column(db.Integer, nullable=False)
+    datos = db.Column(db.LargeBinary, nullable=False)  # JSON compacto con filas empaquetadas en listas
+    fecha_generacion = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<InstantaneaViaje {self.viaje_id} v{self.version_agregado}>'
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Objetos de solo lectura para las consultas de los servicios.
+"""
+
+from dataclasses import dataclass, fields
+from datetime import date, datetime, time
+
+from sqlalchemy import select
+
+
+# Nombres de los campos por clase (dataclasses.fields recorre la clase en cada llamada)
+_CAMPOS = {}
+
+
+class Lectura:
+    """
+    Base de las filas de solo lectura que devuelven los servicios.
+    
+    Cada subclase es una dataclass con __slots__ y congelada cuyos campos
+    llevan el nombre de las columnas del modelo: la consulta selecciona solo
+    esas columnas y cada fila se construye por posición, sin identity map ni
+    instrumentación del ORM. Tienen los mismos atributos que el modelo, así
+    que el código que solo lee (agrupaciones, validaciones, plantillas) sirve
+    para ambos, y a_dict() las deja listas para jsonify.
+    """
+    
+    __slots__ = ()
+    
+    @classmethod
+    def campos(cls):
+        """Nombres de los campos, en el orden de la dataclass."""
+        campos = _CAMPOS.get(cls)
+        if campos is None:
+            campos = _CAMPOS[cls] = tuple(f.name for f in fields(cls))
+        return campos
+    
+    @classmethod
+    def seleccionar(cls, modelo):
+        """SELECT de las columnas del modelo que forman esta lectura (para agregar filtros y orden)."""
+        return select(*(getattr(modelo, campo) for campo in cls.campos()))
+    
+    @classmethod
+    def de_filas(cls, filas):
+        """Construir una lectura por cada fila de un SELECT hecho con seleccionar()."""
+        return [cls(*fila) for fila in filas]
+    
+    @classmethod
+    def de_objetos(cls, objetos):
+        """Construir lecturas a partir de objetos con esos atributos (p.ej. los de una instantánea)."""
+        campos = cls.campos()
+        return [cls(*(getattr(objeto, campo) for campo in campos)) for objeto in objetos]
+    
+    @classmethod
+    def consultar(cls, session, modelo, *criterios, orden=()):
+        """
+        Consultar el modelo y devolver lecturas.
+        
+        Args:
+            session: Sesión de base de datos
+            modelo: Modelo del ORM con las columnas de la lectura
+            *criterios: Condiciones del WHERE
+            orden (tuple): Columnas del ORDER BY
+        
+        Returns:
+            list: Lecturas en el orden de la consulta
+        """
+        consulta = cls.seleccionar(modelo).where(*criterios).order_by(*orden)
+        return cls.de_filas(session.execute(consulta))
+    
+    def a_dict(self):
+        """Diccionario serializable a JSON (fechas y horas en ISO 8601)."""
+        return {campo: _a_json(getattr(self, campo)) for campo in self.campos()}
+
+
+def _a_json(valor):
+    if isinstance(valor, (date, datetime, time)):
+        return valor.isoformat()
+    return valor
+
+
+@dataclass(frozen=True, slots=True)
+class TransporteLectura(Lectura):
+    """Transporte de un viaje (sin notas)."""
+    
+    id: int
+    viaje_id: int
+    tipo: str
+    origen: str
+    destino: str
+    codigo_reserva: str
+    fecha_salida: date
+    hora_salida: time
+    fecha_llegada: date
+    hora_llegada: time
+    aerolinea: str
+    numero_vuelo: str
+    terminal: str
+    puerta: str
+    asiento: str
+
+
+@dataclass(frozen=True, slots=True)
+class DocumentoLectura(Lectura):
+    """Documento de un viaje (sin notas)."""
+    
+    id: int
+    viaje_id: int
+    tipo: str
+    nombre: str
+    numero: str
+    fecha_vencimiento: date
+
+
+@dataclass(frozen=True, slots=True)
+class AlojamientoLectura(Lectura):
+    """Alojamiento de un viaje."""
+    
+    id: int
+    viaje_id: int
+    destino: str
+    nombre: str
+    direccion: str
+    fecha_entrada: date
+    horario_checkin: time
+    fecha_salida: date
+    horario_checkout: time
+    incluye_desayuno: bool
+    numero_confirmacion: str
+    codigo_pin: str
+    numero_checkin: str
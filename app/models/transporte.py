@@ -4,9 +4,10 @@ Modelo para Transportes.
 """
 
 from . import db
+from .versionado import Versionado
 
 
-class Transporte(db.Model):
+class Transporte(Versionado, db.Model):
     """Modelo para representar transportes de un viaje."""
     
     id = db.Column(db.Integer, primary_key=True)
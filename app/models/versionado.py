@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Versión y fecha de actualización comunes a todos los modelos.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import declared_attr, object_session
+
+from . import db
+
+
+class Versionado:
+    """
+    Mixin con la versión de la fila y el momento de su última modificación.
+    
+    Se mantienen solos: cada UPDATE del ORM que cambia alguna columna incrementa
+    la versión y renueva fecha_actualizacion, también en los UPDATE masivos
+    (query.update) de una sesión con registrar_eventos. Los UPDATE masivos con
+    la opción de ejecución solo_campos_calculados (columnas que calcula el
+    servidor, p.ej. presupuesto_gastado) no cambian la versión: no son una
+    edición de la fila y no deben hacer chocar a quien la está editando.
+    
+    version es la version_id_col del mapper: los UPDATE y DELETE del ORM llevan
+    WHERE version = <versión cargada> y fallan con StaleDataError si otra
+    transacción cambió la fila (ver app.utils.concurrencia).
+    """
+    
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @declared_attr.directive
+    def __mapper_args__(cls):
+        return {'version_id_col': cls.__table__.c.version}
+
+
+@event.listens_for(Versionado, 'before_update', propagate=True)
+def _nueva_fecha(mapper, connection, target):
+    """Renovar la fecha de una fila con cambios reales (la versión la sube el mapper)."""
+    session = object_session(target)
+    if session is not None and not session.is_modified(target, include_collections=False):
+        return
+    target.fecha_actualizacion = datetime.utcnow()
+
+
+def _nueva_version_masiva(estado):
+    """Agregar version + 1 y fecha_actualizacion a los UPDATE masivos del ORM."""
+    if not estado.is_update or estado.bind_mapper is None:
+        return
+    if estado.execution_options.get('solo_campos_calculados'):
+        return
+    modelo = estado.bind_mapper.class_
+    if issubclass(modelo, Versionado):
+        estado.statement = estado.statement.values(version=modelo.version + 1,
+                                                   fecha_actualizacion=datetime.utcnow())
+
+
+def registrar_eventos(session):
+    """Escuchar los UPDATE masivos de la sesión (idempotente)."""
+    if not event.contains(session, 'do_orm_execute', _nueva_version_masiva):
+        event.listen(session, 'do_orm_execute', _nueva_version_masiva)
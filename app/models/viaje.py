@@ -5,9 +5,10 @@ Modelos para Viajes y Paradas.
 
 from datetime import datetime, date
 from . import db
+from .versionado import Versionado
 
 
-class Viaje(db.Model):
+class Viaje(Versionado, db.Model):
     """Modelo para representar un viaje completo."""
     
     id = db.Column(db.Integer, primary_key=True)
@@ -18,6 +19,11 @@ class Viaje(db.Model):
     presupuesto_gastado = db.Column(db.Float, default=0.0)
     notas = db.Column(db.Text)
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    # Versión del viaje completo: sube con cualquier cambio del viaje o de sus elementos
+    version_agregado = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    fecha_actualizacion_agregado = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Un viaje restaurado del archivo no se vuelve a archivar automáticamente antes de esta fecha
+    conservar_hasta = db.Column(db.Date)
     
     # Relaciones
     paradas = db.relationship('Parada', backref='viaje', lazy=True, cascade='all, delete-orphan', order_by='Parada.orden')
@@ -26,12 +32,16 @@ class Viaje(db.Model):
     documentos = db.relationship('Documento', backref='viaje', lazy=True, cascade='all, delete-orphan')
     transportes = db.relationship('Transporte', backref='viaje', lazy=True, cascade='all, delete-orphan', order_by='Transporte.fecha_salida')
     alojamientos = db.relationship('Alojamiento', backref='viaje', lazy=True, cascade='all, delete-orphan', order_by='Alojamiento.fecha_entrada')
-
+    
+    # Sin reutilizar IDs en SQLite: el ID de un viaje archivado o eliminado sigue
+    # identificándolo en el registro de cambios y en la caché de los clientes
+    __table_args__ = {'sqlite_autoincrement': True}
+    
     def __repr__(self):
         return f'<Viaje {self.nombre}: {self.fecha_inicio} - {self.fecha_fin}>'
 
 
-class Parada(db.Model):
+class Parada(Versionado, db.Model):
     """Modelo para representar una parada/destino dentro de un viaje."""
     
     id = db.Column(db.Integer, primary_key=True)
@@ -44,6 +54,6 @@ class Parada(db.Model):
     
     # Constraint para evitar paradas duplicadas en el mismo orden
     __table_args__ = (db.UniqueConstraint('viaje_id', 'orden', name='_viaje_orden_uc'),)
-
+    
     def __repr__(self):
         return f'<Parada {self.orden}: {self.destino} ({self.fecha_llegada} - {self.fecha_salida})>'
@@ -34,7 +34,33 @@ def register_blueprints(app):
     from .alojamientos import alojamientos_bp
     app.register_blueprint(alojamientos_bp)
     
-    print("✅ Blueprints registrados correctamente")
+    # Importar y registrar blueprint de búsqueda
+    from .busqueda import busqueda_bp
+    app.register_blueprint(busqueda_bp)
+    
+    # Importar y registrar blueprint de exportación
+    from .exportacion import exportacion_bp
+    app.register_blueprint(exportacion_bp)
+    
+    # Importar y registrar blueprint de importación
+    from .importacion import importacion_bp
+    app.register_blueprint(importacion_bp)
+    
+    # Importar y registrar blueprint de calendario
+    from .calendario import calendario_bp
+    app.register_blueprint(calendario_bp)
+    
+    # Importar y registrar blueprint de sincronización offline
+    from .sincronizacion import sincronizacion_bp
+    app.register_blueprint(sincronizacion_bp)
+    
+    # Importar y registrar blueprint del archivo de viajes
+    from .archivo import archivo_bp
+    app.register_blueprint(archivo_bp)
+    
+    # Importar y registrar blueprint de monitoreo
+    from .monitoreo import monitoreo_bp
+    app.register_blueprint(monitoreo_bp)
 
 # Exportar función principal
 __all__ = ['register_blueprints']
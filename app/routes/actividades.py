@@ -38,3 +38,25 @@ def completar_actividad(actividad_id):
     """Marcar una actividad como completada o no completada."""
     resultado = actividad_service.completar_actividad(actividad_id)
     return jsonify(resultado)
+
+@actividades_bp.route('/actividad/<int:actividad_id>', methods=['PUT'])
+def editar_actividad(actividad_id):
+    """
+    Editar una actividad.
+    
+    Con "version" en el cuerpo la edición se rechaza (409) si la actividad
+    cambió desde que el cliente la leyó.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'No se recibieron datos'}), 400
+    
+    version = data.pop('version', None)
+    data.pop('actividad_id', None)
+    resultado = actividad_service.actualizar_actividad(actividad_id, version=version, **data)
+    
+    if resultado['success']:
+        return jsonify(resultado)
+    if resultado.get('conflicto'):
+        return jsonify(resultado), 409
+    return jsonify(resultado), 404 if resultado.get('no_encontrado') else 400
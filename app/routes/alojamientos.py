@@ -55,6 +55,28 @@ def agregar_alojamiento(viaje_id):
             return jsonify(resultado)
         else:
             return jsonify(resultado), 400
-            
+    
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
+
+@alojamientos_bp.route('/alojamiento/<int:alojamiento_id>', methods=['PUT'])
+def editar_alojamiento(alojamiento_id):
+    """
+    Editar un alojamiento.
+    
+    Con "version" en el cuerpo la edición se rechaza (409) si el alojamiento
+    cambió desde que el cliente lo leyó.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'No se recibieron datos'}), 400
+    
+    version = data.pop('version', None)
+    data.pop('alojamiento_id', None)
+    resultado = alojamiento_service.actualizar_alojamiento(alojamiento_id, version=version, **data)
+    
+    if resultado['success']:
+        return jsonify(resultado)
+    if resultado.get('conflicto'):
+        return jsonify(resultado), 409
+    return jsonify(resultado), 404 if resultado.get('no_encontrado') else 400
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Blueprint para el archivo de viajes pasados.
+"""
+
+import json
+
+from flask import Blueprint, abort, jsonify, redirect, request, url_for
+
+# Crear el blueprint
+archivo_bp = Blueprint('archivo', __name__)
+
+# Variables globales para servicios (se inicializarán después)
+archivo_service = None
+
+def init_archivo_routes(archivo_service_instance):
+    """Inicializa las rutas del archivo con el servicio necesario."""
+    global archivo_service
+    archivo_service = archivo_service_instance
+
+def _resumen_json(archivado):
+    return {
+        'id': archivado.id,
+        'viaje_id': archivado.viaje_id,
+        'nombre': archivado.nombre,
+        'fecha_inicio': archivado.fecha_inicio.isoformat(),
+        'fecha_fin': archivado.fecha_fin.isoformat(),
+        'presupuesto_total': archivado.presupuesto_total,
+        'presupuesto_gastado': archivado.presupuesto_gastado,
+        'destinos': json.loads(archivado.destinos or '[]'),
+        'num_paradas': archivado.num_paradas,
+        'num_gastos': archivado.num_gastos,
+        'num_actividades': archivado.num_actividades,
+        'tamano_original': archivado.tamano_original,
+        'fecha_archivado': archivado.fecha_archivado.isoformat()
+    }
+
+@archivo_bp.route('/archivo', methods=['GET'])
+def listar_archivados():
+    """Listar los viajes archivados (solo el resumen), por páginas (?pagina=, ?por_pagina=)."""
+    pagina = max(request.args.get('pagina', 1, type=int), 1)
+    por_pagina = max(min(request.args.get('por_pagina', 50, type=int), 500), 1)
+    total = archivo_service.contar_archivados()
+    archivados = archivo_service.listar_archivados(limite=por_pagina, desplazamiento=(pagina - 1) * por_pagina)
+    return jsonify({
+        'success': True,
+        'viajes': [_resumen_json(a) for a in archivados],
+        'total': total,
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'paginas': (total + por_pagina - 1) // por_pagina
+    })
+
+@archivo_bp.route('/archivo/<int:archivo_id>', methods=['POST'])
+def abrir_archivado(archivo_id):
+    """
+    Restaurar un viaje archivado y mostrarlo.
+    
+    Solo por POST: restaurar escribe en la base de datos, y un GET lo podría
+    disparar un prefetch del navegador o un rastreador.
+    """
+    resultado = archivo_service.restaurar(archivo_id)
+    if not resultado['success']:
+        abort(404 if 'no encontrado' in resultado['error'] else 500)
+    return redirect(url_for('viajes.ver_viaje', viaje_id=resultado['viaje_id']), code=303)
+
+@archivo_bp.route('/archivo/<int:archivo_id>/restaurar', methods=['POST'])
+def restaurar_archivado(archivo_id):
+    """Devolver un viaje archivado a las tablas de uso diario."""
+    resultado = archivo_service.restaurar(archivo_id)
+    if resultado['success']:
+        return jsonify(resultado)
+    return jsonify(resultado), 404 if 'no encontrado' in resultado['error'] else 500
+
+@archivo_bp.route('/viaje/<int:viaje_id>/archivar', methods=['POST'])
+def archivar_viaje(viaje_id):
+    """Archivar un viaje terminado."""
+    resultado = archivo_service.archivar_viaje(viaje_id)
+    if resultado['success']:
+        return jsonify(resultado)
+    return jsonify(resultado), 404 if 'no encontrado' in resultado['error'] else 400
+
+@archivo_bp.route('/archivo/ejecutar', methods=['POST'])
+def ejecutar_archivado():
+    """
+    Archivar ahora los viajes terminados hace más de ?dias_gracia= días.
+    
+    Procesa ?tamano_lote= viajes por transacción, hasta ?max_lotes= lotes.
+    """
+    resultado = archivo_service.archivar_pendientes(
+        dias_gracia=request.args.get('dias_gracia', 30, type=int),
+        tamano_lote=min(request.args.get('tamano_lote', 100, type=int), 1000),
+        max_lotes=request.args.get('max_lotes', type=int)
+    )
+    return jsonify(dict(resultado, success=not resultado['errores']))
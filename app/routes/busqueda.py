@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Blueprint para rutas de búsqueda.
+"""
+
+from flask import Blueprint, request, jsonify, url_for
+
+# Crear el blueprint
+busqueda_bp = Blueprint('busqueda', __name__)
+
+# Variables globales para servicios (se inicializarán después)
+busqueda_service = None
+
+def init_busqueda_routes(busqueda_service_instance):
+    """Inicializa las rutas de búsqueda con el servicio necesario."""
+    global busqueda_service
+    busqueda_service = busqueda_service_instance
+
+@busqueda_bp.route('/buscar', methods=['GET'])
+def buscar():
+    """Buscar texto en viajes, paradas, actividades, alojamientos, transportes y documentos."""
+    consulta = request.args.get('q', '').strip()
+    limite = min(request.args.get('limite', 20, type=int), 100)
+    viaje_id = request.args.get('viaje_id', type=int)
+    entidades = [e for e in request.args.get('tipos', '').split(',') if e] or None
+    
+    if not consulta:
+        return jsonify({'success': False, 'error': 'Parámetro requerido: q'}), 400
+    
+    resultados = busqueda_service.buscar(consulta, limite=limite, entidades=entidades, viaje_id=viaje_id)
+    for resultado in resultados:
+        resultado['url'] = url_for('viajes.ver_viaje', viaje_id=resultado['viaje_id'])
+    
+    return jsonify({
+        'success': True,
+        'consulta': consulta,
+        'backend': busqueda_service.backend,
+        'resultados': resultados
+    })
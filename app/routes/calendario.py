@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Blueprint para los feeds de calendario (.ics).
+"""
+
+from flask import Blueprint, Response, abort, request, stream_with_context
+
+# Crear el blueprint
+calendario_bp = Blueprint('calendario', __name__)
+
+# Variables globales para servicios (se inicializarán después)
+calendario_service = None
+
+MIMETYPE_ICS = 'text/calendar; charset=utf-8'
+
+def init_calendario_routes(calendario_service_instance):
+    """Inicializa las rutas de calendario con el servicio necesario."""
+    global calendario_service
+    calendario_service = calendario_service_instance
+
+def _respuesta_feed(viaje_id, nombre_archivo, estado=None):
+    """
+    Servir el feed desde la caché o generarlo por partes, con ETag y 304 en ambos casos.
+    
+    El ETag y el Last-Modified salen de los datos (ver CalendarioService.estado),
+    así que también se conocen antes de generar un feed que no está en caché.
+    """
+    cacheado = calendario_service.obtener_cache(viaje_id)
+    if cacheado:
+        cuerpo, etag, ultima_modificacion = cacheado
+        respuesta = Response(cuerpo, mimetype=MIMETYPE_ICS)
+    else:
+        estado = estado or calendario_service.estado(viaje_id)
+        etag, ultima_modificacion = estado['etag'], estado['ultima_modificacion']
+        if request.if_none_match.contains(etag):
+            # El cliente ya tiene esta versión: no generar el feed
+            respuesta = Response(status=304)
+        else:
+            respuesta = Response(stream_with_context(calendario_service.generar(viaje_id, estado=estado)),
+                                 mimetype=MIMETYPE_ICS)
+    
+    respuesta.set_etag(etag)
+    if ultima_modificacion:
+        respuesta.last_modified = ultima_modificacion
+    respuesta.headers['Content-Disposition'] = f'inline; filename="{nombre_archivo}"'
+    # Los clientes pueden guardar el feed pero deben revalidarlo en cada consulta
+    respuesta.headers['Cache-Control'] = 'no-cache'
+    return respuesta.make_conditional(request)
+
+@calendario_bp.route('/viaje/<int:viaje_id>/calendario.ics')
+def calendario_viaje(viaje_id):
+    """Feed iCalendar con el itinerario de un viaje."""
+    estado = None
+    if calendario_service.obtener_cache(viaje_id) is None:
+        estado = calendario_service.estado(viaje_id)
+        if not estado['nombres']:
+            abort(404)
+    return _respuesta_feed(viaje_id, f'viaje_{viaje_id}.ics', estado)
+
+@calendario_bp.route('/calendario/proximos.ics')
+def calendario_proximos():
+    """Feed iCalendar con todos los viajes que todavía no terminaron."""
+    return _respuesta_feed(None, 'proximos_viajes.ics')
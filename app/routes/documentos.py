@@ -4,17 +4,21 @@ Blueprint para rutas de documentos.
 """
 
 from flask import Blueprint, request, jsonify
+from datetime import date
+from app.utils.monitor_sql import presupuesto_consultas
 
 # Crear el blueprint
 documentos_bp = Blueprint('documentos', __name__)
 
 # Variables globales para servicios (se inicializarán después)
 documento_service = None
+vencimiento_service = None
 
-def init_documentos_routes(documento_service_instance):
-    """Inicializa las rutas de documentos con el servicio necesario."""
-    global documento_service
+def init_documentos_routes(documento_service_instance, vencimiento_service_instance=None):
+    """Inicializa las rutas de documentos con los servicios necesarios."""
+    global documento_service, vencimiento_service
     documento_service = documento_service_instance
+    vencimiento_service = vencimiento_service_instance
 
 @documentos_bp.route('/viaje/<int:viaje_id>/documento', methods=['POST'])
 def agregar_documento(viaje_id):
@@ -32,6 +36,28 @@ def agregar_documento(viaje_id):
     
     return jsonify(resultado)
 
+@documentos_bp.route('/documento/<int:documento_id>', methods=['PUT'])
+def editar_documento(documento_id):
+    """
+    Editar un documento.
+    
+    Con "version" en el cuerpo la edición se rechaza (409) si el documento
+    cambió desde que el cliente lo leyó.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'No se recibieron datos'}), 400
+    
+    version = data.pop('version', None)
+    data.pop('documento_id', None)
+    resultado = documento_service.actualizar_documento(documento_id, version=version, **data)
+    
+    if resultado['success']:
+        return jsonify(resultado)
+    if resultado.get('conflicto'):
+        return jsonify(resultado), 409
+    return jsonify(resultado), 404 if resultado.get('no_encontrado') else 400
+
 @documentos_bp.route('/viaje/<int:viaje_id>/documentos/validar', methods=['GET'])
 def validar_documentos(viaje_id):
     """Validar documentos esenciales para un viaje."""
@@ -50,3 +76,30 @@ def estadisticas_documentos(viaje_id):
     """Obtener estadísticas de documentos de un viaje."""
     resultado = documento_service.obtener_estadisticas_documentos(viaje_id)
     return jsonify(resultado)
+
+@documentos_bp.route('/documentos/vencimientos', methods=['GET'])
+@presupuesto_consultas(3)
+def vencimientos_globales():
+    """Listar, paginados, los documentos de todos los viajes próximos a vencer."""
+    dias = request.args.get('dias', 30, type=int)
+    pagina = request.args.get('pagina', 1, type=int)
+    por_pagina = request.args.get('por_pagina', 50, type=int)
+    incluir_vencidos = request.args.get('incluir_vencidos', 'false').lower() in ('1', 'true', 'si')
+    
+    resultado = vencimiento_service.obtener_por_vencer(dias, pagina, por_pagina, incluir_vencidos)
+    
+    return jsonify({
+        'success': True,
+        'documentos': [{
+            'id': d.id,
+            'viaje_id': d.viaje_id,
+            'tipo': d.tipo,
+            'nombre': d.nombre,
+            'fecha_vencimiento': d.fecha_vencimiento.isoformat(),
+            'dias_restantes': (d.fecha_vencimiento - date.today()).days
+        } for d in resultado['documentos']],
+        'total': resultado['total'],
+        'pagina': resultado['pagina'],
+        'por_pagina': resultado['por_pagina'],
+        'paginas': resultado['paginas']
+    })
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Blueprint para rutas de exportación de datos.
+"""
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from app.services.exportacion_service import ENTIDADES
+
+# Crear el blueprint
+exportacion_bp = Blueprint('exportacion', __name__)
+
+# Variables globales para servicios (se inicializarán después)
+exportacion_service = None
+
+FORMATOS = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+def init_exportacion_routes(exportacion_service_instance):
+    """Inicializa las rutas de exportación con el servicio necesario."""
+    global exportacion_service
+    exportacion_service = exportacion_service_instance
+
+def _respuesta_streaming(generador, formato, nombre_archivo):
+    """Respuesta que escribe el generador a medida que produce datos."""
+    respuesta = Response(stream_with_context(generador), mimetype=FORMATOS[formato])
+    respuesta.headers['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    # Evitar que un proxy acumule la respuesta completa antes de enviarla
+    respuesta.headers['X-Accel-Buffering'] = 'no'
+    return respuesta
+
+@exportacion_bp.route('/exportar/viajes-completos.ndjson')
+def exportar_viajes_completos():
+    """Exportar todos los viajes (o uno con ?viaje_id=) con sus elementos, un viaje por línea."""
+    viaje_id = request.args.get('viaje_id', type=int)
+    nombre = f'viaje_{viaje_id}.ndjson' if viaje_id else 'viajes.ndjson'
+    return _respuesta_streaming(exportacion_service.exportar_viajes_ndjson(viaje_id), 'ndjson', nombre)
+
+@exportacion_bp.route('/viaje/<int:viaje_id>/exportar')
+def exportar_viaje(viaje_id):
+    """Exportar un viaje con todos sus elementos en NDJSON."""
+    return _respuesta_streaming(exportacion_service.exportar_viajes_ndjson(viaje_id), 'ndjson',
+                                f'viaje_{viaje_id}.ndjson')
+
+@exportacion_bp.route('/exportar/<entidad>.<formato>')
+def exportar_entidad(entidad, formato):
+    """Exportar las filas de una entidad en NDJSON o CSV (?viaje_id= para un solo viaje)."""
+    if entidad not in ENTIDADES:
+        return jsonify({'success': False, 'error': f'Entidad desconocida: {entidad}',
+                        'entidades': list(ENTIDADES)}), 404
+    if formato not in FORMATOS:
+        return jsonify({'success': False, 'error': f'Formato no soportado: {formato}'}), 400
+    
+    viaje_id = request.args.get('viaje_id', type=int)
+    if viaje_id is not None and entidad == 'geocodificaciones':
+        return jsonify({'success': False, 'error': 'Las geocodificaciones no pertenecen a un viaje'}), 400
+    
+    if formato == 'csv':
+        generador = exportacion_service.exportar_entidad_csv(entidad, viaje_id)
+    else:
+        generador = exportacion_service.exportar_entidad_ndjson(entidad, viaje_id)
+    sufijo = f'_viaje_{viaje_id}' if viaje_id else ''
+    return _respuesta_streaming(generador, formato, f'{entidad}{sufijo}.{formato}')
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+Blueprint para rutas de importación de datos.
+"""
+
+from flask import Blueprint, request, jsonify
+
+# Crear el blueprint
+importacion_bp = Blueprint('importacion', __name__)
+
+# Variables globales para servicios (se inicializarán después)
+importacion_service = None
+
+def init_importacion_routes(importacion_service_instance):
+    """Inicializa las rutas de importación con el servicio necesario."""
+    global importacion_service
+    importacion_service = importacion_service_instance
+
+@importacion_bp.route('/importar/viajes.ndjson', methods=['POST'])
+def importar_viajes():
+    """
+    Importar viajes completos desde un cuerpo NDJSON (formato de /exportar/viajes-completos.ndjson).
+    
+    El cuerpo se lee línea por línea a medida que llega. Parámetros opcionales:
+    ?validar=1 solo valida, ?detener_en_error=1 corta en el primer viaje inválido.
+    """
+    resumen = importacion_service.importar_ndjson(
+        request.stream,
+        solo_validar=request.args.get('validar', '0') == '1',
+        detener_en_error=request.args.get('detener_en_error', '0') == '1'
+    )
+    codigo = 200 if resumen['success'] else (207 if resumen['importados'] else 400)
+    return jsonify(resumen), codigo
@@ -3,30 +3,50 @@
 Blueprint para rutas principales de la aplicación.
 """
 
-from flask import Blueprint, render_template, jsonify
+import json
+
+from flask import Blueprint, render_template, jsonify, url_for
 from datetime import datetime, date
 
+from app.utils.monitor_sql import presupuesto_consultas
+
 # Crear el blueprint
 main_bp = Blueprint('main', __name__)
 
+# Viajes archivados que se muestran en la página principal (los más recientes)
+ARCHIVADOS_EN_INICIO = 12
+
 # Importar funciones y modelos necesarios (se definirán después de la inicialización)
 Viaje = None
 ensure_db_initialized = None
 init_db_auto = None
 get_db_initialized_status = None
 set_db_initialized_status = None
+salud_service = None
 
-def init_main_routes(models_dict, db_functions):
+def init_main_routes(models_dict, db_functions, salud_service_instance=None):
     """Inicializa las rutas principales con los modelos y funciones necesarias."""
     global Viaje, ensure_db_initialized, init_db_auto, get_db_initialized_status, set_db_initialized_status
+    global salud_service
     
     Viaje = models_dict['Viaje']
     ensure_db_initialized = db_functions['ensure_db_initialized']
     init_db_auto = db_functions['init_db_auto']
     get_db_initialized_status = db_functions['get_db_initialized_status']
     set_db_initialized_status = db_functions['set_db_initialized_status']
+    salud_service = salud_service_instance
+
+def _paradas_info(primeras_tres, total):
+    """Resumen de paradas para la tarjeta de un viaje."""
+    return {
+        'total': total,
+        'primeras_tres': primeras_tres,
+        'tiene_mas': total > 3,
+        'extras': total - 3 if total > 3 else 0
+    }
 
 @main_bp.route('/')
+@presupuesto_consultas(6)  # viajes, paradas, gastos, actividades y archivados (conteo y lista)
 def index():
     """Página principal con lista de viajes."""
     # Asegurar que la DB esté inicializada
@@ -40,6 +60,11 @@ def index():
         init_db_auto()
         viajes = Viaje.query.order_by(Viaje.fecha_inicio.desc()).all()
     
+    # Paradas, gastos y actividades contados en tres consultas, no por viaje
+    from app.services import viaje_service
+    resumen = viaje_service.resumen_tarjetas()
+    vacio = {'destinos': [], 'num_paradas': 0, 'num_gastos': 0, 'num_actividades': 0}
+    
     # Calcular el estado de cada viaje en el backend para evitar problemas en Jinja2
     hoy = date.today()
     viajes_con_estado = []
@@ -55,33 +80,48 @@ def index():
             else:
                 estado = 'pasado'
         
-        # Calcular información de paradas para evitar comparaciones en template
-        paradas_info = {
-            'total': len(viaje.paradas) if viaje.paradas else 0,
-            'primeras_tres': viaje.paradas[:3] if viaje.paradas else [],
-            'tiene_mas': len(viaje.paradas) > 3 if viaje.paradas else False,
-            'extras': len(viaje.paradas) - 3 if viaje.paradas and len(viaje.paradas) > 3 else 0
-        }
-        
         # Crear un objeto con el viaje y su estado calculado
+        datos = resumen.get(viaje.id, vacio)
         viaje_info = {
             'viaje': viaje,
             'estado': estado,
-            'paradas_info': paradas_info
+            'url': url_for('viajes.ver_viaje', viaje_id=viaje.id),
+            'paradas_info': _paradas_info(datos['destinos'], datos['num_paradas']),
+            'num_gastos': datos['num_gastos'],
+            'num_actividades': datos['num_actividades']
         }
         viajes_con_estado.append(viaje_info)
     
-    return render_template('index.html', viajes_con_estado=viajes_con_estado, hoy=hoy)
+    # Viajes archivados: solo el resumen de los más recientes, se restauran al
+    # abrirlos (la lista completa, por páginas, en /archivo)
+    from app.services import archivo_service
+    total_archivados = archivo_service.contar_archivados()
+    for archivado in archivo_service.listar_archivados(limite=ARCHIVADOS_EN_INICIO):
+        viajes_con_estado.append({
+            'viaje': archivado,
+            'estado': 'pasado',
+            'url': url_for('archivo.abrir_archivado', archivo_id=archivado.id),
+            'restaurar': True,
+            'paradas_info': _paradas_info(json.loads(archivado.destinos or '[]'), archivado.num_paradas),
+            'num_gastos': archivado.num_gastos,
+            'num_actividades': archivado.num_actividades
+        })
+    viajes_con_estado.sort(key=lambda info: info['viaje'].fecha_inicio, reverse=True)
+    
+    return render_template('index.html', viajes_con_estado=viajes_con_estado, hoy=hoy,
+                           archivados_ocultos=max(total_archivados - ARCHIVADOS_EN_INICIO, 0))
 
 @main_bp.route('/health')
 def health_check():
-    """Endpoint de health check para Railway y otros servicios."""
-    # Health check súper simple - solo verifica que Flask responde
-    return jsonify({
-        'status': 'ok',
-        'app': 'viajes-pwa',
-        'timestamp': datetime.utcnow().isoformat()
-    }), 200
+    """
+    Readiness: verifica base de datos, pool de conexiones y cachés.
+    
+    Responde 503 si la instancia no puede atender tráfico. El resultado se
+    reutiliza unos segundos (SALUD_CACHE_SEGUNDOS). Para liveness usar /ping.
+    """
+    resultado = salud_service.verificar()
+    resultado['app'] = 'viajes-pwa'
+    return jsonify(resultado), 200 if resultado['listo'] else 503
 
 @main_bp.route('/ping')
 def ping():
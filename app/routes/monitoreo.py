@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Blueprint para rutas de monitoreo y diagnóstico.
+"""
+
+from flask import Blueprint, Response, request, jsonify, send_file
+
+# Crear el blueprint
+monitoreo_bp = Blueprint('monitoreo', __name__)
+
+# Variables globales para servicios (se inicializarán después)
+registro_consultas = None
+metricas = None
+perfilador = None
+
+def init_monitoreo_routes(registro_consultas_instance, metricas_instance=None, perfilador_instance=None):
+    """Inicializa las rutas de monitoreo con el registro de consultas, las métricas y el perfilador."""
+    global registro_consultas, metricas, perfilador
+    registro_consultas = registro_consultas_instance
+    metricas = metricas_instance
+    perfilador = perfilador_instance
+
+@monitoreo_bp.route('/admin/consultas-sql', methods=['GET'])
+def consultas_sql():
+    """Consultas SQL agrupadas por huella, ordenadas por tiempo total (o ?orden=)."""
+    orden = request.args.get('orden', 'total')
+    limite = min(request.args.get('limite', 50, type=int), 500)
+    
+    return jsonify({
+        'success': True,
+        'desde': registro_consultas.desde.isoformat(),
+        'umbral_lenta_ms': registro_consultas.umbral_lenta * 1000,
+        'huellas': registro_consultas.resumen(orden=orden, limite=limite)
+    })
+
+@monitoreo_bp.route('/admin/consultas-sql/reiniciar', methods=['POST'])
+def reiniciar_consultas_sql():
+    """Descartar las estadísticas acumuladas de consultas SQL."""
+    registro_consultas.reiniciar()
+    return jsonify({'success': True, 'message': 'Estadísticas de consultas reiniciadas'})
+
+@monitoreo_bp.route('/metrics', methods=['GET'])
+def exportar_metricas():
+    """Métricas en formato de exposición de Prometheus."""
+    return Response(metricas.exportar(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@monitoreo_bp.route('/admin/perfilado', methods=['GET'])
+def estado_perfilado():
+    """Estado del muestreo y perfiles guardados."""
+    return jsonify({
+        'success': True,
+        'muestreo': perfilador.estado(),
+        'perfiles': perfilador.listar_perfiles()
+    })
+
+@monitoreo_bp.route('/admin/perfilado', methods=['POST'])
+def configurar_perfilado():
+    """Activar ({"peticiones": 10, "muestreo": 0.1, "endpoint": "..."}) o desactivar ({"activo": false}) el muestreo."""
+    data = request.get_json(silent=True) or {}
+    
+    if data.get('activo') is False:
+        perfilador.desactivar_muestreo()
+    else:
+        try:
+            perfilador.activar_muestreo(
+                peticiones=int(data.get('peticiones', 10)),
+                muestreo=float(data.get('muestreo', 1.0)),
+                endpoint=data.get('endpoint')
+            )
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'peticiones y muestreo deben ser numéricos'}), 400
+    
+    return jsonify({'success': True, 'muestreo': perfilador.estado()})
+
+@monitoreo_bp.route('/admin/perfilado/servicios', methods=['GET'])
+def perfilado_servicios():
+    """Tiempo y consultas SQL acumulados por método de servicio."""
+    from app.utils.perfilado import resumen_servicios
+    return jsonify({'success': True, 'metodos': resumen_servicios()})
+
+@monitoreo_bp.route('/admin/perfilado/<nombre>', methods=['GET'])
+def descargar_perfil(nombre):
+    """Descargar un perfil: resumen en texto (por defecto) o ?formato=prof para pstats."""
+    extension = '.prof' if request.args.get('formato') == 'prof' else '.txt'
+    ruta = perfilador.ruta_perfil(nombre, extension)
+    if ruta is None:
+        return jsonify({'success': False, 'error': 'Perfil no encontrado'}), 404
+    
+    return send_file(ruta, as_attachment=extension == '.prof')
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Blueprint para la sincronización offline de la PWA.
+"""
+
+from flask import Blueprint, jsonify, request
+
+# Crear el blueprint
+sincronizacion_bp = Blueprint('sincronizacion', __name__)
+
+# Variables globales para servicios (se inicializarán después)
+sincronizacion_service = None
+
+def init_sincronizacion_routes(sincronizacion_service_instance):
+    """Inicializa las rutas de sincronización con el servicio necesario."""
+    global sincronizacion_service
+    sincronizacion_service = sincronizacion_service_instance
+
+@sincronizacion_bp.route('/viaje/<int:viaje_id>/cambios', methods=['GET'])
+def obtener_cambios(viaje_id):
+    """
+    Cambios de un viaje posteriores a ?cursor= (sin cursor devuelve el viaje completo).
+    
+    Con hay_mas=true el cliente vuelve a pedir con el cursor recibido.
+    """
+    cursor = request.args.get('cursor', type=int)
+    limite = min(request.args.get('limite', 500, type=int), 5000)
+    resultado = sincronizacion_service.obtener_cambios(viaje_id, cursor, limite)
+    if resultado is None:
+        return jsonify({'success': False, 'error': 'Viaje no encontrado'}), 404
+    return jsonify(resultado)
+
+@sincronizacion_bp.route('/viaje/<int:viaje_id>/sincronizar', methods=['POST'])
+def sincronizar(viaje_id):
+    """
+    Aplicar un lote de mutaciones hechas sin conexión.
+    
+    Cuerpo: {"cursor": N, "mutaciones": [{"id_cliente", "entidad", "operacion", "id", "datos"}, ...]}
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Se esperaba un cuerpo JSON'}), 400
+    
+    resultado = sincronizacion_service.aplicar_mutaciones(viaje_id, data.get('mutaciones'), data.get('cursor', 0))
+    if resultado is None:
+        return jsonify({'success': False, 'error': 'Viaje no encontrado'}), 404
+    if 'resultados' not in resultado:
+        return jsonify(resultado), 400
+    return jsonify(resultado), 200 if resultado['success'] else 207
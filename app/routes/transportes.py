@@ -4,6 +4,8 @@ Blueprint para rutas de transportes.
 """
 
 from flask import Blueprint, request, jsonify
+from datetime import timedelta
+from app.utils.monitor_sql import presupuesto_consultas
 
 # Crear el blueprint
 transportes_bp = Blueprint('transportes', __name__)
@@ -41,3 +43,46 @@ def agregar_transporte(viaje_id):
     )
     
     return jsonify(resultado)
+
+@transportes_bp.route('/transporte/<int:transporte_id>', methods=['PUT'])
+def editar_transporte(transporte_id):
+    """
+    Editar un transporte.
+    
+    Con "version" en el cuerpo la edición se rechaza (409) si el transporte
+    cambió desde que el cliente lo leyó.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'No se recibieron datos'}), 400
+    
+    version = data.pop('version', None)
+    data.pop('transporte_id', None)
+    resultado = transporte_service.actualizar_transporte(transporte_id, version=version, **data)
+    
+    if resultado['success']:
+        return jsonify(resultado)
+    if resultado.get('conflicto'):
+        return jsonify(resultado), 409
+    return jsonify(resultado), 404 if resultado.get('no_encontrado') else 400
+
+@transportes_bp.route('/transportes/conexiones-criticas', methods=['GET'])
+@presupuesto_consultas(2)
+def conexiones_criticas_proximas():
+    """Verificar conexiones críticas de todos los viajes en curso o futuros."""
+    minutos = request.args.get('minutos', 60, type=int)
+    conexiones_por_viaje = transporte_service.verificar_conexiones_viajes_proximos(
+        tiempo_minimo_conexion=timedelta(minutes=minutos)
+    )
+    
+    resultado = {}
+    for viaje_id, conexiones in conexiones_por_viaje.items():
+        resultado[viaje_id] = [{
+            'transporte_actual_id': c['transporte_actual'].id,
+            'siguiente_transporte_id': c['siguiente_transporte'].id,
+            'punto_conexion': c['transporte_actual'].destino,
+            'minutos_conexion': int(c['tiempo_conexion'].total_seconds() // 60),
+            'minutos_faltantes': int(c['diferencia'].total_seconds() // 60)
+        } for c in conexiones]
+    
+    return jsonify({'success': True, 'viajes': resultado})
@@ -3,10 +3,17 @@
 Blueprint para rutas de viajes y paradas.
 """
 
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for
-from datetime import datetime, date
+import json
+from flask import Blueprint, Response, abort, render_template, request, jsonify, redirect, url_for
+from datetime import datetime, date, timezone
 from collections import OrderedDict
 
+from sqlalchemy import func
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.utils.concurrencia import reintentar_en_conflicto, resultado_conflicto, version_vigente
+from app.utils.monitor_sql import presupuesto_consultas
+
 # Crear el blueprint
 viajes_bp = Blueprint('viajes', __name__)
 
@@ -28,19 +35,85 @@ def init_viajes_routes(models_dict, database_instance):
     viaje_service.init_service(models_dict, database_instance)
 
 @viajes_bp.route('/viaje/<int:viaje_id>')
+@presupuesto_consultas(12)  # 2 con la instantánea al día, 11 si hay que regenerarla
 def ver_viaje(viaje_id):
-    """Mostrar los detalles de un viaje específico."""
-    viaje = Viaje.query.get_or_404(viaje_id)
+    """
+    Mostrar los detalles de un viaje específico (si está archivado, solo su resumen).
+    
+    Se muestra desde la instantánea del viaje, sin hidratar objetos del ORM.
+    """
+    from app.services import instantanea_service
+    viaje = instantanea_service.obtener(viaje_id)
+    if viaje is None:
+        from app.services import archivo_service
+        archivado = archivo_service.obtener_por_viaje(viaje_id)
+        if archivado is None:
+            abort(404)
+        # Solo el resumen: restaurarlo es un POST desde esa página
+        return render_template('viaje_archivado.html', archivado=archivado,
+                               destinos=json.loads(archivado.destinos or '[]'))
     
     # Usar el servicio para agrupar actividades
-    from app.services import viaje_service
-    actividades_ordenadas = viaje_service.agrupar_actividades_por_destino(viaje)
+    from app.services import actividad_service
+    actividades_ordenadas = actividad_service.agrupar_actividades(viaje.actividades)
+    
+    # Coordenadas del mapa solo desde la caché: la página pide las que falten
+    # a /viaje/<id>/coordenadas después de cargar, sin esperar al geocodificador
+    from app.services import geocodificacion_service
+    coordenadas_paradas, coordenadas_pendientes = geocodificacion_service.coordenadas_paradas_cacheadas(viaje)
     
     return render_template('viaje.html', 
                          viaje=viaje, 
                          actividades_agrupadas=actividades_ordenadas,
+                         coordenadas_paradas=coordenadas_paradas,
+                         coordenadas_pendientes=coordenadas_pendientes,
                          hoy=date.today())
 
+@viajes_bp.route('/viaje/<int:viaje_id>/coordenadas', methods=['GET'])
+def coordenadas_viaje(viaje_id):
+    """
+    Coordenadas de las paradas de un viaje, resolviendo con el geocodificador las que falten.
+    
+    Puede tardar (la instancia pública de Nominatim admite una petición por
+    segundo); la página del viaje la llama en segundo plano.
+    """
+    viaje = db.session.get(Viaje, viaje_id)
+    if viaje is None:
+        return jsonify({'success': False, 'error': 'Viaje no encontrado'}), 404
+    
+    from app.services import geocodificacion_service
+    coordenadas = geocodificacion_service.coordenadas_paradas(viaje)
+    return jsonify({'success': True, 'coordenadas': coordenadas})
+
+@viajes_bp.route('/viaje/<int:viaje_id>/datos', methods=['GET'])
+def datos_viaje(viaje_id):
+    """
+    Viaje completo en JSON, leído de su instantánea.
+    
+    Con ?formato=compacto se devuelve la instantánea tal como está guardada
+    (filas como listas y los nombres de columna una vez por tabla en "c").
+    """
+    from app.services import instantanea_service
+    if request.args.get('formato') == 'compacto':
+        datos = instantanea_service.obtener_datos(viaje_id)
+        if datos is None:
+            return jsonify({'success': False, 'error': 'Viaje no encontrado'}), 404
+        return Response(datos, mimetype='application/json')
+    
+    agregado = instantanea_service.obtener_agregado(viaje_id)
+    if agregado is None:
+        return jsonify({'success': False, 'error': 'Viaje no encontrado'}), 404
+    return jsonify(agregado)
+
+@viajes_bp.route('/viaje/<int:viaje_id>/validar', methods=['GET'])
+def validar_viaje(viaje_id):
+    """Revisión completa del viaje: documentos, transportes y alojamientos con sus recomendaciones."""
+    from app.services import viaje_service
+    resultado = viaje_service.validar_viaje(viaje_id)
+    if not resultado['success']:
+        return jsonify(resultado), 404
+    return jsonify(resultado)
+
 @viajes_bp.route('/viaje/<int:viaje_id>/eliminar', methods=['POST'])
 def eliminar_viaje(viaje_id):
     """Eliminar un viaje y todos sus elementos relacionados."""
@@ -101,17 +174,23 @@ def agregar_parada(viaje_id):
     """Agregar una nueva parada a un viaje."""
     data = request.get_json()
     
-    parada = Parada(
-        viaje_id=viaje_id,
-        destino=data['destino'],
-        orden=999,  # Orden temporal, se reorganizará automáticamente
-        fecha_llegada=datetime.strptime(data['fecha_llegada'], '%Y-%m-%d').date(),
-        fecha_salida=datetime.strptime(data['fecha_salida'], '%Y-%m-%d').date(),
-        notas=data.get('notas', '')
-    )
+    def crear():
+        # Al final (se reorganizará automáticamente); si otra alta concurrente
+        # toma el mismo orden, el constraint falla y se reintenta
+        ultimo = db.session.query(func.max(Parada.orden)).filter_by(viaje_id=viaje_id).scalar()
+        parada = Parada(
+            viaje_id=viaje_id,
+            destino=data['destino'],
+            orden=(ultimo or 0) + 1,
+            fecha_llegada=datetime.strptime(data['fecha_llegada'], '%Y-%m-%d').date(),
+            fecha_salida=datetime.strptime(data['fecha_salida'], '%Y-%m-%d').date(),
+            notas=data.get('notas', '')
+        )
+        db.session.add(parada)
+        db.session.commit()
+        return parada
     
-    db.session.add(parada)
-    db.session.commit()
+    parada = reintentar_en_conflicto(db.session, crear)
     
     # Reordenar automáticamente todas las paradas por fecha
     from app.services import viaje_service
@@ -136,7 +215,7 @@ def reordenar_parada(parada_id):
         data = request.get_json()
         if not data or 'nuevo_orden' not in data:
             return jsonify({'success': False, 'error': 'Datos incompletos'}), 400
-            
+        
         nuevo_orden = int(data['nuevo_orden'])
         
         # Usar el servicio para reordenar la parada
@@ -145,20 +224,30 @@ def reordenar_parada(parada_id):
         
         if resultado['success']:
             return jsonify(resultado)
+        elif resultado.get('conflicto'):
+            return jsonify(resultado), 409
         else:
             return jsonify(resultado), 500
-        
+    
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @viajes_bp.route('/parada/<int:parada_id>', methods=['PUT'])
 def editar_parada(parada_id):
-    """Editar los datos de una parada."""
+    """
+    Editar los datos de una parada.
+    
+    Con "version" en el cuerpo la edición se rechaza (409) si la parada cambió
+    desde que el cliente la leyó.
+    """
     try:
         data = request.get_json()
         parada = Parada.query.get_or_404(parada_id)
         viaje_id = parada.viaje_id
         
+        if not version_vigente(parada, data.get('version')):
+            return jsonify(resultado_conflicto(parada, 'la parada')), 409
+        
         # Actualizar campos
         parada.destino = data['destino']
         parada.fecha_llegada = datetime.strptime(data['fecha_llegada'], '%Y-%m-%d').date()
@@ -173,9 +262,14 @@ def editar_parada(parada_id):
         
         return jsonify({
             'success': True,
-            'message': 'Parada actualizada y reordenada correctamente'
+            'message': 'Parada actualizada y reordenada correctamente',
+            'version': db.session.get(Parada, parada_id).version
         })
-        
+    
+    except StaleDataError:
+        # Otra transacción cambió la parada entre la lectura y el UPDATE
+        db.session.rollback()
+        return jsonify(resultado_conflicto(elemento='la parada')), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -206,7 +300,7 @@ def eliminar_parada(parada_id):
             'success': True,
             'message': 'Parada eliminada correctamente'
         })
-        
+    
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -214,6 +308,33 @@ def eliminar_parada(parada_id):
             'message': f'Error al eliminar parada: {str(e)}'
         }), 500
 
+@viajes_bp.route('/viajes/modificados', methods=['GET'])
+def viajes_modificados():
+    """
+    Viajes con cambios posteriores al cursor ?desde= (ISO 8601, UTC) e ?id=.
+    
+    El cliente guarda el cursor de la respuesta y lo envía en la siguiente
+    consulta (con hay_mas=true, enseguida). Puede repetir viajes que ya
+    recibió: se comparan por version_agregado.
+    """
+    try:
+        desde = datetime.fromisoformat(request.args['desde'])
+    except (KeyError, ValueError):
+        return jsonify({'success': False, 'error': 'Parámetro desde requerido (ISO 8601)'}), 400
+    if desde.tzinfo is not None:
+        # Las fechas se guardan en UTC sin zona horaria
+        desde = desde.astimezone(timezone.utc).replace(tzinfo=None)
+    despues_de_id = request.args.get('id', 0, type=int)
+    limite = max(min(request.args.get('limite', 1000, type=int), 10000), 1)
+    
+    from app.services import viaje_service
+    resultado = viaje_service.obtener_viajes_modificados_desde(desde, limite, despues_de_id)
+    for viaje in resultado['viajes']:
+        viaje['fecha_actualizacion_agregado'] = viaje['fecha_actualizacion_agregado'].isoformat()
+    cursor = resultado['cursor']
+    return jsonify({'success': True, 'viajes': resultado['viajes'], 'hay_mas': resultado['hay_mas'],
+                    'cursor': {'desde': cursor['desde'].isoformat(), 'id': cursor['id']}})
+
 @viajes_bp.route('/admin/reordenar-todos-viajes', methods=['POST'])
 def reordenar_todos_viajes():
     """Endpoint administrativo para reordenar todas las paradas de todos los viajes por fecha."""
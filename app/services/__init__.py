@@ -10,6 +10,16 @@ from .actividad_service import ActividadService, actividad_service
 from .documento_service import DocumentoService, documento_service
 from .transporte_service import TransporteService, transporte_service
 from .alojamiento_service import AlojamientoService, alojamiento_service
+from .vencimiento_service import VencimientoService, vencimiento_service
+from .busqueda_service import BusquedaService, busqueda_service
+from .geocodificacion_service import GeocodificacionService, geocodificacion_service
+from .salud_service import SaludService, salud_service
+from .exportacion_service import ExportacionService, exportacion_service
+from .importacion_service import ImportacionService, importacion_service
+from .calendario_service import CalendarioService, calendario_service
+from .sincronizacion_service import SincronizacionService, sincronizacion_service
+from .archivo_service import ArchivoService, archivo_service
+from .instantanea_service import InstantaneaService, instantanea_service
 
 # Exportar servicios principales
 __all__ = [
@@ -26,5 +36,25 @@ __all__ = [
     'TransporteService',
     'transporte_service',
     'AlojamientoService',
-    'alojamiento_service'
+    'alojamiento_service',
+    'VencimientoService',
+    'vencimiento_service',
+    'BusquedaService',
+    'busqueda_service',
+    'GeocodificacionService',
+    'geocodificacion_service',
+    'SaludService',
+    'salud_service',
+    'ExportacionService',
+    'exportacion_service',
+    'ImportacionService',
+    'importacion_service',
+    'CalendarioService',
+    'calendario_service',
+    'SincronizacionService',
+    'sincronizacion_service',
+    'ArchivoService',
+    'archivo_service',
+    'InstantaneaService',
+    'instantanea_service'
 ]
@@ -6,7 +6,13 @@ Servicio para la lógica de negocio de actividades.
 from datetime import datetime, date
 from collections import OrderedDict
 
+from sqlalchemy.orm.exc import StaleDataError
 
+from app.utils.metricas import medir_servicio
+from app.utils.concurrencia import resultado_conflicto, version_vigente
+
+
+@medir_servicio('actividad')
 class ActividadService:
     """Servicio para manejar la lógica de negocio relacionada con actividades."""
     
@@ -85,7 +91,7 @@ class ActividadService:
         try:
             actividad = self.Actividad.query.get(actividad_id)
             if not actividad:
-                return {'success': False, 'error': 'Actividad no encontrada'}
+                return {'success': False, 'no_encontrado': True, 'error': 'Actividad no encontrada'}
             
             # Si no se especifica completada, hacer toggle
             if completada is None:
@@ -129,7 +135,19 @@ class ActividadService:
         Returns:
             OrderedDict: Actividades agrupadas por destino y ordenadas
         """
-        actividades = self.obtener_actividades_por_viaje(viaje_id)
+        return self.agrupar_actividades(self.obtener_actividades_por_viaje(viaje_id))
+    
+    def agrupar_actividades(self, actividades):
+        """
+        Agrupa y ordena por destino y fecha/hora actividades ya cargadas.
+        
+        Args:
+            actividades (list): Actividades del ORM u objetos con los mismos atributos
+                (p.ej. las de una instantánea del viaje)
+            
+        Returns:
+            OrderedDict: Actividades agrupadas por destino y ordenadas
+        """
         actividades_agrupadas = {}
         
         # Agrupar actividades por destino
@@ -228,7 +246,7 @@ class ActividadService:
         try:
             actividad = self.Actividad.query.get(actividad_id)
             if not actividad:
-                return {'success': False, 'error': 'Actividad no encontrada'}
+                return {'success': False, 'no_encontrado': True, 'error': 'Actividad no encontrada'}
             
             self.db.session.delete(actividad)
             self.db.session.commit()
@@ -239,21 +257,25 @@ class ActividadService:
             self.db.session.rollback()
             return {'success': False, 'error': str(e)}
     
-    def actualizar_actividad(self, actividad_id, **kwargs):
+    def actualizar_actividad(self, actividad_id, version=None, **kwargs):
         """
         Actualizar campos de una actividad.
         
         Args:
             actividad_id (int): ID de la actividad
+            version (int): Versión que editó el cliente; si ya no es la actual
+                no se escribe nada y se informa el conflicto
             **kwargs: Campos a actualizar
             
         Returns:
-            dict: Resultado con success
+            dict: Resultado con success y la nueva version, o conflicto=True o no_encontrado=True
         """
         try:
             actividad = self.Actividad.query.get(actividad_id)
             if not actividad:
-                return {'success': False, 'error': 'Actividad no encontrada'}
+                return {'success': False, 'no_encontrado': True, 'error': 'Actividad no encontrada'}
+            if not version_vigente(actividad, version):
+                return resultado_conflicto(actividad, 'la actividad')
             
             # Actualizar campos permitidos
             campos_permitidos = ['nombre', 'fecha', 'hora', 'ubicacion', 'descripcion', 'destino', 'completada']
@@ -268,10 +290,16 @@ class ActividadService:
                     
                     setattr(actividad, campo, valor)
             
+            self.db.session.flush()
+            nueva_version = actividad.version
             self.db.session.commit()
             
-            return {'success': True}
+            return {'success': True, 'version': nueva_version}
             
+        except StaleDataError:
+            # Otra transacción cambió la fila entre la lectura y el UPDATE
+            self.db.session.rollback()
+            return resultado_conflicto(elemento='la actividad')
         except Exception as e:
             self.db.session.rollback()
             return {'success': False, 'error': str(e)}
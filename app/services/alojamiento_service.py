@@ -6,7 +6,15 @@ Servicio para la lógica de negocio de alojamientos de viaje.
 from datetime import datetime, date, timedelta
 from collections import defaultdict, OrderedDict
 
+from sqlalchemy import select
+from sqlalchemy.orm.exc import StaleDataError
 
+from app.models.lecturas import AlojamientoLectura
+from app.utils.metricas import medir_servicio
+from app.utils.concurrencia import resultado_conflicto, version_vigente
+
+
+@medir_servicio('alojamiento')
 class AlojamientoService:
     """Servicio para manejar la lógica de negocio relacionada con alojamientos."""
     
@@ -92,29 +100,32 @@ class AlojamientoService:
     
     def obtener_alojamientos_por_viaje(self, viaje_id):
         """
-        Obtener todos los alojamientos de un viaje ordenados por fecha de entrada.
+        Obtener todos los alojamientos de un viaje ordenados por fecha de entrada, de solo lectura.
         
         Args:
             viaje_id (int): ID del viaje
             
         Returns:
-            list: Lista de alojamientos del viaje
+            list: Lista de AlojamientoLectura del viaje
         """
-        return self.Alojamiento.query.filter_by(viaje_id=viaje_id).order_by(
-            self.Alojamiento.fecha_entrada
-        ).all()
+        return AlojamientoLectura.consultar(
+            self.db.session, self.Alojamiento, self.Alojamiento.viaje_id == viaje_id,
+            orden=(self.Alojamiento.fecha_entrada,)
+        )
     
-    def agrupar_alojamientos_por_destino(self, viaje_id):
+    def agrupar_alojamientos_por_destino(self, viaje_id, alojamientos=None):
         """
         Agrupar alojamientos de un viaje por destino.
         
         Args:
             viaje_id (int): ID del viaje
+            alojamientos (list): Alojamientos ya cargados (optional, evita la consulta)
             
         Returns:
             dict: Diccionario con destinos como claves y listas de alojamientos como valores
         """
-        alojamientos = self.obtener_alojamientos_por_viaje(viaje_id)
+        if alojamientos is None:
+            alojamientos = self.obtener_alojamientos_por_viaje(viaje_id)
         alojamientos_agrupados = defaultdict(list)
         
         for alojamiento in alojamientos:
@@ -159,23 +170,31 @@ class AlojamientoService:
             'noches_por_destino': dict(estancias_por_destino)
         }
     
-    def verificar_continuidad_alojamiento(self, viaje_id):
+    def verificar_continuidad_alojamiento(self, viaje_id, alojamientos=None, viaje=None):
         """
         Verificar si hay gaps en la cobertura de alojamiento durante el viaje.
         
         Args:
             viaje_id (int): ID del viaje
+            alojamientos (list): Alojamientos ya cargados y ordenados por fecha de entrada
+                (optional, evita la consulta)
+            viaje: Objeto con fecha_inicio y fecha_fin del viaje (optional, evita la consulta)
             
         Returns:
             dict: Información sobre gaps y cobertura
         """
-        alojamientos = self.obtener_alojamientos_por_viaje(viaje_id)
+        if alojamientos is None:
+            alojamientos = self.obtener_alojamientos_por_viaje(viaje_id)
         
         if not alojamientos:
-            return {'gaps': [], 'cobertura_completa': False, 'primer_alojamiento': None, 'ultimo_alojamiento': None}
+            return {'gaps': [], 'cobertura_completa': False, 'primer_alojamiento': None, 'ultimo_alojamiento': None,
+                    'total_gaps': 0, 'dias_sin_alojamiento': 0}
         
         # Obtener fechas del viaje
-        viaje = self.Viaje.query.get(viaje_id)
+        if viaje is None:
+            viaje = self.db.session.execute(
+                select(self.Viaje.fecha_inicio, self.Viaje.fecha_fin).where(self.Viaje.id == viaje_id)
+            ).first()
         if not viaje:
             return {'error': 'Viaje no encontrado'}
         
@@ -241,15 +260,16 @@ class AlojamientoService:
             viaje_id (int): ID del viaje
             
         Returns:
-            list: Lista de alojamientos actuales
+            list: Lista de AlojamientoLectura actuales
         """
         hoy = date.today()
         
-        return self.Alojamiento.query.filter(
+        return AlojamientoLectura.consultar(
+            self.db.session, self.Alojamiento,
             self.Alojamiento.viaje_id == viaje_id,
             self.Alojamiento.fecha_entrada <= hoy,
             self.Alojamiento.fecha_salida > hoy
-        ).all()
+        )
     
     def obtener_proximos_checkins(self, viaje_id, dias_anticipacion=7):
         """
@@ -260,15 +280,17 @@ class AlojamientoService:
             dias_anticipacion (int): Días de anticipación desde hoy
             
         Returns:
-            list: Lista de alojamientos con check-in próximo
+            list: Lista de AlojamientoLectura con check-in próximo
         """
         fecha_limite = date.today() + timedelta(days=dias_anticipacion)
         
-        return self.Alojamiento.query.filter(
+        return AlojamientoLectura.consultar(
+            self.db.session, self.Alojamiento,
             self.Alojamiento.viaje_id == viaje_id,
             self.Alojamiento.fecha_entrada <= fecha_limite,
-            self.Alojamiento.fecha_entrada >= date.today()
-        ).order_by(self.Alojamiento.fecha_entrada).all()
+            self.Alojamiento.fecha_entrada >= date.today(),
+            orden=(self.Alojamiento.fecha_entrada,)
+        )
     
     def obtener_estadisticas_alojamientos(self, viaje_id):
         """
@@ -295,7 +317,7 @@ class AlojamientoService:
         
         # Calcular estadísticas básicas
         noches_info = self.calcular_noches_estancia(viaje_id)
-        continuidad_info = self.verificar_continuidad_alojamiento(viaje_id)
+        continuidad_info = self.verificar_continuidad_alojamiento(viaje_id, alojamientos)
         
         # Contar alojamientos con características específicas
         con_desayuno = sum(1 for a in alojamientos if a.incluye_desayuno)
@@ -320,18 +342,22 @@ class AlojamientoService:
             'porcentaje_con_confirmacion': round((con_confirmacion / total * 100), 1)
         }
     
-    def validar_alojamientos_para_viaje(self, viaje_id):
+    def validar_alojamientos_para_viaje(self, viaje_id, alojamientos=None, viaje=None):
         """
         Validar la completitud y coherencia de los alojamientos de un viaje.
         
         Args:
             viaje_id (int): ID del viaje
+            alojamientos (list): Alojamientos ya cargados y ordenados por fecha de entrada
+                (optional, evita la consulta)
+            viaje: Objeto con fecha_inicio y fecha_fin del viaje (optional, evita la consulta)
             
         Returns:
             dict: Resultado de validación con recomendaciones
         """
-        alojamientos = self.obtener_alojamientos_por_viaje(viaje_id)
-        continuidad_info = self.verificar_continuidad_alojamiento(viaje_id)
+        if alojamientos is None:
+            alojamientos = self.obtener_alojamientos_por_viaje(viaje_id)
+        continuidad_info = self.verificar_continuidad_alojamiento(viaje_id, alojamientos, viaje)
         
         # Verificar información faltante
         sin_confirmacion = [a for a in alojamientos if not a.numero_confirmacion]
@@ -370,7 +396,7 @@ class AlojamientoService:
             recomendaciones.append(f"Completar direcciones para {len(sin_direccion)} alojamientos")
         
         # Verificar si hay muchas noches en el mismo destino sin alojamiento continuo
-        agrupados = self.agrupar_alojamientos_por_destino(alojamientos[0].viaje_id)
+        agrupados = self.agrupar_alojamientos_por_destino(alojamientos[0].viaje_id, alojamientos)
         for destino, alojamientos_destino in agrupados.items():
             if len(alojamientos_destino) > 2:
                 recomendaciones.append(f"Considerar consolidar alojamientos en {destino.title()} ({len(alojamientos_destino)} alojamientos)")
@@ -390,7 +416,7 @@ class AlojamientoService:
         try:
             alojamiento = self.Alojamiento.query.get(alojamiento_id)
             if not alojamiento:
-                return {'success': False, 'error': 'Alojamiento no encontrado'}
+                return {'success': False, 'no_encontrado': True, 'error': 'Alojamiento no encontrado'}
             
             self.db.session.delete(alojamiento)
             self.db.session.commit()
@@ -401,21 +427,25 @@ class AlojamientoService:
             self.db.session.rollback()
             return {'success': False, 'error': str(e)}
     
-    def actualizar_alojamiento(self, alojamiento_id, **kwargs):
+    def actualizar_alojamiento(self, alojamiento_id, version=None, **kwargs):
         """
         Actualizar campos de un alojamiento.
         
         Args:
             alojamiento_id (int): ID del alojamiento
+            version (int): Versión que editó el cliente; si ya no es la actual
+                no se escribe nada y se informa el conflicto
             **kwargs: Campos a actualizar
             
         Returns:
-            dict: Resultado con success
+            dict: Resultado con success y la nueva version, o conflicto=True o no_encontrado=True
         """
         try:
             alojamiento = self.Alojamiento.query.get(alojamiento_id)
             if not alojamiento:
-                return {'success': False, 'error': 'Alojamiento no encontrado'}
+                return {'success': False, 'no_encontrado': True, 'error': 'Alojamiento no encontrado'}
+            if not version_vigente(alojamiento, version):
+                return resultado_conflicto(alojamiento, 'el alojamiento')
             
             # Actualizar campos permitidos
             campos_permitidos = [
@@ -436,10 +466,16 @@ class AlojamientoService:
                     
                     setattr(alojamiento, campo, valor)
             
+            self.db.session.flush()
+            nueva_version = alojamiento.version
             self.db.session.commit()
             
-            return {'success': True}
+            return {'success': True, 'version': nueva_version}
             
+        except StaleDataError:
+            # Otra transacción cambió la fila entre la lectura y el UPDATE
+            self.db.session.rollback()
+            return resultado_conflicto(elemento='el alojamiento')
         except Exception as e:
             self.db.session.rollback()
             return {'success': False, 'error': str(e)}
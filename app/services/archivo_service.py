@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio para archivar viajes pasados y restaurarlos bajo demanda.
+"""
+
+import json
+import threading
+import zlib
+from datetime import date, timedelta
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import defer
+
+from app.utils.metricas import medir_servicio
+from .busqueda_service import CAMPOS_INDEXADOS
+from .exportacion_service import ELEMENTOS_VIAJE, _serializar
+from .importacion_service import _convertir
+
+
+# Destinos guardados en el resumen (la lista de viajes muestra los tres primeros)
+DESTINOS_RESUMEN = 3
+
+# Días que un viaje restaurado queda fuera del archivado automático
+DIAS_CONSERVAR_RESTAURADO = 30
+
+
+@medir_servicio('archivo')
+class ArchivoService:
+    """
+    Mueve los viajes terminados fuera de las tablas de uso diario.
+    
+    Cada viaje archivado queda como una fila de viaje_archivado: un resumen para
+    la lista de viajes y el agregado completo en JSON comprimido. Sus filas se
+    borran de viaje y de las tablas de elementos, así que las consultas
+    globales y la lista de viajes ya no las recorren. Restaurar vuelve a
+    insertar las filas tal como estaban (mismos IDs si siguen libres).
+    
+    El archivado se hace por lotes, cada uno en su propia transacción, y puede
+    correr en un hilo en segundo plano (iniciar_archivador) o con
+    archivar_viajes.py desde cron.
+    """
+    
+    def __init__(self, database_service=None):
+        """Inicializar el servicio de archivo."""
+        self.db_service = database_service
+        self.db = None
+        self._models = None
+        self._archivador = None
+        self._detener = threading.Event()
+    
+    def init_models(self, models_dict, database_instance):
+        """Inicializar los modelos necesarios."""
+        self._models = models_dict
+        self.db = database_instance
+    
+    def _tabla(self, nombre_modelo):
+        return self._models[nombre_modelo].__table__
+    
+    # ------------------------------------------------------------------
+    # Archivar
+    # ------------------------------------------------------------------
+    
+    def obtener_candidatos(self, dias_gracia=30, limite=100):
+        """
+        IDs de los viajes terminados hace más de dias_gracia días.
+        
+        Se saltean los viajes restaurados hace poco (conservar_hasta todavía
+        no pasó): de lo contrario el archivador los volvería a archivar en su
+        próxima pasada, porque su fecha de fin sigue siendo la misma.
+        
+        Args:
+            dias_gracia (int): Días desde la fecha de fin antes de archivar
+            limite (int): Máximo de IDs a devolver
+        
+        Returns:
+            list: IDs de viaje en orden ascendente
+        """
+        Viaje = self._models['Viaje']
+        hoy = date.today()
+        fecha_limite = hoy - timedelta(days=dias_gracia)
+        return self.db.session.execute(
+            select(Viaje.id).where(
+                Viaje.fecha_fin < fecha_limite,
+                or_(Viaje.conservar_hasta.is_(None), Viaje.conservar_hasta < hoy)
+            ).order_by(Viaje.id).limit(limite)
+        ).scalars().all()
+    
+    @staticmethod
+    def _resumen(agregado, datos, tamano_original):
+        """Fila de viaje_archivado para un agregado."""
+        viaje = agregado['viaje']
+        return {
+            'viaje_id': viaje['id'],
+            'nombre': viaje['nombre'],
+            'fecha_inicio': viaje['fecha_inicio'],
+            'fecha_fin': viaje['fecha_fin'],
+            'presupuesto_total': viaje['presupuesto_total'],
+            'presupuesto_gastado': viaje['presupuesto_gastado'],
+            'destinos': json.dumps([p['destino'] for p in agregado['paradas'][:DESTINOS_RESUMEN]],
+                                   ensure_ascii=False),
+            'num_paradas': len(agregado['paradas']),
+            'num_gastos': len(agregado['gastos']),
+            'num_actividades': len(agregado['actividades']),
+            'datos': datos,
+            'tamano_original': tamano_original,
+        }
+    
+    def archivar_lote(self, viaje_ids):
+        """
+        Archivar varios viajes en una transacción.
+        
+        Las filas de los viajes se bloquean (SELECT ... FOR UPDATE) antes de
+        leerlas: una escritura concurrente sobre el viaje o sus elementos espera
+        a que termine el archivado en lugar de perderse.
+        
+        Args:
+            viaje_ids (list): IDs de los viajes a archivar
+        
+        Returns:
+            dict: Resultado con success, archivados, viaje_ids y bytes antes/después
+        """
+        from app.services import busqueda_service, calendario_service, exportacion_service
+        
+        session = self.db.session
+        tabla_viaje = self._tabla('Viaje')
+        try:
+            viaje_ids = session.execute(
+                select(tabla_viaje.c.id).where(tabla_viaje.c.id.in_(viaje_ids)).with_for_update()
+            ).scalars().all()
+            if not viaje_ids:
+                return {'success': True, 'archivados': 0, 'viaje_ids': [], 'bytes_originales': 0,
+                        'bytes_archivados': 0}
+            
+            resumenes = []
+            ids_elementos = {clave: [] for clave in ELEMENTOS_VIAJE}
+            for agregado in exportacion_service.viajes_completos(viaje_ids=viaje_ids):
+                contenido = json.dumps(agregado, ensure_ascii=False, default=_serializar).encode('utf-8')
+                resumenes.append(self._resumen(agregado, zlib.compress(contenido, 6), len(contenido)))
+                for clave, ids in ids_elementos.items():
+                    ids.extend(fila['id'] for fila in agregado[clave])
+            session.execute(self._tabla('ViajeArchivado').insert(), resumenes)
+            
+            # Borrado masivo con Core: los eventos de la sesión no lo ven, así que
+            # el registro de sincronización no deja lápidas (archivar no es eliminar)
+            for clave, (nombre_modelo, _) in ELEMENTOS_VIAJE.items():
+                tabla = self._tabla(nombre_modelo)
+                session.execute(tabla.delete().where(tabla.c.viaje_id.in_(viaje_ids)))
+                busqueda_service.desindexar_filas(nombre_modelo, ids_elementos[clave])
+            session.execute(tabla_viaje.delete().where(tabla_viaje.c.id.in_(viaje_ids)))
+            busqueda_service.desindexar_filas('Viaje', viaje_ids)
+            tabla_instantanea = self._tabla('InstantaneaViaje')
+            session.execute(tabla_instantanea.delete().where(tabla_instantanea.c.viaje_id.in_(viaje_ids)))
+            
+            # El registro de cambios del viaje se reemplaza por una lápida: los
+            # clientes offline dejan de aplicarle deltas (ver SincronizacionService)
+            tabla_cambio = self._tabla('Cambio')
+            session.execute(tabla_cambio.delete().where(tabla_cambio.c.viaje_id.in_(viaje_ids)))
+            session.execute(tabla_cambio.insert(), [
+                {'viaje_id': viaje_id, 'entidad': 'viajes', 'entidad_id': viaje_id, 'operacion': 'delete'}
+                for viaje_id in viaje_ids
+            ])
+            
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"❌ Error al archivar viajes: {e}")
+            return {'success': False, 'error': str(e)}
+        
+        calendario_service.invalidar(viaje_ids)
+        return {
+            'success': True,
+            'archivados': len(resumenes),
+            'viaje_ids': list(viaje_ids),
+            'bytes_originales': sum(r['tamano_original'] for r in resumenes),
+            'bytes_archivados': sum(len(r['datos']) for r in resumenes),
+        }
+    
+    def archivar_viaje(self, viaje_id):
+        """
+        Archivar un viaje terminado.
+        
+        Returns:
+            dict: Resultado de archivar_lote, o error si el viaje no existe o no terminó
+        """
+        viaje = self.db.session.get(self._models['Viaje'], viaje_id)
+        if viaje is None:
+            return {'success': False, 'error': 'Viaje no encontrado'}
+        if viaje.fecha_fin >= date.today():
+            return {'success': False, 'error': 'Solo se pueden archivar viajes terminados'}
+        return self.archivar_lote([viaje_id])
+    
+    def archivar_pendientes(self, dias_gracia=30, tamano_lote=100, max_lotes=None):
+        """
+        Archivar por lotes todos los viajes terminados hace más de dias_gracia días.
+        
+        Args:
+            dias_gracia (int): Días desde la fecha de fin antes de archivar
+            tamano_lote (int): Viajes por transacción
+            max_lotes (int): Cortar después de esta cantidad de lotes (None = todos)
+        
+        Returns:
+            dict: Totales de viajes archivados, lotes y bytes antes/después
+        """
+        totales = {'archivados': 0, 'lotes': 0, 'bytes_originales': 0, 'bytes_archivados': 0, 'errores': 0}
+        while max_lotes is None or totales['lotes'] < max_lotes:
+            candidatos = self.obtener_candidatos(dias_gracia, tamano_lote)
+            if not candidatos:
+                break
+            resultado = self.archivar_lote(candidatos)
+            totales['lotes'] += 1
+            if not resultado['success']:
+                totales['errores'] += 1
+                break
+            for clave in ('archivados', 'bytes_originales', 'bytes_archivados'):
+                totales[clave] += resultado[clave]
+            # Liberar las filas leídas en este lote
+            self.db.session.remove()
+        
+        if totales['archivados']:
+            print(f"🗄️  {totales['archivados']} viajes archivados en {totales['lotes']} lotes "
+                  f"({totales['bytes_originales'] // 1024} KB → {totales['bytes_archivados'] // 1024} KB)")
+        return totales
+    
+    # ------------------------------------------------------------------
+    # Consultar y restaurar
+    # ------------------------------------------------------------------
+    
+    def listar_archivados(self, limite=None, desplazamiento=0):
+        """
+        Resúmenes de los viajes archivados, del más reciente al más antiguo (sin los datos).
+        
+        Args:
+            limite (int): Máximo de viajes a devolver (None = todos)
+            desplazamiento (int): Viajes a saltear (paginación)
+        
+        Returns:
+            list: Filas de viaje_archivado con datos diferido
+        """
+        ViajeArchivado = self._models['ViajeArchivado']
+        return ViajeArchivado.query.options(defer(ViajeArchivado.datos)).order_by(
+            ViajeArchivado.fecha_inicio.desc(), ViajeArchivado.id.desc()
+        ).offset(desplazamiento).limit(limite).all()
+    
+    def contar_archivados(self):
+        """Cantidad de viajes archivados."""
+        ViajeArchivado = self._models['ViajeArchivado']
+        return self.db.session.query(func.count(ViajeArchivado.id)).scalar()
+    
+    def obtener_por_viaje(self, viaje_id):
+        """El viaje archivado con ese ID original, o None."""
+        ViajeArchivado = self._models['ViajeArchivado']
+        return ViajeArchivado.query.filter_by(viaje_id=viaje_id).order_by(ViajeArchivado.id.desc()).first()
+    
+    @staticmethod
+    def _fila_restaurada(tabla, fila):
+        """Valores del JSON archivado convertidos a los tipos de las columnas."""
+        return {columna.name: None if fila[columna.name] is None else _convertir(columna, fila[columna.name])
+                for columna in tabla.columns if columna.name in fila}
+    
+    def _ids_ocupados(self, tabla, ids):
+        if not ids:
+            return set()
+        return set(self.db.session.execute(select(tabla.c.id).where(tabla.c.id.in_(ids))).scalars())
+    
+    def _insertar(self, nombre_modelo, filas, ocupados):
+        """
+        Insertar filas restauradas; las de IDs ya ocupados reciben uno nuevo.
+        
+        Returns:
+            list: Filas insertadas con su ID final
+        """
+        from app.services import busqueda_service
+        
+        tabla = self._tabla(nombre_modelo)
+        conservadas = [fila for fila in filas if fila['id'] not in ocupados]
+        nuevas = [{k: v for k, v in fila.items() if k != 'id'} for fila in filas if fila['id'] in ocupados]
+        
+        if conservadas:
+            self.db.session.execute(tabla.insert(), conservadas)
+        if nuevas:
+            ids = self.db.session.execute(
+                tabla.insert().returning(tabla.c.id, sort_by_parameter_order=True), nuevas
+            ).scalars().all()
+            nuevas = [dict(fila, id=i) for fila, i in zip(nuevas, ids)]
+        
+        insertadas = conservadas + nuevas
+        if nombre_modelo in CAMPOS_INDEXADOS:
+            busqueda_service.indexar_filas(nombre_modelo, insertadas)
+        return insertadas
+    
+    def restaurar(self, archivo_id, dias_conservar=DIAS_CONSERVAR_RESTAURADO):
+        """
+        Devolver un viaje archivado a las tablas de uso diario.
+        
+        Las filas recuperan sus IDs, versiones y fechas originales. Si mientras
+        tanto otro viaje o elemento tomó alguno de esos IDs (SQLite reutiliza el
+        último ID borrado de las tablas sin AUTOINCREMENT), esa fila recibe un ID
+        nuevo. El viaje queda con conservar_hasta para que el archivador no lo
+        vuelva a archivar enseguida, y con una marca 'restaurado' en el registro
+        de cambios para que los clientes offline lo vuelvan a descargar completo.
+        
+        Args:
+            archivo_id (int): ID de la fila de viaje_archivado
+            dias_conservar (int): Días que el viaje queda fuera del archivado automático
+        
+        Returns:
+            dict: Resultado con success y viaje_id (el ID con que quedó el viaje)
+        """
+        from app.services import calendario_service
+        
+        session = self.db.session
+        archivado = session.get(self._models['ViajeArchivado'], archivo_id)
+        if archivado is None:
+            return {'success': False, 'error': 'Viaje archivado no encontrado'}
+        
+        try:
+            agregado = json.loads(zlib.decompress(archivado.datos))
+            tabla_viaje = self._tabla('Viaje')
+            viaje = self._fila_restaurada(tabla_viaje, agregado['viaje'])
+            viaje['conservar_hasta'] = date.today() + timedelta(days=dias_conservar)
+            viaje_id = self._insertar('Viaje', [viaje], self._ids_ocupados(tabla_viaje, [viaje['id']]))[0]['id']
+            
+            for clave, (nombre_modelo, _) in ELEMENTOS_VIAJE.items():
+                tabla = self._tabla(nombre_modelo)
+                filas = [dict(self._fila_restaurada(tabla, fila), viaje_id=viaje_id)
+                         for fila in agregado.get(clave, [])]
+                if filas:
+                    self._insertar(nombre_modelo, filas, self._ids_ocupados(tabla, [f['id'] for f in filas]))
+            
+            session.execute(self._tabla('Cambio').insert(), [
+                {'viaje_id': viaje_id, 'entidad': 'viajes', 'entidad_id': viaje_id, 'operacion': 'restaurado'}
+            ])
+            session.delete(archivado)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"❌ Error al restaurar viaje archivado {archivo_id}: {e}")
+            return {'success': False, 'error': str(e)}
+        
+        calendario_service.invalidar([viaje_id])
+        print(f"📤 Viaje restaurado del archivo: {agregado['viaje']['nombre']} (ID: {viaje_id})")
+        return {'success': True, 'viaje_id': viaje_id}
+    
+    # ------------------------------------------------------------------
+    # Archivador en segundo plano
+    # ------------------------------------------------------------------
+    
+    def iniciar_archivador(self, app, dias_gracia=30, intervalo_segundos=86400, tamano_lote=100):
+        """
+        Iniciar un hilo en segundo plano que archiva los viajes terminados.
+        
+        Args:
+            app: Aplicación Flask (para el contexto de base de datos)
+            dias_gracia (int): Días desde la fecha de fin antes de archivar
+            intervalo_segundos (int): Cada cuánto buscar viajes para archivar
+            tamano_lote (int): Viajes por transacción
+        
+        Returns:
+            bool: True si el archivador se inició
+        """
+        if self._archivador and self._archivador.is_alive():
+            return False
+        
+        self._detener.clear()
+        
+        def ciclo():
+            while not self._detener.is_set():
+                try:
+                    with app.app_context():
+                        self.archivar_pendientes(dias_gracia, tamano_lote)
+                        self.db.session.remove()
+                except Exception as e:
+                    print(f"❌ Error en archivador de viajes: {e}")
+                
+                self._detener.wait(intervalo_segundos)
+        
+        self._archivador = threading.Thread(target=ciclo, name='archivador-viajes', daemon=True)
+        self._archivador.start()
+        print("🗄️  Archivador de viajes iniciado")
+        return True
+    
+    def detener_archivador(self):
+        """Detener el hilo del archivador si está corriendo."""
+        self._detener.set()
+
+
+# Instancia global del servicio
+archivo_service = ArchivoService()
@@ -0,0 +1,640 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio de búsqueda de texto completo sobre viajes y sus elementos.
+"""
+
+import os
+import re
+import math
+import bisect
+import heapq
+import threading
+import unicodedata
+from collections import defaultdict
+
+from sqlalchemy import event, inspect, text
+
+from app.utils.estado_app import estado_de_app
+from app.utils.metricas import medir_servicio
+
+
+# Campos indexados por modelo: (entidad, campo del título, campos de búsqueda)
+CAMPOS_INDEXADOS = {
+    'Viaje': ('viaje', 'nombre', ['nombre', 'notas']),
+    'Parada': ('parada', 'destino', ['destino']),
+    'Actividad': ('actividad', 'nombre', ['nombre', 'descripcion', 'ubicacion']),
+    'Alojamiento': ('alojamiento', 'nombre', ['nombre', 'direccion', 'numero_confirmacion']),
+    'Transporte': ('transporte', None, ['codigo_reserva', 'numero_vuelo']),
+    'Documento': ('documento', 'nombre', ['nombre', 'numero']),
+}
+
+# Código numérico por entidad para construir un rowid único (entidad, id)
+CODIGOS_ENTIDAD = {'viaje': 1, 'parada': 2, 'actividad': 3, 'alojamiento': 4, 'transporte': 5, 'documento': 6}
+_FACTOR_ROWID = 10 ** 12
+
+_PATRON_TOKEN = re.compile(r'\w+')
+
+
+def normalizar_texto(texto):
+    """Normaliza texto para indexar/buscar: minúsculas y sin acentos."""
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def tokenizar(texto):
+    """Divide un texto normalizado en tokens alfanuméricos."""
+    return _PATRON_TOKEN.findall(normalizar_texto(texto))
+
+
+def _rowid(entidad, entidad_id):
+    return CODIGOS_ENTIDAD[entidad] * _FACTOR_ROWID + entidad_id
+
+
+class _IndiceMemoria:
+    """
+    Índice invertido en memoria con ranking BM25.
+    
+    Se usa cuando la base de datos no ofrece FTS5 ni tsvector. Es local a
+    cada proceso: se carga completo en la primera búsqueda y luego se
+    mantiene con las escrituras confirmadas de ese proceso. Solo sirve con
+    un único proceso: con varios workers, lo que escribe uno no aparece en
+    las búsquedas de los demás hasta que se reinician.
+    """
+    
+    nombre = 'memoria'
+    transaccional = False
+    K1 = 1.2
+    B = 0.75
+    
+    def __init__(self):
+        self._postings = defaultdict(dict)  # token -> {clave: frecuencia}
+        self._vocabulario = []              # tokens ordenados (búsqueda por prefijo)
+        self._documentos = {}               # clave -> (viaje_id, titulo, longitud, tokens)
+        self._longitud_total = 0
+        self._lock = threading.RLock()
+    
+    def existe(self, conexion):
+        return bool(self._documentos)
+    
+    def crear(self, conexion):
+        pass
+    
+    def vaciar(self, conexion):
+        with self._lock:
+            self._postings.clear()
+            self._vocabulario = []
+            self._documentos.clear()
+            self._longitud_total = 0
+    
+    def _quitar(self, clave):
+        documento = self._documentos.pop(clave, None)
+        if not documento:
+            return
+        self._longitud_total -= documento[2]
+        for token in documento[3]:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(clave, None)
+            if not postings:
+                del self._postings[token]
+                posicion = bisect.bisect_left(self._vocabulario, token)
+                if posicion < len(self._vocabulario) and self._vocabulario[posicion] == token:
+                    del self._vocabulario[posicion]
+    
+    def guardar(self, conexion, filas):
+        with self._lock:
+            for entidad, entidad_id, viaje_id, titulo, contenido in filas:
+                clave = (entidad, entidad_id)
+                self._quitar(clave)
+                tokens = _PATRON_TOKEN.findall(contenido)
+                frecuencias = defaultdict(int)
+                for token in tokens:
+                    frecuencias[token] += 1
+                for token, frecuencia in frecuencias.items():
+                    if token not in self._postings:
+                        bisect.insort(self._vocabulario, token)
+                    self._postings[token][clave] = frecuencia
+                self._documentos[clave] = (viaje_id, titulo, len(tokens), tuple(frecuencias))
+                self._longitud_total += len(tokens)
+    
+    def borrar(self, conexion, claves):
+        with self._lock:
+            for clave in claves:
+                self._quitar(clave)
+    
+    def borrar_viaje(self, conexion, viaje_id):
+        with self._lock:
+            claves = [clave for clave, documento in self._documentos.items()
+                      if documento[0] == viaje_id]
+            for clave in claves:
+                self._quitar(clave)
+    
+    def _terminos(self, token, prefijo):
+        if not prefijo:
+            return [token] if token in self._postings else []
+        inicio = bisect.bisect_left(self._vocabulario, token)
+        terminos = []
+        for termino in self._vocabulario[inicio:]:
+            if not termino.startswith(token):
+                break
+            terminos.append(termino)
+        return terminos
+    
+    def buscar(self, conexion, tokens, limite):
+        with self._lock:
+            total_documentos = len(self._documentos)
+            if not total_documentos:
+                return []
+            longitud_media = self._longitud_total / total_documentos
+            
+            # Términos que cubre cada token; el último se busca como prefijo
+            # (búsqueda mientras se escribe)
+            grupos = []
+            for posicion, token in enumerate(tokens):
+                terminos = self._terminos(token, prefijo=posicion == len(tokens) - 1)
+                if not terminos:
+                    return []
+                grupos.append([self._postings[termino] for termino in terminos])
+            
+            # Intersección (AND) empezando por el token más selectivo
+            grupos.sort(key=lambda postings: sum(len(p) for p in postings))
+            candidatos = set().union(*grupos[0])
+            for postings in grupos[1:]:
+                candidatos = {clave for clave in candidatos if any(clave in p for p in postings)}
+                if not candidatos:
+                    return []
+            
+            # Puntuar solo los candidatos con BM25
+            puntajes = defaultdict(float)
+            for postings_grupo in grupos:
+                for postings in postings_grupo:
+                    idf = math.log(1 + (total_documentos - len(postings) + 0.5) / (len(postings) + 0.5))
+                    # Recorrer el conjunto más chico de los dos
+                    if len(postings) < len(candidatos):
+                        coincidencias = ((c, f) for c, f in postings.items() if c in candidatos)
+                    else:
+                        coincidencias = ((c, postings[c]) for c in candidatos if c in postings)
+                    for clave, frecuencia in coincidencias:
+                        longitud = self._documentos[clave][2]
+                        puntajes[clave] += idf * frecuencia * (self.K1 + 1) / (
+                            frecuencia + self.K1 * (1 - self.B + self.B * longitud / longitud_media))
+            
+            mejores = heapq.nlargest(limite, puntajes.items(), key=lambda item: item[1])
+            return [(clave[0], clave[1], self._documentos[clave][0], self._documentos[clave][1], puntaje)
+                    for clave, puntaje in mejores]
+
+
+class _IndiceFTS5:
+    """Índice sobre una tabla virtual FTS5 de SQLite."""
+    
+    nombre = 'sqlite-fts5'
+    transaccional = True
+    TABLA = 'busqueda_fts'
+    
+    def existe(self, conexion):
+        return conexion.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :tabla"),
+            {'tabla': self.TABLA}
+        ).first() is not None
+    
+    def crear(self, conexion):
+        conexion.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.TABLA} USING fts5("
+            "entidad UNINDEXED, entidad_id UNINDEXED, viaje_id UNINDEXED, titulo UNINDEXED, "
+            "contenido, tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+    
+    def vaciar(self, conexion):
+        conexion.execute(text(f"DELETE FROM {self.TABLA}"))
+    
+    def guardar(self, conexion, filas):
+        parametros = [{'rowid': _rowid(e, i), 'entidad': e, 'entidad_id': i, 'viaje_id': v,
+                       'titulo': t, 'contenido': c} for e, i, v, t, c in filas]
+        conexion.execute(text(f"DELETE FROM {self.TABLA} WHERE rowid = :rowid"), parametros)
+        conexion.execute(text(
+            f"INSERT INTO {self.TABLA} (rowid, entidad, entidad_id, viaje_id, titulo, contenido) "
+            "VALUES (:rowid, :entidad, :entidad_id, :viaje_id, :titulo, :contenido)"
+        ), parametros)
+    
+    def borrar(self, conexion, claves):
+        conexion.execute(text(f"DELETE FROM {self.TABLA} WHERE rowid = :rowid"),
+                         [{'rowid': _rowid(e, i)} for e, i in claves])
+    
+    def borrar_viaje(self, conexion, viaje_id):
+        conexion.execute(text(f"DELETE FROM {self.TABLA} WHERE viaje_id = :viaje_id"),
+                         {'viaje_id': viaje_id})
+    
+    def buscar(self, conexion, tokens, limite):
+        # Cada token entre comillas; el último además como prefijo
+        consulta = ' '.join(f'"{t}"' for t in tokens[:-1]) + f' "{tokens[-1]}"*'
+        filas = conexion.execute(text(
+            f"SELECT entidad, entidad_id, viaje_id, titulo, bm25({self.TABLA}) AS rango "
+            f"FROM {self.TABLA} WHERE {self.TABLA} MATCH :consulta ORDER BY rango LIMIT :limite"
+        ), {'consulta': consulta.strip(), 'limite': limite}).fetchall()
+        return [(f[0], f[1], f[2], f[3], -f[4]) for f in filas]
+
+
+class _IndicePostgres:
+    """Índice sobre una tabla con columna tsvector e índice GIN en PostgreSQL."""
+    
+    nombre = 'postgres-tsvector'
+    transaccional = True
+    TABLA = 'busqueda_indice'
+    
+    def existe(self, conexion):
+        return conexion.execute(text("SELECT to_regclass(:tabla)"), {'tabla': self.TABLA}).scalar() is not None
+    
+    def crear(self, conexion):
+        conexion.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {self.TABLA} ("
+            "id BIGINT PRIMARY KEY, entidad VARCHAR(20) NOT NULL, entidad_id INTEGER NOT NULL, "
+            "viaje_id INTEGER NOT NULL, titulo TEXT, vector TSVECTOR NOT NULL)"
+        ))
+        conexion.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{self.TABLA}_vector ON {self.TABLA} USING GIN (vector)"))
+        conexion.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{self.TABLA}_viaje ON {self.TABLA} (viaje_id)"))
+    
+    def vaciar(self, conexion):
+        conexion.execute(text(f"TRUNCATE {self.TABLA}"))
+    
+    def guardar(self, conexion, filas):
+        conexion.execute(text(
+            f"INSERT INTO {self.TABLA} (id, entidad, entidad_id, viaje_id, titulo, vector) "
+            "VALUES (:rowid, :entidad, :entidad_id, :viaje_id, :titulo, to_tsvector('simple', :contenido)) "
+            "ON CONFLICT (id) DO UPDATE SET viaje_id = EXCLUDED.viaje_id, titulo = EXCLUDED.titulo, "
+            "vector = EXCLUDED.vector"
+        ), [{'rowid': _rowid(e, i), 'entidad': e, 'entidad_id': i, 'viaje_id': v,
+             'titulo': t, 'contenido': c} for e, i, v, t, c in filas])
+    
+    def borrar(self, conexion, claves):
+        conexion.execute(text(f"DELETE FROM {self.TABLA} WHERE id = :rowid"),
+                         [{'rowid': _rowid(e, i)} for e, i in claves])
+    
+    def borrar_viaje(self, conexion, viaje_id):
+        conexion.execute(text(f"DELETE FROM {self.TABLA} WHERE viaje_id = :viaje_id"),
+                         {'viaje_id': viaje_id})
+    
+    def buscar(self, conexion, tokens, limite):
+        consulta = ' & '.join(f'{t}:*' if i == len(tokens) - 1 else t for i, t in enumerate(tokens))
+        filas = conexion.execute(text(
+            f"SELECT entidad, entidad_id, viaje_id, titulo, ts_rank(vector, q) AS rango "
+            f"FROM {self.TABLA}, to_tsquery('simple', :consulta) AS q "
+            "WHERE vector @@ q ORDER BY rango DESC LIMIT :limite"
+        ), {'consulta': consulta, 'limite': limite}).fetchall()
+        return [(f[0], f[1], f[2], f[3], f[4]) for f in filas]
+
+
+@medir_servicio('busqueda')
+class BusquedaService:
+    """
+    Servicio de búsqueda de texto completo sobre viajes, paradas, actividades,
+    alojamientos, transportes y documentos.
+    
+    El backend se elige según la base de datos: FTS5 en SQLite, tsvector en
+    PostgreSQL y un índice invertido en memoria como alternativa. El índice
+    se mantiene sincronizado con las escrituras que realizan los servicios
+    mediante eventos de la sesión de SQLAlchemy. El backend elegido y si el
+    índice está listo son de cada app (en app.extensions): dos apps del mismo
+    proceso pueden usar bases de datos distintas.
+    """
+    
+    def __init__(self, database_service=None):
+        """Inicializar el servicio de búsqueda."""
+        self.db_service = database_service
+        self.db = None
+        self._models = None
+        self._lock = threading.Lock()
+    
+    def init_models(self, models_dict, database_instance):
+        """Inicializar los modelos necesarios y escuchar las escrituras de la sesión."""
+        self._models = models_dict
+        self.db = database_instance
+        
+        # Registrar los listeners una sola vez aunque se cree más de una app
+        for nombre, funcion in (('after_flush', self._despues_de_flush),
+                                ('after_commit', self._despues_de_commit),
+                                ('after_rollback', self._despues_de_rollback)):
+            if not event.contains(self.db.session, nombre, funcion):
+                event.listen(self.db.session, nombre, funcion)
+    
+    @staticmethod
+    def _estado():
+        return estado_de_app('busqueda_service', lambda: {'backend': None, 'listo': False})
+    
+    @property
+    def _backend(self):
+        return self._estado()['backend']
+    
+    @_backend.setter
+    def _backend(self, backend):
+        self._estado()['backend'] = backend
+    
+    @property
+    def _listo(self):
+        return self._estado()['listo']
+    
+    @_listo.setter
+    def _listo(self, listo):
+        self._estado()['listo'] = listo
+    
+    @property
+    def backend(self):
+        """Nombre del backend en uso (None si aún no se eligió)."""
+        return self._backend.nombre if self._backend else None
+    
+    @property
+    def indice_listo(self):
+        """True si el índice ya está construido y se mantiene con cada escritura."""
+        return self._listo
+    
+    def _elegir_backend(self, conexion):
+        """Elegir el backend según la configuración y el dialecto de la base de datos."""
+        preferido = os.environ.get('BUSQUEDA_BACKEND', '').lower()
+        dialecto = conexion.dialect.name
+        
+        if preferido != 'memoria':
+            if dialecto == 'sqlite':
+                disponible = conexion.execute(
+                    text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+                ).scalar()
+                if disponible:
+                    return _IndiceFTS5()
+            elif dialecto == 'postgresql':
+                return _IndicePostgres()
+        
+        procesos = int(os.environ.get('GUNICORN_WORKERS') or os.environ.get('WEB_CONCURRENCY') or 1)
+        if procesos > 1:
+            print(f"⚠️  Búsqueda con índice en memoria y {procesos} workers: cada worker solo ve "
+                  "sus propias escrituras (usar SQLite con FTS5 o PostgreSQL)")
+        return _IndiceMemoria()
+    
+    @staticmethod
+    def _fila_indice(nombre_modelo, obtener):
+        """Construir la fila de índice (entidad, id, viaje_id, titulo, contenido) con obtener(campo)."""
+        entidad, campo_titulo, campos = CAMPOS_INDEXADOS[nombre_modelo]
+        valores = [obtener(campo) for campo in campos]
+        viaje_id = obtener('id') if entidad == 'viaje' else obtener('viaje_id')
+        if campo_titulo:
+            titulo = obtener(campo_titulo)
+        else:
+            titulo = f"{obtener('origen')} → {obtener('destino')}"
+        return (entidad, obtener('id'), viaje_id, titulo,
+                ' '.join(normalizar_texto(v) for v in valores if v))
+    
+    def _filas_de_objeto(self, objeto):
+        """Fila de índice de un objeto del ORM."""
+        return self._fila_indice(type(objeto).__name__, lambda campo: getattr(objeto, campo))
+    
+    def reconstruir_indice(self, tamano_lote=1000):
+        """
+        Reconstruir el índice completo a partir de la base de datos.
+        
+        Args:
+            tamano_lote (int): Filas leídas e insertadas por lote
+        
+        Returns:
+            int: Cantidad de elementos indexados
+        """
+        conexion = self.db.session.connection()
+        with self._lock:
+            if self._backend is None:
+                self._backend = self._elegir_backend(conexion)
+            self._backend.crear(conexion)
+            self._backend.vaciar(conexion)
+            
+            total = 0
+            for nombre_modelo, (entidad, campo_titulo, campos) in CAMPOS_INDEXADOS.items():
+                modelo = self._models[nombre_modelo]
+                columnas = [modelo.id, modelo.id if entidad == 'viaje' else modelo.viaje_id]
+                if campo_titulo:
+                    columnas.append(getattr(modelo, campo_titulo))
+                else:
+                    columnas.extend([modelo.origen, modelo.destino])
+                columnas.extend(getattr(modelo, campo) for campo in campos)
+                
+                lote = []
+                consulta = self.db.session.query(*columnas).execution_options(yield_per=tamano_lote)
+                for fila in consulta:
+                    if campo_titulo:
+                        titulo, valores = fila[2], fila[3:]
+                    else:
+                        titulo, valores = f'{fila[2]} → {fila[3]}', fila[4:]
+                    lote.append((entidad, fila[0], fila[1], titulo,
+                                 ' '.join(normalizar_texto(v) for v in valores if v)))
+                    if len(lote) >= tamano_lote:
+                        self._backend.guardar(conexion, lote)
+                        total += len(lote)
+                        lote = []
+                if lote:
+                    self._backend.guardar(conexion, lote)
+                    total += len(lote)
+            
+            self.db.session.commit()
+            self._listo = True
+        
+        print(f"🔎 Índice de búsqueda reconstruido ({self._backend.nombre}): {total} elementos")
+        return total
+    
+    def _comprobar_indice(self, conexion):
+        """
+        Indicar si el índice existe y hay que mantenerlo con cada escritura.
+        
+        Con FTS5 o tsvector basta con que la tabla exista (la pudo construir
+        otro proceso o init_db.py): desde ese momento se indexan todas las
+        escrituras, aunque este proceso todavía no haya buscado. Mientras no
+        exista se vuelve a comprobar en cada escritura, porque otro proceso
+        puede crearla en cualquier momento. El índice en memoria, en cambio,
+        recién está listo cuando este proceso lo carga.
+        
+        Args:
+            conexion: Conexión de la sesión actual
+        
+        Returns:
+            bool: True si el índice está listo
+        """
+        if self._listo:
+            return True
+        if self._backend is None:
+            self._backend = self._elegir_backend(conexion)
+        if self._backend.transaccional and self._backend.existe(conexion):
+            self._listo = True
+        return self._listo
+    
+    def _asegurar_indice(self):
+        """Preparar el backend y crear/cargar el índice si todavía no existe."""
+        if not self._comprobar_indice(self.db.session.connection()):
+            self.reconstruir_indice()
+    
+    def buscar(self, consulta, limite=20, entidades=None, viaje_id=None):
+        """
+        Buscar texto en viajes y sus elementos.
+        
+        Args:
+            consulta (str): Texto a buscar (el último término se trata como prefijo)
+            limite (int): Máximo de resultados
+            entidades (list): Restringir a estos tipos de entidad (optional)
+            viaje_id (int): Restringir a un viaje (optional)
+        
+        Returns:
+            list: Resultados ordenados por relevancia
+        """
+        tokens = tokenizar(consulta)
+        if not tokens:
+            return []
+        
+        self._asegurar_indice()
+        
+        # Pedir más resultados si luego se filtran en memoria
+        filtrar = bool(entidades) or viaje_id is not None
+        limite_backend = limite * 10 if filtrar else limite
+        encontrados = self._backend.buscar(self.db.session.connection(), tokens, limite_backend)
+        
+        resultados = []
+        for entidad, entidad_id, viaje, titulo, puntaje in encontrados:
+            if entidades and entidad not in entidades:
+                continue
+            if viaje_id is not None and viaje != viaje_id:
+                continue
+            resultados.append({
+                'entidad': entidad,
+                'id': entidad_id,
+                'viaje_id': viaje,
+                'titulo': titulo,
+                'puntaje': round(puntaje, 4)
+            })
+            if len(resultados) >= limite:
+                break
+        
+        return resultados
+    
+    def eliminar_viaje(self, viaje_id):
+        """
+        Quitar del índice todo lo asociado a un viaje.
+        
+        Necesario cuando los elementos se borran con consultas masivas
+        (``query.delete()``), que no pasan por los eventos de la sesión.
+        
+        Args:
+            viaje_id (int): ID del viaje
+        """
+        if not self._comprobar_indice(self.db.session.connection()):
+            return
+        if self._backend.transaccional:
+            self._backend.borrar_viaje(self.db.session.connection(), viaje_id)
+        else:
+            self._pendientes(self.db.session)['viajes'].add(viaje_id)
+    
+    def indexar_filas(self, nombre_modelo, filas):
+        """
+        Indexar filas insertadas con sentencias masivas de SQLAlchemy Core.
+        
+        Esas inserciones no pasan por los eventos de la sesión; los cambios se
+        aplican en la misma transacción (o al confirmarla, con el índice en memoria).
+        
+        Args:
+            nombre_modelo (str): Nombre del modelo (p.ej. 'Actividad')
+            filas (list): Diccionarios con las columnas, incluidos id y viaje_id
+        """
+        if nombre_modelo not in CAMPOS_INDEXADOS or not filas:
+            return
+        if not self._comprobar_indice(self.db.session.connection()):
+            return
+        nuevas = [self._fila_indice(nombre_modelo, fila.get) for fila in filas]
+        if self._backend.transaccional:
+            self._backend.guardar(self.db.session.connection(), nuevas)
+        else:
+            self._pendientes(self.db.session)['guardar'].update(((f[0], f[1]), f) for f in nuevas)
+    
+    def desindexar_filas(self, nombre_modelo, ids):
+        """
+        Quitar del índice filas borradas con sentencias masivas de SQLAlchemy Core.
+        
+        Con los IDs a mano es más barato que eliminar_viaje: se borra por clave
+        en lugar de recorrer el índice buscando las filas del viaje.
+        
+        Args:
+            nombre_modelo (str): Nombre del modelo (p.ej. 'Actividad')
+            ids (list): IDs de las filas borradas
+        """
+        if nombre_modelo not in CAMPOS_INDEXADOS or not ids:
+            return
+        if not self._comprobar_indice(self.db.session.connection()):
+            return
+        claves = {(CAMPOS_INDEXADOS[nombre_modelo][0], i) for i in ids}
+        if self._backend.transaccional:
+            self._backend.borrar(self.db.session.connection(), claves)
+        else:
+            pendientes = self._pendientes(self.db.session)
+            for clave in claves:
+                pendientes['guardar'].pop(clave, None)
+            pendientes['borrar'].update(claves)
+    
+    # --- Sincronización con la sesión ---
+    
+    @staticmethod
+    def _pendientes(session):
+        return session.info.setdefault('busqueda_pendientes', {'guardar': {}, 'borrar': set(), 'viajes': set()})
+    
+    def _despues_de_flush(self, session, flush_context):
+        """Registrar (o aplicar, si el backend es transaccional) los cambios indexables."""
+        guardar = {}
+        borrar = set()
+        for objeto in session.new:
+            if type(objeto).__name__ in CAMPOS_INDEXADOS:
+                fila = self._filas_de_objeto(objeto)
+                guardar[(fila[0], fila[1])] = fila
+        for objeto in session.dirty:
+            nombre = type(objeto).__name__
+            if nombre not in CAMPOS_INDEXADOS:
+                continue
+            estado = inspect(objeto)
+            campos = CAMPOS_INDEXADOS[nombre][2] + ['origen', 'destino', 'nombre']
+            if any(campo in estado.attrs and estado.attrs[campo].history.has_changes() for campo in campos):
+                fila = self._filas_de_objeto(objeto)
+                guardar[(fila[0], fila[1])] = fila
+        for objeto in session.deleted:
+            nombre = type(objeto).__name__
+            if nombre in CAMPOS_INDEXADOS:
+                clave = (CAMPOS_INDEXADOS[nombre][0], objeto.id)
+                guardar.pop(clave, None)
+                borrar.add(clave)
+        
+        if not guardar and not borrar:
+            return
+        if not self._comprobar_indice(session.connection()):
+            return  # El índice se construirá completo en la primera búsqueda
+        
+        if self._backend.transaccional:
+            conexion = session.connection()
+            if guardar:
+                self._backend.guardar(conexion, list(guardar.values()))
+            if borrar:
+                self._backend.borrar(conexion, borrar)
+        else:
+            pendientes = self._pendientes(session)
+            for clave in borrar:
+                pendientes['guardar'].pop(clave, None)
+            pendientes['guardar'].update(guardar)
+            pendientes['borrar'].update(borrar)
+    
+    def _despues_de_commit(self, session):
+        """Aplicar al índice en memoria los cambios confirmados."""
+        pendientes = session.info.pop('busqueda_pendientes', None)
+        if not pendientes or not self._listo:
+            return
+        for viaje_id in pendientes['viajes']:
+            self._backend.borrar_viaje(None, viaje_id)
+        if pendientes['borrar']:
+            self._backend.borrar(None, pendientes['borrar'])
+        if pendientes['guardar']:
+            self._backend.guardar(None, list(pendientes['guardar'].values()))
+    
+    def _despues_de_rollback(self, session):
+        """Descartar los cambios pendientes de una transacción revertida."""
+        session.info.pop('busqueda_pendientes', None)
+
+
+# Instancia global del servicio
+busqueda_service = BusquedaService()
@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio de feeds iCalendar (.ics) de los viajes.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import event, inspect, select
+
+from config.settings import Config
+from app.utils.estado_app import estado_de_app
+from app.utils.zonas_horarias import obtener_zona_horaria
+
+
+DOMINIO_UID = 'viajes.app'
+
+ICONOS_TRANSPORTE = {'vuelo': '✈️', 'tren': '🚆', 'bus': '🚌', 'auto': '🚗', 'ferry': '⛴️'}
+
+# Modelos que aparecen en el calendario: sus cambios invalidan la caché
+MODELOS_CALENDARIO = ('Viaje', 'Parada', 'Actividad', 'Transporte', 'Alojamiento')
+
+# DTSTAMP de los viajes sin fecha de actualización (filas anteriores a la columna)
+DTSTAMP_SIN_FECHA = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _escapar(texto):
+    """Escapar texto según RFC 5545 (barra invertida, ';', ',' y saltos de línea)."""
+    return (str(texto).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _plegar(linea):
+    """Partir una línea en tramos de 75 octetos como máximo (RFC 5545, 3.1)."""
+    codificada = linea.encode('utf-8')
+    if len(codificada) <= 75:
+        return linea + '\r\n'
+    partes = []
+    inicio = 0
+    limite = 75
+    while inicio < len(codificada):
+        fin = min(inicio + limite, len(codificada))
+        # No cortar en medio de un carácter multibyte
+        while fin < len(codificada) and (codificada[fin] & 0xC0) == 0x80:
+            fin -= 1
+        partes.append(codificada[inicio:fin].decode('utf-8'))
+        inicio = fin
+        limite = 74  # Las líneas de continuación empiezan con un espacio
+    return '\r\n '.join(partes) + '\r\n'
+
+
+def _fecha(valor):
+    return valor.strftime('%Y%m%d')
+
+
+def _instante(fecha, hora, lugar):
+    """Fecha y hora en UTC si se conoce la zona del lugar; si no, hora local flotante."""
+    momento = datetime.combine(fecha, hora)
+    zona = obtener_zona_horaria(lugar)
+    if zona is None:
+        return momento.strftime('%Y%m%dT%H%M%S')
+    return momento.replace(tzinfo=zona).astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+class CalendarioService:
+    """
+    Genera feeds .ics de un viaje o de todos los viajes próximos.
+    
+    Los eventos salen de paradas (días completos), transportes, check-in y
+    check-out de alojamientos y actividades, con UIDs estables por elemento.
+    El ETag, el Last-Modified y el DTSTAMP salen de los datos (versión y fecha
+    de actualización de cada viaje incluido), no del momento de generar: un
+    feed regenerado sin cambios es idéntico byte a byte y los clientes
+    reciben 304 aunque la caché de este proceso se haya vaciado.
+    El feed se escribe evento por evento y el cuerpo completo queda en caché
+    junto con su ETag; la caché se invalida con las escrituras confirmadas en
+    la sesión y, como es local a cada proceso, además vence a los
+    CALENDARIO_CACHE_SEGUNDOS para acotar lo que puede quedar desactualizado en
+    otros workers.
+    """
+    
+    def __init__(self, database_service=None, max_entradas=256):
+        """Inicializar el servicio de calendario."""
+        self.db_service = database_service
+        self.db = None
+        self._models = None
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+    
+    def init_models(self, models_dict, database_instance):
+        """Inicializar los modelos necesarios y escuchar las escrituras de la sesión."""
+        self._models = models_dict
+        self.db = database_instance
+        
+        for nombre, funcion in (('after_flush', self._despues_de_flush),
+                                ('after_commit', self._despues_de_commit),
+                                ('after_rollback', self._despues_de_rollback)):
+            if not event.contains(self.db.session, nombre, funcion):
+                event.listen(self.db.session, nombre, funcion)
+    
+    # ------------------------------------------------------------------
+    # Caché
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def _estado():
+        """
+        Caché de la app actual (cada app puede usar otra base de datos).
+        
+        cache: clave -> (cuerpo, etag, ultima_modificacion, momento).
+        generaciones y generacion_global: un feed solo se guarda si no hubo
+        escrituras mientras se generaba.
+        """
+        return estado_de_app('calendario_service', lambda: {
+            'cache': OrderedDict(), 'generaciones': {}, 'generacion_global': 0})
+    
+    @staticmethod
+    def _clave(viaje_id):
+        return ('viaje', viaje_id) if viaje_id is not None else ('proximos', date.today())
+    
+    def _generacion(self, viaje_id):
+        estado = self._estado()
+        return (estado['generaciones'].get(viaje_id, 0), estado['generacion_global'])
+    
+    def obtener_cache(self, viaje_id=None):
+        """
+        Feed cacheado si existe y está vigente.
+        
+        Returns:
+            tuple: (cuerpo bytes, etag, ultima_modificacion) o None
+        """
+        clave = self._clave(viaje_id)
+        cache = self._estado()['cache']
+        with self._lock:
+            entrada = cache.get(clave)
+            if entrada is None:
+                return None
+            if time.monotonic() - entrada[3] > Config.get_calendario_cache_segundos():
+                del cache[clave]
+                return None
+            cache.move_to_end(clave)
+            return entrada[:3]
+    
+    def invalidar(self, viaje_ids=()):
+        """
+        Descartar los feeds de los viajes indicados y el de viajes próximos.
+        
+        Necesario después de escrituras que no pasan por la sesión del ORM
+        (INSERT o DELETE masivos).
+        """
+        estado = self._estado()
+        cache, generaciones = estado['cache'], estado['generaciones']
+        with self._lock:
+            for viaje_id in viaje_ids:
+                generaciones[viaje_id] = generaciones.get(viaje_id, 0) + 1
+                cache.pop(('viaje', viaje_id), None)
+            estado['generacion_global'] += 1
+            for clave in [c for c in cache if c[0] == 'proximos']:
+                del cache[clave]
+    
+    def _guardar(self, clave, generacion, viaje_id, partes, etag, ultima_modificacion):
+        cuerpo = ''.join(partes).encode('utf-8')
+        cache = self._estado()['cache']
+        with self._lock:
+            if self._generacion(viaje_id) != generacion:
+                return  # Hubo una escritura mientras se generaba: el feed ya es viejo
+            cache[clave] = (cuerpo, etag, ultima_modificacion, time.monotonic())
+            cache.move_to_end(clave)
+            while len(cache) > self.max_entradas:
+                cache.popitem(last=False)
+    
+    # ------------------------------------------------------------------
+    # Generación
+    # ------------------------------------------------------------------
+    
+    def obtener_viaje(self, viaje_id):
+        """ID y nombre de un viaje, o None si no existe."""
+        Viaje = self._models['Viaje']
+        return self.db.session.query(Viaje.id, Viaje.nombre).filter(Viaje.id == viaje_id).first()
+    
+    def estado(self, viaje_id=None):
+        """
+        Viajes que entran en el feed, con el ETag y la última modificación que les corresponden.
+        
+        Solo lee las columnas de los viajes: alcanza para responder 304 sin
+        generar el feed. Cualquier cambio de un viaje o de sus elementos sube
+        su version_agregado, así que el ETag cambia si y solo si cambia algún
+        viaje incluido (o qué viajes se incluyen).
+        
+        Args:
+            viaje_id (int): Viaje del feed; None para todos los viajes que no terminaron
+        
+        Returns:
+            dict: nombres (viaje_id -> nombre), etag y ultima_modificacion
+            (datetime UTC, o None si el feed no tiene viajes)
+        """
+        Viaje = self._models['Viaje']
+        consulta = self.db.session.query(Viaje.id, Viaje.nombre, Viaje.version, Viaje.version_agregado,
+                                         Viaje.fecha_actualizacion_agregado)
+        if viaje_id is not None:
+            consulta = consulta.filter(Viaje.id == viaje_id)
+        else:
+            consulta = consulta.filter(Viaje.fecha_fin >= date.today())
+        filas = consulta.order_by(Viaje.id).all()
+        
+        huella = hashlib.sha1(str(viaje_id).encode('utf-8'))
+        for fila in filas:
+            huella.update(f'|{fila.id}:{fila.version}:{fila.version_agregado}'.encode('utf-8'))
+        fechas = [fila.fecha_actualizacion_agregado for fila in filas if fila.fecha_actualizacion_agregado]
+        if fechas:
+            ultima_modificacion = max(fechas).replace(tzinfo=timezone.utc, microsecond=0)
+        else:
+            ultima_modificacion = DTSTAMP_SIN_FECHA if filas else None
+        
+        return {
+            'nombres': {fila.id: fila.nombre for fila in filas},
+            'etag': huella.hexdigest(),
+            'ultima_modificacion': ultima_modificacion,
+        }
+    
+    def generar(self, viaje_id=None, tamano_lote=500, estado=None):
+        """
+        Generar el feed de un viaje (o de los viajes próximos) por partes y
+        guardarlo en caché al terminar.
+        
+        Args:
+            viaje_id (int): Viaje del feed; None para todos los viajes que no terminaron
+            tamano_lote (int): Filas por lectura del cursor
+            estado (dict): Resultado de estado() si ya se consultó
+        
+        Yields:
+            str: Fragmentos del archivo .ics
+        """
+        clave = self._clave(viaje_id)
+        with self._lock:
+            generacion = self._generacion(viaje_id)
+        estado = estado or self.estado(viaje_id)
+        partes = []
+        
+        for fragmento in self._fragmentos(viaje_id, estado, tamano_lote):
+            partes.append(fragmento)
+            yield fragmento
+        
+        self._guardar(clave, generacion, viaje_id, partes, estado['etag'], estado['ultima_modificacion'])
+    
+    def _fragmentos(self, viaje_id, estado, tamano_lote):
+        Viaje = self._models['Viaje']
+        nombres = estado['nombres']
+        if viaje_id is not None:
+            nombre_calendario = nombres.get(viaje_id, 'Viaje')
+        else:
+            nombre_calendario = 'Próximos viajes'
+        
+        yield ''.join(_plegar(l) for l in (
+            'BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Viajes//Itinerario//ES', 'CALSCALE:GREGORIAN',
+            'METHOD:PUBLISH', f'X-WR-CALNAME:{_escapar(nombre_calendario)}'
+        ))
+        
+        # Mismo DTSTAMP mientras los datos no cambien: regenerar da el mismo feed
+        dtstamp = (estado['ultima_modificacion'] or DTSTAMP_SIN_FECHA).strftime('%Y%m%dT%H%M%SZ')
+        for nombre_modelo, formatear in (('Parada', self._eventos_parada),
+                                         ('Transporte', self._eventos_transporte),
+                                         ('Alojamiento', self._eventos_alojamiento),
+                                         ('Actividad', self._eventos_actividad)):
+            tabla = self._models[nombre_modelo].__table__
+            consulta = select(tabla).order_by(tabla.c.viaje_id, tabla.c.id)
+            if viaje_id is not None:
+                consulta = consulta.where(tabla.c.viaje_id == viaje_id)
+            else:
+                consulta = consulta.where(tabla.c.viaje_id.in_(
+                    select(Viaje.id).where(Viaje.fecha_fin >= date.today())))
+            filas = self.db.session.execute(consulta.execution_options(yield_per=tamano_lote)).mappings()
+            for fila in filas:
+                for evento in formatear(fila, nombres.get(fila['viaje_id'], '')):
+                    yield self._evento(evento, dtstamp)
+        
+        yield _plegar('END:VCALENDAR')
+    
+    @staticmethod
+    def _evento(propiedades, dtstamp):
+        """Serializar un VEVENT a partir de una lista de (propiedad, valor)."""
+        lineas = ['BEGIN:VEVENT', f'DTSTAMP:{dtstamp}']
+        lineas.extend(f'{nombre}:{valor}' for nombre, valor in propiedades if valor not in (None, ''))
+        lineas.append('END:VEVENT')
+        return ''.join(_plegar(l) for l in lineas)
+    
+    @staticmethod
+    def _descripcion(*partes):
+        return _escapar('\n'.join(p for p in partes if p))
+    
+    def _eventos_parada(self, parada, nombre_viaje):
+        fin = max(parada['fecha_salida'], parada['fecha_llegada'] + timedelta(days=1))
+        yield [
+            ('UID', f"parada-{parada['id']}@{DOMINIO_UID}"),
+            ('DTSTART;VALUE=DATE', _fecha(parada['fecha_llegada'])),
+            ('DTEND;VALUE=DATE', _fecha(fin)),
+            ('SUMMARY', _escapar(f"📍 {parada['destino']}")),
+            ('LOCATION', _escapar(parada['destino'])),
+            ('DESCRIPTION', self._descripcion(nombre_viaje, parada['notas'])),
+            ('TRANSP', 'TRANSPARENT'),
+        ]
+    
+    def _eventos_transporte(self, transporte, nombre_viaje):
+        icono = ICONOS_TRANSPORTE.get(transporte['tipo'], '🧭')
+        if transporte['hora_salida']:
+            inicio = ('DTSTART', _instante(transporte['fecha_salida'], transporte['hora_salida'],
+                                           transporte['origen']))
+            fin = ('DTEND', _instante(transporte['fecha_llegada'], transporte['hora_llegada'],
+                                      transporte['destino']) if transporte['hora_llegada'] else None)
+        else:
+            inicio = ('DTSTART;VALUE=DATE', _fecha(transporte['fecha_salida']))
+            fin = ('DTEND;VALUE=DATE', _fecha(max(transporte['fecha_llegada'],
+                                                  transporte['fecha_salida']) + timedelta(days=1)))
+        detalle = ' '.join(p for p in (transporte['aerolinea'], transporte['numero_vuelo']) if p)
+        yield [
+            ('UID', f"transporte-{transporte['id']}@{DOMINIO_UID}"),
+            inicio,
+            fin,
+            ('SUMMARY', _escapar(f"{icono} {transporte['origen']} → {transporte['destino']}")),
+            ('LOCATION', _escapar(transporte['origen'])),
+            ('DESCRIPTION', self._descripcion(
+                nombre_viaje, detalle,
+                f"Reserva: {transporte['codigo_reserva']}" if transporte['codigo_reserva'] else None,
+                f"Terminal {transporte['terminal']}" if transporte['terminal'] else None,
+                f"Puerta {transporte['puerta']}" if transporte['puerta'] else None,
+                f"Asiento {transporte['asiento']}" if transporte['asiento'] else None,
+                transporte['notas'])),
+        ]
+    
+    def _eventos_alojamiento(self, alojamiento, nombre_viaje):
+        descripcion = self._descripcion(
+            nombre_viaje,
+            f"Confirmación: {alojamiento['numero_confirmacion']}" if alojamiento['numero_confirmacion'] else None,
+            'Incluye desayuno' if alojamiento['incluye_desayuno'] else None)
+        for momento, fecha, hora in (('checkin', alojamiento['fecha_entrada'], alojamiento['horario_checkin']),
+                                     ('checkout', alojamiento['fecha_salida'], alojamiento['horario_checkout'])):
+            inicio = datetime.combine(fecha, hora)
+            yield [
+                ('UID', f"alojamiento-{alojamiento['id']}-{momento}@{DOMINIO_UID}"),
+                ('DTSTART', _instante(fecha, hora, alojamiento['destino'])),
+                ('DTEND', _instante((inicio + timedelta(minutes=30)).date(),
+                                    (inicio + timedelta(minutes=30)).time(), alojamiento['destino'])),
+                ('SUMMARY', _escapar(f"🏨 {'Check-in' if momento == 'checkin' else 'Check-out'}: "
+                                     f"{alojamiento['nombre']}")),
+                ('LOCATION', _escapar(alojamiento['direccion'])),
+                ('DESCRIPTION', descripcion),
+            ]
+    
+    def _eventos_actividad(self, actividad, nombre_viaje):
+        if actividad['hora']:
+            inicio = datetime.combine(actividad['fecha'], actividad['hora'])
+            fin = inicio + timedelta(hours=1)
+            fechas = [('DTSTART', _instante(inicio.date(), inicio.time(), actividad['destino'])),
+                      ('DTEND', _instante(fin.date(), fin.time(), actividad['destino']))]
+        else:
+            fechas = [('DTSTART;VALUE=DATE', _fecha(actividad['fecha'])),
+                      ('DTEND;VALUE=DATE', _fecha(actividad['fecha'] + timedelta(days=1)))]
+        yield [
+            ('UID', f"actividad-{actividad['id']}@{DOMINIO_UID}"),
+            *fechas,
+            ('SUMMARY', _escapar(f"{'✅' if actividad['completada'] else '🎯'} {actividad['nombre']}")),
+            ('LOCATION', _escapar(actividad['ubicacion'] or '')),
+            ('DESCRIPTION', self._descripcion(nombre_viaje, actividad['descripcion'])),
+        ]
+    
+    # ------------------------------------------------------------------
+    # Sincronización con la sesión
+    # ------------------------------------------------------------------
+    
+    def _despues_de_flush(self, session, flush_context):
+        """Anotar los viajes cuyos elementos de calendario cambiaron en esta transacción."""
+        afectados = session.info.setdefault('calendario_invalidar', set())
+        for coleccion in (session.new, session.dirty, session.deleted):
+            for objeto in coleccion:
+                nombre = type(objeto).__name__
+                if nombre not in MODELOS_CALENDARIO:
+                    continue
+                if nombre == 'Viaje':
+                    afectados.add(objeto.id)
+                    continue
+                afectados.add(objeto.viaje_id)
+                # Si el elemento se movió de viaje, también cambió el feed del viaje anterior
+                historial = inspect(objeto).attrs.viaje_id.history
+                afectados.update(v for v in historial.deleted if v is not None)
+    
+    def _despues_de_commit(self, session):
+        afectados = session.info.pop('calendario_invalidar', None)
+        if afectados:
+            self.invalidar(afectados)
+    
+    def _despues_de_rollback(self, session):
+        session.info.pop('calendario_invalidar', None)
+
+
+# Instancia global del servicio
+calendario_service = CalendarioService()
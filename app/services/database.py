@@ -5,42 +5,66 @@ Servicio para manejo de base de datos.
 
 import os
 
+from flask import current_app, has_app_context
+from sqlalchemy import inspect, text
+
 
 class DatabaseService:
-    """Servicio centralizado para operaciones de base de datos."""
+    """
+    Servicio centralizado para operaciones de base de datos.
+    
+    El estado de inicialización es de cada app (en app.extensions): si un
+    proceso crea más de una (p.ej. tests con bases distintas), cada una
+    inicializa la suya. Las operaciones usan la app del contexto actual y,
+    fuera de un contexto, la última registrada con init_service.
+    """
     
     def __init__(self):
         self._db = None
         self._app = None
         self._models = None
-        self._initialized = False
     
     def init_service(self, app, db, models):
         """Inicializa el servicio con la aplicación, base de datos y modelos."""
         self._app = app
         self._db = db
         self._models = models
-        print("🔧 DatabaseService inicializado")
+        app.extensions['database_service'] = {'initialized': False}
+    
+    def _app_actual(self):
+        """App del contexto actual; fuera de un contexto, la última registrada."""
+        if has_app_context():
+            return current_app._get_current_object()
+        return self._app
+    
+    def _estado(self, app=None):
+        app = app or self._app_actual()
+        if app is None:
+            return {'initialized': False}
+        return app.extensions.setdefault('database_service', {'initialized': False})
     
     @property
     def is_initialized(self):
-        """Retorna si la base de datos está inicializada."""
-        return self._initialized
+        """Retorna si la base de datos de la app actual está inicializada."""
+        return self._estado()['initialized']
     
     def set_initialized(self, status):
-        """Establece el estado de inicialización."""
-        self._initialized = status
+        """Establece el estado de inicialización de la app actual."""
+        self._estado()['initialized'] = status
     
     def init_database(self):
-        """Inicializa la base de datos automáticamente."""
-        if self._initialized:
+        """Inicializa la base de datos de la app actual automáticamente."""
+        app = self._app_actual()
+        estado = self._estado(app)
+        if estado['initialized']:
             return True
-            
+        
         try:
             print("🔄 Inicializando base de datos...")
+            print(f"🗄️  Usando: {app.config['SQLALCHEMY_DATABASE_URI'].split('@')[-1]}")
             
             # Crear el directorio si no existe (solo para SQLite local)
-            db_uri = self._app.config['SQLALCHEMY_DATABASE_URI']
+            db_uri = app.config['SQLALCHEMY_DATABASE_URI']
             if db_uri.startswith('sqlite:///'):
                 db_path = db_uri.replace('sqlite:///', '')
                 db_dir = os.path.dirname(db_path)
@@ -49,34 +73,81 @@ class DatabaseService:
                     print(f"📁 Directorio de DB creado: {db_dir}")
             
             # Usar contexto de aplicación para crear tablas
-            with self._app.app_context():
+            with app.app_context():
                 self._db.create_all()
                 print("✅ Tablas de base de datos verificadas/creadas correctamente")
                 
+                # create_all no agrega columnas ni índices nuevos a tablas ya existentes
+                self._agregar_columnas_faltantes()
+                self._crear_indices_faltantes()
+                
                 # Verificar que la conexión funciona
                 Viaje = self._models['Viaje']
                 viajes_count = Viaje.query.count()
                 print(f"📊 Base de datos conectada correctamente. Viajes existentes: {viajes_count}")
             
-            self._initialized = True
+            estado['initialized'] = True
             return True
-            
+        
         except Exception as e:
             print(f"❌ Error al crear tablas: {e}")
             import traceback
             traceback.print_exc()
             return False
     
+    def _agregar_columnas_faltantes(self):
+        """
+        Agrega a las tablas existentes las columnas declaradas en los modelos que les faltan.
+        
+        Las filas existentes reciben el server_default de la columna o, si no tiene,
+        su default de Python (p.ej. la fecha actual para fecha_actualizacion).
+        """
+        engine = self._db.engine
+        inspector = inspect(engine)
+        tablas_existentes = set(inspector.get_table_names())
+        for tabla in self._db.metadata.sorted_tables:
+            if tabla.name not in tablas_existentes:
+                continue
+            existentes = {columna['name'] for columna in inspector.get_columns(tabla.name)}
+            for columna in tabla.columns:
+                if columna.name in existentes:
+                    continue
+                tipo = columna.type.compile(dialect=engine.dialect)
+                sentencia = f'ALTER TABLE {tabla.name} ADD COLUMN {columna.name} {tipo}'
+                if columna.server_default is not None:
+                    sentencia += f' DEFAULT {columna.server_default.arg}'
+                    if not columna.nullable:
+                        sentencia += ' NOT NULL'
+                try:
+                    with engine.begin() as conexion:
+                        conexion.execute(text(sentencia))
+                        if columna.server_default is None and columna.default is not None:
+                            valor = columna.default.arg(None) if columna.default.is_callable else columna.default.arg
+                            conexion.execute(tabla.update().where(columna.is_(None)).values({columna.name: valor}))
+                    print(f"🧱 Columna agregada: {tabla.name}.{columna.name}")
+                except Exception as e:
+                    print(f"⚠️  No se pudo agregar la columna {tabla.name}.{columna.name}: {e}")
+    
+    def _crear_indices_faltantes(self):
+        """Crea los índices declarados en los modelos que aún no existen en la base de datos."""
+        for tabla in self._db.metadata.sorted_tables:
+            for indice in tabla.indexes:
+                try:
+                    indice.create(bind=self._db.engine, checkfirst=True)
+                except Exception as e:
+                    print(f"⚠️  No se pudo crear el índice {indice.name}: {e}")
+    
     def ensure_initialized(self):
         """Garantiza que la DB esté inicializada antes de cualquier operación."""
-        if not self._initialized:
+        if not self.is_initialized:
             self.init_database()
     
     def get_status(self):
         """Retorna el estado actual de la base de datos."""
+        app = self._app_actual()
         return {
-            'initialized': self._initialized,
-            'uri': self._app.config.get('SQLALCHEMY_DATABASE_URI', 'No configurada') if self._app else 'App no inicializada',
+            'initialized': self._estado(app)['initialized'],
+            'uri': app.config.get('SQLALCHEMY_DATABASE_URI', 'No configurada') if app else 'App no inicializada',
             'models_loaded': len(self._models) if self._models else 0
         }
 
@@ -6,7 +6,15 @@ Servicio para la lógica de negocio de documentos de viaje.
 from datetime import datetime, date, timedelta
 from collections import defaultdict
 
+from sqlalchemy.orm.exc import StaleDataError
 
+from .vencimiento_service import vencimiento_service
+from app.models.lecturas import DocumentoLectura
+from app.utils.metricas import medir_servicio
+from app.utils.concurrencia import resultado_conflicto, version_vigente
+
+
+@medir_servicio('documento')
 class DocumentoService:
     """Servicio para manejar la lógica de negocio relacionada con documentos de viaje."""
     
@@ -58,6 +66,8 @@ class DocumentoService:
             self.db.session.add(documento)
             self.db.session.commit()
             
+            vencimiento_service.registrar_documento(documento)
+            
             return {'success': True, 'documento_id': documento.id}
             
         except Exception as e:
@@ -66,17 +76,18 @@ class DocumentoService:
     
     def obtener_documentos_por_viaje(self, viaje_id):
         """
-        Obtener todos los documentos de un viaje.
+        Obtener todos los documentos de un viaje, de solo lectura.
         
         Args:
             viaje_id (int): ID del viaje
             
         Returns:
-            list: Lista de documentos del viaje
+            list: Lista de DocumentoLectura del viaje
         """
-        return self.Documento.query.filter_by(viaje_id=viaje_id).order_by(
-            self.Documento.tipo, self.Documento.nombre
-        ).all()
+        return DocumentoLectura.consultar(
+            self.db.session, self.Documento, self.Documento.viaje_id == viaje_id,
+            orden=(self.Documento.tipo, self.Documento.nombre)
+        )
     
     def agrupar_documentos_por_tipo(self, viaje_id):
         """
@@ -110,18 +121,20 @@ class DocumentoService:
         
         return resultado
     
-    def verificar_vencimientos(self, viaje_id, dias_anticipacion=30):
+    def verificar_vencimientos(self, viaje_id, dias_anticipacion=30, documentos=None):
         """
         Verificar documentos que están próximos a vencer o ya vencidos.
         
         Args:
             viaje_id (int): ID del viaje
             dias_anticipacion (int): Días de anticipación para alertas
+            documentos (list): Documentos ya cargados (optional, evita la consulta)
             
         Returns:
             dict: Diccionario con documentos categorizados por estado de vencimiento
         """
-        documentos = self.obtener_documentos_por_viaje(viaje_id)
+        if documentos is None:
+            documentos = self.obtener_documentos_por_viaje(viaje_id)
         hoy = date.today()
         fecha_alerta = hoy + timedelta(days=dias_anticipacion)
         
@@ -144,17 +157,18 @@ class DocumentoService:
         
         return resultado
     
-    def obtener_documentos_criticos(self, viaje_id):
+    def obtener_documentos_criticos(self, viaje_id, documentos=None):
         """
         Obtener documentos críticos para el viaje (vencidos o por vencer pronto).
         
         Args:
             viaje_id (int): ID del viaje
+            documentos (list): Documentos ya cargados (optional, evita la consulta)
             
         Returns:
             list: Lista de documentos que requieren atención
         """
-        vencimientos = self.verificar_vencimientos(viaje_id, dias_anticipacion=15)
+        vencimientos = self.verificar_vencimientos(viaje_id, dias_anticipacion=15, documentos=documentos)
         return vencimientos['vencidos'] + vencimientos['por_vencer']
     
     def obtener_estadisticas_documentos(self, viaje_id):
@@ -168,7 +182,7 @@ class DocumentoService:
             dict: Estadísticas de documentos
         """
         documentos = self.obtener_documentos_por_viaje(viaje_id)
-        vencimientos = self.verificar_vencimientos(viaje_id)
+        vencimientos = self.verificar_vencimientos(viaje_id, documentos=documentos)
         
         total = len(documentos)
         con_fecha = sum(1 for d in documentos if d.fecha_vencimiento)
@@ -190,17 +204,19 @@ class DocumentoService:
             'requieren_atencion': len(vencimientos['vencidos']) + len(vencimientos['por_vencer'])
         }
     
-    def validar_documentos_para_viaje(self, viaje_id):
+    def validar_documentos_para_viaje(self, viaje_id, documentos=None):
         """
         Validar que se tienen los documentos esenciales para un viaje.
         
         Args:
             viaje_id (int): ID del viaje
+            documentos (list): Documentos ya cargados (optional, evita la consulta)
             
         Returns:
             dict: Resultado de validación con recomendaciones
         """
-        documentos = self.obtener_documentos_por_viaje(viaje_id)
+        if documentos is None:
+            documentos = self.obtener_documentos_por_viaje(viaje_id)
         tipos_presentes = set(d.tipo.lower() for d in documentos)
         
         # Documentos esenciales recomendados
@@ -211,16 +227,38 @@ class DocumentoService:
         faltantes_recomendados = [tipo for tipo in recomendados if tipo not in tipos_presentes]
         
         # Verificar vencimientos críticos
-        criticos = self.obtener_documentos_criticos(viaje_id)
+        criticos = self.obtener_documentos_criticos(viaje_id, documentos=documentos)
         
         return {
             'completo': len(faltantes_esenciales) == 0 and len(criticos) == 0,
             'faltantes_esenciales': faltantes_esenciales,
             'faltantes_recomendados': faltantes_recomendados,
             'documentos_criticos': criticos,
-            'total_documentos': len(documentos)
+            'total_documentos': len(documentos),
+            'recomendaciones': self._generar_recomendaciones_documentos(
+                faltantes_esenciales, faltantes_recomendados, criticos)
         }
     
+    def _generar_recomendaciones_documentos(self, faltantes_esenciales, faltantes_recomendados, criticos):
+        """Generar recomendaciones basadas en el análisis de documentos."""
+        recomendaciones = []
+        
+        if faltantes_esenciales:
+            recomendaciones.append(f"Agregar documentos esenciales: {', '.join(faltantes_esenciales)}")
+        
+        vencidos = [d for d in criticos if d.fecha_vencimiento < date.today()]
+        if vencidos:
+            recomendaciones.append(f"Renovar {len(vencidos)} documentos vencidos")
+        
+        por_vencer = len(criticos) - len(vencidos)
+        if por_vencer:
+            recomendaciones.append(f"Revisar {por_vencer} documentos que vencen en los próximos 15 días")
+        
+        if faltantes_recomendados:
+            recomendaciones.append(f"Considerar agregar: {', '.join(faltantes_recomendados)}")
+        
+        return recomendaciones
+    
     def eliminar_documento(self, documento_id):
         """
         Eliminar un documento.
@@ -234,32 +272,38 @@ class DocumentoService:
         try:
             documento = self.Documento.query.get(documento_id)
             if not documento:
-                return {'success': False, 'error': 'Documento no encontrado'}
+                return {'success': False, 'no_encontrado': True, 'error': 'Documento no encontrado'}
             
             self.db.session.delete(documento)
             self.db.session.commit()
             
+            vencimiento_service.descartar_documento(documento_id)
+            
             return {'success': True}
             
         except Exception as e:
             self.db.session.rollback()
             return {'success': False, 'error': str(e)}
     
-    def actualizar_documento(self, documento_id, **kwargs):
+    def actualizar_documento(self, documento_id, version=None, **kwargs):
         """
         Actualizar campos de un documento.
         
         Args:
             documento_id (int): ID del documento
+            version (int): Versión que editó el cliente; si ya no es la actual
+                no se escribe nada y se informa el conflicto
             **kwargs: Campos a actualizar
             
         Returns:
-            dict: Resultado con success
+            dict: Resultado con success y la nueva version, o conflicto=True o no_encontrado=True
         """
         try:
             documento = self.Documento.query.get(documento_id)
             if not documento:
-                return {'success': False, 'error': 'Documento no encontrado'}
+                return {'success': False, 'no_encontrado': True, 'error': 'Documento no encontrado'}
+            if not version_vigente(documento, version):
+                return resultado_conflicto(documento, 'el documento')
             
             # Actualizar campos permitidos
             campos_permitidos = ['tipo', 'nombre', 'numero', 'fecha_vencimiento', 'notas']
@@ -272,10 +316,18 @@ class DocumentoService:
                     
                     setattr(documento, campo, valor)
             
+            self.db.session.flush()
+            nueva_version = documento.version
             self.db.session.commit()
             
-            return {'success': True}
+            vencimiento_service.registrar_documento(documento)
             
+            return {'success': True, 'version': nueva_version}
+            
+        except StaleDataError:
+            # Otra transacción cambió la fila entre la lectura y el UPDATE
+            self.db.session.rollback()
+            return resultado_conflicto(elemento='el documento')
         except Exception as e:
             self.db.session.rollback()
             return {'success': False, 'error': str(e)}
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio de exportación de viajes en NDJSON y CSV.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime, time
+from itertools import groupby
+
+from sqlalchemy import select
+
+
+# Nombre de entidad en las URLs -> modelo
+ENTIDADES = {
+    'viajes': 'Viaje',
+    'paradas': 'Parada',
+    'gastos': 'Gasto',
+    'actividades': 'Actividad',
+    'documentos': 'Documento',
+    'transportes': 'Transporte',
+    'alojamientos': 'Alojamiento',
+    'geocodificaciones': 'Geocodificacion',
+}
+
+# Elementos de un viaje en el agregado completo y su orden dentro del viaje
+ELEMENTOS_VIAJE = {
+    'paradas': ('Parada', ('orden', 'id')),
+    'gastos': ('Gasto', ('fecha', 'id')),
+    'actividades': ('Actividad', ('fecha', 'hora', 'id')),
+    'documentos': ('Documento', ('id',)),
+    'transportes': ('Transporte', ('fecha_salida', 'hora_salida', 'id')),
+    'alojamientos': ('Alojamiento', ('fecha_entrada', 'id')),
+}
+
+
+def _serializar(valor):
+    """Convertir fechas y horas a ISO 8601 para JSON y CSV."""
+    if isinstance(valor, (date, datetime, time)):
+        return valor.isoformat()
+    raise TypeError(f'Tipo no serializable: {type(valor).__name__}')
+
+
+def _linea_json(objeto):
+    return json.dumps(objeto, ensure_ascii=False, default=_serializar) + '\n'
+
+
+class ExportacionService:
+    """
+    Exporta viajes y sus elementos sin cargar todo en memoria.
+    
+    Las filas se leen con cursores del lado del servidor (``yield_per``) y se
+    escriben a medida que llegan, así que la memoria usada no depende de la
+    cantidad de viajes. El agregado completo de cada viaje se arma recorriendo
+    en paralelo una consulta por tabla ordenada por viaje_id (7 consultas en
+    total, sin importar cuántos viajes haya).
+    """
+    
+    def __init__(self, database_service=None):
+        """Inicializar el servicio de exportación."""
+        self.db_service = database_service
+        self.db = None
+        self._models = None
+    
+    def init_models(self, models_dict, database_instance):
+        """Inicializar los modelos necesarios."""
+        self._models = models_dict
+        self.db = database_instance
+    
+    def _tabla(self, nombre_modelo):
+        return self._models[nombre_modelo].__table__
+    
+    def _filas(self, consulta, tamano_lote):
+        """Ejecutar una consulta con un cursor del lado del servidor."""
+        return self.db.session.execute(consulta.execution_options(yield_per=tamano_lote)).mappings()
+    
+    def filas_entidad(self, entidad, viaje_id=None, tamano_lote=1000):
+        """
+        Iterar las filas de una entidad como diccionarios.
+        
+        Args:
+            entidad (str): Clave de ENTIDADES (p.ej. 'gastos')
+            viaje_id (int): Limitar a un viaje (no aplica a geocodificaciones)
+            tamano_lote (int): Filas por lectura del cursor
+        
+        Yields:
+            dict: Columnas de cada fila
+        """
+        tabla = self._tabla(ENTIDADES[entidad])
+        consulta = select(tabla).order_by(tabla.c.id)
+        if viaje_id is not None:
+            columna = tabla.c.id if entidad == 'viajes' else tabla.c.get('viaje_id')
+            if columna is None:
+                raise ValueError(f'La entidad {entidad} no pertenece a un viaje')
+            consulta = consulta.where(columna == viaje_id)
+        for fila in self._filas(consulta, tamano_lote):
+            yield dict(fila)
+    
+    def columnas_entidad(self, entidad):
+        """Nombres de las columnas de una entidad, en el orden de la tabla."""
+        return [columna.name for columna in self._tabla(ENTIDADES[entidad]).columns]
+    
+    def _grupos_por_viaje(self, nombre_modelo, orden, viaje_ids, tamano_lote):
+        """Iterar (viaje_id, [filas]) de una tabla hija, en orden de viaje_id."""
+        tabla = self._tabla(nombre_modelo)
+        consulta = select(tabla).order_by(tabla.c.viaje_id, *(tabla.c[c] for c in orden))
+        if viaje_ids is not None:
+            consulta = consulta.where(tabla.c.viaje_id.in_(viaje_ids))
+        for clave, filas in groupby(self._filas(consulta, tamano_lote), key=lambda f: f['viaje_id']):
+            yield clave, [{k: v for k, v in fila.items() if k != 'viaje_id'} for fila in filas]
+    
+    def viajes_completos(self, viaje_id=None, tamano_lote=1000, viaje_ids=None):
+        """
+        Iterar el agregado completo de cada viaje.
+        
+        Args:
+            viaje_id (int): Exportar solo este viaje
+            tamano_lote (int): Filas por lectura de cada cursor
+            viaje_ids (list): Exportar solo estos viajes (las mismas 7 consultas)
+        
+        Yields:
+            dict: {'viaje': {...}, 'paradas': [...], 'gastos': [...], 'actividades': [...],
+                   'documentos': [...], 'transportes': [...], 'alojamientos': [...]}
+        """
+        if viaje_id is not None:
+            viaje_ids = [viaje_id]
+        
+        grupos = {}
+        pendientes = {}
+        for clave, (nombre_modelo, orden) in ELEMENTOS_VIAJE.items():
+            grupos[clave] = self._grupos_por_viaje(nombre_modelo, orden, viaje_ids, tamano_lote)
+            pendientes[clave] = next(grupos[clave], None)
+        
+        tabla_viaje = self._tabla('Viaje')
+        consulta = select(tabla_viaje).order_by(tabla_viaje.c.id)
+        if viaje_ids is not None:
+            consulta = consulta.where(tabla_viaje.c.id.in_(viaje_ids))
+        for viaje in map(dict, self._filas(consulta, tamano_lote)):
+            agregado = {'viaje': viaje}
+            for clave, iterador in grupos.items():
+                # Descartar grupos huérfanos (viaje_id sin viaje) que quedaron antes
+                while pendientes[clave] is not None and pendientes[clave][0] < viaje['id']:
+                    pendientes[clave] = next(iterador, None)
+                if pendientes[clave] is not None and pendientes[clave][0] == viaje['id']:
+                    agregado[clave] = pendientes[clave][1]
+                    pendientes[clave] = next(iterador, None)
+                else:
+                    agregado[clave] = []
+            yield agregado
+    
+    def exportar_viajes_ndjson(self, viaje_id=None):
+        """Generador de líneas NDJSON, un viaje completo por línea."""
+        for agregado in self.viajes_completos(viaje_id):
+            yield _linea_json(agregado)
+    
+    def exportar_entidad_ndjson(self, entidad, viaje_id=None):
+        """Generador de líneas NDJSON, una fila de la entidad por línea."""
+        for fila in self.filas_entidad(entidad, viaje_id):
+            yield _linea_json(fila)
+    
+    def exportar_entidad_csv(self, entidad, viaje_id=None, filas_por_bloque=500):
+        """Generador de bloques CSV (con encabezado) de una entidad."""
+        columnas = self.columnas_entidad(entidad)
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(columnas)
+        
+        for i, fila in enumerate(self.filas_entidad(entidad, viaje_id), 1):
+            escritor.writerow([
+                _serializar(v) if isinstance(v, (date, datetime, time)) else v
+                for v in (fila[c] for c in columnas)
+            ])
+            if i % filas_por_bloque == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        
+        if buffer.tell():
+            yield buffer.getvalue()
+
+
+# Instancia global del servicio
+exportacion_service = ExportacionService()
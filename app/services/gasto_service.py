@@ -5,7 +5,12 @@ Servicio para la lógica de negocio de gastos.
 
 from datetime import datetime
 
+from sqlalchemy import func, select, update
 
+from app.utils.metricas import medir_servicio
+
+
+@medir_servicio('gasto')
 class GastoService:
     """Servicio para manejar la lógica de negocio relacionada con gastos."""
     
@@ -15,13 +20,13 @@ class GastoService:
         self.db = None
         self.Gasto = None
         self.Viaje = None
-        
+    
     def init_models(self, models_dict, database_instance):
         """Inicializar los modelos necesarios."""
         self.Gasto = models_dict['Gasto']
         self.Viaje = models_dict['Viaje']
         self.db = database_instance
-        
+    
     def crear_gasto(self, viaje_id, categoria, descripcion, monto, fecha, moneda='USD'):
         """
         Crear un nuevo gasto y actualizar el presupuesto del viaje.
@@ -33,7 +38,7 @@ class GastoService:
             monto (float): Monto del gasto
             fecha (str|date): Fecha del gasto
             moneda (str): Moneda del gasto (default: USD)
-            
+        
         Returns:
             dict: Resultado con success y gasto_id
         """
@@ -56,26 +61,33 @@ class GastoService:
             self.db.session.flush()  # Para que el gasto esté disponible en la relación
             
             # Actualizar presupuesto gastado del viaje
-            self._actualizar_presupuesto_viaje(viaje_id)
+            self.actualizar_presupuesto_viaje(viaje_id)
             
             self.db.session.commit()
             
             return {'success': True, 'gasto_id': gasto.id}
-            
+        
         except Exception as e:
             self.db.session.rollback()
             return {'success': False, 'error': str(e)}
     
-    def _actualizar_presupuesto_viaje(self, viaje_id):
+    def actualizar_presupuesto_viaje(self, viaje_id):
         """
         Actualizar el presupuesto gastado de un viaje sumando todos sus gastos.
         
+        La suma se calcula dentro del UPDATE: dos gastos simultáneos del mismo
+        viaje no se pisan. presupuesto_gastado es un campo calculado: el UPDATE
+        no sube la versión del viaje y el registro de sincronización lo anota
+        como 'calculado', así que no choca con quien esté editando el viaje.
+        
         Args:
             viaje_id (int): ID del viaje
         """
-        viaje = self.Viaje.query.get(viaje_id)
-        if viaje:
-            viaje.presupuesto_gastado = sum(g.monto for g in viaje.gastos)
+        total = select(func.coalesce(func.sum(self.Gasto.monto), 0.0)).where(
+            self.Gasto.viaje_id == viaje_id).scalar_subquery()
+        self.db.session.execute(
+            update(self.Viaje).where(self.Viaje.id == viaje_id).values(presupuesto_gastado=total)
+            .execution_options(solo_campos_calculados=True))
     
     def obtener_gastos_por_viaje(self, viaje_id):
         """
@@ -83,7 +95,7 @@ class GastoService:
         
         Args:
             viaje_id (int): ID del viaje
-            
+        
         Returns:
             list: Lista de gastos del viaje
         """
@@ -95,7 +107,7 @@ class GastoService:
         
         Args:
             viaje_id (int): ID del viaje
-            
+        
         Returns:
             dict: Diccionario con categorías como claves y totales como valores
         """
@@ -107,7 +119,7 @@ class GastoService:
             if categoria not in categorias:
                 categorias[categoria] = 0
             categorias[categoria] += gasto.monto
-            
+        
         return categorias
     
     def calcular_total_gastado(self, viaje_id):
@@ -116,7 +128,7 @@ class GastoService:
         
         Args:
             viaje_id (int): ID del viaje
-            
+        
         Returns:
             float: Total gastado
         """
@@ -129,7 +141,7 @@ class GastoService:
         
         Args:
             gasto_id (int): ID del gasto a eliminar
-            
+        
         Returns:
             dict: Resultado con success
         """
@@ -143,12 +155,12 @@ class GastoService:
             self.db.session.delete(gasto)
             
             # Actualizar presupuesto gastado del viaje
-            self._actualizar_presupuesto_viaje(viaje_id)
+            self.actualizar_presupuesto_viaje(viaje_id)
             
             self.db.session.commit()
             
             return {'success': True}
-            
+        
         except Exception as e:
             self.db.session.rollback()
             return {'success': False, 'error': str(e)}
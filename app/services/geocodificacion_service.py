@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio de geocodificación de destinos con caché persistente.
+"""
+
+import os
+import json
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from app.utils.zonas_horarias import normalizar_lugar
+from app.utils.metricas import medir_servicio, metricas
+
+
+# Segundos durante los que no se reintenta un destino cuya consulta falló
+# (timeout, error de red): evita repetir la espera en cada carga de la página
+TTL_FALLOS_SEGUNDOS = 300
+
+# Coordenadas (lat, lon) de destinos habituales para el proveedor offline.
+# Las claves están normalizadas (minúsculas, sin acentos).
+COORDENADAS_CONOCIDAS = {
+    'buenos aires': (-34.6037, -58.3816), 'cordoba': (-31.4201, -64.1888),
+    'mendoza': (-32.8895, -68.8458), 'bariloche': (-41.1335, -71.3103),
+    'salta': (-24.7821, -65.4232), 'ushuaia': (-54.8019, -68.3030),
+    'el calafate': (-50.3379, -72.2648), 'rosario': (-32.9442, -60.6505),
+    'puerto iguazu': (-25.5972, -54.5786), 'iguazu': (-25.5972, -54.5786),
+    'mar del plata': (-38.0055, -57.5426), 'santiago': (-33.4489, -70.6693),
+    'santiago de chile': (-33.4489, -70.6693), 'montevideo': (-34.9011, -56.1645),
+    'punta del este': (-34.9667, -54.9500), 'asuncion': (-25.2637, -57.5759),
+    'lima': (-12.0464, -77.0428), 'cusco': (-13.5320, -71.9675),
+    'la paz': (-16.4897, -68.1193), 'bogota': (4.7110, -74.0721),
+    'medellin': (6.2442, -75.5812), 'cartagena': (10.3910, -75.4794),
+    'quito': (-0.1807, -78.4678), 'caracas': (10.4806, -66.9036),
+    'sao paulo': (-23.5505, -46.6333), 'rio de janeiro': (-22.9068, -43.1729),
+    'florianopolis': (-27.5954, -48.5480), 'salvador': (-12.9777, -38.5016),
+    'panama': (8.9824, -79.5199), 'san jose': (9.9281, -84.0907),
+    'ciudad de mexico': (19.4326, -99.1332), 'cancun': (21.1619, -86.8515),
+    'la habana': (23.1136, -82.3666), 'punta cana': (18.5601, -68.3725),
+    'miami': (25.7617, -80.1918), 'nueva york': (40.7128, -74.0060),
+    'new york': (40.7128, -74.0060), 'orlando': (28.5383, -81.3792),
+    'washington': (38.9072, -77.0369), 'boston': (42.3601, -71.0589),
+    'chicago': (41.8781, -87.6298), 'los angeles': (34.0522, -118.2437),
+    'san francisco': (37.7749, -122.4194), 'las vegas': (36.1699, -115.1398),
+    'toronto': (43.6532, -79.3832), 'montreal': (45.5017, -73.5673),
+    'vancouver': (49.2827, -123.1207), 'honolulu': (21.3069, -157.8583),
+    'madrid': (40.4168, -3.7038), 'barcelona': (41.3874, 2.1686),
+    'sevilla': (37.3891, -5.9845), 'valencia': (39.4699, -0.3763),
+    'malaga': (36.7213, -4.4214), 'bilbao': (43.2630, -2.9350),
+    'granada': (37.1773, -3.5986), 'palma': (39.5696, 2.6502),
+    'lisboa': (38.7223, -9.1393), 'oporto': (41.1579, -8.6291), 'porto': (41.1579, -8.6291),
+    'paris': (48.8566, 2.3522), 'niza': (43.7102, 7.2620), 'lyon': (45.7640, 4.8357),
+    'londres': (51.5074, -0.1278), 'london': (51.5074, -0.1278),
+    'edimburgo': (55.9533, -3.1883), 'dublin': (53.3498, -6.2603),
+    'amsterdam': (52.3676, 4.9041), 'bruselas': (50.8503, 4.3517),
+    'berlin': (52.5200, 13.4050), 'munich': (48.1351, 11.5820), 'frankfurt': (50.1109, 8.6821),
+    'zurich': (47.3769, 8.5417), 'ginebra': (46.2044, 6.1432),
+    'viena': (48.2082, 16.3738), 'praga': (50.0755, 14.4378), 'budapest': (47.4979, 19.0402),
+    'varsovia': (52.2297, 21.0122), 'copenhague': (55.6761, 12.5683),
+    'estocolmo': (59.3293, 18.0686), 'oslo': (59.9139, 10.7522), 'helsinki': (60.1699, 24.9384),
+    'roma': (41.9028, 12.4964), 'milan': (45.4642, 9.1900), 'florencia': (43.7696, 11.2558),
+    'venecia': (45.4408, 12.3155), 'napoles': (40.8518, 14.2681),
+    'atenas': (37.9838, 23.7275), 'estambul': (41.0082, 28.9784), 'moscu': (55.7558, 37.6173),
+    'marrakech': (31.6295, -7.9811), 'casablanca': (33.5731, -7.5898),
+    'el cairo': (30.0444, 31.2357), 'ciudad del cabo': (-33.9249, 18.4241),
+    'dubai': (25.2048, 55.2708), 'doha': (25.2854, 51.5310), 'tel aviv': (32.0853, 34.7818),
+    'delhi': (28.7041, 77.1025), 'mumbai': (19.0760, 72.8777),
+    'bangkok': (13.7563, 100.5018), 'singapur': (1.3521, 103.8198),
+    'hong kong': (22.3193, 114.1694), 'pekin': (39.9042, 116.4074),
+    'shanghai': (31.2304, 121.4737), 'seul': (37.5665, 126.9780),
+    'tokio': (35.6762, 139.6503), 'tokyo': (35.6762, 139.6503),
+    'kioto': (35.0116, 135.7681), 'osaka': (34.6937, 135.5023),
+    'bali': (-8.3405, 115.0920), 'sidney': (-33.8688, 151.2093), 'sydney': (-33.8688, 151.2093),
+    'melbourne': (-37.8136, 144.9631), 'auckland': (-36.8485, 174.7633),
+}
+
+
+class ProveedorGazetteer:
+    """Proveedor offline basado en un diccionario de destinos conocidos (útil para tests)."""
+    
+    nombre = 'gazetteer'
+    max_concurrencia = 8
+    
+    def __init__(self, coordenadas=None):
+        self.coordenadas = coordenadas if coordenadas is not None else COORDENADAS_CONOCIDAS
+    
+    def geocodificar(self, destino):
+        """Devuelve (lat, lon) o None si el destino no está en el diccionario."""
+        normalizado = normalizar_lugar(destino)
+        if normalizado in self.coordenadas:
+            return self.coordenadas[normalizado]
+        
+        # Probar por segmentos: "Roma, Italia", "París (Francia)"
+        for segmento in re.split(r'[,()/\-]', normalizado):
+            segmento = segmento.strip()
+            if segmento in self.coordenadas:
+                return self.coordenadas[segmento]
+        return None
+
+
+class ProveedorNominatim:
+    """Proveedor que consulta la API de búsqueda de Nominatim (OpenStreetMap)."""
+    
+    nombre = 'nominatim'
+    URL_PUBLICA = 'https://nominatim.openstreetmap.org'
+    
+    def __init__(self, url_base=None, timeout=5):
+        self.url_base = (url_base or os.environ.get('NOMINATIM_URL') or self.URL_PUBLICA).rstrip('/')
+        self.timeout = timeout
+        # La instancia pública permite 1 petición por segundo; una propia admite más
+        publica = self.url_base == self.URL_PUBLICA
+        self.max_concurrencia = 1 if publica else 8
+        self.intervalo_minimo = 1.0 if publica else 0.0
+        self._ultima_peticion = 0.0
+        self._lock = threading.Lock()
+    
+    def _esperar_turno(self):
+        """Espaciar las peticiones al menos intervalo_minimo segundos (en este proceso)."""
+        if not self.intervalo_minimo:
+            return
+        with self._lock:
+            espera = self._ultima_peticion + self.intervalo_minimo - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            self._ultima_peticion = time.monotonic()
+    
+    def geocodificar(self, destino):
+        """Devuelve (lat, lon) o None si Nominatim no encuentra el destino."""
+        self._esperar_turno()
+        parametros = urllib.parse.urlencode({'format': 'json', 'q': destino, 'limit': 1})
+        peticion = urllib.request.Request(
+            f'{self.url_base}/search?{parametros}',
+            headers={'User-Agent': 'viajes-pwa/1.0'}
+        )
+        with urllib.request.urlopen(peticion, timeout=self.timeout) as respuesta:
+            datos = json.loads(respuesta.read().decode('utf-8'))
+        
+        if datos:
+            return float(datos[0]['lat']), float(datos[0]['lon'])
+        return None
+
+
+@medir_servicio('geocodificacion')
+class GeocodificacionService:
+    """Servicio para resolver coordenadas de destinos con caché persistente en base de datos."""
+    
+    def __init__(self, database_service=None, proveedor=None):
+        """Inicializar el servicio de geocodificación."""
+        self.db_service = database_service
+        self.db = None
+        self.Geocodificacion = None
+        self.proveedor = proveedor
+        self._fallos = {}  # destino normalizado -> momento (monotonic) del último error
+        self._lock_fallos = threading.Lock()
+    
+    def init_models(self, models_dict, database_instance):
+        """Inicializar los modelos necesarios."""
+        self.Geocodificacion = models_dict['Geocodificacion']
+        self.db = database_instance
+        
+        if self.proveedor is None:
+            if os.environ.get('GEOCODIFICADOR', 'nominatim').lower() == 'gazetteer':
+                self.proveedor = ProveedorGazetteer()
+            else:
+                self.proveedor = ProveedorNominatim()
+    
+    def set_proveedor(self, proveedor):
+        """Cambiar el proveedor de geocodificación (p.ej. el gazetteer offline en tests)."""
+        self.proveedor = proveedor
+    
+    def _resolver(self, destino):
+        """Consultar al proveedor sin propagar errores de red."""
+        try:
+            return self.proveedor.geocodificar(destino)
+        except Exception as e:
+            print(f"⚠️  Error geocodificando '{destino}': {e}")
+            with self._lock_fallos:
+                self._fallos[normalizar_lugar(destino)] = time.monotonic()
+            return False  # Distinto de None: no se guarda en caché para reintentar
+    
+    def _fallo_reciente(self, clave):
+        """True si la última consulta de este destino falló hace menos de TTL_FALLOS_SEGUNDOS."""
+        with self._lock_fallos:
+            momento = self._fallos.get(clave)
+            if momento is None:
+                return False
+            if time.monotonic() - momento < TTL_FALLOS_SEGUNDOS:
+                return True
+            del self._fallos[clave]
+            return False
+    
+    def _claves(self, destinos):
+        """Destino normalizado -> primer texto original con esa clave."""
+        por_clave = {}
+        for destino in destinos:
+            clave = normalizar_lugar(destino)
+            if clave:
+                por_clave.setdefault(clave, destino)
+        return por_clave
+    
+    def _leer_cache(self, claves):
+        """Coordenadas guardadas para esas claves: clave -> (lat, lon) o None si no se encontró."""
+        coordenadas = {}
+        if not claves:
+            return coordenadas
+        cacheados = self.Geocodificacion.query.filter(
+            self.Geocodificacion.destino_normalizado.in_(list(claves))
+        ).all()
+        for registro in cacheados:
+            if registro.latitud is not None:
+                coordenadas[registro.destino_normalizado] = (registro.latitud, registro.longitud)
+            else:
+                coordenadas[registro.destino_normalizado] = None
+        return coordenadas
+    
+    def geocodificar_lote(self, destinos):
+        """
+        Obtener coordenadas para varios destinos.
+        
+        Los destinos ya resueltos se leen de la caché con una sola consulta; los
+        faltantes se resuelven en paralelo con el proveedor y se guardan. Los
+        que fallaron hace poco (TTL_FALLOS_SEGUNDOS) no se vuelven a consultar.
+        
+        Args:
+            destinos (list): Lista de nombres de destino
+        
+        Returns:
+            dict: Destino original -> (lat, lon) o None si no se pudo resolver
+        """
+        por_clave = self._claves(destinos)
+        
+        resultado = {destino: None for destino in destinos}
+        if not por_clave:
+            return resultado
+        
+        # 1. Caché persistente
+        coordenadas = self._leer_cache(por_clave)
+        
+        # 2. Resolver los faltantes en paralelo
+        faltantes = [clave for clave in por_clave
+                     if clave not in coordenadas and not self._fallo_reciente(clave)]
+        metricas.incrementar('cache_aciertos_total', ('geocodificacion',), len(coordenadas))
+        metricas.incrementar('cache_fallos_total', ('geocodificacion',), len(faltantes))
+        if faltantes:
+            workers = max(1, min(len(faltantes), getattr(self.proveedor, 'max_concurrencia', 1)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                resueltos = list(executor.map(self._resolver, [por_clave[c] for c in faltantes]))
+            
+            filas = []
+            for clave, coords in zip(faltantes, resueltos):
+                if coords is False:
+                    continue  # Error transitorio: no cachear
+                coordenadas[clave] = coords
+                filas.append({
+                    'destino_normalizado': clave,
+                    'destino': por_clave[clave],
+                    'latitud': coords[0] if coords else None,
+                    'longitud': coords[1] if coords else None,
+                    'proveedor': self.proveedor.nombre,
+                    'fecha_actualizacion': datetime.utcnow()
+                })
+            
+            if filas:
+                self._guardar_cache(filas)
+        
+        for destino in destinos:
+            resultado[destino] = coordenadas.get(normalizar_lugar(destino))
+        return resultado
+    
+    def _guardar_cache(self, filas):
+        """
+        Guardar destinos resueltos en la caché, ignorando los que ya estén.
+        
+        Otro proceso puede guardar el mismo destino en paralelo: con
+        INSERT ... ON CONFLICT DO NOTHING (SQLite y PostgreSQL) ese destino se
+        omite sin descartar el resto del lote, que si no habría que volver a
+        pedir al proveedor.
+        
+        Args:
+            filas (list): Filas de geocodificacion a insertar
+        """
+        tabla = self.Geocodificacion.__table__
+        session = self.db.session
+        dialecto = session.get_bind().dialect.name
+        try:
+            if dialecto in ('sqlite', 'postgresql'):
+                if dialecto == 'sqlite':
+                    from sqlalchemy.dialects.sqlite import insert
+                else:
+                    from sqlalchemy.dialects.postgresql import insert
+                session.execute(insert(tabla).on_conflict_do_nothing(index_elements=['destino_normalizado']), filas)
+            else:
+                # Sin ON CONFLICT: un savepoint por fila
+                for fila in filas:
+                    try:
+                        with session.begin_nested():
+                            session.execute(tabla.insert(), [fila])
+                    except IntegrityError:
+                        pass
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"⚠️  No se pudo guardar la caché de geocodificación: {e}")
+    
+    def geocodificar(self, destino):
+        """
+        Obtener las coordenadas de un destino.
+        
+        Args:
+            destino (str): Nombre del destino
+        
+        Returns:
+            tuple: (lat, lon) o None si no se pudo resolver
+        """
+        return self.geocodificar_lote([destino])[destino]
+    
+    def coordenadas_paradas(self, viaje):
+        """
+        Obtener las coordenadas de todas las paradas de un viaje.
+        
+        Consulta al proveedor por los destinos que no están en caché, así que
+        puede tardar (con la instancia pública de Nominatim, un segundo por
+        destino): no usarlo al renderizar una página.
+        
+        Args:
+            viaje: Instancia del modelo Viaje
+        
+        Returns:
+            dict: parada_id -> [lat, lon] o None
+        """
+        paradas = viaje.paradas
+        coordenadas = self.geocodificar_lote([p.destino for p in paradas])
+        return {p.id: list(coordenadas[p.destino]) if coordenadas[p.destino] else None for p in paradas}
+    
+    def coordenadas_paradas_cacheadas(self, viaje):
+        """
+        Coordenadas de las paradas de un viaje que ya están en caché, sin consultar al proveedor.
+        
+        Args:
+            viaje: Viaje (o su instantánea) con la lista paradas
+        
+        Returns:
+            tuple: (dict parada_id -> [lat, lon] o None, cantidad de paradas
+            cuyo destino todavía no se resolvió)
+        """
+        paradas = viaje.paradas
+        cacheadas = self._leer_cache(self._claves([p.destino for p in paradas]))
+        coordenadas = {}
+        pendientes = 0
+        for parada in paradas:
+            clave = normalizar_lugar(parada.destino)
+            if clave and clave not in cacheadas:
+                pendientes += 1
+            coords = cacheadas.get(clave)
+            coordenadas[parada.id] = list(coords) if coords else None
+        return coordenadas, pendientes
+
+
+# Instancia global del servicio
+geocodificacion_service = GeocodificacionService()
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio de importación masiva de viajes completos desde NDJSON.
+"""
+
+import json
+from datetime import date, datetime, time
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, String, Time
+
+from app.utils.metricas import medir_servicio
+from .busqueda_service import CAMPOS_INDEXADOS
+from .exportacion_service import ELEMENTOS_VIAJE
+
+
+# Valores por defecto que aplican los servicios al crear cada elemento
+DEFAULTS_IMPORTACION = {
+    'Alojamiento': {'horario_checkin': time(15, 0), 'horario_checkout': time(11, 0)},
+}
+
+# Columnas que mantiene el servidor: los valores del archivo se ignoran
+COLUMNAS_CONTROL = ('version', 'fecha_actualizacion', 'version_agregado', 'fecha_actualizacion_agregado')
+
+# Pares (inicio, fin) que deben estar en orden dentro de cada fila
+RANGOS_FECHAS = {
+    'Viaje': ('fecha_inicio', 'fecha_fin'),
+    'Parada': ('fecha_llegada', 'fecha_salida'),
+    'Alojamiento': ('fecha_entrada', 'fecha_salida'),
+    'Transporte': ('fecha_salida', 'fecha_llegada'),
+}
+
+
+class ErrorValidacion(ValueError):
+    """Un viaje del archivo de importación no es válido."""
+
+
+def _convertir(columna, valor):
+    """Convertir un valor JSON al tipo de la columna."""
+    tipo = columna.type
+    if isinstance(tipo, DateTime):
+        return valor if isinstance(valor, datetime) else datetime.fromisoformat(str(valor))
+    if isinstance(tipo, Date):
+        return valor if isinstance(valor, date) else date.fromisoformat(str(valor)[:10])
+    if isinstance(tipo, Time):
+        return valor if isinstance(valor, time) else time.fromisoformat(str(valor))
+    if isinstance(tipo, Boolean):
+        if isinstance(valor, str):
+            return valor.strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+        return bool(valor)
+    if isinstance(tipo, Float):
+        return float(valor)
+    if isinstance(tipo, Integer):
+        return int(valor)
+    if isinstance(tipo, String):
+        valor = str(valor)
+        if tipo.length and len(valor) > tipo.length:
+            raise ValueError(f'más de {tipo.length} caracteres')
+        return valor
+    return valor
+
+
+@medir_servicio('importacion')
+class ImportacionService:
+    """
+    Importa viajes completos con el formato de exportación NDJSON: una línea por
+    viaje con sus paradas, gastos, actividades, documentos, transportes y
+    alojamientos.
+    
+    El archivo se procesa línea por línea (la memoria depende del viaje más
+    grande, no del archivo). Cada viaje se valida completo antes de escribir y
+    se inserta en su propia transacción, con un INSERT masivo por tabla. Los IDs
+    del archivo se ignoran: la base asigna IDs nuevos.
+    """
+    
+    def __init__(self, database_service=None):
+        """Inicializar el servicio de importación."""
+        self.db_service = database_service
+        self.db = None
+        self._models = None
+    
+    def init_models(self, models_dict, database_instance):
+        """Inicializar los modelos necesarios."""
+        self._models = models_dict
+        self.db = database_instance
+    
+    # ------------------------------------------------------------------
+    # Validación
+    # ------------------------------------------------------------------
+    
+    def _validar_fila(self, nombre_modelo, datos, ubicacion, parcial=False):
+        """
+        Normalizar una fila: todas las columnas (salvo id y viaje_id) con el tipo correcto.
+        
+        Args:
+            nombre_modelo (str): Modelo de la fila (p.ej. 'Gasto')
+            datos (dict): Valores recibidos
+            ubicacion (str): Prefijo de los mensajes de error
+            parcial (bool): Normalizar solo los campos presentes (actualizaciones)
+        
+        Raises:
+            ErrorValidacion: Si falta un campo requerido o un valor no es válido
+        """
+        if not isinstance(datos, dict):
+            raise ErrorValidacion(f'{ubicacion}: se esperaba un objeto')
+        
+        defaults = DEFAULTS_IMPORTACION.get(nombre_modelo, {})
+        fila = {}
+        for columna in self._models[nombre_modelo].__table__.columns:
+            if columna.name in ('id', 'viaje_id') or (parcial and (columna.name not in datos or
+                                                                    columna.name in COLUMNAS_CONTROL)):
+                continue
+            valor = datos.get(columna.name) if columna.name not in COLUMNAS_CONTROL else None
+            if valor is None or valor == '':
+                if parcial:
+                    if not columna.nullable:
+                        raise ErrorValidacion(f'{ubicacion}: campo requerido {columna.name}')
+                    fila[columna.name] = None
+                    continue
+                if columna.name in defaults:
+                    valor = defaults[columna.name]
+                elif columna.default is not None:
+                    # Los INSERT masivos necesitan las mismas claves en todas las filas
+                    valor = columna.default.arg(None) if columna.default.is_callable else columna.default.arg
+                elif not columna.nullable:
+                    raise ErrorValidacion(f'{ubicacion}: campo requerido {columna.name}')
+                else:
+                    fila[columna.name] = None
+                    continue
+            try:
+                fila[columna.name] = _convertir(columna, valor)
+            except (TypeError, ValueError) as e:
+                raise ErrorValidacion(f'{ubicacion}: valor inválido en {columna.name} ({e})')
+        
+        rango = RANGOS_FECHAS.get(nombre_modelo)
+        if rango and fila.get(rango[0]) and fila.get(rango[1]) and fila[rango[1]] < fila[rango[0]]:
+            raise ErrorValidacion(f'{ubicacion}: {rango[1]} anterior a {rango[0]}')
+        return fila
+    
+    def validar_fila(self, nombre_modelo, datos, ubicacion='fila', parcial=False):
+        """Validar y normalizar una fila suelta (lo usa la sincronización offline)."""
+        return self._validar_fila(nombre_modelo, datos, ubicacion, parcial=parcial)
+    
+    def validar_agregado(self, agregado):
+        """
+        Validar un viaje completo y normalizar sus filas.
+        
+        Args:
+            agregado (dict): {'viaje': {...}, 'paradas': [...], 'gastos': [...], ...}
+        
+        Returns:
+            dict: {'viaje': fila, 'paradas': [filas], ...} listo para insertar
+        
+        Raises:
+            ErrorValidacion: Con la ubicación del primer error encontrado
+        """
+        if not isinstance(agregado, dict) or not isinstance(agregado.get('viaje'), dict):
+            raise ErrorValidacion("se esperaba un objeto con la clave 'viaje'")
+        
+        filas = {'viaje': self._validar_fila('Viaje', agregado['viaje'], 'viaje')}
+        for clave, (nombre_modelo, _) in ELEMENTOS_VIAJE.items():
+            elementos = agregado.get(clave) or []
+            if not isinstance(elementos, list):
+                raise ErrorValidacion(f'{clave}: se esperaba una lista')
+            filas[clave] = [self._validar_fila(nombre_modelo, datos, f'{clave}[{i}]')
+                            for i, datos in enumerate(elementos)]
+        
+        # El orden de las paradas debe ser único (_viaje_orden_uc); las que no lo
+        # traen van al final en el orden del archivo
+        ordenes = [p['orden'] for p in filas['paradas'] if p['orden'] is not None]
+        if len(ordenes) != len(set(ordenes)):
+            raise ErrorValidacion('paradas: orden repetido')
+        siguiente = max(ordenes, default=0) + 1
+        for parada in filas['paradas']:
+            if parada['orden'] is None:
+                parada['orden'] = siguiente
+                siguiente += 1
+        
+        # El presupuesto gastado se recalcula como lo hace el servicio de gastos
+        filas['viaje']['presupuesto_gastado'] = sum(g['monto'] for g in filas['gastos'])
+        return filas
+    
+    # ------------------------------------------------------------------
+    # Importación
+    # ------------------------------------------------------------------
+    
+    def importar_agregado(self, agregado, solo_validar=False):
+        """
+        Validar e insertar un viaje completo en una transacción.
+        
+        Args:
+            agregado (dict): Viaje con sus elementos (formato de exportación)
+            solo_validar (bool): Validar sin escribir en la base de datos
+        
+        Returns:
+            dict: Resultado con success, viaje_id y filas por tabla, o error
+        """
+        try:
+            filas = self.validar_agregado(agregado)
+        except ErrorValidacion as e:
+            return {'success': False, 'error': str(e)}
+        
+        conteo = {clave: len(lista) for clave, lista in filas.items() if clave != 'viaje'}
+        if solo_validar:
+            return {'success': True, 'viaje_id': None, 'filas': conteo}
+        
+        from app.services import busqueda_service, calendario_service
+        session = self.db.session
+        try:
+            tabla_viaje = self._models['Viaje'].__table__
+            resultado = session.execute(tabla_viaje.insert().values(**filas['viaje']))
+            viaje_id = resultado.inserted_primary_key[0]
+            busqueda_service.indexar_filas('Viaje', [dict(filas['viaje'], id=viaje_id)])
+            
+            for clave, (nombre_modelo, _) in ELEMENTOS_VIAJE.items():
+                if not filas[clave]:
+                    continue
+                for fila in filas[clave]:
+                    fila['viaje_id'] = viaje_id
+                tabla = self._models[nombre_modelo].__table__
+                if busqueda_service.indice_listo and nombre_modelo in CAMPOS_INDEXADOS:
+                    # Un INSERT por tabla; RETURNING trae los IDs en el orden de las filas
+                    ids = session.execute(
+                        tabla.insert().returning(tabla.c.id, sort_by_parameter_order=True), filas[clave]
+                    ).scalars().all()
+                    busqueda_service.indexar_filas(
+                        nombre_modelo, [dict(fila, id=i) for fila, i in zip(filas[clave], ids)])
+                else:
+                    session.execute(tabla.insert(), filas[clave])
+            
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            return {'success': False, 'error': str(e)}
+        
+        # Los INSERT masivos no pasan por los eventos de la sesión
+        calendario_service.invalidar([viaje_id])
+        return {'success': True, 'viaje_id': viaje_id, 'filas': conteo}
+    
+    def importar_ndjson(self, lineas, solo_validar=False, detener_en_error=False, max_errores=100):
+        """
+        Importar viajes desde un iterable de líneas NDJSON (str o bytes).
+        
+        Args:
+            lineas: Archivo, stream de la petición o cualquier iterable de líneas
+            solo_validar (bool): Validar todo el archivo sin escribir
+            detener_en_error (bool): Cortar en el primer viaje inválido
+            max_errores (int): Errores detallados a conservar en el resumen
+        
+        Returns:
+            dict: {'success', 'importados', 'con_error', 'viaje_ids', 'filas', 'errores'}
+                  (viaje_ids solo guarda los primeros 1000 IDs)
+        """
+        resumen = {'importados': 0, 'con_error': 0, 'viaje_ids': [], 'errores': [],
+                   'filas': {clave: 0 for clave in ELEMENTOS_VIAJE}}
+        
+        for numero, linea in enumerate(lineas, 1):
+            try:
+                if isinstance(linea, bytes):
+                    linea = linea.decode('utf-8')
+                linea = linea.strip()
+                if not linea:
+                    continue
+                
+                resultado = self.importar_agregado(json.loads(linea), solo_validar=solo_validar)
+            except UnicodeDecodeError as e:
+                resultado = {'success': False, 'error': f'Línea no es UTF-8 válido: {e}'}
+            except json.JSONDecodeError as e:
+                resultado = {'success': False, 'error': f'JSON inválido: {e}'}
+            
+            if resultado['success']:
+                resumen['importados'] += 1
+                if resultado['viaje_id'] is not None and len(resumen['viaje_ids']) < 1000:
+                    resumen['viaje_ids'].append(resultado['viaje_id'])
+                for clave, cantidad in resultado['filas'].items():
+                    resumen['filas'][clave] += cantidad
+            else:
+                resumen['con_error'] += 1
+                if len(resumen['errores']) < max_errores:
+                    resumen['errores'].append({'linea': numero, 'error': resultado['error']})
+                if detener_en_error:
+                    break
+        
+        resumen['success'] = resumen['con_error'] == 0
+        return resumen
+
+
+# Instancia global del servicio
+importacion_service = ImportacionService()
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio de instantáneas serializadas de viajes completos.
+"""
+
+import json
+from datetime import date, datetime, time
+from types import SimpleNamespace
+
+from sqlalchemy import Date, DateTime, Time, event, select
+
+from app.utils.metricas import medir_servicio
+from .exportacion_service import ELEMENTOS_VIAJE, _serializar
+
+
+# Versión del formato: las instantáneas de otro formato se regeneran al leerlas
+FORMATO = 1
+
+# Conversión de los valores ISO 8601 guardados según el tipo de la columna
+_CONVERSORES = ((DateTime, datetime.fromisoformat), (Date, date.fromisoformat), (Time, time.fromisoformat))
+
+
+@medir_servicio('instantanea')
+class InstantaneaService:
+    """
+    Guarda cada viaje completo serializado para mostrarlo sin hidratar el ORM.
+    
+    La instantánea es JSON compacto con las filas empaquetadas en listas: los
+    nombres de columna se guardan una sola vez por tabla en 'c'.
+        
+        {"f": 1, "c": {"viaje": [...], "paradas": [...], ...},
+         "viaje": [valores], "paradas": [[valores], ...], ...}
+    
+    Se regenera en el commit de cada escritura sobre el viaje o sus elementos
+    (los que registra la sincronización en session.info['viajes_modificados'])
+    y es válida mientras su version_agregado coincida con la del viaje: leerla
+    cuesta una consulta y un json.loads en lugar de siete consultas y cientos
+    de objetos del ORM. Si está desactualizada (p.ej. tras una importación
+    masiva, que no pasa por la sesión) se regenera al leerla.
+    """
+    
+    def __init__(self, database_service=None):
+        """Inicializar el servicio de instantáneas."""
+        self.db_service = database_service
+        self.db = None
+        self._models = None
+        self._conversores = {}
+    
+    def init_models(self, models_dict, database_instance):
+        """Inicializar los modelos necesarios y regenerar las instantáneas en cada commit."""
+        self._models = models_dict
+        self.db = database_instance
+        
+        for nombre, funcion in (('before_commit', self._antes_de_commit),
+                                ('after_rollback', self._despues_de_rollback)):
+            if not event.contains(self.db.session, nombre, funcion):
+                event.listen(self.db.session, nombre, funcion)
+    
+    def _tabla(self, nombre_modelo):
+        return self._models[nombre_modelo].__table__
+    
+    def _columnas(self):
+        """Columnas guardadas por tabla (los elementos sin viaje_id, como en la exportación)."""
+        columnas = {'viaje': [c.name for c in self._tabla('Viaje').columns]}
+        for clave, (nombre_modelo, _) in ELEMENTOS_VIAJE.items():
+            columnas[clave] = [c.name for c in self._tabla(nombre_modelo).columns if c.name != 'viaje_id']
+        return columnas
+    
+    # ------------------------------------------------------------------
+    # Generación
+    # ------------------------------------------------------------------
+    
+    def _empaquetar(self, agregado, columnas):
+        """Serializar un agregado de viajes_completos en el formato compacto."""
+        datos = {'f': FORMATO, 'c': columnas,
+                 'viaje': [agregado['viaje'][c] for c in columnas['viaje']]}
+        for clave in ELEMENTOS_VIAJE:
+            datos[clave] = [[fila[c] for c in columnas[clave]] for fila in agregado[clave]]
+        return json.dumps(datos, ensure_ascii=False, separators=(',', ':'), default=_serializar).encode('utf-8')
+    
+    def regenerar(self, viaje_ids):
+        """
+        Generar y guardar las instantáneas de varios viajes en la transacción en curso.
+        
+        Los viajes que ya no existen pierden su instantánea.
+        
+        Args:
+            viaje_ids (list): IDs de los viajes
+        
+        Returns:
+            dict: viaje_id -> (version_agregado, datos) de las instantáneas generadas
+        """
+        from app.services import exportacion_service
+        
+        columnas = self._columnas()
+        generadas = {}
+        for agregado in exportacion_service.viajes_completos(viaje_ids=viaje_ids):
+            viaje = agregado['viaje']
+            generadas[viaje['id']] = (viaje['version_agregado'], self._empaquetar(agregado, columnas))
+        
+        tabla = self._tabla('InstantaneaViaje')
+        session = self.db.session
+        session.execute(tabla.delete().where(tabla.c.viaje_id.in_(viaje_ids)))
+        if generadas:
+            ahora = datetime.utcnow()
+            session.execute(tabla.insert(), [
+                {'viaje_id': viaje_id, 'version_agregado': version, 'formato': FORMATO,
+                 'datos': datos, 'fecha_generacion': ahora}
+                for viaje_id, (version, datos) in generadas.items()
+            ])
+        return generadas
+    
+    def _antes_de_commit(self, session):
+        """Regenerar las instantáneas de los viajes modificados en esta transacción."""
+        if session.new or session.dirty or session.deleted:
+            session.flush()
+        viaje_ids = session.info.pop('viajes_modificados', None)
+        if viaje_ids:
+            self.regenerar(sorted(viaje_ids))
+    
+    @staticmethod
+    def _despues_de_rollback(session):
+        session.info.pop('viajes_modificados', None)
+    
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    
+    def obtener_datos(self, viaje_id):
+        """
+        Instantánea vigente de un viaje tal como está guardada (JSON compacto en bytes).
+        
+        Si falta o está desactualizada se regenera y se guarda.
+        
+        Args:
+            viaje_id (int): ID del viaje
+        
+        Returns:
+            bytes: JSON compacto, o None si el viaje no existe
+        """
+        viaje = self._tabla('Viaje')
+        instantanea = self._tabla('InstantaneaViaje')
+        fila = self.db.session.execute(
+            select(viaje.c.version_agregado, instantanea.c.version_agregado,
+                   instantanea.c.formato, instantanea.c.datos)
+            .select_from(viaje.outerjoin(instantanea, instantanea.c.viaje_id == viaje.c.id))
+            .where(viaje.c.id == viaje_id)
+        ).first()
+        if fila is None:
+            return None
+        if fila[1] == fila[0] and fila[2] == FORMATO:
+            return fila[3]
+        
+        generada = self.regenerar([viaje_id]).get(viaje_id)
+        try:
+            self.db.session.commit()
+        except Exception as e:
+            # Otra petición la guardó primero: la generada sirve igual
+            self.db.session.rollback()
+            print(f"⚠️  No se pudo guardar la instantánea del viaje {viaje_id}: {e}")
+        return generada[1] if generada else None
+    
+    def obtener_agregado(self, viaje_id):
+        """
+        Viaje completo como diccionarios, con el mismo formato que viajes_completos.
+        
+        Returns:
+            dict: {'viaje': {...}, 'paradas': [...], ...}, o None si el viaje no existe
+        """
+        datos = self.obtener_datos(viaje_id)
+        if datos is None:
+            return None
+        datos = json.loads(datos)
+        columnas = datos['c']
+        agregado = {'viaje': dict(zip(columnas['viaje'], datos['viaje']))}
+        for clave in ELEMENTOS_VIAJE:
+            agregado[clave] = [dict(zip(columnas[clave], fila)) for fila in datos.get(clave, [])]
+        return agregado
+    
+    def _conversores_de(self, nombre_modelo, columnas):
+        """Funciones de conversión por columna (None si el valor JSON sirve tal cual)."""
+        clave = (nombre_modelo, tuple(columnas))
+        conversores = self._conversores.get(clave)
+        if conversores is None:
+            tabla = self._tabla(nombre_modelo)
+            conversores = []
+            for nombre in columnas:
+                columna = tabla.c.get(nombre)
+                conversores.append(next((funcion for tipo, funcion in _CONVERSORES
+                                         if columna is not None and isinstance(columna.type, tipo)), None))
+            self._conversores[clave] = conversores
+        return conversores
+    
+    def _objetos(self, nombre_modelo, columnas, filas, **extra):
+        """Objetos de solo lectura con un atributo por columna, con fechas y horas ya convertidas."""
+        conversores = self._conversores_de(nombre_modelo, columnas)
+        objetos = []
+        for fila in filas:
+            valores = {nombre: conversor(valor) if conversor and valor is not None else valor
+                       for nombre, conversor, valor in zip(columnas, conversores, fila)}
+            valores.update(extra)
+            objetos.append(SimpleNamespace(**valores))
+        return objetos
+    
+    def _orden_relacion(self, clave, columnas):
+        """Posiciones de las columnas por las que ordena la relación del modelo Viaje (y el id)."""
+        order_by = self._models['Viaje'].__mapper__.relationships[clave].order_by or ()
+        return [columnas.index(c.name) for c in order_by] + [columnas.index('id')]
+    
+    def obtener(self, viaje_id):
+        """
+        Viaje completo para mostrar, leído de la instantánea.
+        
+        El resultado tiene los mismos atributos que el modelo Viaje (columnas y
+        las listas paradas, gastos, actividades, documentos, transportes y
+        alojamientos, en el orden de las relaciones), pero son objetos simples:
+        no hay sesión, carga diferida ni escritura.
+        
+        Args:
+            viaje_id (int): ID del viaje
+        
+        Returns:
+            SimpleNamespace: El viaje, o None si no existe
+        """
+        datos = self.obtener_datos(viaje_id)
+        if datos is None:
+            return None
+        datos = json.loads(datos)
+        columnas = datos['c']
+        viaje = self._objetos('Viaje', columnas['viaje'], [datos['viaje']])[0]
+        for clave, (nombre_modelo, _) in ELEMENTOS_VIAJE.items():
+            posiciones = self._orden_relacion(clave, columnas[clave])
+            filas = sorted(datos.get(clave, []),
+                           key=lambda fila: [(fila[i] is None, fila[i]) for i in posiciones])
+            setattr(viaje, clave, self._objetos(nombre_modelo, columnas[clave], filas, viaje_id=viaje.id))
+        return viaje
+
+
+# Instancia global del servicio
+instantanea_service = InstantaneaService()
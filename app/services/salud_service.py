@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio de verificación de salud (readiness) de la aplicación.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from config.settings import Config
+from .database import database_service
+
+
+class SaludService:
+    """
+    Verifica las dependencias de la aplicación: latencia de la base de datos,
+    saturación del pool de conexiones y estado de las cachés.
+    
+    El resultado se guarda durante unos segundos y una sola petición a la vez
+    ejecuta las verificaciones, para que los probes del balanceador no puedan
+    sobrecargar la base de datos.
+    """
+    
+    def __init__(self, database_service=None):
+        """Inicializar el servicio de salud."""
+        self.db_service = database_service
+        self.db = None
+        self._models = None
+        self._resultado = None
+        self._momento = 0.0
+        self._lock = threading.Lock()
+    
+    def init_models(self, models_dict, database_instance):
+        """Inicializar los modelos necesarios."""
+        self._models = models_dict
+        self.db = database_instance
+    
+    def verificar(self, forzar=False):
+        """
+        Obtener el estado de salud, reutilizando el último resultado si es reciente.
+        
+        Args:
+            forzar (bool): Ignorar el resultado guardado
+        
+        Returns:
+            dict: {'listo': bool, 'status': 'ok'|'degradado'|'error', 'verificaciones': {...},
+                   'edad_segundos': float}
+        """
+        ttl = Config.get_salud_cache_segundos()
+        if not forzar and self._vigente(ttl):
+            return self._con_edad()
+        
+        with self._lock:
+            # Otra petición pudo completar la verificación mientras esperábamos
+            if forzar or not self._vigente(ttl):
+                self._resultado = self._ejecutar_verificaciones()
+                self._momento = time.monotonic()
+        return self._con_edad()
+    
+    def _vigente(self, ttl):
+        return self._resultado is not None and time.monotonic() - self._momento < ttl
+    
+    def _con_edad(self):
+        resultado = dict(self._resultado)
+        resultado['edad_segundos'] = round(time.monotonic() - self._momento, 3)
+        return resultado
+    
+    def _ejecutar_verificaciones(self):
+        """Ejecutar todas las verificaciones y combinar su estado."""
+        pool = self._verificar_pool()
+        if pool['status'] == 'saturado':
+            # Sin conexiones libres el SELECT 1 esperaría el timeout del pool
+            base_datos = {'status': 'omitido', 'motivo': 'pool saturado'}
+        else:
+            base_datos = self._verificar_base_datos()
+        caches = self._verificar_caches(consultar_db=base_datos['status'] in ('ok', 'lento'))
+        
+        listo = base_datos['status'] in ('ok', 'lento') and pool['status'] != 'saturado'
+        if not listo:
+            status = 'error'
+        elif base_datos['status'] == 'lento' or pool['status'] == 'alto' or any(
+                c['status'] != 'ok' for c in caches.values()):
+            status = 'degradado'
+        else:
+            status = 'ok'
+        
+        return {
+            'listo': listo,
+            'status': status,
+            'timestamp': datetime.utcnow().isoformat(),
+            'verificaciones': {
+                'base_datos': base_datos,
+                'pool': pool,
+                'caches': caches
+            }
+        }
+    
+    def _verificar_base_datos(self):
+        """Medir la latencia de ida y vuelta con una consulta trivial."""
+        inicio = time.perf_counter()
+        try:
+            with self.db.engine.connect() as conexion:
+                conexion.execute(text('SELECT 1'))
+        except Exception as e:
+            return {'status': 'error', 'error': str(e)}
+        
+        latencia_ms = round((time.perf_counter() - inicio) * 1000, 3)
+        estado = {
+            'status': 'lento' if latencia_ms > Config.get_salud_umbral_db_ms() else 'ok',
+            'latencia_ms': latencia_ms
+        }
+        if self.db_service:
+            estado['inicializada'] = self.db_service.get_status()['initialized']
+        return estado
+    
+    def _verificar_pool(self):
+        """Conexiones en uso respecto de la capacidad total del pool."""
+        pool = self.db.engine.pool
+        if not hasattr(pool, 'size'):
+            return {'status': 'ok', 'tipo': type(pool).__name__}
+        
+        tamano = pool.size()
+        capacidad = tamano + max(getattr(pool, '_max_overflow', 0), 0)
+        en_uso = pool.checkedout()
+        saturacion = en_uso / capacidad if capacidad else 0.0
+        
+        if saturacion >= 1:
+            estado = 'saturado'
+        elif saturacion >= 0.8:
+            estado = 'alto'
+        else:
+            estado = 'ok'
+        return {
+            'status': estado,
+            'tamano': tamano,
+            'capacidad': capacidad,
+            'en_uso': en_uso,
+            'saturacion': round(saturacion, 3)
+        }
+    
+    def _verificar_caches(self, consultar_db=True):
+        """Estado de las cachés: índice de búsqueda y caché de geocodificación."""
+        from app.services import busqueda_service, geocodificacion_service
+        
+        caches = {
+            'busqueda': {
+                'status': 'ok',
+                'backend': busqueda_service.backend,
+                'construido': busqueda_service.backend is not None
+            }
+        }
+        
+        proveedor = geocodificacion_service.proveedor
+        if not consultar_db:
+            caches['geocodificacion'] = {'status': 'error', 'error': 'base de datos no disponible'}
+            return caches
+        try:
+            Geocodificacion = self._models['Geocodificacion']
+            entradas = self.db.session.query(Geocodificacion.id).limit(1).count()
+            caches['geocodificacion'] = {
+                'status': 'ok',
+                'proveedor': proveedor.nombre if proveedor else None,
+                'vacia': entradas == 0
+            }
+        except Exception as e:
+            self.db.session.rollback()
+            caches['geocodificacion'] = {'status': 'error', 'error': str(e)}
+        return caches
+
+
+# Instancia global del servicio
+salud_service = SaludService(database_service)
@@ -0,0 +1,486 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio de sincronización por deltas para el modo offline de la PWA.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import event, func, inspect, select
+
+from app.utils.concurrencia import version_vigente
+from app.utils.metricas import medir_servicio
+from .exportacion_service import ENTIDADES
+from .importacion_service import ErrorValidacion, RANGOS_FECHAS
+
+
+# Modelo -> entidad en la API (las geocodificaciones no pertenecen a ningún viaje)
+ENTIDAD_DE_MODELO = {modelo: entidad for entidad, modelo in ENTIDADES.items() if modelo != 'Geocodificacion'}
+
+OPERACIONES = ('crear', 'actualizar', 'eliminar')
+
+# Campos que calcula el servidor: se ignoran si llegan en una mutación
+CAMPOS_CALCULADOS = {
+    'Viaje': ('presupuesto_gastado', 'fecha_creacion'),
+    'Parada': ('orden',),
+}
+
+
+def _columnas(objeto):
+    """Valores de todas las columnas de un objeto del ORM."""
+    return {columna.name: getattr(objeto, columna.name) for columna in objeto.__table__.columns}
+
+
+@medir_servicio('sincronizacion')
+class SincronizacionService:
+    """
+    Sincroniza viajes con clientes offline intercambiando solo lo que cambió.
+    
+    Cada escritura sobre un viaje o sus elementos deja una fila en el registro
+    de cambios (tabla cambio), en la misma transacción que la escritura. El id
+    de esa fila es el cursor del cliente: pide los cambios posteriores a su
+    cursor y recibe las filas actuales de los elementos modificados y lápidas
+    para los eliminados (archivar un viaje también deja la lápida del viaje, y
+    restaurarlo hace que el cliente lo reciba completo). Las mutaciones que el cliente encoló sin conexión se
+    suben en lote; una mutación sobre un elemento que cambió en el servidor
+    después del cursor con el que se editó se devuelve como conflicto.
+    """
+    
+    def __init__(self, database_service=None):
+        """Inicializar el servicio de sincronización."""
+        self.db_service = database_service
+        self.db = None
+        self._models = None
+    
+    def init_models(self, models_dict, database_instance):
+        """Inicializar los modelos necesarios y registrar las escrituras de la sesión."""
+        self._models = models_dict
+        self.db = database_instance
+        
+        for nombre, funcion in (('before_flush', self._antes_de_flush),
+                                ('after_flush', self._despues_de_flush),
+                                ('do_orm_execute', self._antes_de_sentencia)):
+            if not event.contains(self.db.session, nombre, funcion):
+                event.listen(self.db.session, nombre, funcion)
+    
+    # ------------------------------------------------------------------
+    # Registro de cambios
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def _cambio(viaje_id, entidad, entidad_id, operacion, origen):
+        return {'viaje_id': viaje_id, 'entidad': entidad, 'entidad_id': entidad_id,
+                'operacion': operacion, 'origen': origen}
+    
+    def _registrar(self, session, cambios):
+        """
+        Registrar los cambios y subir la versión agregada de sus viajes, en la transacción en curso.
+        
+        Los viajes afectados quedan además en session.info['viajes_modificados']
+        hasta el commit (ver InstantaneaService).
+        """
+        if not cambios:
+            return
+        conexion = session.connection()
+        # Subir la versión agregada de los viajes afectados. El UPDATE además
+        # bloquea esas filas hasta el commit: los cambios de un viaje reciben ids
+        # en el mismo orden en que se confirman, así que un cliente nunca avanza
+        # su cursor por encima de un cambio todavía en vuelo
+        viaje = self._models['Viaje'].__table__
+        viaje_ids = sorted({cambio['viaje_id'] for cambio in cambios})
+        conexion.execute(viaje.update().where(viaje.c.id.in_(viaje_ids)).values(
+            version_agregado=viaje.c.version_agregado + 1, fecha_actualizacion_agregado=datetime.utcnow()))
+        conexion.execute(self._models['Cambio'].__table__.insert(), cambios)
+        session.info.setdefault('viajes_modificados', set()).update(viaje_ids)
+    
+    def _antes_de_flush(self, session, flush_context, instancias):
+        """Cargar el viaje de los elementos a eliminar mientras la fila todavía existe."""
+        for objeto in session.deleted:
+            nombre = type(objeto).__name__
+            if nombre in ENTIDAD_DE_MODELO and nombre != 'Viaje':
+                objeto.viaje_id
+    
+    def _despues_de_flush(self, session, flush_context):
+        """Registrar los elementos insertados, modificados y eliminados en este flush."""
+        origen = session.info.get('sincronizacion_origen')
+        cambios = []
+        for coleccion, operacion in ((session.new, 'upsert'), (session.dirty, 'upsert'),
+                                     (session.deleted, 'delete')):
+            for objeto in coleccion:
+                entidad = ENTIDAD_DE_MODELO.get(type(objeto).__name__)
+                if entidad is None:
+                    continue
+                if coleccion is session.dirty and not session.is_modified(objeto, include_collections=False):
+                    continue
+                if entidad == 'viajes':
+                    cambios.append(self._cambio(objeto.id, entidad, objeto.id, operacion, origen))
+                    continue
+                cambios.append(self._cambio(objeto.viaje_id, entidad, objeto.id, operacion, origen))
+                # Un elemento que pasó a otro viaje desaparece del viaje anterior
+                for anterior in inspect(objeto).attrs.viaje_id.history.deleted:
+                    if anterior is not None and anterior != objeto.viaje_id:
+                        cambios.append(self._cambio(anterior, entidad, objeto.id, 'delete', origen))
+        self._registrar(session, cambios)
+    
+    def _antes_de_sentencia(self, estado):
+        """Registrar las filas que va a tocar un UPDATE o DELETE masivo del ORM."""
+        if not (estado.is_update or estado.is_delete) or estado.bind_mapper is None:
+            return
+        entidad = ENTIDAD_DE_MODELO.get(estado.bind_mapper.class_.__name__)
+        if entidad is None:
+            return
+        
+        tabla = estado.bind_mapper.local_table
+        columna_viaje = tabla.c.id if entidad == 'viajes' else tabla.c.viaje_id
+        consulta = select(tabla.c.id, columna_viaje)
+        if estado.statement.whereclause is not None:
+            consulta = consulta.where(estado.statement.whereclause)
+        
+        conexion = estado.session.connection()
+        if estado.is_delete:
+            operacion = 'delete'
+        elif estado.execution_options.get('solo_campos_calculados'):
+            # Se envía como upsert pero no cuenta como conflicto (ver _cambios_posteriores)
+            operacion = 'calculado'
+        else:
+            operacion = 'upsert'
+        origen = estado.session.info.get('sincronizacion_origen')
+        self._registrar(estado.session, [self._cambio(viaje_id, entidad, entidad_id, operacion, origen)
+                                         for entidad_id, viaje_id in conexion.execute(consulta)])
+    
+    # ------------------------------------------------------------------
+    # Descarga de cambios
+    # ------------------------------------------------------------------
+    
+    def cursor_actual(self, viaje_id):
+        """Cursor del último cambio registrado de un viaje (0 si no tiene cambios)."""
+        Cambio = self._models['Cambio']
+        consulta = select(func.max(Cambio.id)).where(Cambio.viaje_id == viaje_id)
+        return self.db.session.execute(consulta).scalar() or 0
+    
+    def _viaje_eliminado(self, viaje_id):
+        """Cursor de la lápida del viaje, o None si el viaje nunca existió."""
+        Cambio = self._models['Cambio']
+        consulta = select(func.max(Cambio.id)).where(
+            Cambio.viaje_id == viaje_id, Cambio.entidad == 'viajes', Cambio.operacion == 'delete')
+        return self.db.session.execute(consulta).scalar()
+    
+    def obtener_cambios(self, viaje_id, cursor=None, limite=500):
+        """
+        Obtener lo que cambió en un viaje después del cursor del cliente.
+        
+        Args:
+            viaje_id (int): ID del viaje
+            cursor (int): Cursor de la última sincronización; None pide el viaje completo
+            limite (int): Máximo de entradas del registro a procesar por llamada
+        
+        Returns:
+            dict: {'success', 'completo', 'cursor', 'hay_mas'} más 'viaje' (agregado
+                  completo) o 'cambios'; con 'eliminado' si el viaje fue borrado;
+                  None si el viaje no existe
+        """
+        from app.services import instantanea_service
+        
+        if cursor is None:
+            # El cursor se lee antes que los datos: lo que cambie entre ambas
+            # lecturas se vuelve a enviar en la próxima sincronización
+            nuevo_cursor = self.cursor_actual(viaje_id)
+            agregado = instantanea_service.obtener_agregado(viaje_id)
+            if agregado is None:
+                lapida = self._viaje_eliminado(viaje_id)
+                if lapida is None:
+                    return None
+                return {'success': True, 'eliminado': True, 'completo': True, 'cursor': lapida, 'hay_mas': False}
+            return {'success': True, 'completo': True, 'cursor': nuevo_cursor, 'hay_mas': False,
+                    'viaje': agregado}
+        
+        Cambio = self._models['Cambio']
+        entradas = self.db.session.execute(
+            select(Cambio.id, Cambio.entidad, Cambio.entidad_id, Cambio.operacion)
+            .where(Cambio.viaje_id == viaje_id, Cambio.id > cursor)
+            .order_by(Cambio.id).limit(limite + 1)
+        ).all()
+        hay_mas = len(entradas) > limite
+        entradas = entradas[:limite]
+        
+        if not entradas and self.db.session.get(self._models['Viaje'], viaje_id) is None:
+            return None
+        
+        # Lápida (viaje eliminado o archivado) o marca de restauración: los deltas
+        # anteriores ya no sirven. Si el viaje existe de nuevo se reenvía completo
+        if any(entrada.entidad == 'viajes' and entrada.operacion in ('delete', 'restaurado') for entrada in entradas):
+            if self.db.session.get(self._models['Viaje'], viaje_id) is not None:
+                return self.obtener_cambios(viaje_id)
+            lapida = next((entrada.id for entrada in entradas
+                           if entrada.entidad == 'viajes' and entrada.operacion == 'delete'), entradas[-1].id)
+            return {'success': True, 'eliminado': True, 'completo': False, 'cursor': lapida, 'hay_mas': False}
+        
+        # Quedarse con la última operación de cada elemento, en el orden en que ocurrió
+        ultimas = {}
+        for entrada in entradas:
+            clave = (entrada.entidad, entrada.entidad_id)
+            ultimas.pop(clave, None)
+            ultimas[clave] = 'delete' if entrada.operacion == 'delete' else 'upsert'
+        
+        # Filas actuales de los elementos modificados: una consulta por entidad
+        filas = {}
+        for entidad in {entidad for (entidad, _), operacion in ultimas.items() if operacion == 'upsert'}:
+            tabla = self._models[ENTIDADES[entidad]].__table__
+            ids = [entidad_id for (e, entidad_id), operacion in ultimas.items()
+                   if e == entidad and operacion == 'upsert']
+            for fila in self.db.session.execute(select(tabla).where(tabla.c.id.in_(ids))).mappings():
+                fila = dict(fila)
+                if entidad == 'viajes' or fila.pop('viaje_id') == viaje_id:
+                    filas[(entidad, fila['id'])] = fila
+        
+        cambios = []
+        for (entidad, entidad_id), operacion in ultimas.items():
+            fila = filas.get((entidad, entidad_id)) if operacion == 'upsert' else None
+            if fila is None:
+                # Eliminado o movido a otro viaje después de esta página del registro
+                cambios.append({'entidad': entidad, 'id': entidad_id, 'operacion': 'delete'})
+            else:
+                cambios.append({'entidad': entidad, 'id': entidad_id, 'operacion': 'upsert', 'datos': fila})
+        
+        return {'success': True, 'completo': False, 'cursor': entradas[-1].id if entradas else cursor,
+                'hay_mas': hay_mas, 'cambios': cambios}
+    
+    # ------------------------------------------------------------------
+    # Subida de mutaciones offline
+    # ------------------------------------------------------------------
+    
+    def _preparar(self, mutacion, viaje_id, cursor):
+        """
+        Validar una mutación y normalizar sus datos sin tocar la base de datos.
+        
+        Raises:
+            ErrorValidacion: Si la mutación está mal formada o sus datos no son válidos
+        """
+        from app.services import importacion_service
+        
+        if not isinstance(mutacion, dict):
+            raise ErrorValidacion('se esperaba un objeto')
+        id_cliente = mutacion.get('id_cliente')
+        if not isinstance(id_cliente, str) or not 0 < len(id_cliente) <= 64:
+            raise ErrorValidacion('id_cliente requerido (texto de hasta 64 caracteres)')
+        
+        entidad = mutacion.get('entidad')
+        operacion = mutacion.get('operacion')
+        if entidad not in ENTIDAD_DE_MODELO.values():
+            raise ErrorValidacion(f'entidad desconocida: {entidad}')
+        if operacion not in OPERACIONES:
+            raise ErrorValidacion(f'operación desconocida: {operacion}')
+        
+        nombre_modelo = ENTIDADES[entidad]
+        elemento_id = mutacion.get('id')
+        if entidad == 'viajes' and (operacion != 'actualizar' or elemento_id != viaje_id):
+            raise ErrorValidacion('del viaje solo se pueden actualizar sus propios datos')
+        if operacion != 'crear' and not isinstance(elemento_id, (int, str)):
+            raise ErrorValidacion('id requerido (número, o id_cliente de un elemento creado en el lote)')
+        
+        datos = {}
+        if operacion != 'eliminar':
+            recibidos = mutacion.get('datos')
+            if not isinstance(recibidos, dict):
+                raise ErrorValidacion('datos requeridos')
+            recibidos = {k: v for k, v in recibidos.items() if k not in CAMPOS_CALCULADOS.get(nombre_modelo, ())}
+            if operacion == 'crear' and nombre_modelo == 'Parada':
+                recibidos['orden'] = 0  # Provisional: el orden real se asigna al aplicar
+            datos = importacion_service.validar_fila(nombre_modelo, recibidos, entidad,
+                                                     parcial=operacion == 'actualizar')
+        
+        cursor_mutacion = mutacion.get('cursor', cursor)
+        if not isinstance(cursor_mutacion, int):
+            raise ErrorValidacion('cursor inválido')
+        
+        return {'id_cliente': id_cliente, 'entidad': entidad, 'modelo': nombre_modelo, 'operacion': operacion,
+                'id': elemento_id, 'datos': datos, 'cursor': cursor_mutacion,
+                'version': mutacion.get('version'), 'forzar': bool(mutacion.get('forzar'))}
+    
+    def _cambios_posteriores(self, viaje_id, preparadas):
+        """Último cambio registrado de cada elemento que el lote quiere modificar (sin los calculados)."""
+        objetivos = [(m['entidad'], m['id']) for m in preparadas
+                     if m['operacion'] != 'crear' and isinstance(m['id'], int)]
+        if not objetivos:
+            return {}
+        Cambio = self._models['Cambio']
+        consulta = (select(Cambio.entidad, Cambio.entidad_id, func.max(Cambio.id))
+                    .where(Cambio.viaje_id == viaje_id,
+                           Cambio.operacion != 'calculado',
+                           Cambio.id > min(m['cursor'] for m in preparadas),
+                           Cambio.entidad_id.in_({entidad_id for _, entidad_id in objetivos}))
+                    .group_by(Cambio.entidad, Cambio.entidad_id))
+        return {(entidad, entidad_id): ultimo for entidad, entidad_id, ultimo in self.db.session.execute(consulta)}
+    
+    def _ya_aplicadas(self, viaje_id, preparadas):
+        """Mutaciones de un envío anterior que ya se aplicaron: id_cliente -> {entidad: id}."""
+        Cambio = self._models['Cambio']
+        consulta = select(Cambio.origen, Cambio.entidad, Cambio.entidad_id).where(
+            Cambio.viaje_id == viaje_id, Cambio.origen.in_({m['id_cliente'] for m in preparadas}))
+        aplicadas = {}
+        for origen, entidad, entidad_id in self.db.session.execute(consulta):
+            aplicadas.setdefault(origen, {})[entidad] = entidad_id
+        return aplicadas
+    
+    def _cargar_objetivos(self, preparadas):
+        """Elementos a modificar o eliminar, con una consulta por entidad."""
+        objetos = {}
+        por_modelo = {}
+        for m in preparadas:
+            if m['operacion'] != 'crear' and isinstance(m['id'], int):
+                por_modelo.setdefault(m['modelo'], set()).add(m['id'])
+        for nombre_modelo, ids in por_modelo.items():
+            Modelo = self._models[nombre_modelo]
+            for objeto in Modelo.query.filter(Modelo.id.in_(ids)).all():
+                objetos[(nombre_modelo, objeto.id)] = objeto
+        return objetos
+    
+    def aplicar_mutaciones(self, viaje_id, mutaciones, cursor=0):
+        """
+        Aplicar en una transacción las mutaciones que un cliente encoló sin conexión.
+        
+        Cada mutación es {'id_cliente', 'entidad', 'operacion': 'crear' | 'actualizar' |
+        'eliminar', 'id', 'datos', 'cursor', 'version', 'forzar'}. 'id' puede ser el
+        id_cliente de un 'crear' anterior del mismo lote; 'cursor' (por defecto el del
+        lote) es el cursor que tenía el cliente al editar y 'version' (opcional) la
+        versión de la fila que editó. Reenviar un lote es seguro: las
+        mutaciones ya aplicadas se informan como duplicadas.
+        
+        Args:
+            viaje_id (int): ID del viaje
+            mutaciones (list): Mutaciones en el orden en que se hicieron
+            cursor (int): Cursor del cliente al encolarlas
+        
+        Returns:
+            dict: {'success', 'resultados': [{'id_cliente', 'estado', 'id', ...}]} con
+                  estado aplicada, duplicada, conflicto, error o pendiente (no se
+                  aplicó por un error de otra mutación; reenviarla); None si el
+                  viaje no existe
+        """
+        Viaje = self._models['Viaje']
+        session = self.db.session
+        viaje = session.get(Viaje, viaje_id)
+        if viaje is None:
+            return None
+        if not isinstance(mutaciones, list) or not isinstance(cursor, int):
+            return {'success': False, 'error': 'Se esperaba {"cursor": número, "mutaciones": [...]}'}
+        
+        resultados = [None] * len(mutaciones)
+        preparadas = []
+        for i, mutacion in enumerate(mutaciones):
+            try:
+                preparadas.append((i, self._preparar(mutacion, viaje_id, cursor)))
+            except ErrorValidacion as e:
+                id_cliente = mutacion.get('id_cliente') if isinstance(mutacion, dict) else None
+                resultados[i] = {'id_cliente': id_cliente, 'estado': 'error', 'error': str(e)}
+        
+        lista = [m for _, m in preparadas]
+        ultimos_cambios = self._cambios_posteriores(viaje_id, lista)
+        ya_aplicadas = self._ya_aplicadas(viaje_id, lista) if lista else {}
+        objetos = self._cargar_objetivos(lista)
+        
+        creados = {}
+        toca_gastos = toca_paradas = False
+        actual = None
+        try:
+            for actual, m in preparadas:
+                resultados[actual] = self._aplicar(viaje, m, ultimos_cambios, ya_aplicadas, objetos, creados)
+                if resultados[actual]['estado'] == 'aplicada':
+                    toca_gastos = toca_gastos or m['entidad'] == 'gastos'
+                    toca_paradas = toca_paradas or m['entidad'] == 'paradas'
+            actual = None
+            session.info.pop('sincronizacion_origen', None)
+            
+            if toca_gastos:
+                # Igual que el servicio de gastos: la suma dentro del UPDATE
+                from app.services import gasto_service
+                gasto_service.actualizar_presupuesto_viaje(viaje_id)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"❌ Error al aplicar mutaciones del viaje {viaje_id}: {e}")
+            for i, resultado in enumerate(resultados):
+                if resultado and resultado['estado'] == 'aplicada':
+                    resultados[i] = {'id_cliente': resultado['id_cliente'], 'estado': 'pendiente'}
+            if actual is not None:
+                resultados[actual] = {'id_cliente': mutaciones[actual].get('id_cliente'), 'estado': 'error',
+                                      'error': str(e)}
+            for i, resultado in enumerate(resultados):
+                if resultado is None:
+                    resultados[i] = {'id_cliente': mutaciones[i].get('id_cliente'), 'estado': 'pendiente'}
+            return {'success': False, 'error': str(e), 'resultados': resultados}
+        finally:
+            session.info.pop('sincronizacion_origen', None)
+        
+        if toca_paradas:
+            # Igual que al agregar o editar paradas desde la web
+            from app.services import viaje_service
+            viaje_service.reordenar_paradas_por_fecha(viaje_id)
+        
+        return {'success': all(r['estado'] in ('aplicada', 'duplicada') for r in resultados),
+                'resultados': resultados}
+    
+    def _aplicar(self, viaje, m, ultimos_cambios, ya_aplicadas, objetos, creados):
+        """Aplicar una mutación preparada y devolver su resultado."""
+        session = self.db.session
+        resultado = {'id_cliente': m['id_cliente']}
+        Modelo = self._models[m['modelo']]
+        
+        if m['id_cliente'] in ya_aplicadas:
+            elemento_id = ya_aplicadas[m['id_cliente']].get(m['entidad'], m['id'])
+            if m['operacion'] == 'crear':
+                creados[m['id_cliente']] = elemento_id
+            return dict(resultado, estado='duplicada', id=elemento_id)
+        
+        elemento_id = m['id']
+        if isinstance(elemento_id, str):
+            if elemento_id not in creados:
+                return dict(resultado, estado='error', error=f'referencia desconocida: {elemento_id}')
+            elemento_id = creados[elemento_id]
+        
+        session.info['sincronizacion_origen'] = m['id_cliente']
+        
+        if m['operacion'] == 'crear':
+            objeto = Modelo(viaje_id=viaje.id, **m['datos'])
+            if m['modelo'] == 'Parada':
+                # Orden provisional al final; el lote termina reordenando por fecha
+                Parada = self._models['Parada']
+                objeto.orden = (session.execute(select(func.max(Parada.orden))
+                                                .where(Parada.viaje_id == viaje.id)).scalar() or 0) + 1
+            session.add(objeto)
+            session.flush()
+            creados[m['id_cliente']] = objeto.id
+            return dict(resultado, estado='aplicada', id=objeto.id)
+        
+        objeto = viaje if m['modelo'] == 'Viaje' else (
+            objetos.get((m['modelo'], elemento_id)) or session.get(Modelo, elemento_id))
+        if objeto is None or (objeto is not viaje and objeto.viaje_id != viaje.id):
+            # Eliminado en el servidor (o nunca fue de este viaje)
+            if m['operacion'] == 'eliminar':
+                return dict(resultado, estado='duplicada', id=elemento_id)
+            return dict(resultado, estado='conflicto', id=elemento_id, actual=None)
+        
+        ultimo = ultimos_cambios.get((m['entidad'], elemento_id))
+        cambiado = (ultimo is not None and ultimo > m['cursor']) or not version_vigente(objeto, m['version'])
+        if cambiado and not m['forzar']:
+            actual = _columnas(objeto)
+            actual.pop('viaje_id', None)
+            return dict(resultado, estado='conflicto', id=elemento_id, cursor=ultimo, actual=actual)
+        
+        if m['operacion'] == 'eliminar':
+            session.delete(objeto)
+        else:
+            rango = RANGOS_FECHAS.get(m['modelo'])
+            if rango:
+                inicio = m['datos'].get(rango[0], getattr(objeto, rango[0]))
+                fin = m['datos'].get(rango[1], getattr(objeto, rango[1]))
+                if inicio and fin and fin < inicio:
+                    return dict(resultado, estado='error', id=elemento_id,
+                                error=f'{m["entidad"]}: {rango[1]} anterior a {rango[0]}')
+            for campo, valor in m['datos'].items():
+                setattr(objeto, campo, valor)
+        session.flush()
+        return dict(resultado, estado='aplicada', id=elemento_id)
+
+
+# Instancia global del servicio
+sincronizacion_service = SincronizacionService()
@@ -6,7 +6,15 @@ Servicio para la lógica de negocio de transportes de viaje.
 from datetime import datetime, date, timedelta
 from collections import defaultdict, OrderedDict
 
+from sqlalchemy.orm.exc import StaleDataError
 
+from app.models.lecturas import TransporteLectura
+from app.utils.zonas_horarias import obtener_zona_horaria
+from app.utils.metricas import medir_servicio
+from app.utils.concurrencia import resultado_conflicto, version_vigente
+
+
+@medir_servicio('transporte')
 class TransporteService:
     """Servicio para manejar la lógica de negocio relacionada con transportes."""
     
@@ -16,13 +24,13 @@ class TransporteService:
         self.db = None
         self.Transporte = None
         self.Viaje = None
-        
+    
     def init_models(self, models_dict, database_instance):
         """Inicializar los modelos necesarios."""
         self.Transporte = models_dict['Transporte']
         self.Viaje = models_dict['Viaje']
         self.db = database_instance
-        
+    
     def crear_transporte(self, viaje_id, tipo, origen, destino, fecha_salida, fecha_llegada, 
                         hora_salida=None, hora_llegada=None, codigo_reserva='', 
                         aerolinea='', numero_vuelo='', terminal='', puerta='', asiento='', notas=''):
@@ -45,7 +53,7 @@ class TransporteService:
             puerta (str): Puerta de embarque (optional)
             asiento (str): Asiento asignado (optional)
             notas (str): Notas adicionales (optional)
-            
+        
         Returns:
             dict: Resultado con success y transporte_id
         """
@@ -85,24 +93,26 @@ class TransporteService:
             self.db.session.commit()
             
             return {'success': True, 'transporte_id': transporte.id}
-            
+        
         except Exception as e:
             self.db.session.rollback()
             return {'success': False, 'error': str(e)}
     
     def obtener_transportes_por_viaje(self, viaje_id):
         """
-        Obtener todos los transportes de un viaje ordenados por fecha y hora de salida.
+        Obtener todos los transportes de un viaje ordenados por fecha y hora de salida, de solo lectura.
         
         Args:
             viaje_id (int): ID del viaje
-            
+        
         Returns:
-            list: Lista de transportes del viaje
+            list: Lista de TransporteLectura del viaje
         """
-        return self.Transporte.query.filter_by(viaje_id=viaje_id).order_by(
-            self.Transporte.fecha_salida, self.Transporte.hora_salida
-        ).all()
+        transportes = TransporteLectura.consultar(
+            self.db.session, self.Transporte, self.Transporte.viaje_id == viaje_id,
+            orden=(self.Transporte.fecha_salida, self.Transporte.hora_salida)
+        )
+        return [transporte for transporte, _ in self._ordenar_por_salida(transportes)]
     
     def agrupar_transportes_por_tipo(self, viaje_id):
         """
@@ -110,7 +120,7 @@ class TransporteService:
         
         Args:
             viaje_id (int): ID del viaje
-            
+        
         Returns:
             dict: Diccionario con tipos como claves y listas de transportes como valores
         """
@@ -136,61 +146,155 @@ class TransporteService:
         
         return resultado
     
-    def obtener_itinerario_transportes(self, viaje_id):
+    def _instantes_transporte(self, transporte):
         """
-        Obtener el itinerario completo de transportes del viaje con conexiones.
+        Obtener salida y llegada de un transporte como datetimes.
+        
+        Si se conocen las zonas horarias de origen y destino, los datetimes son
+        conscientes de zona (aware) y se pueden restar entre sí aunque el tramo
+        cruce husos horarios. En otro caso se devuelven naive.
+        
+        Args:
+            transporte: Transporte (modelo o TransporteLectura)
+        
+        Returns:
+            tuple: (salida, llegada), cualquiera puede ser None si falta la hora
+        """
+        zona_origen = obtener_zona_horaria(transporte.origen)
+        zona_destino = obtener_zona_horaria(transporte.destino)
+        
+        # Solo usar zonas si ambas son conocidas, para no mezclar aware y naive
+        if not (zona_origen and zona_destino):
+            zona_origen = zona_destino = None
+        
+        salida = None
+        if transporte.fecha_salida and transporte.hora_salida:
+            salida = datetime.combine(transporte.fecha_salida, transporte.hora_salida, tzinfo=zona_origen)
+        
+        llegada = None
+        if transporte.fecha_llegada and transporte.hora_llegada:
+            llegada = datetime.combine(transporte.fecha_llegada, transporte.hora_llegada, tzinfo=zona_destino)
+        
+        return salida, llegada
+    
+    def _ordenar_por_salida(self, transportes, instantes=None):
+        """
+        Ordenar tramos por su instante real de salida.
+        
+        La base de datos ordena por fecha y hora locales, que no sirven cuando
+        el viaje cruza husos horarios (Tokio → Los Ángeles y luego Los Ángeles
+        → Nueva York el mismo día). Si todos los tramos tienen hora de salida
+        con zona horaria conocida se ordenan por ese instante; si no, se
+        conserva el orden recibido.
+        
+        Args:
+            transportes (list): Tramos ordenados por fecha y hora locales
+            instantes (list): _instantes_transporte de cada tramo (optional, se calculan)
+        
+        Returns:
+            list: Pares (transporte, (salida, llegada)) ordenados
+        """
+        if instantes is None:
+            instantes = [self._instantes_transporte(t) for t in transportes]
+        pares = list(zip(transportes, instantes))
+        if pares and all(salida is not None and salida.tzinfo is not None for _, (salida, _) in pares):
+            # Los datetimes aware se comparan por el instante, sin importar la zona
+            pares.sort(key=lambda par: par[1][0])
+        return pares
+    
+    @staticmethod
+    def _diferencia(inicio, fin):
+        """
+        Calcular la diferencia entre dos instantes.
+        
+        Con datetimes aware la resta ya contempla el huso horario. Con naive
+        se mantiene el criterio histórico: si el fin es anterior al inicio se
+        asume que ocurre al día siguiente.
+        """
+        if inicio is None or fin is None:
+            return None
+        
+        if (inicio.tzinfo is None) != (fin.tzinfo is None):
+            # Un extremo con zona y otro sin ella: comparar en hora local
+            inicio = inicio.replace(tzinfo=None)
+            fin = fin.replace(tzinfo=None)
+        
+        if inicio.tzinfo is None and fin < inicio:
+            fin += timedelta(days=1)
+        
+        return fin - inicio
+    
+    def analizar_conexiones(self, viaje_id, tiempo_minimo_conexion=timedelta(hours=1), transportes=None):
+        """
+        Construir el itinerario de transportes y detectar conexiones críticas en una sola pasada.
         
         Args:
             viaje_id (int): ID del viaje
-            
+            tiempo_minimo_conexion (timedelta): Tiempo mínimo recomendado entre conexiones
+            transportes (list): Transportes ya cargados, en orden de fecha y hora locales (optional, evita la consulta)
+        
         Returns:
-            list: Lista de transportes con información de conexiones
+            dict: Itinerario completo y lista de conexiones críticas
         """
-        transportes = self.obtener_transportes_por_viaje(viaje_id)
+        if transportes is None:
+            transportes = self.obtener_transportes_por_viaje(viaje_id)
+        
+        # Calcular los instantes de cada tramo una única vez y ordenar por ellos
+        pares = self._ordenar_por_salida(transportes)
+        transportes = [transporte for transporte, _ in pares]
+        instantes = [instantes_tramo for _, instantes_tramo in pares]
         itinerario = []
+        conexiones_criticas = []
         
         for i, transporte in enumerate(transportes):
+            salida, llegada = instantes[i]
+            es_ultimo = i == len(transportes) - 1
+            
             # Calcular tiempo de viaje si hay horas
-            tiempo_viaje = None
-            if transporte.hora_salida and transporte.hora_llegada:
-                # Combinar fecha y hora para cálculo
-                salida = datetime.combine(transporte.fecha_salida, transporte.hora_salida)
-                llegada = datetime.combine(transporte.fecha_llegada, transporte.hora_llegada)
-                
-                # Ajustar si la llegada es al día siguiente
-                if llegada < salida:
-                    llegada += timedelta(days=1)
-                
-                tiempo_viaje = llegada - salida
+            tiempo_viaje = self._diferencia(salida, llegada)
             
             # Calcular tiempo de conexión con el siguiente transporte
             tiempo_conexion = None
             siguiente_transporte = None
-            if i < len(transportes) - 1:
-                siguiente = transportes[i + 1]
-                siguiente_transporte = siguiente
-                
-                if (transporte.hora_llegada and siguiente.hora_salida and 
-                    transporte.fecha_llegada and siguiente.fecha_salida):
-                    
-                    llegada_actual = datetime.combine(transporte.fecha_llegada, transporte.hora_llegada)
-                    salida_siguiente = datetime.combine(siguiente.fecha_salida, siguiente.hora_salida)
-                    
-                    # Ajustar fechas si es necesario
-                    if salida_siguiente < llegada_actual:
-                        salida_siguiente += timedelta(days=1)
-                    
-                    tiempo_conexion = salida_siguiente - llegada_actual
+            if not es_ultimo:
+                siguiente_transporte = transportes[i + 1]
+                tiempo_conexion = self._diferencia(llegada, instantes[i + 1][0])
             
             itinerario.append({
                 'transporte': transporte,
+                'salida': salida,
+                'llegada': llegada,
                 'tiempo_viaje': tiempo_viaje,
                 'tiempo_conexion': tiempo_conexion,
                 'siguiente_transporte': siguiente_transporte,
-                'es_ultimo': i == len(transportes) - 1
+                'es_ultimo': es_ultimo
             })
+            
+            if tiempo_conexion is not None and tiempo_conexion < tiempo_minimo_conexion:
+                conexiones_criticas.append({
+                    'transporte_actual': transporte,
+                    'siguiente_transporte': siguiente_transporte,
+                    'tiempo_conexion': tiempo_conexion,
+                    'tiempo_minimo_recomendado': tiempo_minimo_conexion,
+                    'diferencia': tiempo_minimo_conexion - tiempo_conexion
+                })
         
-        return itinerario
+        return {
+            'itinerario': itinerario,
+            'conexiones_criticas': conexiones_criticas
+        }
+    
+    def obtener_itinerario_transportes(self, viaje_id):
+        """
+        Obtener el itinerario completo de transportes del viaje con conexiones.
+        
+        Args:
+            viaje_id (int): ID del viaje
+        
+        Returns:
+            list: Lista de transportes con información de conexiones
+        """
+        return self.analizar_conexiones(viaje_id)['itinerario']
     
     def verificar_conexiones_criticas(self, viaje_id, tiempo_minimo_conexion=timedelta(hours=1)):
         """
@@ -199,24 +303,44 @@ class TransporteService:
         Args:
             viaje_id (int): ID del viaje
             tiempo_minimo_conexion (timedelta): Tiempo mínimo recomendado entre conexiones
-            
+        
         Returns:
             list: Lista de conexiones problemáticas
         """
-        itinerario = self.obtener_itinerario_transportes(viaje_id)
-        conexiones_criticas = []
+        return self.analizar_conexiones(viaje_id, tiempo_minimo_conexion)['conexiones_criticas']
+    
+    def verificar_conexiones_viajes_proximos(self, tiempo_minimo_conexion=timedelta(hours=1)):
+        """
+        Verificar conexiones críticas de todos los viajes en curso o futuros a la vez.
         
-        for item in itinerario:
-            if item['tiempo_conexion'] and item['tiempo_conexion'] < tiempo_minimo_conexion:
-                conexiones_criticas.append({
-                    'transporte_actual': item['transporte'],
-                    'siguiente_transporte': item['siguiente_transporte'],
-                    'tiempo_conexion': item['tiempo_conexion'],
-                    'tiempo_minimo_recomendado': tiempo_minimo_conexion,
-                    'diferencia': tiempo_minimo_conexion - item['tiempo_conexion']
-                })
+        Carga los transportes de todos los viajes con una única consulta y
+        analiza cada viaje en memoria.
+        
+        Args:
+            tiempo_minimo_conexion (timedelta): Tiempo mínimo recomendado entre conexiones
+        
+        Returns:
+            dict: Conexiones críticas por viaje_id (solo viajes con alguna conexión crítica)
+        """
+        transportes = TransporteLectura.de_filas(self.db.session.execute(
+            TransporteLectura.seleccionar(self.Transporte).join(self.Viaje).where(
+                self.Viaje.fecha_fin >= date.today()
+            ).order_by(
+                self.Transporte.viaje_id, self.Transporte.fecha_salida, self.Transporte.hora_salida
+            )
+        ))
+        
+        transportes_por_viaje = defaultdict(list)
+        for transporte in transportes:
+            transportes_por_viaje[transporte.viaje_id].append(transporte)
         
-        return conexiones_criticas
+        resultado = {}
+        for viaje_id, transportes_viaje in transportes_por_viaje.items():
+            analisis = self.analizar_conexiones(viaje_id, tiempo_minimo_conexion, transportes_viaje)
+            if analisis['conexiones_criticas']:
+                resultado[viaje_id] = analisis['conexiones_criticas']
+        
+        return resultado
     
     def obtener_transportes_proximos(self, viaje_id, dias_anticipacion=7):
         """
@@ -225,17 +349,20 @@ class TransporteService:
         Args:
             viaje_id (int): ID del viaje
             dias_anticipacion (int): Días de anticipación desde hoy
-            
+        
         Returns:
-            list: Lista de transportes próximos
+            list: Lista de TransporteLectura próximos
         """
         fecha_limite = date.today() + timedelta(days=dias_anticipacion)
         
-        return self.Transporte.query.filter(
+        transportes = TransporteLectura.consultar(
+            self.db.session, self.Transporte,
             self.Transporte.viaje_id == viaje_id,
             self.Transporte.fecha_salida <= fecha_limite,
-            self.Transporte.fecha_salida >= date.today()
-        ).order_by(self.Transporte.fecha_salida, self.Transporte.hora_salida).all()
+            self.Transporte.fecha_salida >= date.today(),
+            orden=(self.Transporte.fecha_salida, self.Transporte.hora_salida)
+        )
+        return [transporte for transporte, _ in self._ordenar_por_salida(transportes)]
     
     def obtener_estadisticas_transportes(self, viaje_id):
         """
@@ -243,7 +370,7 @@ class TransporteService:
         
         Args:
             viaje_id (int): ID del viaje
-            
+        
         Returns:
             dict: Estadísticas de transportes
         """
@@ -260,8 +387,8 @@ class TransporteService:
         con_codigo_reserva = sum(1 for t in transportes if t.codigo_reserva)
         con_asiento = sum(1 for t in transportes if t.asiento)
         
-        # Verificar conexiones críticas
-        conexiones_criticas = self.verificar_conexiones_criticas(viaje_id)
+        # Verificar conexiones críticas reutilizando los transportes ya cargados
+        conexiones_criticas = self.analizar_conexiones(viaje_id, transportes=transportes)['conexiones_criticas']
         
         return {
             'total': total,
@@ -273,18 +400,20 @@ class TransporteService:
             'porcentaje_info_completa': round((con_hora / total * 100) if total > 0 else 0, 1)
         }
     
-    def validar_transportes_para_viaje(self, viaje_id):
+    def validar_transportes_para_viaje(self, viaje_id, transportes=None):
         """
         Validar la completitud y coherencia de los transportes de un viaje.
         
         Args:
             viaje_id (int): ID del viaje
-            
+            transportes (list): Transportes ya cargados y ordenados (optional, evita la consulta)
+        
         Returns:
             dict: Resultado de validación con recomendaciones
         """
-        transportes = self.obtener_transportes_por_viaje(viaje_id)
-        conexiones_criticas = self.verificar_conexiones_criticas(viaje_id)
+        if transportes is None:
+            transportes = self.obtener_transportes_por_viaje(viaje_id)
+        conexiones_criticas = self.analizar_conexiones(viaje_id, transportes=transportes)['conexiones_criticas']
         
         # Verificar información faltante
         sin_codigo_reserva = [t for t in transportes if not t.codigo_reserva]
@@ -328,39 +457,43 @@ class TransporteService:
         
         Args:
             transporte_id (int): ID del transporte a eliminar
-            
+        
         Returns:
             dict: Resultado con success
         """
         try:
             transporte = self.Transporte.query.get(transporte_id)
             if not transporte:
-                return {'success': False, 'error': 'Transporte no encontrado'}
+                return {'success': False, 'no_encontrado': True, 'error': 'Transporte no encontrado'}
             
             self.db.session.delete(transporte)
             self.db.session.commit()
             
             return {'success': True}
-            
+        
         except Exception as e:
             self.db.session.rollback()
             return {'success': False, 'error': str(e)}
     
-    def actualizar_transporte(self, transporte_id, **kwargs):
+    def actualizar_transporte(self, transporte_id, version=None, **kwargs):
         """
         Actualizar campos de un transporte.
         
         Args:
             transporte_id (int): ID del transporte
+            version (int): Versión que editó el cliente; si ya no es la actual
+                no se escribe nada y se informa el conflicto
             **kwargs: Campos a actualizar
-            
+        
         Returns:
-            dict: Resultado con success
+            dict: Resultado con success y la nueva version, o conflicto=True o no_encontrado=True
         """
         try:
             transporte = self.Transporte.query.get(transporte_id)
             if not transporte:
-                return {'success': False, 'error': 'Transporte no encontrado'}
+                return {'success': False, 'no_encontrado': True, 'error': 'Transporte no encontrado'}
+            if not version_vigente(transporte, version):
+                return resultado_conflicto(transporte, 'el transporte')
             
             # Actualizar campos permitidos
             campos_permitidos = [
@@ -379,10 +512,16 @@ class TransporteService:
                     
                     setattr(transporte, campo, valor)
             
+            self.db.session.flush()
+            nueva_version = transporte.version
             self.db.session.commit()
             
-            return {'success': True}
-            
+            return {'success': True, 'version': nueva_version}
+        
+        except StaleDataError:
+            # Otra transacción cambió la fila entre la lectura y el UPDATE
+            self.db.session.rollback()
+            return resultado_conflicto(elemento='el transporte')
         except Exception as e:
             self.db.session.rollback()
             return {'success': False, 'error': str(e)}
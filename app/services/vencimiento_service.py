@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio para el seguimiento global de vencimientos de documentos.
+"""
+
+import heapq
+import threading
+from datetime import date, timedelta
+
+
+class VencimientoService:
+    """
+    Servicio para consultar y programar vencimientos de documentos de todos los viajes.
+    
+    Las consultas globales usan el índice sobre ``Documento.fecha_vencimiento``
+    (búsqueda por rango) en lugar de recorrer los viajes uno a uno. Para el
+    notificador en segundo plano se mantiene un min-heap en memoria con los
+    próximos vencimientos.
+    
+    El heap es de cada proceso y DocumentoService solo lo actualiza con sus
+    propias escrituras; la sincronización, la importación, el archivo y los
+    otros workers no pasan por ahí. Por eso el notificador lo vuelve a cargar
+    con la consulta por rango en cada ciclo, y recuerda qué documentos ya
+    avisó para no repetirlos.
+    """
+    
+    def __init__(self, database_service=None):
+        """Inicializar el servicio de vencimientos."""
+        self.db_service = database_service
+        self.db = None
+        self.Documento = None
+        self.Viaje = None
+        
+        # Min-heap de (fecha_vencimiento, documento_id) y fecha vigente por documento.
+        # Las entradas del heap que no coinciden con _fechas quedaron obsoletas
+        # (documento editado o eliminado) y se descartan al extraerlas.
+        self._heap = []
+        self._fechas = {}
+        self._horizonte = None
+        self._lock = threading.Lock()
+        self._avisados = {}  # documento_id -> fecha_vencimiento ya avisada
+        self._notificador = None
+        self._detener = threading.Event()
+    
+    def init_models(self, models_dict, database_instance):
+        """Inicializar los modelos necesarios."""
+        self.Documento = models_dict['Documento']
+        self.Viaje = models_dict['Viaje']
+        self.db = database_instance
+    
+    def obtener_por_vencer(self, dias_anticipacion=30, pagina=1, por_pagina=50, incluir_vencidos=False):
+        """
+        Obtener los documentos de todos los viajes que vencen en los próximos días.
+        
+        Args:
+            dias_anticipacion (int): Días hacia adelante a considerar
+            pagina (int): Número de página (1-indexed)
+            por_pagina (int): Documentos por página
+            incluir_vencidos (bool): Incluir también documentos ya vencidos
+        
+        Returns:
+            dict: Documentos de la página, total y datos de paginación
+        """
+        hoy = date.today()
+        fecha_limite = hoy + timedelta(days=dias_anticipacion)
+        pagina = max(pagina, 1)
+        por_pagina = max(min(por_pagina, 500), 1)
+        
+        # Búsqueda por rango sobre el índice de fecha_vencimiento
+        query = self.Documento.query.filter(
+            self.Documento.fecha_vencimiento.isnot(None),
+            self.Documento.fecha_vencimiento <= fecha_limite
+        )
+        if not incluir_vencidos:
+            query = query.filter(self.Documento.fecha_vencimiento >= hoy)
+        
+        total = query.count()
+        documentos = query.order_by(
+            self.Documento.fecha_vencimiento, self.Documento.id
+        ).offset((pagina - 1) * por_pagina).limit(por_pagina).all()
+        
+        return {
+            'documentos': documentos,
+            'total': total,
+            'pagina': pagina,
+            'por_pagina': por_pagina,
+            'paginas': (total + por_pagina - 1) // por_pagina,
+            'fecha_limite': fecha_limite
+        }
+    
+    def cargar_programacion(self, horizonte_dias=90, desde=None):
+        """
+        Cargar en el heap los vencimientos desde una fecha hasta el horizonte indicado.
+        
+        Args:
+            horizonte_dias (int): Días hacia adelante (desde hoy) a mantener en memoria
+            desde (date): Primera fecha a cargar (default: hoy)
+        
+        Returns:
+            int: Cantidad de vencimientos programados
+        """
+        hoy = date.today()
+        desde = desde or hoy
+        self._horizonte = hoy + timedelta(days=horizonte_dias)
+        
+        filas = self.db.session.query(
+            self.Documento.id, self.Documento.fecha_vencimiento
+        ).filter(
+            self.Documento.fecha_vencimiento >= desde,
+            self.Documento.fecha_vencimiento <= self._horizonte
+        ).all()
+        
+        with self._lock:
+            self._fechas = {documento_id: fecha for documento_id, fecha in filas}
+            self._heap = [(fecha, documento_id) for documento_id, fecha in filas]
+            heapq.heapify(self._heap)
+        
+        return len(self._heap)
+    
+    def registrar_documento(self, documento):
+        """
+        Actualizar la programación tras crear o modificar un documento.
+        
+        Args:
+            documento: Instancia del modelo Documento
+        """
+        if self._horizonte is None:
+            return  # Programación no cargada
+        
+        with self._lock:
+            fecha = documento.fecha_vencimiento
+            if fecha and date.today() <= fecha <= self._horizonte:
+                self._fechas[documento.id] = fecha
+                heapq.heappush(self._heap, (fecha, documento.id))
+            else:
+                self._fechas.pop(documento.id, None)
+    
+    def descartar_documento(self, documento_id):
+        """
+        Quitar un documento de la programación (por ejemplo, al eliminarlo).
+        
+        Args:
+            documento_id (int): ID del documento
+        """
+        with self._lock:
+            self._fechas.pop(documento_id, None)
+    
+    def _limpiar_obsoletos(self):
+        """Descartar del tope del heap las entradas que ya no son vigentes."""
+        while self._heap:
+            fecha, documento_id = self._heap[0]
+            if self._fechas.get(documento_id) == fecha:
+                return
+            heapq.heappop(self._heap)
+    
+    def proximo_vencimiento(self):
+        """
+        Obtener el próximo vencimiento programado sin extraerlo.
+        
+        Returns:
+            tuple: (fecha_vencimiento, documento_id) o None si no hay ninguno
+        """
+        with self._lock:
+            self._limpiar_obsoletos()
+            return self._heap[0] if self._heap else None
+    
+    def extraer_vencimientos_hasta(self, fecha_limite):
+        """
+        Extraer del heap todos los vencimientos hasta una fecha (inclusive).
+        
+        Args:
+            fecha_limite (date): Fecha límite
+        
+        Returns:
+            list: Lista de tuplas (fecha_vencimiento, documento_id) en orden
+        """
+        vencimientos = []
+        with self._lock:
+            self._limpiar_obsoletos()
+            while self._heap and self._heap[0][0] <= fecha_limite:
+                fecha, documento_id = heapq.heappop(self._heap)
+                del self._fechas[documento_id]
+                vencimientos.append((fecha, documento_id))
+                self._limpiar_obsoletos()
+        return vencimientos
+    
+    def revisar_vencimientos(self, dias_anticipacion=15, horizonte_dias=90, callback=None):
+        """
+        Un ciclo del notificador: recargar la programación y avisar los vencimientos nuevos.
+        
+        La programación se recarga con la consulta por rango, así que incluye
+        los documentos escritos por cualquier proceso o camino. Un documento se
+        avisa una vez por fecha de vencimiento: si la fecha cambia se vuelve a avisar.
+        
+        Args:
+            dias_anticipacion (int): Días de anticipación para avisar
+            horizonte_dias (int): Días hacia adelante a cargar en el heap
+            callback (callable): Función que recibe la lista de documentos a avisar
+        
+        Returns:
+            int: Cantidad de documentos avisados
+        """
+        callback = callback or self._notificar_por_consola
+        hoy = date.today()
+        self.cargar_programacion(max(horizonte_dias, dias_anticipacion))
+        
+        vencimientos = self.extraer_vencimientos_hasta(hoy + timedelta(days=dias_anticipacion))
+        nuevos = [(fecha, documento_id) for fecha, documento_id in vencimientos
+                  if self._avisados.get(documento_id) != fecha]
+        # Los ya vencidos no vuelven a aparecer en la consulta: olvidarlos
+        self._avisados = {documento_id: fecha for documento_id, fecha in self._avisados.items()
+                          if fecha >= hoy}
+        if not nuevos:
+            return 0
+        
+        ids = [documento_id for _, documento_id in nuevos]
+        documentos = self.Documento.query.filter(self.Documento.id.in_(ids)).order_by(
+            self.Documento.fecha_vencimiento, self.Documento.id
+        ).all()
+        callback(documentos)
+        self._avisados.update((documento.id, documento.fecha_vencimiento) for documento in documentos)
+        return len(documentos)
+    
+    def iniciar_notificador(self, app, dias_anticipacion=15, intervalo_segundos=3600,
+                            horizonte_dias=90, callback=None):
+        """
+        Iniciar un hilo en segundo plano que avisa de los documentos por vencer.
+        
+        Debe correr en un solo proceso: con gunicorn lo inicia gunicorn.conf.py
+        en un único worker (no en el master, donde el hilo no sobrevive al fork).
+        
+        Args:
+            app: Aplicación Flask (para el contexto de base de datos)
+            dias_anticipacion (int): Días de anticipación para avisar
+            intervalo_segundos (int): Cada cuánto revisar el heap
+            horizonte_dias (int): Días hacia adelante a mantener en memoria
+            callback (callable): Función que recibe la lista de documentos a avisar
+        
+        Returns:
+            bool: True si el notificador se inició
+        """
+        if self._notificador and self._notificador.is_alive():
+            return False
+        
+        self._detener.clear()
+        
+        def ciclo():
+            while not self._detener.is_set():
+                try:
+                    with app.app_context():
+                        self.revisar_vencimientos(dias_anticipacion, horizonte_dias, callback)
+                        self.db.session.remove()
+                except Exception as e:
+                    print(f"❌ Error en notificador de vencimientos: {e}")
+                
+                self._detener.wait(intervalo_segundos)
+        
+        self._notificador = threading.Thread(target=ciclo, name='notificador-vencimientos', daemon=True)
+        self._notificador.start()
+        print("⏰ Notificador de vencimientos iniciado")
+        return True
+    
+    def detener_notificador(self):
+        """Detener el hilo del notificador si está corriendo."""
+        self._detener.set()
+    
+    @staticmethod
+    def _notificar_por_consola(documentos):
+        """Callback por defecto: informar los vencimientos por consola."""
+        for documento in documentos:
+            print(f"⚠️  Documento por vencer: {documento.nombre} ({documento.tipo}) "
+                  f"del viaje {documento.viaje_id} vence el {documento.fecha_vencimiento}")
+
+
+# Instancia global del servicio
+vencimiento_service = VencimientoService()
@@ -3,10 +3,23 @@
 Servicio para lógica de negocio de viajes.
 """
 
-from datetime import datetime, date
+from time import perf_counter
+from datetime import datetime, date, time, timedelta
 from collections import OrderedDict
 
+from sqlalchemy import func
 
+from app.models.lecturas import AlojamientoLectura, DocumentoLectura, TransporteLectura
+from app.utils.concurrencia import es_conflicto, reintentar_en_conflicto, resultado_conflicto
+from app.utils.metricas import medir_servicio
+
+
+# Cuánto puede tardar una transacción entre su flush y su commit sin que
+# /viajes/modificados pierda sus viajes (ver obtener_viajes_modificados_desde)
+MARGEN_VIAJES_MODIFICADOS = timedelta(seconds=60)
+
+
+@medir_servicio('viaje')
 class ViajeService:
     """Servicio centralizado para operaciones de viajes."""
     
@@ -18,7 +31,6 @@ class ViajeService:
         """Inicializa el servicio con los modelos y base de datos."""
         self._models = models
         self._db = db
-        print("🧳 ViajeService inicializado")
     
     def agrupar_actividades_por_destino(self, viaje):
         """
@@ -27,7 +39,7 @@ class ViajeService:
         
         Args:
             viaje: Instancia del modelo Viaje
-            
+        
         Returns:
             OrderedDict: Actividades agrupadas por destino y ordenadas
         """
@@ -41,18 +53,12 @@ class ViajeService:
         
         Args:
             viaje_id: ID del viaje a eliminar
-            
+        
         Returns:
             dict: Resultado de la operación con éxito y mensaje
         """
         try:
             Viaje = self._models['Viaje']
-            Parada = self._models['Parada']
-            Gasto = self._models['Gasto']
-            Actividad = self._models['Actividad']
-            Documento = self._models['Documento']
-            Transporte = self._models['Transporte']
-            Alojamiento = self._models['Alojamiento']
             
             viaje = Viaje.query.get_or_404(viaje_id)
             nombre_viaje = viaje.nombre
@@ -75,32 +81,14 @@ class ViajeService:
             print(f"  - Transportes: {num_transportes}")
             print(f"  - Alojamientos: {num_alojamientos}")
             
-            # Eliminar explícitamente elementos relacionados
-            # (aunque el cascade debería manejar esto automáticamente)
+            # Los elementos relacionados los elimina el cascade de las relaciones.
+            # No se borran antes con query.delete(): cada fila lleva versión y el
+            # DELETE del ORM (WHERE id = ? AND version = ?) fallaría con
+            # StaleDataError al no encontrar las filas ya borradas.
             
-            # Eliminar paradas
-            Parada.query.filter_by(viaje_id=viaje_id).delete()
-            print("  ✓ Paradas eliminadas")
-            
-            # Eliminar gastos
-            Gasto.query.filter_by(viaje_id=viaje_id).delete()
-            print("  ✓ Gastos eliminados")
-            
-            # Eliminar actividades
-            Actividad.query.filter_by(viaje_id=viaje_id).delete()
-            print("  ✓ Actividades eliminadas")
-            
-            # Eliminar documentos
-            Documento.query.filter_by(viaje_id=viaje_id).delete()
-            print("  ✓ Documentos eliminados")
-            
-            # Eliminar transportes
-            Transporte.query.filter_by(viaje_id=viaje_id).delete()
-            print("  ✓ Transportes eliminados")
-            
-            # Eliminar alojamientos
-            Alojamiento.query.filter_by(viaje_id=viaje_id).delete()
-            print("  ✓ Alojamientos eliminados")
+            # Quitar del índice de búsqueda
+            from app.services import busqueda_service
+            busqueda_service.eliminar_viaje(viaje_id)
             
             # Finalmente, eliminar el viaje
             self._db.session.delete(viaje)
@@ -116,7 +104,7 @@ class ViajeService:
                 'success': True,
                 'message': f'Viaje "{nombre_viaje}" y {total_elementos} elementos relacionados eliminados correctamente'
             }
-            
+        
         except Exception as e:
             print(f"❌ Error al eliminar viaje: {str(e)}")
             self._db.session.rollback()
@@ -133,9 +121,17 @@ class ViajeService:
         2. Nombre del destino (alfabéticamente)
         3. ID de la parada (orden de creación)
         
+        El orden se recalcula desde cero, así que si otra edición concurrente
+        cambia las paradas entretanto (versión distinta o choque en el
+        constraint de orden) se vuelve a calcular con los datos nuevos.
+        
         Args:
             viaje_id: ID del viaje cuyas paradas se van a reordenar
         """
+        reintentar_en_conflicto(self._db.session, lambda: self._reordenar_paradas_por_fecha(viaje_id))
+    
+    def _reordenar_paradas_por_fecha(self, viaje_id):
+        """Un intento de reordenar_paradas_por_fecha."""
         try:
             Parada = self._models['Parada']
             
@@ -156,11 +152,20 @@ class ViajeService:
                 p.id                       # 4. ID (orden de creación)
             ))
             
-            print("Nueva secuencia de paradas:")
+            # Solo se escriben las paradas que cambian de lugar: las demás
+            # conservan su versión y no generan conflictos ni cambios de sincronización
+            cambios = [(parada, i + 1) for i, parada in enumerate(paradas_ordenadas)
+                       if parada.orden != i + 1]
+            
+            if not cambios:
+                print("Las paradas ya están ordenadas por fecha, no se necesita reordenar")
+                return
+            
+            print(f"Nueva secuencia de paradas ({len(cambios)} cambian de orden):")
             
             # PASO 1: Asignar órdenes temporales únicos (negativos para evitar conflictos)
             print("Paso 1: Asignando órdenes temporales...")
-            for i, parada in enumerate(paradas_ordenadas):
+            for i, (parada, _) in enumerate(cambios):
                 orden_temporal = -(i + 1000)  # Usar números negativos muy grandes
                 print(f"  Temp {orden_temporal}: {parada.destino} - Llegada: {parada.fecha_llegada}")
                 parada.orden = orden_temporal
@@ -170,20 +175,19 @@ class ViajeService:
             
             # PASO 2: Asignar los órdenes finales correctos
             print("Paso 2: Asignando órdenes finales...")
-            for i, parada in enumerate(paradas_ordenadas):
-                nuevo_orden = i + 1
+            for parada, nuevo_orden in cambios:
                 print(f"  {nuevo_orden}. {parada.destino} - Llegada: {parada.fecha_llegada}")
                 parada.orden = nuevo_orden
             
             # Commit final
             self._db.session.commit()
             print("Reordenamiento automático completado exitosamente")
-            
+        
         except Exception as e:
             print(f"Error al reordenar paradas por fecha: {str(e)}")
             self._db.session.rollback()
             raise
-
+    
     def reordenar_parada_especifica(self, parada_id, nuevo_orden):
         """
         Reordena una parada específica a una nueva posición.
@@ -191,9 +195,10 @@ class ViajeService:
         Args:
             parada_id: ID de la parada a reordenar
             nuevo_orden: Nueva posición (1-indexed)
-            
+        
         Returns:
-            dict: Resultado de la operación
+            dict: Resultado de la operación (conflicto=True si otra edición
+            concurrente cambió las paradas del viaje)
         """
         try:
             Parada = self._models['Parada']
@@ -226,20 +231,23 @@ class ViajeService:
                 nueva_posicion = 0
             elif nueva_posicion > len(paradas_temp):
                 nueva_posicion = len(paradas_temp)
-                
+            
             paradas_temp.insert(nueva_posicion, parada)
             
+            # Solo cambian las paradas entre la posición vieja y la nueva
+            cambios = [(p, i + 1) for i, p in enumerate(paradas_temp) if p.orden != i + 1]
+            
             # Usar valores temporales negativos para evitar conflictos de constraint
             print("Asignando órdenes temporales...")
-            for i, p in enumerate(paradas_temp):
+            for i, (p, _) in enumerate(cambios):
                 p.orden = -(i + 1)  # Valores negativos temporales
             
             self._db.session.flush()  # Aplicar cambios temporales
             
             # Ahora asignar los órdenes finales correctos
             print("Asignando órdenes finales...")
-            for i, p in enumerate(paradas_temp):
-                p.orden = i + 1  # Órdenes finales correctos
+            for p, orden_final in cambios:
+                p.orden = orden_final  # Órdenes finales correctos
             
             self._db.session.commit()
             
@@ -248,11 +256,157 @@ class ViajeService:
                 print(f"  Parada {p.id} ({p.destino}): orden {p.orden}")
             
             return {'success': True}
-            
+        
         except Exception as e:
-            print(f"Error al reordenar parada: {str(e)}")
             self._db.session.rollback()
+            if es_conflicto(e):
+                print(f"⚠️ Conflicto al reordenar parada: {str(e)}")
+                return resultado_conflicto(elemento='el orden de las paradas')
+            print(f"Error al reordenar parada: {str(e)}")
             return {'success': False, 'error': str(e)}
+    
+    
+    def obtener_viajes_modificados_desde(self, desde, limite=1000, despues_de_id=0):
+        """
+        Viajes en los que algo cambió (el viaje o cualquiera de sus elementos) después de un cursor.
+        
+        Usa el índice de fecha_actualizacion_agregado: no recorre los elementos.
+        El cursor es (fecha, id): los viajes que comparten fecha (p.ej. los de
+        un mismo flush) no se pierden entre páginas. La fecha se toma en el
+        flush, no en el commit, así que el cursor devuelto nunca pasa de
+        ahora - MARGEN_VIAJES_MODIFICADOS: una transacción que confirma tarde
+        aparece en la siguiente consulta. Los viajes de ese margen se repiten
+        (el cliente los descarta por version_agregado).
+        
+        Args:
+            desde (datetime): Fecha (UTC) del cursor
+            limite (int): Máximo de viajes a devolver, los menos recientes primero
+            despues_de_id (int): ID del cursor: de los viajes con fecha igual a
+                desde, solo los de ID mayor
+        
+        Returns:
+            dict: {'viajes': [{'id', 'version', 'version_agregado', 'fecha_actualizacion_agregado'}],
+                   'hay_mas', 'cursor': {'desde', 'id'}}
+        """
+        Viaje = self._models['Viaje']
+        ahora = datetime.utcnow()
+        filas = self._db.session.query(
+            Viaje.id, Viaje.version, Viaje.version_agregado, Viaje.fecha_actualizacion_agregado
+        ).filter(
+            (Viaje.fecha_actualizacion_agregado > desde)
+            | ((Viaje.fecha_actualizacion_agregado == desde) & (Viaje.id > despues_de_id))
+        ).order_by(Viaje.fecha_actualizacion_agregado, Viaje.id).limit(limite).all()
+        viajes = [fila._asdict() for fila in filas]
+        
+        hay_mas = len(viajes) == limite
+        cursor = {'desde': desde, 'id': despues_de_id}
+        if viajes:
+            ultimo = viajes[-1]
+            cursor = {'desde': ultimo['fecha_actualizacion_agregado'], 'id': ultimo['id']}
+        limite_seguro = ahora - MARGEN_VIAJES_MODIFICADOS
+        if cursor['desde'] > limite_seguro:
+            # Los viajes del margen se envían igual, pero el cursor queda antes:
+            # vuelven en la próxima consulta junto con los que confirmen tarde
+            if desde < limite_seguro:
+                cursor = {'desde': limite_seguro, 'id': 0}
+            else:
+                cursor = {'desde': desde, 'id': despues_de_id}
+            hay_mas = False
+        return {'viajes': viajes, 'hay_mas': hay_mas, 'cursor': cursor}
+    
+    def resumen_tarjetas(self, destinos_por_viaje=3):
+        """
+        Datos de las tarjetas de la lista de viajes, para todos los viajes.
+        
+        Tres consultas en total en lugar de cargar las paradas, gastos y
+        actividades de cada viaje: las paradas solo con viaje_id y destino, y
+        gastos y actividades contados con GROUP BY.
+        
+        Args:
+            destinos_por_viaje (int): Destinos a incluir por viaje (las primeras paradas)
+        
+        Returns:
+            dict: viaje_id -> {'destinos', 'num_paradas', 'num_gastos', 'num_actividades'}
+            (solo los viajes con algún elemento)
+        """
+        Parada = self._models['Parada']
+        resumen = {}
+        
+        def tarjeta(viaje_id):
+            if viaje_id not in resumen:
+                resumen[viaje_id] = {'destinos': [], 'num_paradas': 0, 'num_gastos': 0, 'num_actividades': 0}
+            return resumen[viaje_id]
+        
+        paradas = self._db.session.query(Parada.viaje_id, Parada.destino).order_by(
+            Parada.viaje_id, Parada.orden
+        )
+        for viaje_id, destino in paradas:
+            datos = tarjeta(viaje_id)
+            datos['num_paradas'] += 1
+            if len(datos['destinos']) < destinos_por_viaje:
+                datos['destinos'].append(destino)
+        
+        for nombre_modelo, campo in (('Gasto', 'num_gastos'), ('Actividad', 'num_actividades')):
+            modelo = self._models[nombre_modelo]
+            conteos = self._db.session.query(modelo.viaje_id, func.count(modelo.id)).group_by(modelo.viaje_id)
+            for viaje_id, total in conteos:
+                tarjeta(viaje_id)[campo] = total
+        
+        return resumen
+    
+    def validar_viaje(self, viaje_id):
+        """
+        Validar documentos, transportes y alojamientos de un viaje en una sola pasada.
+        
+        El viaje completo se lee una vez (de su instantánea) y los validadores
+        de cada servicio trabajan sobre esas listas en memoria en lugar de
+        consultar cada uno sus tablas.
+        
+        Args:
+            viaje_id (int): ID del viaje
+        
+        Returns:
+            dict: Resultado de cada validador, recomendaciones de todos y
+                tiempos en ms por etapa ('carga' y uno por validador)
+        """
+        from app.services import (alojamiento_service, documento_service, instantanea_service,
+                                  transporte_service)
+        
+        tiempos = {}
+        inicio = perf_counter()
+        viaje = instantanea_service.obtener(viaje_id)
+        if viaje is None:
+            return {'success': False, 'error': 'Viaje no encontrado'}
+        
+        # Las mismas lecturas y el mismo orden que las consultas de cada servicio
+        # (la instantánea sigue el orden de las relaciones del modelo)
+        documentos = sorted(DocumentoLectura.de_objetos(viaje.documentos), key=lambda d: (d.tipo, d.nombre))
+        transportes = sorted(TransporteLectura.de_objetos(viaje.transportes), key=lambda t: (
+            t.fecha_salida, t.hora_salida is not None, t.hora_salida or time.min))
+        alojamientos = sorted(AlojamientoLectura.de_objetos(viaje.alojamientos), key=lambda a: a.fecha_entrada)
+        tiempos['carga'] = (perf_counter() - inicio) * 1000
+        
+        validadores = {
+            'documentos': lambda: documento_service.validar_documentos_para_viaje(viaje_id, documentos),
+            'transportes': lambda: transporte_service.validar_transportes_para_viaje(viaje_id, transportes),
+            'alojamientos': lambda: alojamiento_service.validar_alojamientos_para_viaje(
+                viaje_id, alojamientos, viaje),
+        }
+        validaciones = {}
+        for nombre, validador in validadores.items():
+            inicio = perf_counter()
+            validaciones[nombre] = validador()
+            tiempos[nombre] = (perf_counter() - inicio) * 1000
+        
+        return {
+            'success': True,
+            'viaje_id': viaje_id,
+            'completo': all(v['completo'] for v in validaciones.values()),
+            'validaciones': validaciones,
+            'recomendaciones': [r for v in validaciones.values() for r in v['recomendaciones']],
+            'tiempos_ms': {etapa: round(ms, 3) for etapa, ms in tiempos.items()},
+            'total_ms': round(sum(tiempos.values()), 3)
+        }
 
 
 # Instancia global del servicio
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Control de concurrencia optimista con la columna version de los modelos.
+
+Los modelos declaran version como version_id_col: cada UPDATE del ORM se emite
+como UPDATE ... WHERE id = ? AND version = ? y, si otra transacción cambió la
+fila entretanto, SQLAlchemy lanza StaleDataError en lugar de pisar el cambio.
+Las ediciones que vienen de un cliente además comparan la versión que el
+cliente editó con la actual antes de escribir.
+"""
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+# Violación del orden único de paradas por viaje: Postgres incluye el nombre
+# del constraint en el mensaje y SQLite solo las columnas
+MARCAS_CONFLICTO_ORDEN = ('_viaje_orden_uc', 'parada.viaje_id, parada.orden')
+
+
+def es_conflicto(error):
+    """
+    Indicar si un error significa que otra transacción escribió primero.
+    
+    Solo cuentan StaleDataError (la versión de la fila cambió) y la violación
+    de _viaje_orden_uc (dos escrituras tomaron el mismo orden). El resto de
+    los IntegrityError (NOT NULL, claves foráneas, otros únicos) son errores
+    de los datos y repetir la operación no los arregla.
+    
+    Args:
+        error: Excepción capturada
+    
+    Returns:
+        bool: True si reintentar con los datos nuevos puede funcionar
+    """
+    if isinstance(error, StaleDataError):
+        return True
+    if isinstance(error, IntegrityError):
+        mensaje = str(error.orig)
+        return any(marca in mensaje for marca in MARCAS_CONFLICTO_ORDEN)
+    return False
+
+
+def version_vigente(objeto, version_esperada):
+    """
+    Verificar que el cliente editó la versión actual de la fila.
+    
+    Args:
+        objeto: Fila cargada del ORM
+        version_esperada: Versión que tenía el cliente (None omite la verificación)
+    
+    Returns:
+        bool: True si se puede escribir
+    """
+    if version_esperada in (None, ''):
+        return True
+    try:
+        return int(version_esperada) == objeto.version
+    except (TypeError, ValueError):
+        return False
+
+
+def resultado_conflicto(objeto=None, elemento='el elemento'):
+    """Resultado de servicio para una escritura rechazada por un cambio concurrente."""
+    return {
+        'success': False,
+        'conflicto': True,
+        'error': f'Otra persona modificó {elemento}; recarga los datos y vuelve a intentarlo',
+        'version_actual': objeto.version if objeto is not None else None
+    }
+
+
+def reintentar_en_conflicto(session, funcion, intentos=3):
+    """
+    Ejecutar una operación idempotente y repetirla si otra transacción escribió primero.
+    
+    Sirve para operaciones que el servidor recalcula desde cero (p.ej. reordenar
+    paradas por fecha), donde volver a intentar con los datos nuevos es seguro.
+    
+    Raises:
+        StaleDataError, IntegrityError: Si el conflicto persiste en el último
+        intento, o enseguida si el IntegrityError no es de conflicto (ver es_conflicto)
+    """
+    for intento in range(1, intentos + 1):
+        try:
+            return funcion()
+        except (StaleDataError, IntegrityError) as e:
+            session.rollback()
+            if intento == intentos or not es_conflicto(e):
+                raise
+            print(f"🔁 Conflicto de concurrencia, reintentando ({intento}/{intentos - 1})")
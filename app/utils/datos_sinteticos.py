@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+"""
+Generador determinístico de datos sintéticos para pruebas de carga y benchmarks.
+
+Crea viajes con paradas, gastos en varias monedas, actividades, documentos,
+transportes (con vuelos en conexión) y alojamientos siguiendo distribuciones
+parecidas a las de uso real. Con la misma semilla y la misma fecha base se
+obtienen exactamente los mismos datos.
+
+Las filas se insertan con INSERT masivos de SQLAlchemy Core (executemany) por
+lotes de viajes, con los IDs asignados por el generador, así que sirve tanto
+para unas decenas de viajes en un test como para millones de filas en SQLite
+o PostgreSQL.
+
+Uso:
+    from app.utils.datos_sinteticos import generar_dataset
+    resumen = generar_dataset(db, get_models(), n_viajes=1000, semilla=7)
+"""
+
+import random
+import time
+from datetime import date, datetime, time as hora, timedelta
+
+from sqlalchemy import func, text
+
+
+# (ciudad, moneda local, código IATA); las ciudades existen en zonas_horarias
+DESTINOS = [
+    ('Buenos Aires', 'ARS', 'EZE'), ('Córdoba', 'ARS', 'COR'), ('Mendoza', 'ARS', 'MDZ'),
+    ('Bariloche', 'ARS', 'BRC'), ('Ushuaia', 'ARS', 'USH'), ('Salta', 'ARS', 'SLA'),
+    ('Santiago', 'CLP', 'SCL'), ('Montevideo', 'UYU', 'MVD'), ('Lima', 'PEN', 'LIM'),
+    ('Cusco', 'PEN', 'CUZ'), ('Bogotá', 'COP', 'BOG'), ('Cartagena', 'COP', 'CTG'),
+    ('Sao Paulo', 'BRL', 'GRU'), ('Rio de Janeiro', 'BRL', 'GIG'), ('Florianópolis', 'BRL', 'FLN'),
+    ('Ciudad de México', 'MXN', 'MEX'), ('Cancún', 'MXN', 'CUN'), ('Miami', 'USD', 'MIA'),
+    ('Nueva York', 'USD', 'JFK'), ('Madrid', 'EUR', 'MAD'), ('Barcelona', 'EUR', 'BCN'),
+    ('París', 'EUR', 'CDG'), ('Roma', 'EUR', 'FCO'), ('Londres', 'GBP', 'LHR'),
+    ('Lisboa', 'EUR', 'LIS'),
+]
+
+# Aeropuertos donde se hacen las escalas de los vuelos en conexión
+ESCALAS = ['Sao Paulo', 'Santiago', 'Lima', 'Panamá', 'Bogotá', 'Miami', 'Madrid']
+
+# categoria -> (peso, mediana del monto en USD, dispersión lognormal)
+CATEGORIAS_GASTO = {
+    'comida': (35, 25, 0.7),
+    'transporte': (20, 40, 0.9),
+    'entretenimiento': (15, 35, 0.8),
+    'compras': (12, 50, 1.0),
+    'hospedaje': (10, 120, 0.5),
+    'otros': (8, 15, 0.9),
+}
+
+# Cotización aproximada de cada moneda respecto del dólar
+COTIZACIONES = {
+    'USD': 1, 'EUR': 0.92, 'GBP': 0.79, 'ARS': 900, 'CLP': 930, 'UYU': 39, 'PEN': 3.7,
+    'COP': 3900, 'BRL': 5.0, 'MXN': 17,
+}
+
+ACTIVIDADES = ['City tour', 'Visita al museo', 'Excursión de día completo', 'Cena show',
+               'Clase de cocina', 'Recorrido en bicicleta', 'Paseo en barco', 'Mercado local',
+               'Trekking', 'Degustación de vinos', 'Free walking tour', 'Playa']
+
+AEROLINEAS = ['Aerolíneas Argentinas', 'LATAM', 'Avianca', 'Copa', 'Iberia', 'Gol',
+              'Aeroméxico', 'American Airlines', 'JetSMART', 'Flybondi']
+
+HOTELES = ['Hotel Central', 'Hostel del Centro', 'Apart Plaza', 'Gran Hotel', 'Posada del Sol',
+           'Residencia Norte', 'Boutique Hotel', 'Departamento Airbnb']
+
+# Cantidad de paradas por viaje y su peso relativo
+PARADAS_POR_VIAJE = ([1, 2, 3, 4, 5, 6, 7, 8], [15, 25, 22, 15, 10, 6, 4, 3])
+
+# Orden de inserción: primero los padres por las claves foráneas
+TABLAS = ['Viaje', 'Parada', 'Gasto', 'Actividad', 'Documento', 'Transporte', 'Alojamiento']
+
+
+class GeneradorDatos:
+    """Genera e inserta viajes sintéticos de forma reproducible."""
+    
+    def __init__(self, database_instance, models_dict, semilla=42, fecha_base=None,
+                 viajes_por_lote=500):
+        """
+        Args:
+            database_instance: Instancia de Flask-SQLAlchemy
+            models_dict (dict): Modelos de la app (ver app.factory.get_models)
+            semilla (int): Semilla del generador de números aleatorios
+            fecha_base (date): Fecha alrededor de la cual se ubican los viajes
+                (default: hoy; fijarla para que los datos sean idénticos entre días)
+            viajes_por_lote (int): Viajes generados e insertados por transacción
+        """
+        self.db = database_instance
+        self._models = models_dict
+        self.semilla = semilla
+        self.fecha_base = fecha_base or date.today()
+        self.viajes_por_lote = viajes_por_lote
+        self._random = random.Random(semilla)
+        self._siguiente_id = {}
+    
+    # ------------------------------------------------------------------
+    # Generación e inserción
+    # ------------------------------------------------------------------
+    
+    def generar(self, n_viajes, reindexar=True):
+        """
+        Generar e insertar n_viajes viajes con todos sus elementos.
+        
+        Args:
+            n_viajes (int): Cantidad de viajes a crear
+            reindexar (bool): Reconstruir el índice de búsqueda al terminar
+                (los INSERT masivos no pasan por los eventos de la sesión)
+        
+        Returns:
+            dict: {'filas': {tabla: cantidad}, 'total_filas': int, 'segundos': float,
+                   'filas_por_segundo': float}
+        """
+        inicio = time.perf_counter()
+        self._siguiente_id = {nombre: self._maximo_id(nombre) + 1 for nombre in TABLAS}
+        conteo = {nombre: 0 for nombre in TABLAS}
+        
+        restantes = n_viajes
+        while restantes > 0:
+            cantidad = min(self.viajes_por_lote, restantes)
+            filas = {nombre: [] for nombre in TABLAS}
+            for _ in range(cantidad):
+                self._generar_viaje(filas)
+            self._insertar(filas)
+            for nombre, lista in filas.items():
+                conteo[nombre] += len(lista)
+            restantes -= cantidad
+        
+        self._ajustar_secuencias()
+        if reindexar:
+            from app.services import busqueda_service
+            busqueda_service.reconstruir_indice()
+        
+        segundos = time.perf_counter() - inicio
+        total = sum(conteo.values())
+        return {
+            'filas': {self._tabla(nombre).name: cantidad for nombre, cantidad in conteo.items()},
+            'total_filas': total,
+            'segundos': round(segundos, 3),
+            'filas_por_segundo': round(total / segundos, 1) if segundos else 0.0
+        }
+    
+    def limpiar(self):
+        """Borrar todos los viajes y sus elementos (la caché de geocodificación se conserva)."""
+        for nombre in reversed(TABLAS):
+            self.db.session.execute(self._tabla(nombre).delete())
+        self.db.session.execute(self._tabla('InstantaneaViaje').delete())
+        self.db.session.commit()
+    
+    def _tabla(self, nombre):
+        return self._models[nombre].__table__
+    
+    def _maximo_id(self, nombre):
+        tabla = self._tabla(nombre)
+        return self.db.session.execute(func.max(tabla.c.id).select()).scalar() or 0
+    
+    def _nuevo_id(self, nombre):
+        valor = self._siguiente_id[nombre]
+        self._siguiente_id[nombre] = valor + 1
+        return valor
+    
+    def _insertar(self, filas):
+        """Insertar un lote con un executemany por tabla y confirmar la transacción."""
+        # Fecha de actualización fija: con la hora real los datos cambiarían en cada corrida
+        marca = datetime.combine(self.fecha_base, hora())
+        for nombre in TABLAS:
+            for fila in filas[nombre]:
+                fila['fecha_actualizacion'] = marca
+        for fila in filas['Viaje']:
+            fila['fecha_actualizacion_agregado'] = marca
+        try:
+            for nombre in TABLAS:
+                if filas[nombre]:
+                    self.db.session.execute(self._tabla(nombre).insert(), filas[nombre])
+            self.db.session.commit()
+        except Exception:
+            self.db.session.rollback()
+            raise
+    
+    def _ajustar_secuencias(self):
+        """En PostgreSQL, mover las secuencias de IDs después de los IDs insertados."""
+        if self.db.engine.dialect.name != 'postgresql':
+            return
+        for nombre in TABLAS:
+            tabla = self._tabla(nombre).name
+            self.db.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{tabla}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {tabla}), 1))"
+            ))
+        self.db.session.commit()
+    
+    # ------------------------------------------------------------------
+    # Distribuciones
+    # ------------------------------------------------------------------
+    
+    def _monto(self, categoria, moneda):
+        """Monto lognormal en la moneda indicada, redondeado como un precio real."""
+        _, mediana, dispersion = CATEGORIAS_GASTO[categoria]
+        usd = self._random.lognormvariate(0, dispersion) * mediana
+        monto = usd * COTIZACIONES[moneda]
+        return round(monto, 2) if monto < 1000 else float(round(monto, -1))
+    
+    def _hora(self, desde=6, hasta=22):
+        return hora(self._random.randint(desde, hasta), self._random.choice((0, 15, 30, 45)))
+    
+    def _fecha_entre(self, desde, hasta):
+        return desde + timedelta(days=self._random.randint(0, max((hasta - desde).days, 0)))
+    
+    def _codigo(self, largo=6):
+        return ''.join(self._random.choice('ABCDEFGHJKLMNPQRSTUVWXYZ23456789') for _ in range(largo))
+    
+    # ------------------------------------------------------------------
+    # Un viaje completo
+    # ------------------------------------------------------------------
+    
+    def _generar_viaje(self, filas):
+        """Agregar a `filas` un viaje con todos sus elementos."""
+        rnd = self._random
+        viaje_id = self._nuevo_id('Viaje')
+        origen = rnd.choice(DESTINOS[:6])
+        
+        # Paradas consecutivas: se llega a una el día que se sale de la anterior
+        cantidad = rnd.choices(*PARADAS_POR_VIAJE)[0]
+        destinos = rnd.sample([d for d in DESTINOS if d is not origen], cantidad)
+        fecha_inicio = self.fecha_base + timedelta(days=rnd.randint(-365, 365))
+        fecha = fecha_inicio
+        paradas = []
+        for orden, destino in enumerate(destinos, 1):
+            salida = fecha + timedelta(days=rnd.choices([1, 2, 3, 4, 5, 7], [10, 25, 25, 20, 12, 8])[0])
+            paradas.append((destino, fecha, salida))
+            filas['Parada'].append({
+                'id': self._nuevo_id('Parada'), 'viaje_id': viaje_id, 'destino': destino[0],
+                'orden': orden, 'fecha_llegada': fecha, 'fecha_salida': salida,
+                'notas': None
+            })
+            fecha = salida
+        fecha_fin = fecha
+        
+        gastado = self._generar_gastos(filas, viaje_id, paradas)
+        self._generar_actividades(filas, viaje_id, paradas)
+        self._generar_documentos(filas, viaje_id, fecha_inicio, paradas)
+        self._generar_transportes(filas, viaje_id, origen, paradas)
+        self._generar_alojamientos(filas, viaje_id, paradas)
+        
+        nombre = paradas[0][0][0] if cantidad == 1 else f'{paradas[0][0][0]} y {cantidad - 1} destinos más'
+        filas['Viaje'].append({
+            'id': viaje_id,
+            'nombre': f'Viaje {viaje_id}: {nombre}',
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin': fecha_fin,
+            'presupuesto_total': float(round(gastado * rnd.uniform(0.8, 1.6), -2)),
+            'presupuesto_gastado': round(gastado, 2),
+            'notas': None,
+            'fecha_creacion': datetime.combine(fecha_inicio - timedelta(days=rnd.randint(7, 180)),
+                                               self._hora(8, 23))
+        })
+    
+    def _generar_gastos(self, filas, viaje_id, paradas):
+        """Gastos por parada, en moneda local o en dólares. Devuelve la suma de los montos."""
+        rnd = self._random
+        categorias = list(CATEGORIAS_GASTO)
+        pesos = [CATEGORIAS_GASTO[c][0] for c in categorias]
+        gastado = 0.0
+        for (ciudad, moneda_local, _), llegada, salida in paradas:
+            for _ in range(rnd.randint(1, 3) * max((salida - llegada).days, 1)):
+                categoria = rnd.choices(categorias, pesos)[0]
+                moneda = moneda_local if rnd.random() < 0.7 else 'USD'
+                monto = self._monto(categoria, moneda)
+                gastado += monto
+                filas['Gasto'].append({
+                    'id': self._nuevo_id('Gasto'), 'viaje_id': viaje_id, 'categoria': categoria,
+                    'descripcion': f'{categoria.capitalize()} en {ciudad}', 'monto': monto,
+                    'fecha': self._fecha_entre(llegada, salida), 'moneda': moneda
+                })
+        return gastado
+    
+    def _generar_actividades(self, filas, viaje_id, paradas):
+        rnd = self._random
+        for (ciudad, _, _), llegada, salida in paradas:
+            for nombre in rnd.sample(ACTIVIDADES, rnd.randint(0, 4)):
+                fecha = self._fecha_entre(llegada, salida)
+                filas['Actividad'].append({
+                    'id': self._nuevo_id('Actividad'), 'viaje_id': viaje_id, 'destino': ciudad,
+                    'nombre': nombre, 'fecha': fecha,
+                    'hora': self._hora(8, 21) if rnd.random() < 0.8 else None,
+                    'ubicacion': f'{ciudad} centro' if rnd.random() < 0.5 else None,
+                    'descripcion': None, 'completada': fecha < self.fecha_base
+                })
+    
+    def _generar_documentos(self, filas, viaje_id, fecha_inicio, paradas):
+        """Pasaporte siempre; visa, seguro y reservas según el viaje. Vencimientos ±2 años."""
+        rnd = self._random
+        documentos = [('pasaporte', 'Pasaporte')]
+        if any(moneda not in ('ARS', 'UYU', 'CLP') for (_, moneda, _), _, _ in paradas) and rnd.random() < 0.3:
+            documentos.append(('visa', 'Visa de turista'))
+        if rnd.random() < 0.6:
+            documentos.append(('seguro', 'Seguro de viaje'))
+        if rnd.random() < 0.4:
+            documentos.append(('reserva_vuelo', 'Reserva de vuelo'))
+        if rnd.random() < 0.3:
+            documentos.append(('reserva_hotel', 'Reserva de hotel'))
+        for tipo, nombre in documentos:
+            filas['Documento'].append({
+                'id': self._nuevo_id('Documento'), 'viaje_id': viaje_id, 'tipo': tipo,
+                'nombre': nombre, 'numero': self._codigo(9),
+                'fecha_vencimiento': fecha_inicio + timedelta(days=rnd.randint(-60, 730)),
+                'notas': None
+            })
+    
+    def _agregar_tramo(self, filas, viaje_id, tipo, origen, destino, partida, duracion, codigo):
+        """Agregar un transporte y devolver el momento de llegada."""
+        llegada = partida + duracion
+        filas['Transporte'].append({
+            'id': self._nuevo_id('Transporte'), 'viaje_id': viaje_id, 'tipo': tipo,
+            'origen': origen, 'destino': destino, 'codigo_reserva': codigo,
+            'fecha_salida': partida.date(), 'hora_salida': partida.time(),
+            'fecha_llegada': llegada.date(), 'hora_llegada': llegada.time(),
+            'aerolinea': self._random.choice(AEROLINEAS) if tipo == 'vuelo' else None,
+            'numero_vuelo': f'{self._codigo(2)}{self._random.randint(100, 9999)}' if tipo == 'vuelo' else None,
+            'terminal': None, 'puerta': None, 'asiento': None, 'notas': None
+        })
+        return llegada
+    
+    def _generar_transportes(self, filas, viaje_id, origen, paradas):
+        """Un traslado entre cada par de ciudades (incluida la ida y la vuelta al origen)."""
+        rnd = self._random
+        ciudades = [origen] + [p[0] for p in paradas] + [origen]
+        fechas = [p[1] for p in paradas] + [paradas[-1][2]]
+        for (desde, moneda_desde, _), (hasta, moneda_hasta, _), fecha in zip(ciudades, ciudades[1:], fechas):
+            partida = datetime.combine(fecha, self._hora(6, 14))
+            codigo = self._codigo()
+            mismo_pais = moneda_desde == moneda_hasta and moneda_desde not in ('USD', 'EUR')
+            if mismo_pais and rnd.random() < 0.4:
+                tipo = rnd.choice(['bus', 'tren', 'auto'])
+                self._agregar_tramo(filas, viaje_id, tipo, desde, hasta, partida,
+                                    timedelta(minutes=rnd.randint(90, 720)), codigo)
+                continue
+            
+            escalas = [e for e in ESCALAS if e not in (desde, hasta)]
+            if not mismo_pais and rnd.random() < 0.35:
+                # Vuelo en conexión: dos tramos con una escala de 40 a 240 minutos
+                escala = rnd.choice(escalas)
+                llegada = self._agregar_tramo(filas, viaje_id, 'vuelo', desde, escala, partida,
+                                              timedelta(minutes=rnd.randint(90, 600)), codigo)
+                self._agregar_tramo(filas, viaje_id, 'vuelo', escala, hasta,
+                                    llegada + timedelta(minutes=rnd.randint(40, 240)),
+                                    timedelta(minutes=rnd.randint(90, 600)), codigo)
+            else:
+                self._agregar_tramo(filas, viaje_id, 'vuelo', desde, hasta, partida,
+                                    timedelta(minutes=rnd.randint(60, 720)), codigo)
+    
+    def _generar_alojamientos(self, filas, viaje_id, paradas):
+        """Un alojamiento por parada; alrededor de un 10% queda sin cubrir para generar huecos."""
+        rnd = self._random
+        for (ciudad, _, _), llegada, salida in paradas:
+            if rnd.random() < 0.1:
+                continue
+            filas['Alojamiento'].append({
+                'id': self._nuevo_id('Alojamiento'), 'viaje_id': viaje_id, 'destino': ciudad,
+                'nombre': f'{rnd.choice(HOTELES)} {ciudad}',
+                'direccion': f'Calle {rnd.randint(1, 99)} n° {rnd.randint(10, 3000)}, {ciudad}',
+                'fecha_entrada': llegada, 'horario_checkin': hora(rnd.choice((14, 15, 16)), 0),
+                'fecha_salida': salida, 'horario_checkout': hora(rnd.choice((10, 11, 12)), 0),
+                'incluye_desayuno': rnd.random() < 0.5,
+                'numero_confirmacion': self._codigo(10) if rnd.random() < 0.8 else None,
+                'codigo_pin': str(rnd.randint(1000, 9999)) if rnd.random() < 0.2 else None,
+                'numero_checkin': None
+            })
+
+
+def generar_dataset(database_instance, models_dict, n_viajes, semilla=42, fecha_base=None,
+                    limpiar=False, reindexar=True, viajes_por_lote=500):
+    """
+    Atajo para tests y benchmarks: generar un dataset dentro del contexto de la app.
+    
+    Args:
+        database_instance: Instancia de Flask-SQLAlchemy
+        models_dict (dict): Modelos de la app
+        n_viajes (int): Cantidad de viajes a crear
+        semilla (int): Semilla del generador
+        fecha_base (date): Fecha de referencia de los viajes (default: hoy)
+        limpiar (bool): Borrar antes los viajes existentes
+        reindexar (bool): Reconstruir el índice de búsqueda al terminar
+        viajes_por_lote (int): Viajes insertados por transacción
+    
+    Returns:
+        dict: Resumen de GeneradorDatos.generar
+    """
+    generador = GeneradorDatos(database_instance, models_dict, semilla=semilla,
+                               fecha_base=fecha_base, viajes_por_lote=viajes_por_lote)
+    if limpiar:
+        generador.limpiar()
+    return generador.generar(n_viajes, reindexar=reindexar)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+Estado de los servicios guardado por app.
+
+Los servicios son instancias globales, pero un proceso puede crear más de una
+app (p.ej. tests o CLIs con bases de datos distintas). Lo que depende de la
+base de datos (backend de búsqueda, cachés, engine) se guarda en
+app.extensions para que cada app tenga el suyo.
+"""
+
+from flask import current_app, has_app_context
+
+
+# Estado usado fuera de un contexto de aplicación
+_sin_app = {}
+
+
+def estado_de_app(clave, crear):
+    """
+    Estado de la app actual para `clave`, creado con crear() la primera vez.
+    
+    Args:
+        clave (str): Nombre del estado en app.extensions (p.ej. 'busqueda_service')
+        crear (callable): Función sin argumentos que devuelve el estado inicial
+    
+    Returns:
+        El estado de la app del contexto actual; fuera de un contexto, uno
+        compartido por el proceso
+    """
+    extensiones = current_app.extensions if has_app_context() else _sin_app
+    estado = extensiones.get(clave)
+    if estado is None:
+        estado = extensiones[clave] = crear()
+    return estado
@@ -0,0 +1,461 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas de la aplicación en formato de exposición de Prometheus.
+
+Los contadores e histogramas se acumulan en un almacén por hilo, de modo que
+registrar una observación no toma ningún lock; los almacenes se suman al
+exportar. Con varios workers de gunicorn, si METRICAS_DIR está definido cada
+proceso vuelca periódicamente su instantánea a un archivo JSON en ese
+directorio y /metrics agrega los archivos de todos los procesos.
+"""
+
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+from app.utils.estado_app import estado_de_app
+from app.utils.monitor_sql import consultas_en_hilo
+
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+ARCHIVO_ACUMULADO = 'metricas_finalizados.json'
+
+
+def _clave(nombre, etiquetas):
+    """Clave serializable de una serie: nombre + valores de etiquetas."""
+    return json.dumps([nombre, list(etiquetas)], ensure_ascii=False)
+
+
+class _AlmacenHilo:
+    """Valores acumulados por un único hilo (sin locks)."""
+    
+    __slots__ = ('contadores', 'gauges', 'histogramas')
+    
+    def __init__(self):
+        self.contadores = {}
+        self.gauges = {}
+        self.histogramas = {}
+
+
+class Metricas:
+    """Registro de métricas con almacenes por hilo y agregación entre procesos."""
+    
+    def __init__(self, prefijo='viajes'):
+        self.prefijo = prefijo
+        self._definiciones = {}
+        self._almacenes = []
+        self._lock_almacenes = threading.Lock()
+        self._local = threading.local()
+        self._colectores = []
+        self._directorio = None
+        self._intervalo_volcado = 5
+        self._pid_volcador = None
+        self._motor = None
+    
+    # ------------------------------------------------------------------
+    # Definición y registro de valores
+    # ------------------------------------------------------------------
+    
+    def definir(self, nombre, tipo, ayuda, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        """
+        Declarar una métrica.
+        
+        Args:
+            nombre (str): Nombre sin prefijo (p.ej. 'http_peticiones_total')
+            tipo (str): 'counter', 'gauge' o 'histogram'
+            ayuda (str): Texto de HELP
+            etiquetas (tuple): Nombres de las etiquetas
+            buckets (tuple): Límites superiores del histograma
+        """
+        self._definiciones[nombre] = {
+            'tipo': tipo, 'ayuda': ayuda, 'etiquetas': tuple(etiquetas),
+            'buckets': tuple(buckets) if tipo == 'histogram' else ()
+        }
+    
+    def _almacen(self):
+        almacen = getattr(self._local, 'almacen', None)
+        if almacen is None:
+            almacen = self._local.almacen = _AlmacenHilo()
+            with self._lock_almacenes:
+                self._almacenes.append(almacen)
+        return almacen
+    
+    def incrementar(self, nombre, etiquetas=(), valor=1):
+        """Sumar `valor` a un contador (o a un gauge, con valor negativo para restar)."""
+        almacen = self._almacen()
+        destino = almacen.gauges if self._definiciones[nombre]['tipo'] == 'gauge' else almacen.contadores
+        clave = (nombre, etiquetas)
+        destino[clave] = destino.get(clave, 0) + valor
+    
+    def observar(self, nombre, etiquetas, valor):
+        """Registrar una observación en un histograma."""
+        almacen = self._almacen()
+        clave = (nombre, etiquetas)
+        serie = almacen.histogramas.get(clave)
+        buckets = self._definiciones[nombre]['buckets']
+        if serie is None:
+            # Conteos por bucket (no acumulados) + [+Inf], suma
+            serie = almacen.histogramas[clave] = [0] * (len(buckets) + 1) + [0.0]
+        for i, limite in enumerate(buckets):
+            if valor <= limite:
+                serie[i] += 1
+                break
+        else:
+            serie[len(buckets)] += 1
+        serie[-1] += valor
+    
+    def agregar_colector(self, funcion):
+        """
+        Registrar una función que al exportar devuelve valores calculados en el momento.
+        
+        La función devuelve una lista de (nombre, etiquetas, valor); el tipo sale
+        de la definición de la métrica.
+        """
+        if funcion not in self._colectores:
+            self._colectores.append(funcion)
+    
+    # ------------------------------------------------------------------
+    # Instantáneas y agregación
+    # ------------------------------------------------------------------
+    
+    def instantanea(self):
+        """Sumar los almacenes de todos los hilos y los colectores del proceso."""
+        contadores, gauges, histogramas = {}, {}, {}
+        with self._lock_almacenes:
+            almacenes = list(self._almacenes)
+        
+        for almacen in almacenes:
+            for (nombre, etiquetas), valor in list(almacen.contadores.items()):
+                clave = _clave(nombre, etiquetas)
+                contadores[clave] = contadores.get(clave, 0) + valor
+            for (nombre, etiquetas), valor in list(almacen.gauges.items()):
+                clave = _clave(nombre, etiquetas)
+                gauges[clave] = gauges.get(clave, 0) + valor
+            for (nombre, etiquetas), serie in list(almacen.histogramas.items()):
+                clave = _clave(nombre, etiquetas)
+                actual = histogramas.get(clave)
+                histogramas[clave] = list(serie) if actual is None else [a + b for a, b in zip(actual, serie)]
+        
+        for colector in self._colectores:
+            try:
+                for nombre, etiquetas, valor in colector():
+                    destino = gauges if self._definiciones[nombre]['tipo'] == 'gauge' else contadores
+                    destino[_clave(nombre, etiquetas)] = valor
+            except Exception as e:
+                print(f"⚠️  Error en colector de métricas: {e}")
+        
+        return {'pid': os.getpid(), 'contadores': contadores, 'gauges': gauges, 'histogramas': histogramas}
+    
+    def configurar_multiproceso(self, directorio, intervalo_segundos=None):
+        """Activar el volcado de instantáneas a `directorio` para agregar entre workers."""
+        os.makedirs(directorio, exist_ok=True)
+        self._directorio = directorio
+        self._intervalo_volcado = intervalo_segundos or int(os.environ.get('METRICAS_INTERVALO', 5))
+    
+    def volcar(self):
+        """Escribir la instantánea de este proceso (escritura atómica)."""
+        if not self._directorio:
+            return
+        ruta = os.path.join(self._directorio, f'metricas_{os.getpid()}.json')
+        temporal = ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(self.instantanea(), archivo)
+        os.replace(temporal, ruta)
+    
+    def asegurar_volcador(self):
+        """Iniciar el hilo de volcado en este proceso (los hilos no sobreviven al fork)."""
+        if not self._directorio or self._pid_volcador == os.getpid():
+            return
+        self._pid_volcador = os.getpid()
+        
+        def ciclo():
+            while True:
+                time.sleep(self._intervalo_volcado)
+                try:
+                    self.volcar()
+                except Exception as e:
+                    print(f"⚠️  Error volcando métricas: {e}")
+        
+        threading.Thread(target=ciclo, name='metricas-volcado', daemon=True).start()
+    
+    def proceso_terminado(self, pid):
+        """
+        Acumular los contadores de un worker que terminó y borrar su archivo.
+        
+        Se llama desde el master de gunicorn (child_exit); los gauges del worker
+        terminado se descartan.
+        """
+        if not self._directorio:
+            return
+        ruta = os.path.join(self._directorio, f'metricas_{pid}.json')
+        if not os.path.exists(ruta):
+            return
+        ruta_acumulado = os.path.join(self._directorio, ARCHIVO_ACUMULADO)
+        partes = [self._leer(ruta)]
+        if os.path.exists(ruta_acumulado):
+            partes.append(self._leer(ruta_acumulado))
+        acumulado = self._sumar(partes, incluir_gauges=False)
+        
+        temporal = ruta_acumulado + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(acumulado, archivo)
+        os.replace(temporal, ruta_acumulado)
+        os.remove(ruta)
+    
+    def limpiar_directorio(self):
+        """Borrar las instantáneas de una ejecución anterior (al arrancar el master)."""
+        if not self._directorio:
+            return
+        for nombre in os.listdir(self._directorio):
+            if nombre.startswith('metricas_') and nombre.endswith('.json'):
+                os.remove(os.path.join(self._directorio, nombre))
+    
+    @staticmethod
+    def _leer(ruta):
+        with open(ruta, encoding='utf-8') as archivo:
+            return json.load(archivo)
+    
+    @staticmethod
+    def _proceso_vivo(pid):
+        if pid is None:
+            return False
+        try:
+            os.kill(pid, 0)
+            return True
+        except OSError:
+            return False
+    
+    @staticmethod
+    def _sumar(instantaneas, incluir_gauges=True):
+        total = {'contadores': {}, 'gauges': {}, 'histogramas': {}}
+        for datos in instantaneas:
+            for clave, valor in datos.get('contadores', {}).items():
+                total['contadores'][clave] = total['contadores'].get(clave, 0) + valor
+            if incluir_gauges:
+                for clave, valor in datos.get('gauges', {}).items():
+                    total['gauges'][clave] = total['gauges'].get(clave, 0) + valor
+            for clave, serie in datos.get('histogramas', {}).items():
+                actual = total['histogramas'].get(clave)
+                total['histogramas'][clave] = list(serie) if actual is None else [a + b for a, b in zip(actual, serie)]
+        return total
+    
+    def agregado(self):
+        """Instantánea de todos los procesos (o solo de este, sin METRICAS_DIR)."""
+        propia = self.instantanea()
+        if not self._directorio:
+            return propia
+        
+        instantaneas = [propia]
+        for nombre in os.listdir(self._directorio):
+            if not (nombre.startswith('metricas_') and nombre.endswith('.json')):
+                continue
+            if nombre == f'metricas_{os.getpid()}.json':
+                continue
+            try:
+                datos = self._leer(os.path.join(self._directorio, nombre))
+            except (OSError, ValueError):
+                continue  # Archivo a medio escribir o borrado entre listdir y open
+            if not self._proceso_vivo(datos.get('pid')):
+                datos['gauges'] = {}
+            instantaneas.append(datos)
+        return self._sumar(instantaneas)
+    
+    # ------------------------------------------------------------------
+    # Exposición
+    # ------------------------------------------------------------------
+    
+    def exportar(self):
+        """
+        Texto en formato de exposición de Prometheus (versión 0.0.4).
+        
+        Returns:
+            str: Métricas de todos los procesos
+        """
+        datos = self.agregado()
+        series = {}
+        for tipo in ('contadores', 'gauges', 'histogramas'):
+            for clave, valor in datos[tipo].items():
+                nombre, etiquetas = json.loads(clave)
+                series.setdefault(nombre, []).append((tuple(etiquetas), valor))
+        
+        lineas = []
+        for nombre in sorted(series):
+            definicion = self._definiciones.get(nombre)
+            if definicion is None:
+                continue
+            completo = f'{self.prefijo}_{nombre}'
+            lineas.append(f'# HELP {completo} {definicion["ayuda"]}')
+            lineas.append(f'# TYPE {completo} {definicion["tipo"]}')
+            for etiquetas, valor in sorted(series[nombre]):
+                pares = list(zip(definicion['etiquetas'], etiquetas))
+                if definicion['tipo'] != 'histogram':
+                    lineas.append(f'{completo}{_formatear_etiquetas(pares)} {_formatear_valor(valor)}')
+                    continue
+                acumulado = 0
+                for limite, cantidad in zip(definicion['buckets'] + ('+Inf',), valor[:-1]):
+                    acumulado += cantidad
+                    le = limite if limite == '+Inf' else _formatear_valor(limite)
+                    lineas.append(f'{completo}_bucket{_formatear_etiquetas(pares + [("le", le)])} {acumulado}')
+                lineas.append(f'{completo}_sum{_formatear_etiquetas(pares)} {_formatear_valor(valor[-1])}')
+                lineas.append(f'{completo}_count{_formatear_etiquetas(pares)} {acumulado}')
+        return '\n'.join(lineas) + '\n'
+    
+    # ------------------------------------------------------------------
+    # Integración con Flask y SQLAlchemy
+    # ------------------------------------------------------------------
+    
+    def init_app(self, app, db):
+        """Registrar las métricas HTTP, del pool de conexiones y de cachés."""
+        directorio = app.config.get('METRICAS_DIR', os.environ.get('METRICAS_DIR'))
+        if directorio:
+            self.configurar_multiproceso(directorio)
+        
+        app.before_request(self._iniciar_peticion)
+        app.after_request(self._registrar_estado)
+        app.teardown_request(self._finalizar_peticion)
+        
+        # El engine se crea sin conectar; el pool se lee en cada exportación
+        # porque post_fork lo reemplaza en cada worker. Cada app tiene el suyo
+        # (fuera de un contexto se informa el de la última app)
+        with app.app_context():
+            self._motor = db.engine
+        app.extensions['metricas'] = {'motor': self._motor}
+        self.agregar_colector(self._estadisticas_pool)
+        self.agregar_colector(_estadisticas_caches_memoria)
+    
+    def _estadisticas_pool(self):
+        return _estadisticas_pool(estado_de_app('metricas', lambda: {'motor': self._motor})['motor'])
+    
+    def _iniciar_peticion(self):
+        self.asegurar_volcador()
+        g.inicio_metricas = time.perf_counter()
+        self.incrementar('http_peticiones_en_curso', ())
+    
+    def _registrar_estado(self, response):
+        g.estado_metricas = response.status_code
+        return response
+    
+    def _finalizar_peticion(self, exc=None):
+        inicio = g.pop('inicio_metricas', None)
+        if inicio is None:
+            return
+        self.incrementar('http_peticiones_en_curso', (), -1)
+        endpoint = request.endpoint or 'sin_ruta'
+        estado = str(g.pop('estado_metricas', 500))
+        self.incrementar('http_peticiones_total', (endpoint, request.method, estado))
+        self.observar('http_duracion_segundos', (endpoint,), time.perf_counter() - inicio)
+
+
+def _formatear_valor(valor):
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor)) if abs(valor) < 1e15 else repr(valor)
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+def _formatear_etiquetas(pares):
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares) + '}'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _estadisticas_pool(motor):
+    """Gauges del pool de conexiones del engine (solo los pools con tamaño fijo)."""
+    pool = motor.pool
+    valores = []
+    for nombre, atributo in (('db_pool_tamano', 'size'), ('db_pool_en_uso', 'checkedout'),
+                             ('db_pool_overflow', 'overflow'), ('db_pool_disponibles', 'checkedin')):
+        funcion = getattr(pool, atributo, None)
+        if funcion is not None:
+            valores.append((nombre, (), funcion()))
+    return valores
+
+
+def _estadisticas_caches_memoria():
+    """Aciertos y fallos de las cachés lru del proceso."""
+    from app.utils.zonas_horarias import obtener_zona_horaria
+    from app.utils.registro_consultas import normalizar_sentencia
+    
+    valores = []
+    for nombre, funcion in (('zonas_horarias', obtener_zona_horaria),
+                            ('huellas_sql', normalizar_sentencia)):
+        info = funcion.cache_info()
+        valores.append(('cache_aciertos_total', (nombre,), info.hits))
+        valores.append(('cache_fallos_total', (nombre,), info.misses))
+    return valores
+
+
+# Instancia global de métricas
+metricas = Metricas()
+
+metricas.definir('http_peticiones_total', 'counter', 'Peticiones HTTP atendidas',
+                 ('endpoint', 'metodo', 'estado'))
+metricas.definir('http_duracion_segundos', 'histogram', 'Latencia de las peticiones HTTP por endpoint',
+                 ('endpoint',))
+metricas.definir('http_peticiones_en_curso', 'gauge', 'Peticiones HTTP en curso')
+metricas.definir('db_pool_tamano', 'gauge', 'Conexiones persistentes configuradas en el pool')
+metricas.definir('db_pool_en_uso', 'gauge', 'Conexiones del pool en uso')
+metricas.definir('db_pool_overflow', 'gauge', 'Conexiones de overflow abiertas (negativo: capacidad sin usar)')
+metricas.definir('db_pool_disponibles', 'gauge', 'Conexiones del pool libres')
+metricas.definir('db_pool_checkouts_total', 'counter', 'Conexiones obtenidas del pool')
+metricas.definir('cache_aciertos_total', 'counter', 'Aciertos de caché', ('cache',))
+metricas.definir('cache_fallos_total', 'counter', 'Fallos de caché', ('cache',))
+metricas.definir('servicio_duracion_segundos', 'histogram', 'Duración de los métodos de los servicios',
+                 ('servicio', 'metodo'))
+metricas.definir('servicio_consultas_total', 'counter', 'Consultas SQL ejecutadas por los métodos de los servicios',
+                 ('servicio', 'metodo'))
+
+
+@event.listens_for(Pool, 'checkout')
+def _contar_checkout(conexion, registro, proxy):
+    metricas.incrementar('db_pool_checkouts_total', ())
+
+
+def medir_servicio(nombre_servicio):
+    """
+    Decorador de clase: mide la duración y las consultas SQL de cada método
+    público del servicio.
+    
+    Los métodos init_* (configuración) y los privados no se miden. Las
+    consultas de un método incluyen las de los métodos que invoca.
+    """
+    def decorador(cls):
+        for nombre, atributo in list(vars(cls).items()):
+            if nombre.startswith('_') or nombre.startswith('init_') or not inspect.isfunction(atributo):
+                continue
+            setattr(cls, nombre, _medido(atributo, nombre_servicio, nombre))
+        return cls
+    return decorador
+
+
+def _medido(funcion, nombre_servicio, nombre_metodo):
+    etiquetas = (nombre_servicio, nombre_metodo)
+    
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        consultas = consultas_en_hilo()
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            metricas.observar('servicio_duracion_segundos', etiquetas, time.perf_counter() - inicio)
+            metricas.incrementar('servicio_consultas_total', etiquetas, consultas_en_hilo() - consultas)
+    return envoltura
+
+
+def medir_metodo(nombre_servicio, nombre_metodo=None):
+    """Decorador de función equivalente a medir_servicio, para métodos o funciones sueltas."""
+    def decorador(funcion):
+        return _medido(funcion, nombre_servicio, nombre_metodo or funcion.__name__)
+    return decorador
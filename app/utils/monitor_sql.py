@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+Conteo y tiempo de consultas SQL por petición.
+
+Escucha los eventos before/after_cursor_execute de SQLAlchemy para contar las
+consultas y acumular el tiempo de base de datos de cada petición. Agrega el
+header Server-Timing (db, render, total), registra las peticiones lentas y
+permite declarar un presupuesto de consultas por ruta que hace fallar los
+tests cuando se supera.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config.settings import Config
+
+
+class PresupuestoConsultasExcedido(AssertionError):
+    """Una ruta o bloque de código ejecutó más consultas de las declaradas."""
+
+
+class ContadorConsultas:
+    """Acumula las consultas ejecutadas mientras está activo en el hilo actual."""
+    
+    def __init__(self, registrar_sentencias=False):
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.tiempo_render = 0.0
+        self.registrar_sentencias = registrar_sentencias
+        self.sentencias = []
+    
+    def registrar(self, sentencia, duracion):
+        """Sumar una consulta ejecutada."""
+        self.consultas += 1
+        self.tiempo_db += duracion
+        if self.registrar_sentencias:
+            self.sentencias.append(sentencia)
+    
+    def detalle(self):
+        """Texto con las sentencias registradas, para mensajes de error."""
+        return '\n'.join(f'  {i}. {s}' for i, s in enumerate(self.sentencias, 1))
+
+
+# Contadores activos por hilo: cada petición (y cada limite_consultas) apila el suyo
+_local = threading.local()
+_listeners_registrados = False
+
+# Funciones (sentencia, duracion) que reciben todas las consultas del proceso
+_observadores = []
+
+
+def _contadores_activos():
+    if not hasattr(_local, 'contadores'):
+        _local.contadores = []
+    return _local.contadores
+
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('inicio_consultas', []).append(time.perf_counter())
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get('inicio_consultas')
+    if not inicios:
+        return
+    duracion = time.perf_counter() - inicios.pop()
+    _local.total = getattr(_local, 'total', 0) + 1
+    for contador in _contadores_activos():
+        contador.registrar(statement, duracion)
+    for observador in _observadores:
+        observador(statement, duracion)
+
+
+def consultas_en_hilo():
+    """Total de consultas ejecutadas por el hilo actual (restar dos lecturas para medir un tramo)."""
+    return getattr(_local, 'total', 0)
+
+
+def registrar_listeners():
+    """Escuchar la ejecución de cursores en todos los engines (una sola vez por proceso)."""
+    global _listeners_registrados
+    if _listeners_registrados:
+        return
+    event.listen(Engine, 'before_cursor_execute', _antes_de_ejecutar)
+    event.listen(Engine, 'after_cursor_execute', _despues_de_ejecutar)
+    _listeners_registrados = True
+
+
+def agregar_observador(funcion):
+    """Recibir cada consulta ejecutada como funcion(sentencia, duracion_segundos)."""
+    registrar_listeners()
+    if funcion not in _observadores:
+        _observadores.append(funcion)
+
+
+@contextmanager
+def contar_consultas(registrar_sentencias=False):
+    """
+    Contar las consultas ejecutadas dentro del bloque.
+    
+    Uso:
+        with contar_consultas() as contador:
+            viaje_service.obtener_estadisticas_viaje(1)
+        print(contador.consultas, contador.tiempo_db)
+    """
+    registrar_listeners()
+    contador = ContadorConsultas(registrar_sentencias)
+    _contadores_activos().append(contador)
+    try:
+        yield contador
+    finally:
+        _contadores_activos().remove(contador)
+
+
+@contextmanager
+def limite_consultas(maximo):
+    """
+    Fallar si el bloque ejecuta más de `maximo` consultas (pensado para tests).
+    
+    Raises:
+        PresupuestoConsultasExcedido: Con la lista de sentencias ejecutadas
+    """
+    with contar_consultas(registrar_sentencias=True) as contador:
+        yield contador
+    if contador.consultas > maximo:
+        raise PresupuestoConsultasExcedido(
+            f"Se ejecutaron {contador.consultas} consultas (máximo {maximo}):\n{contador.detalle()}"
+        )
+
+
+def presupuesto_consultas(maximo):
+    """
+    Declarar el máximo de consultas que una ruta puede ejecutar.
+    
+    Con SQL_PRESUPUESTO_ESTRICTO (por defecto en TESTING) superar el presupuesto
+    lanza PresupuestoConsultasExcedido; si no, solo se registra un aviso.
+    """
+    def decorador(funcion):
+        funcion.presupuesto_consultas = maximo
+        return funcion
+    return decorador
+
+
+class MonitorSQL:
+    """Middleware que mide consultas, tiempo de base de datos y de render por petición."""
+    
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Registrar los hooks de petición y las señales de render en la app."""
+        app.config.setdefault('SQL_UMBRAL_PETICION_MS', Config.get_umbral_peticion_lenta_ms())
+        app.config.setdefault('SQL_UMBRAL_CONSULTAS', Config.get_umbral_consultas_peticion())
+        app.config.setdefault('SQL_PRESUPUESTO_ESTRICTO', app.config.get('TESTING', False))
+        
+        registrar_listeners()
+        app.before_request(self._iniciar_peticion)
+        app.after_request(self._finalizar_peticion)
+        app.teardown_request(self._limpiar_peticion)
+        before_render_template.connect(self._antes_de_render, app)
+        template_rendered.connect(self._despues_de_render, app)
+    
+    def _iniciar_peticion(self):
+        g.inicio_peticion = time.perf_counter()
+        g.contador_consultas = ContadorConsultas()
+        _contadores_activos().append(g.contador_consultas)
+    
+    def _antes_de_render(self, sender, template, context, **extra):
+        g.inicio_render = time.perf_counter()
+    
+    def _despues_de_render(self, sender, template, context, **extra):
+        contador = g.get('contador_consultas')
+        inicio = g.pop('inicio_render', None)
+        if contador is not None and inicio is not None:
+            contador.tiempo_render += time.perf_counter() - inicio
+    
+    def _finalizar_peticion(self, response):
+        contador = g.get('contador_consultas')
+        if contador is None:
+            return response
+        
+        total_ms = (time.perf_counter() - g.inicio_peticion) * 1000
+        db_ms = contador.tiempo_db * 1000
+        render_ms = contador.tiempo_render * 1000
+        
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={db_ms:.1f};desc="{contador.consultas} consultas", '
+            f'render;dur={render_ms:.1f}, total;dur={total_ms:.1f}'
+        )
+        response.headers['X-Consultas-SQL'] = str(contador.consultas)
+        
+        config = current_app.config
+        if total_ms > config['SQL_UMBRAL_PETICION_MS'] or contador.consultas > config['SQL_UMBRAL_CONSULTAS']:
+            print(f"🐢 Petición lenta {request.method} {request.path}: {total_ms:.1f} ms, "
+                  f"{contador.consultas} consultas (db {db_ms:.1f} ms, render {render_ms:.1f} ms)")
+        
+        self._verificar_presupuesto(contador, config)
+        return response
+    
+    def _verificar_presupuesto(self, contador, config):
+        vista = current_app.view_functions.get(request.endpoint)
+        maximo = getattr(vista, 'presupuesto_consultas', None)
+        if maximo is None or contador.consultas <= maximo:
+            return
+        
+        mensaje = (f"{request.endpoint} ejecutó {contador.consultas} consultas "
+                   f"(presupuesto {maximo})")
+        if config['SQL_PRESUPUESTO_ESTRICTO']:
+            raise PresupuestoConsultasExcedido(mensaje)
+        print(f"⚠️  Presupuesto de consultas excedido: {mensaje}")
+    
+    def _limpiar_peticion(self, exc=None):
+        contador = g.pop('contador_consultas', None)
+        if contador is not None and contador in _contadores_activos():
+            _contadores_activos().remove(contador)
+
+
+# Instancia global del middleware
+monitor_sql = MonitorSQL()
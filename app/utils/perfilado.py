@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Perfilado bajo demanda de peticiones con cProfile.
+
+Una petición se perfila si trae el header X-Perfilar o si hay un muestreo
+activado desde /admin/perfilado. El perfil se guarda en disco (formato pstats
+y un resumen en texto) para analizarlo después con pstats o snakeviz. Sin
+header ni muestreo activo el costo por petición es una lectura de header.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import tempfile
+import threading
+from datetime import datetime
+
+from flask import current_app, g, request
+
+from app.utils.metricas import metricas
+
+
+HEADER_PERFILAR = 'X-Perfilar'
+
+
+class Perfilador:
+    """Captura perfiles cProfile de peticiones individuales."""
+    
+    def __init__(self, directorio=None, max_perfiles=50):
+        """
+        Args:
+            directorio (str): Carpeta donde guardar los perfiles
+            max_perfiles (int): Perfiles a conservar; se borran los más antiguos
+        """
+        self.directorio = directorio or os.environ.get(
+            'PERFILES_DIR', os.path.join(tempfile.gettempdir(), 'viajes_perfiles')
+        )
+        self.max_perfiles = max_perfiles
+        self._muestreo = 0.0
+        self._restantes = 0
+        self._endpoint = None
+        self._lock = threading.Lock()
+        # cProfile admite un solo perfilador activo a la vez por proceso
+        self._captura = threading.Lock()
+    
+    def init_app(self, app):
+        """Registrar los hooks de petición en la app."""
+        app.before_request(self._iniciar_peticion)
+        app.after_request(self._agregar_header)
+        app.teardown_request(self._finalizar_peticion)
+    
+    # ------------------------------------------------------------------
+    # Muestreo
+    # ------------------------------------------------------------------
+    
+    def activar_muestreo(self, peticiones=10, muestreo=1.0, endpoint=None):
+        """
+        Perfilar las próximas peticiones.
+        
+        Args:
+            peticiones (int): Cantidad máxima de perfiles a capturar
+            muestreo (float): Probabilidad (0-1) de perfilar cada petición
+            endpoint (str): Limitar a un endpoint (p.ej. 'viajes.ver_viaje')
+        """
+        with self._lock:
+            self._restantes = max(0, int(peticiones))
+            self._muestreo = min(max(float(muestreo), 0.0), 1.0)
+            self._endpoint = endpoint or None
+    
+    def desactivar_muestreo(self):
+        """Dejar de perfilar peticiones por muestreo."""
+        with self._lock:
+            self._restantes = 0
+    
+    def estado(self):
+        """Configuración actual del muestreo."""
+        return {
+            'activo': self._restantes > 0,
+            'restantes': self._restantes,
+            'muestreo': self._muestreo,
+            'endpoint': self._endpoint,
+            'directorio': self.directorio
+        }
+    
+    def _header_autorizado(self):
+        valor = request.headers.get(HEADER_PERFILAR)
+        if not valor:
+            return False
+        token = os.environ.get('PERFILADO_TOKEN')
+        if token:
+            return valor == token
+        # Sin token configurado el header solo se acepta en desarrollo y tests
+        return current_app.debug or current_app.testing
+    
+    def _tomar_muestra(self):
+        if self._restantes <= 0:
+            return False
+        if self._endpoint and request.endpoint != self._endpoint:
+            return False
+        if random.random() >= self._muestreo:
+            return False
+        with self._lock:
+            if self._restantes <= 0:
+                return False
+            self._restantes -= 1
+            return True
+    
+    # ------------------------------------------------------------------
+    # Hooks de petición
+    # ------------------------------------------------------------------
+    
+    def _iniciar_peticion(self):
+        if not (self._header_autorizado() or self._tomar_muestra()):
+            return
+        if not self._captura.acquire(blocking=False):
+            return  # Ya hay otra petición perfilándose
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            self._captura.release()
+            return
+        g.perfil = perfil
+        g.perfil_archivo = self._nombre_archivo()
+    
+    def _agregar_header(self, response):
+        if 'perfil_archivo' in g:
+            response.headers['X-Perfil'] = g.perfil_archivo
+        return response
+    
+    def _finalizar_peticion(self, exc=None):
+        perfil = g.pop('perfil', None)
+        if perfil is None:
+            return
+        try:
+            perfil.disable()
+        finally:
+            self._captura.release()
+        try:
+            self._guardar(perfil, g.pop('perfil_archivo'))
+        except OSError as e:
+            print(f"⚠️  No se pudo guardar el perfil: {e}")
+    
+    # ------------------------------------------------------------------
+    # Archivos de perfil
+    # ------------------------------------------------------------------
+    
+    def _nombre_archivo(self):
+        endpoint = re.sub(r'[^\w.-]', '_', request.endpoint or 'sin_ruta')
+        marca = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        return f'{marca}_{endpoint}_{os.getpid()}'
+    
+    def _guardar(self, perfil, nombre):
+        """Guardar el perfil en formato pstats (.prof) y un resumen en texto (.txt)."""
+        os.makedirs(self.directorio, exist_ok=True)
+        base = os.path.join(self.directorio, nombre)
+        perfil.dump_stats(base + '.prof')
+        
+        salida = io.StringIO()
+        estadisticas = pstats.Stats(perfil, stream=salida)
+        estadisticas.sort_stats('cumulative').print_stats(40)
+        with open(base + '.txt', 'w', encoding='utf-8') as archivo:
+            archivo.write(salida.getvalue())
+        
+        self._rotar()
+    
+    def _rotar(self):
+        perfiles = sorted(n for n in os.listdir(self.directorio) if n.endswith('.prof'))
+        for nombre in perfiles[:-self.max_perfiles]:
+            for extension in ('.prof', '.txt'):
+                ruta = os.path.join(self.directorio, nombre[:-len('.prof')] + extension)
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+    
+    def listar_perfiles(self):
+        """Perfiles guardados, del más reciente al más antiguo."""
+        if not os.path.isdir(self.directorio):
+            return []
+        perfiles = []
+        for nombre in sorted(os.listdir(self.directorio), reverse=True):
+            if nombre.endswith('.prof'):
+                ruta = os.path.join(self.directorio, nombre)
+                perfiles.append({'nombre': nombre[:-len('.prof')], 'bytes': os.path.getsize(ruta)})
+        return perfiles
+    
+    def ruta_perfil(self, nombre, extension='.txt'):
+        """Ruta de un perfil guardado, o None si no existe o el nombre no es válido."""
+        if not re.fullmatch(r'[\w.-]+', nombre) or extension not in ('.prof', '.txt'):
+            return None
+        ruta = os.path.join(self.directorio, nombre + extension)
+        return ruta if os.path.exists(ruta) else None
+
+
+def resumen_servicios():
+    """
+    Tiempo y consultas por método de servicio, a partir de las métricas.
+    
+    Returns:
+        list: Diccionarios con servicio, metodo, llamadas, total_ms, promedio_ms,
+            consultas y consultas_por_llamada, ordenados por tiempo total
+    """
+    datos = metricas.agregado()
+    consultas = {}
+    for clave, valor in datos['contadores'].items():
+        nombre, etiquetas = json.loads(clave)
+        if nombre == 'servicio_consultas_total':
+            consultas[tuple(etiquetas)] = valor
+    
+    filas = []
+    for clave, serie in datos['histogramas'].items():
+        nombre, etiquetas = json.loads(clave)
+        if nombre != 'servicio_duracion_segundos':
+            continue
+        llamadas = sum(serie[:-1])
+        total_consultas = consultas.get(tuple(etiquetas), 0)
+        filas.append({
+            'servicio': etiquetas[0],
+            'metodo': etiquetas[1],
+            'llamadas': llamadas,
+            'total_ms': round(serie[-1] * 1000, 3),
+            'promedio_ms': round(serie[-1] / llamadas * 1000, 3) if llamadas else 0.0,
+            'consultas': total_consultas,
+            'consultas_por_llamada': round(total_consultas / llamadas, 2) if llamadas else 0.0
+        })
+    filas.sort(key=lambda f: f['total_ms'], reverse=True)
+    return filas
+
+
+# Instancia global del perfilador
+perfilador = Perfilador()
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Registro de consultas SQL agrupadas por huella.
+
+Cada sentencia se normaliza (literales, parámetros y listas IN reemplazados
+por "?") y se acumulan por huella la cantidad de ejecuciones, el tiempo total,
+promedio, máximo y p95. La estructura está acotada en memoria y puede volcarse
+periódicamente a un archivo JSONL.
+"""
+
+import json
+import re
+import threading
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+
+from config.settings import Config
+
+
+_LITERAL_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_PARAMETRO = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\$\d+")
+_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LISTA_IN = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_FILAS_VALUES = re.compile(r'(\(\?(?:, \?)*\))(?:, \1)+')
+_ESPACIOS = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=2048)
+def normalizar_sentencia(sentencia):
+    """
+    Obtener la huella de una sentencia SQL.
+    
+    Args:
+        sentencia (str): SQL tal como lo envía SQLAlchemy al driver
+    
+    Returns:
+        str: SQL sin literales ni parámetros, con espacios colapsados
+    """
+    huella = _LITERAL_TEXTO.sub('?', sentencia)
+    huella = _PARAMETRO.sub('?', huella)
+    huella = _NUMERO.sub('?', huella)
+    huella = _ESPACIOS.sub(' ', huella).strip()
+    huella = _LISTA_IN.sub('IN (?)', huella)
+    return _FILAS_VALUES.sub(r'\1', huella)
+
+
+def _percentil(valores, p):
+    """Percentil p (0-100) de una lista ya ordenada."""
+    if not valores:
+        return 0.0
+    indice = min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))
+    return valores[indice]
+
+
+class _EstadisticaHuella:
+    """Acumulados de una huella; guarda solo las últimas duraciones para el p95."""
+    
+    __slots__ = ('consultas', 'total', 'maximo', 'lentas', 'muestras', 'ultima_lenta')
+    
+    def __init__(self, max_muestras):
+        self.consultas = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.lentas = 0
+        self.muestras = deque(maxlen=max_muestras)
+        self.ultima_lenta = None
+
+
+class RegistroConsultas:
+    """Agrega las consultas del proceso por huella normalizada."""
+    
+    def __init__(self, max_huellas=500, max_muestras=256, umbral_lenta_ms=None):
+        """
+        Args:
+            max_huellas (int): Huellas distintas a conservar; al superarlo se
+                descarta la de menor tiempo total
+            max_muestras (int): Duraciones recientes por huella para calcular el p95
+            umbral_lenta_ms (float): Consultas más lentas se cuentan como lentas
+        """
+        self.max_huellas = max_huellas
+        self.max_muestras = max_muestras
+        self.umbral_lenta = (umbral_lenta_ms if umbral_lenta_ms is not None
+                             else Config.get_umbral_consulta_lenta_ms()) / 1000
+        self._huellas = {}
+        self._lock = threading.Lock()
+        self._desde = datetime.utcnow()
+        self._volcador = None
+        self._detener = threading.Event()
+    
+    def init_app(self, app):
+        """Registrar el registro como observador de todas las consultas."""
+        from app.utils.monitor_sql import agregar_observador
+        agregar_observador(self.registrar)
+    
+    def registrar(self, sentencia, duracion):
+        """
+        Acumular una consulta ejecutada.
+        
+        Args:
+            sentencia (str): SQL ejecutado
+            duracion (float): Duración en segundos
+        """
+        huella = normalizar_sentencia(sentencia)
+        with self._lock:
+            estadistica = self._huellas.get(huella)
+            if estadistica is None:
+                if len(self._huellas) >= self.max_huellas:
+                    menor = min(self._huellas, key=lambda h: self._huellas[h].total)
+                    del self._huellas[menor]
+                estadistica = self._huellas[huella] = _EstadisticaHuella(self.max_muestras)
+            
+            estadistica.consultas += 1
+            estadistica.total += duracion
+            estadistica.muestras.append(duracion)
+            if duracion > estadistica.maximo:
+                estadistica.maximo = duracion
+            if duracion >= self.umbral_lenta:
+                estadistica.lentas += 1
+                estadistica.ultima_lenta = datetime.utcnow().isoformat()
+    
+    def resumen(self, orden='total', limite=50):
+        """
+        Huellas ordenadas por el criterio indicado.
+        
+        Args:
+            orden (str): 'total', 'consultas', 'promedio', 'p95', 'maximo' o 'lentas'
+            limite (int): Máximo de huellas a devolver
+        
+        Returns:
+            list: Diccionarios con huella, consultas, total_ms, promedio_ms,
+                p95_ms, maximo_ms, lentas y ultima_lenta
+        """
+        with self._lock:
+            copia = [(h, e.consultas, e.total, e.maximo, e.lentas, e.ultima_lenta, sorted(e.muestras))
+                     for h, e in self._huellas.items()]
+        
+        filas = []
+        for huella, consultas, total, maximo, lentas, ultima_lenta, muestras in copia:
+            filas.append({
+                'huella': huella,
+                'consultas': consultas,
+                'total_ms': round(total * 1000, 3),
+                'promedio_ms': round(total / consultas * 1000, 3),
+                'p95_ms': round(_percentil(muestras, 95) * 1000, 3),
+                'maximo_ms': round(maximo * 1000, 3),
+                'lentas': lentas,
+                'ultima_lenta': ultima_lenta,
+            })
+        
+        clave = {'total': 'total_ms', 'promedio': 'promedio_ms', 'p95': 'p95_ms',
+                 'maximo': 'maximo_ms'}.get(orden, orden)
+        if not filas or clave not in filas[0]:
+            clave = 'total_ms'
+        filas.sort(key=lambda f: f[clave], reverse=True)
+        return filas[:limite]
+    
+    @property
+    def desde(self):
+        """Momento desde el que se acumulan las estadísticas."""
+        return self._desde
+    
+    def reiniciar(self):
+        """Descartar las estadísticas acumuladas."""
+        with self._lock:
+            self._huellas = {}
+            self._desde = datetime.utcnow()
+    
+    def volcar(self, ruta, limite=100):
+        """
+        Agregar una línea JSON con el resumen actual al archivo indicado.
+        
+        Returns:
+            int: Cantidad de huellas escritas
+        """
+        filas = self.resumen(limite=limite)
+        linea = {
+            'fecha': datetime.utcnow().isoformat(),
+            'desde': self._desde.isoformat(),
+            'huellas': filas,
+        }
+        with open(ruta, 'a', encoding='utf-8') as archivo:
+            archivo.write(json.dumps(linea, ensure_ascii=False) + '\n')
+        return len(filas)
+    
+    def iniciar_volcado(self, ruta, intervalo_segundos=300):
+        """
+        Iniciar un hilo en segundo plano que vuelca el resumen cada intervalo.
+        
+        Returns:
+            bool: True si el volcado se inició
+        """
+        if self._volcador and self._volcador.is_alive():
+            return False
+        
+        self._detener.clear()
+        
+        def ciclo():
+            while not self._detener.wait(intervalo_segundos):
+                try:
+                    self.volcar(ruta)
+                except Exception as e:
+                    print(f"⚠️  Error volcando el registro de consultas: {e}")
+        
+        self._volcador = threading.Thread(target=ciclo, name='registro-consultas', daemon=True)
+        self._volcador.start()
+        print(f"📝 Registro de consultas: volcado cada {intervalo_segundos}s en {ruta}")
+        return True
+    
+    def detener_volcado(self):
+        """Detener el hilo de volcado."""
+        self._detener.set()
+        if self._volcador:
+            self._volcador.join(timeout=5)
+        self._volcador = None
+
+
+# Instancia global del registro
+registro_consultas = RegistroConsultas()
@@ -0,0 +1,142 @@
+"""
+Serialización JSON de las respuestas de la API con backend intercambiable
+"""
+
+import dataclasses
+import json
+import os
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import inspect
+from sqlalchemy.exc import NoInspectionAvailable
+
+try:
+    import orjson
+except ImportError:  # Dependencia opcional: sin ella se usa json de la biblioteca estándar
+    orjson = None
+
+
+BACKENDS = ('orjson', 'json') if orjson else ('json',)
+
+# Columnas por clase de modelo (inspect() es caro para hacerlo en cada objeto)
+_COLUMNAS_MODELO = {}
+
+
+def backend_por_defecto():
+    """Backend elegido con JSON_BACKEND (orjson si está instalado y no se indica otro)."""
+    pedido = os.environ.get('JSON_BACKEND', '').lower()
+    if pedido in BACKENDS:
+        return pedido
+    if pedido:
+        print(f"⚠️  JSON_BACKEND={pedido} no está disponible, usando {BACKENDS[0]}")
+    return BACKENDS[0]
+
+
+def convertir(valor):
+    """
+    Convertir a un tipo JSON los valores que el encoder no conoce.
+    
+    - date, datetime, time: ISO 8601
+    - timedelta: segundos (float)
+    - Decimal: float
+    - dataclasses (p.ej. las lecturas de app.models.lecturas) y SimpleNamespace
+      (las instantáneas de viajes): diccionario de sus campos
+    - instancias de modelos: diccionario de sus columnas (sin relaciones)
+    - set, frozenset: lista
+    
+    orjson ya serializa fechas, horas y dataclasses por su cuenta y solo
+    llama a esta función para el resto.
+    
+    Raises:
+        TypeError: Si el valor no tiene una representación JSON conocida
+    """
+    if isinstance(valor, (date, datetime, time)):
+        return valor.isoformat()
+    if isinstance(valor, timedelta):
+        return valor.total_seconds()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if dataclasses.is_dataclass(valor) and not isinstance(valor, type):
+        return {campo.name: getattr(valor, campo.name) for campo in dataclasses.fields(valor)}
+    if isinstance(valor, SimpleNamespace):
+        return vars(valor)
+    if isinstance(valor, (set, frozenset)):
+        return list(valor)
+    if isinstance(valor, uuid.UUID):
+        return str(valor)
+    if hasattr(valor, '__html__'):
+        return str(valor.__html__())
+    columnas = _COLUMNAS_MODELO.get(type(valor))
+    if columnas is None:
+        try:
+            mapper = inspect(valor).mapper
+        except (NoInspectionAvailable, AttributeError):
+            raise TypeError(f'{type(valor).__name__} no es serializable a JSON') from None
+        columnas = _COLUMNAS_MODELO[type(valor)] = tuple(a.key for a in mapper.column_attrs)
+    return {columna: getattr(valor, columna) for columna in columnas}
+
+
+def a_json(valor, backend=None, ordenar=False, indentar=False):
+    """
+    Serializar un valor a JSON (UTF-8, en bytes).
+    
+    Args:
+        valor: Valor a serializar
+        backend (str): 'orjson' o 'json' (default: backend_por_defecto())
+        ordenar (bool): Ordenar las claves de los diccionarios
+        indentar (bool): Indentar con dos espacios
+    
+    Returns:
+        bytes: JSON en UTF-8
+    """
+    if (backend or backend_por_defecto()) == 'orjson':
+        opciones = orjson.OPT_NON_STR_KEYS
+        if ordenar:
+            opciones |= orjson.OPT_SORT_KEYS
+        if indentar:
+            opciones |= orjson.OPT_INDENT_2
+        return orjson.dumps(valor, default=convertir, option=opciones)
+    
+    return json.dumps(valor, default=convertir, ensure_ascii=False, sort_keys=ordenar,
+                      indent=2 if indentar else None,
+                      separators=None if indentar else (',', ':')).encode('utf-8')
+
+
+class ProveedorJSON(DefaultJSONProvider):
+    """
+    Proveedor JSON de Flask (jsonify, request.get_json, |tojson) con backend rápido.
+    
+    Usa orjson cuando está instalado y json de la biblioteca estándar si no
+    (o con JSON_BACKEND=json). Con ambos backends la salida es la misma:
+    UTF-8 sin escapar, fechas y horas en ISO 8601 (no en formato HTTP como
+    el proveedor por defecto de Flask) y los tipos de convertir().
+    """
+    
+    ensure_ascii = False
+    
+    def __init__(self, app, backend=None):
+        super().__init__(app)
+        self.backend = backend or backend_por_defecto()
+    
+    def dumps(self, obj, **kwargs):
+        if kwargs or self.backend != 'orjson':
+            # Parámetros propios de json.dumps (p.ej. los de |tojson): biblioteca estándar
+            kwargs.setdefault('default', convertir)
+            return super().dumps(obj, **kwargs)
+        return a_json(obj, self.backend, ordenar=self.sort_keys).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        if kwargs or self.backend != 'orjson':
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        """Respuesta JSON serializada directamente a bytes (sin pasar por str)."""
+        obj = self._prepare_response_obj(args, kwargs)
+        indentar = self.compact is False or (self.compact is None and self._app.debug)
+        cuerpo = a_json(obj, self.backend, ordenar=self.sort_keys, indentar=indentar)
+        return self._app.response_class(cuerpo + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,183 @@
+"""
+Resolución offline de zonas horarias para orígenes y destinos de transportes
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+    ZoneInfoNotFoundError = Exception
+
+
+# Ciudades y códigos IATA más habituales -> zona IANA.
+# Las claves están normalizadas (minúsculas, sin acentos).
+ZONAS_POR_LUGAR = {
+    # Argentina
+    'buenos aires': 'America/Argentina/Buenos_Aires', 'eze': 'America/Argentina/Buenos_Aires',
+    'aep': 'America/Argentina/Buenos_Aires', 'ezeiza': 'America/Argentina/Buenos_Aires',
+    'aeroparque': 'America/Argentina/Buenos_Aires', 'cordoba': 'America/Argentina/Cordoba',
+    'cor': 'America/Argentina/Cordoba', 'mendoza': 'America/Argentina/Mendoza',
+    'mdz': 'America/Argentina/Mendoza', 'bariloche': 'America/Argentina/Salta',
+    'brc': 'America/Argentina/Salta', 'salta': 'America/Argentina/Salta',
+    'sla': 'America/Argentina/Salta', 'ushuaia': 'America/Argentina/Ushuaia',
+    'ush': 'America/Argentina/Ushuaia', 'el calafate': 'America/Argentina/Rio_Gallegos',
+    'fte': 'America/Argentina/Rio_Gallegos', 'rosario': 'America/Argentina/Cordoba',
+    'ros': 'America/Argentina/Cordoba', 'iguazu': 'America/Argentina/Cordoba',
+    'puerto iguazu': 'America/Argentina/Cordoba', 'igr': 'America/Argentina/Cordoba',
+    'mar del plata': 'America/Argentina/Buenos_Aires', 'mdq': 'America/Argentina/Buenos_Aires',
+    # Resto de América
+    'santiago': 'America/Santiago', 'santiago de chile': 'America/Santiago', 'scl': 'America/Santiago',
+    'montevideo': 'America/Montevideo', 'mvd': 'America/Montevideo',
+    'punta del este': 'America/Montevideo', 'pdp': 'America/Montevideo',
+    'asuncion': 'America/Asuncion', 'asu': 'America/Asuncion',
+    'lima': 'America/Lima', 'lim': 'America/Lima', 'cusco': 'America/Lima', 'cuz': 'America/Lima',
+    'la paz': 'America/La_Paz', 'lpb': 'America/La_Paz',
+    'bogota': 'America/Bogota', 'bog': 'America/Bogota', 'medellin': 'America/Bogota',
+    'mde': 'America/Bogota', 'cartagena': 'America/Bogota', 'ctg': 'America/Bogota',
+    'quito': 'America/Guayaquil', 'uio': 'America/Guayaquil',
+    'caracas': 'America/Caracas', 'ccs': 'America/Caracas',
+    'sao paulo': 'America/Sao_Paulo', 'gru': 'America/Sao_Paulo', 'cgh': 'America/Sao_Paulo',
+    'rio de janeiro': 'America/Sao_Paulo', 'gig': 'America/Sao_Paulo', 'sdu': 'America/Sao_Paulo',
+    'florianopolis': 'America/Sao_Paulo', 'fln': 'America/Sao_Paulo',
+    'foz do iguacu': 'America/Sao_Paulo', 'igu': 'America/Sao_Paulo',
+    'salvador': 'America/Bahia', 'ssa': 'America/Bahia',
+    'panama': 'America/Panama', 'pty': 'America/Panama',
+    'san jose': 'America/Costa_Rica', 'sjo': 'America/Costa_Rica',
+    'ciudad de mexico': 'America/Mexico_City', 'mexico': 'America/Mexico_City',
+    'mex': 'America/Mexico_City', 'cancun': 'America/Cancun', 'cun': 'America/Cancun',
+    'la habana': 'America/Havana', 'hav': 'America/Havana',
+    'punta cana': 'America/Santo_Domingo', 'puj': 'America/Santo_Domingo',
+    'miami': 'America/New_York', 'mia': 'America/New_York',
+    'nueva york': 'America/New_York', 'new york': 'America/New_York',
+    'jfk': 'America/New_York', 'ewr': 'America/New_York', 'lga': 'America/New_York',
+    'orlando': 'America/New_York', 'mco': 'America/New_York',
+    'washington': 'America/New_York', 'iad': 'America/New_York',
+    'boston': 'America/New_York', 'bos': 'America/New_York',
+    'atlanta': 'America/New_York', 'atl': 'America/New_York',
+    'toronto': 'America/Toronto', 'yyz': 'America/Toronto',
+    'montreal': 'America/Toronto', 'yul': 'America/Toronto',
+    'chicago': 'America/Chicago', 'ord': 'America/Chicago',
+    'dallas': 'America/Chicago', 'dfw': 'America/Chicago',
+    'houston': 'America/Chicago', 'iah': 'America/Chicago',
+    'denver': 'America/Denver', 'den': 'America/Denver',
+    'los angeles': 'America/Los_Angeles', 'lax': 'America/Los_Angeles',
+    'san francisco': 'America/Los_Angeles', 'sfo': 'America/Los_Angeles',
+    'las vegas': 'America/Los_Angeles', 'las': 'America/Los_Angeles',
+    'vancouver': 'America/Vancouver', 'yvr': 'America/Vancouver',
+    'honolulu': 'Pacific/Honolulu', 'hnl': 'Pacific/Honolulu',
+    # Europa
+    'madrid': 'Europe/Madrid', 'mad': 'Europe/Madrid',
+    'barcelona': 'Europe/Madrid', 'bcn': 'Europe/Madrid',
+    'sevilla': 'Europe/Madrid', 'svq': 'Europe/Madrid',
+    'valencia': 'Europe/Madrid', 'vlc': 'Europe/Madrid',
+    'malaga': 'Europe/Madrid', 'agp': 'Europe/Madrid',
+    'palma': 'Europe/Madrid', 'pmi': 'Europe/Madrid',
+    'bilbao': 'Europe/Madrid', 'bio': 'Europe/Madrid',
+    'tenerife': 'Atlantic/Canary', 'tfs': 'Atlantic/Canary', 'tfn': 'Atlantic/Canary',
+    'gran canaria': 'Atlantic/Canary', 'lpa': 'Atlantic/Canary',
+    'lisboa': 'Europe/Lisbon', 'lis': 'Europe/Lisbon', 'oporto': 'Europe/Lisbon',
+    'porto': 'Europe/Lisbon', 'opo': 'Europe/Lisbon',
+    'paris': 'Europe/Paris', 'cdg': 'Europe/Paris', 'ory': 'Europe/Paris',
+    'niza': 'Europe/Paris', 'nice': 'Europe/Paris', 'nce': 'Europe/Paris',
+    'londres': 'Europe/London', 'london': 'Europe/London', 'lhr': 'Europe/London',
+    'lgw': 'Europe/London', 'stn': 'Europe/London', 'ltn': 'Europe/London',
+    'edimburgo': 'Europe/London', 'edi': 'Europe/London',
+    'dublin': 'Europe/Dublin', 'dub': 'Europe/Dublin',
+    'amsterdam': 'Europe/Amsterdam', 'ams': 'Europe/Amsterdam',
+    'bruselas': 'Europe/Brussels', 'bru': 'Europe/Brussels',
+    'frankfurt': 'Europe/Berlin', 'fra': 'Europe/Berlin',
+    'berlin': 'Europe/Berlin', 'ber': 'Europe/Berlin',
+    'munich': 'Europe/Berlin', 'muc': 'Europe/Berlin',
+    'zurich': 'Europe/Zurich', 'zrh': 'Europe/Zurich',
+    'ginebra': 'Europe/Zurich', 'gva': 'Europe/Zurich',
+    'viena': 'Europe/Vienna', 'vie': 'Europe/Vienna',
+    'praga': 'Europe/Prague', 'prg': 'Europe/Prague',
+    'budapest': 'Europe/Budapest', 'bud': 'Europe/Budapest',
+    'varsovia': 'Europe/Warsaw', 'waw': 'Europe/Warsaw',
+    'copenhague': 'Europe/Copenhagen', 'cph': 'Europe/Copenhagen',
+    'estocolmo': 'Europe/Stockholm', 'arn': 'Europe/Stockholm',
+    'oslo': 'Europe/Oslo', 'osl': 'Europe/Oslo',
+    'helsinki': 'Europe/Helsinki', 'hel': 'Europe/Helsinki',
+    'roma': 'Europe/Rome', 'fco': 'Europe/Rome',
+    'milan': 'Europe/Rome', 'mxp': 'Europe/Rome', 'lin': 'Europe/Rome',
+    'florencia': 'Europe/Rome', 'flr': 'Europe/Rome',
+    'venecia': 'Europe/Rome', 'vce': 'Europe/Rome',
+    'napoles': 'Europe/Rome', 'nap': 'Europe/Rome',
+    'atenas': 'Europe/Athens', 'ath': 'Europe/Athens',
+    'estambul': 'Europe/Istanbul', 'ist': 'Europe/Istanbul', 'saw': 'Europe/Istanbul',
+    'moscu': 'Europe/Moscow', 'svo': 'Europe/Moscow',
+    # África y Medio Oriente
+    'marrakech': 'Africa/Casablanca', 'rak': 'Africa/Casablanca',
+    'casablanca': 'Africa/Casablanca', 'cmn': 'Africa/Casablanca',
+    'el cairo': 'Africa/Cairo', 'cai': 'Africa/Cairo',
+    'ciudad del cabo': 'Africa/Johannesburg', 'cpt': 'Africa/Johannesburg',
+    'johannesburgo': 'Africa/Johannesburg', 'jnb': 'Africa/Johannesburg',
+    'dubai': 'Asia/Dubai', 'dxb': 'Asia/Dubai',
+    'doha': 'Asia/Qatar', 'doh': 'Asia/Qatar',
+    'tel aviv': 'Asia/Jerusalem', 'tlv': 'Asia/Jerusalem',
+    # Asia y Oceanía
+    'delhi': 'Asia/Kolkata', 'del': 'Asia/Kolkata', 'bombay': 'Asia/Kolkata',
+    'mumbai': 'Asia/Kolkata', 'bom': 'Asia/Kolkata',
+    'bangkok': 'Asia/Bangkok', 'bkk': 'Asia/Bangkok',
+    'singapur': 'Asia/Singapore', 'sin': 'Asia/Singapore',
+    'hong kong': 'Asia/Hong_Kong', 'hkg': 'Asia/Hong_Kong',
+    'pekin': 'Asia/Shanghai', 'pek': 'Asia/Shanghai',
+    'shanghai': 'Asia/Shanghai', 'pvg': 'Asia/Shanghai',
+    'seul': 'Asia/Seoul', 'icn': 'Asia/Seoul',
+    'tokio': 'Asia/Tokyo', 'tokyo': 'Asia/Tokyo', 'nrt': 'Asia/Tokyo', 'hnd': 'Asia/Tokyo',
+    'osaka': 'Asia/Tokyo', 'kix': 'Asia/Tokyo', 'kioto': 'Asia/Tokyo',
+    'bali': 'Asia/Makassar', 'dps': 'Asia/Makassar',
+    'sidney': 'Australia/Sydney', 'sydney': 'Australia/Sydney', 'syd': 'Australia/Sydney',
+    'melbourne': 'Australia/Melbourne', 'mel': 'Australia/Melbourne',
+    'auckland': 'Pacific/Auckland', 'akl': 'Pacific/Auckland',
+}
+
+_PATRON_IATA = re.compile(r'\b([A-Z]{3})\b')
+
+
+def normalizar_lugar(texto):
+    """Normaliza un nombre de lugar: minúsculas, sin acentos ni espacios extra"""
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', texto)
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def _candidatos(lugar):
+    """Genera las claves a probar para un lugar, de la más a la menos específica"""
+    # Códigos IATA explícitos, p.ej. "Madrid (MAD)" o "EZE"
+    for codigo in _PATRON_IATA.findall(lugar):
+        yield codigo.lower()
+
+    normalizado = normalizar_lugar(lugar)
+    yield normalizado
+
+    # Segmentos: "Buenos Aires, Argentina", "Roma - Fiumicino", "Paris (CDG)"
+    for segmento in re.split(r'[,()/\-]', normalizado):
+        segmento = segmento.strip()
+        if segmento:
+            yield segmento
+
+
+@lru_cache(maxsize=1024)
+def obtener_zona_horaria(lugar):
+    """
+    Devuelve la zona horaria (ZoneInfo) de un origen/destino, o None si no se conoce.
+    La búsqueda es offline: no realiza llamadas externas.
+    """
+    if not lugar or ZoneInfo is None:
+        return None
+
+    for clave in _candidatos(lugar):
+        nombre_zona = ZONAS_POR_LUGAR.get(clave)
+        if nombre_zona:
+            try:
+                return ZoneInfo(nombre_zona)
+            except ZoneInfoNotFoundError:
+                return None
+    return None
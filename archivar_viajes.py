@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Script para archivar los viajes terminados (pensado para correr desde cron).
+
+Uso:
+    python archivar_viajes.py
+    python archivar_viajes.py --dias-gracia 90 --tamano-lote 200
+    python archivar_viajes.py --restaurar 12
+"""
+import argparse
+import sys
+import time
+
+from app.factory import create_app
+from app.services.database import database_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archivar viajes terminados')
+    parser.add_argument('--dias-gracia', type=int, default=30,
+                        help='Días desde el fin del viaje antes de archivarlo')
+    parser.add_argument('--tamano-lote', type=int, default=100, help='Viajes por transacción')
+    parser.add_argument('--max-lotes', type=int, help='Cortar después de esta cantidad de lotes')
+    parser.add_argument('--restaurar', type=int, metavar='ARCHIVO_ID',
+                        help='Restaurar un viaje archivado en lugar de archivar')
+    args = parser.parse_args()
+    
+    app = create_app()
+    with app.app_context():
+        # init_database además agrega las columnas nuevas a una base ya existente
+        if not database_service.init_database():
+            sys.exit(1)
+        from app.services import archivo_service
+        
+        if args.restaurar is not None:
+            resultado = archivo_service.restaurar(args.restaurar)
+            if not resultado['success']:
+                print(f"❌ {resultado['error']}")
+                sys.exit(1)
+            print(f"✅ Viaje restaurado con ID {resultado['viaje_id']}")
+            return
+        
+        inicio = time.perf_counter()
+        totales = archivo_service.archivar_pendientes(args.dias_gracia, args.tamano_lote, args.max_lotes)
+        segundos = time.perf_counter() - inicio
+    
+    print(f"✅ {totales['archivados']} viajes archivados en {totales['lotes']} lotes ({segundos:.1f} s)")
+    if totales['bytes_originales']:
+        print(f"   {totales['bytes_originales'] // 1024} KB en JSON → {totales['bytes_archivados'] // 1024} KB comprimidos")
+    if totales['errores']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
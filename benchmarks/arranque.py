@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark de arranque de la aplicación
+======================================
+
+Mide, en un proceso nuevo por corrida (arranque en frío):
+
+- importación: tiempo de ``import app.factory``
+- create_app: tiempo de construir la aplicación
+- primera /ping: primera petición que no toca la base de datos
+- primera /: primera petición a la página principal (incluye crear las tablas)
+
+Uso:
+    python benchmarks/arranque.py
+    python benchmarks/arranque.py --corridas 20 --json resultados_arranque.json
+
+Usa una base SQLite temporal salvo que se defina DATABASE_URL.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Código que se ejecuta en cada proceso hijo; imprime los tiempos en JSON
+MEDICION = r'''
+import json, sys, time
+sys.path.insert(0, RAIZ)
+
+t0 = time.perf_counter()
+from app.factory import create_app
+t1 = time.perf_counter()
+app = create_app()
+t2 = time.perf_counter()
+cliente = app.test_client()
+estado_ping = cliente.get('/ping').status_code
+t3 = time.perf_counter()
+estado_inicio = cliente.get('/').status_code
+t4 = time.perf_counter()
+
+print(json.dumps({
+    'importacion': t1 - t0,
+    'create_app': t2 - t1,
+    'primera_ping': t3 - t2,
+    'primera_inicio': t4 - t3,
+    'estados': [estado_ping, estado_inicio],
+}))
+'''
+
+ETAPAS = ['importacion', 'create_app', 'primera_ping', 'primera_inicio']
+
+
+def medir_corrida(entorno):
+    """Ejecuta una medición en un intérprete nuevo y devuelve los tiempos."""
+    codigo = f'RAIZ = {RAIZ!r}\n' + MEDICION
+    salida = subprocess.run([sys.executable, '-c', codigo], env=entorno, cwd=RAIZ,
+                            capture_output=True, text=True, check=True).stdout
+    # La última línea es el JSON; lo anterior son mensajes de la app
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Medir el tiempo de arranque de la aplicación')
+    parser.add_argument('--corridas', type=int, default=10)
+    parser.add_argument('--json', help='Archivo donde guardar los resultados')
+    args = parser.parse_args()
+    
+    entorno = dict(os.environ)
+    base_temporal = not entorno.get('DATABASE_URL')
+    directorio = tempfile.mkdtemp(prefix='viajes_arranque_')
+    
+    corridas = []
+    for i in range(args.corridas):
+        if base_temporal:
+            # Base nueva en cada corrida: la primera petición a / crea las tablas
+            entorno['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, f'viaje_{i}.db')}"
+        resultado = medir_corrida(entorno)
+        if resultado['estados'] != [200, 200]:
+            print(f"⚠️  Corrida {i + 1}: estados inesperados {resultado['estados']}")
+        corridas.append(resultado)
+    
+    resumen = {}
+    print(f"{'etapa':<16}{'mediana ms':>12}{'mín ms':>10}{'máx ms':>10}")
+    for etapa in ETAPAS + ['total']:
+        if etapa == 'total':
+            valores = [sum(c[e] for e in ETAPAS) for c in corridas]
+        else:
+            valores = [c[etapa] for c in corridas]
+        resumen[etapa] = {
+            'mediana_ms': statistics.median(valores) * 1000,
+            'min_ms': min(valores) * 1000,
+            'max_ms': max(valores) * 1000,
+        }
+        print(f"{etapa:<16}{resumen[etapa]['mediana_ms']:>12.1f}"
+              f"{resumen[etapa]['min_ms']:>10.1f}{resumen[etapa]['max_ms']:>10.1f}")
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'corridas': args.corridas, 'resumen': resumen}, f, indent=2)
+        print(f"💾 Resultados guardados en {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga HTTP con una mezcla de tráfico realista
+=======================================================
+
+Genera un dataset sintético, levanta gunicorn localmente y simula usuarios
+concurrentes que repiten una mezcla configurable de operaciones:
+
+- ver_viaje: GET /viaje/<id>
+- index: GET /
+- crear_gasto: POST /viaje/<id>/gasto
+- crear_actividad: POST /viaje/<id>/actividad
+- agregar_parada: POST /viaje/<id>/parada
+- reordenar_viaje: POST /viaje/<id>/reordenar-por-fecha
+- reordenar_parada: POST /parada/<id>/reordenar
+
+Informa throughput y percentiles de latencia por operación, y clasifica los
+errores (SQLite bloqueada, violaciones de _viaje_orden_uc, pool agotado, 5xx)
+tanto en las respuestas como en el log de gunicorn.
+
+Uso:
+    python benchmarks/carga_http.py
+    python benchmarks/carga_http.py --usuarios 32 --duracion 60 --viajes 1000
+    python benchmarks/carga_http.py --mezcla ver_viaje=60 crear_gasto=20 agregar_parada=20
+    python benchmarks/carga_http.py --json carga.json --max-errores 1
+
+Usa una base SQLite temporal salvo que se defina DATABASE_URL; en ese caso se
+usan los viajes existentes (o se agregan con --generar).
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from perfiles_gunicorn import esperar_servidor, percentil
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Operación -> peso por defecto en la mezcla
+MEZCLA = {
+    'ver_viaje': 50,
+    'index': 5,
+    'crear_gasto': 15,
+    'crear_actividad': 10,
+    'agregar_parada': 5,
+    'reordenar_viaje': 10,
+    'reordenar_parada': 5,
+}
+
+# Errores conocidos que se buscan en las respuestas y en el log del servidor
+PATRONES_ERROR = {
+    'sqlite_bloqueada': re.compile(r'database (?:table )?is locked', re.IGNORECASE),
+    'viaje_orden_uc': re.compile(
+        r'_viaje_orden_uc|UNIQUE constraint failed: parada\.viaje_id, parada\.orden'),
+    'pool_agotado': re.compile(r'QueuePool limit of size'),
+}
+
+
+def clasificar_error(texto, estado):
+    """Tipo de error de una respuesta fallida."""
+    for tipo, patron in PATRONES_ERROR.items():
+        if patron.search(texto):
+            return tipo
+    return f'http_{estado}' if estado else 'sin_detalle'
+
+
+class Escenario:
+    """Viajes y paradas sobre los que operan los usuarios simulados."""
+    
+    def __init__(self, viajes, paradas):
+        """
+        Args:
+            viajes (list): Tuplas (id, fecha_inicio, fecha_fin)
+            paradas (dict): viaje_id -> lista de IDs de parada
+        """
+        self.viajes = viajes
+        self.paradas = paradas
+        self.con_paradas = [v for v in viajes if paradas.get(v[0])]
+    
+    def peticion(self, operacion, rnd):
+        """Construir (método, ruta, cuerpo) para una operación."""
+        viaje_id, inicio, fin = rnd.choice(self.viajes)
+        fecha = (inicio + timedelta(days=rnd.randint(0, max((fin - inicio).days, 0)))).isoformat()
+        
+        if operacion == 'ver_viaje':
+            return 'GET', f'/viaje/{viaje_id}', None
+        if operacion == 'index':
+            return 'GET', '/', None
+        if operacion == 'crear_gasto':
+            return 'POST', f'/viaje/{viaje_id}/gasto', {
+                'categoria': rnd.choice(['comida', 'transporte', 'compras']),
+                'descripcion': 'Gasto de carga', 'monto': round(rnd.uniform(1, 200), 2),
+                'fecha': fecha, 'moneda': 'USD'}
+        if operacion == 'crear_actividad':
+            return 'POST', f'/viaje/{viaje_id}/actividad', {
+                'nombre': 'Actividad de carga', 'fecha': fecha, 'hora': '10:00'}
+        if operacion == 'agregar_parada':
+            return 'POST', f'/viaje/{viaje_id}/parada', {
+                'destino': 'Parada de carga', 'fecha_llegada': fecha, 'fecha_salida': fecha}
+        if operacion == 'reordenar_viaje':
+            return 'POST', f'/viaje/{viaje_id}/reordenar-por-fecha', None
+        if operacion == 'reordenar_parada':
+            viaje_id, _, _ = rnd.choice(self.con_paradas)
+            paradas = self.paradas[viaje_id]
+            return 'POST', f'/parada/{rnd.choice(paradas)}/reordenar', {
+                'nuevo_orden': rnd.randint(1, len(paradas))}
+        raise ValueError(f'Operación desconocida: {operacion}')
+
+
+def preparar_escenario(viajes_activos, generar, semilla):
+    """Generar el dataset si corresponde y leer los viajes sobre los que se opera."""
+    from app.factory import create_app, db, get_models
+    from app.utils.datos_sinteticos import generar_dataset
+    
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        if generar:
+            resumen = generar_dataset(db, get_models(), generar, semilla=semilla)
+            print(f"🗄️  Dataset: {resumen['total_filas']} filas en {resumen['segundos']:.1f} s")
+        
+        models = get_models()
+        Viaje, Parada = models['Viaje'], models['Parada']
+        viajes = db.session.query(Viaje.id, Viaje.fecha_inicio, Viaje.fecha_fin).order_by(Viaje.id).all()
+        if not viajes:
+            raise SystemExit('❌ No hay viajes: usá --generar o una base con datos')
+        # Pocos viajes activos concentran las escrituras, como usuarios editando su viaje
+        viajes = random.Random(semilla).sample([tuple(v) for v in viajes], min(viajes_activos, len(viajes)))
+        paradas = defaultdict(list)
+        ids = [v[0] for v in viajes]
+        for parada_id, viaje_id in db.session.query(Parada.id, Parada.viaje_id).filter(
+                Parada.viaje_id.in_(ids)):
+            paradas[viaje_id].append(parada_id)
+        db.session.remove()
+        db.engine.dispose()
+    return Escenario(viajes, dict(paradas))
+
+
+def enviar(url, metodo, cuerpo):
+    """Hacer una petición y devolver (latencia_segundos, estado, texto_de_error)."""
+    datos = json.dumps(cuerpo).encode() if cuerpo is not None else (b'' if metodo == 'POST' else None)
+    req = urllib.request.Request(url, method=metodo, data=datos,
+                                 headers={'Content-Type': 'application/json'} if cuerpo is not None else {})
+    inicio = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=30) as respuesta:
+            texto = respuesta.read()
+            estado = respuesta.status
+    except urllib.error.HTTPError as e:
+        return time.perf_counter() - inicio, e.code, e.read().decode('utf-8', 'replace')
+    except Exception as e:
+        return time.perf_counter() - inicio, 0, f'conexion: {e}'
+    latencia = time.perf_counter() - inicio
+    
+    # Los servicios devuelven {'success': false, 'error': ...} con estado 200
+    if texto[:1] == b'{' and b'"success":false' in texto.replace(b' ', b''):
+        return latencia, estado, texto.decode('utf-8', 'replace')
+    return latencia, estado, None
+
+
+def cargar(url_base, escenario, mezcla, usuarios, duracion, pausa, semilla):
+    """Simular `usuarios` clientes concurrentes durante `duracion` segundos."""
+    operaciones = list(mezcla)
+    pesos = [mezcla[o] for o in operaciones]
+    latencias = defaultdict(list)
+    errores = defaultdict(Counter)
+    ejemplos = {}
+    lock = threading.Lock()
+    fin = time.time() + duracion
+    
+    def usuario(numero):
+        rnd = random.Random(semilla * 1000 + numero)
+        while time.time() < fin:
+            operacion = rnd.choices(operaciones, pesos)[0]
+            metodo, ruta, cuerpo = escenario.peticion(operacion, rnd)
+            latencia, estado, error = enviar(url_base + ruta, metodo, cuerpo)
+            with lock:
+                latencias[operacion].append(latencia)
+                if error is not None or estado >= 400 or estado == 0:
+                    tipo = 'conexion' if estado == 0 else clasificar_error(error or '', estado)
+                    errores[operacion][tipo] += 1
+                    ejemplos.setdefault(tipo, f'{metodo} {ruta} -> {estado}: {" ".join((error or "").split())[:300]}')
+            if pausa:
+                time.sleep(rnd.uniform(0, 2 * pausa))
+    
+    inicio = time.time()
+    with ThreadPoolExecutor(max_workers=usuarios) as executor:
+        list(executor.map(usuario, range(usuarios)))
+    transcurrido = time.time() - inicio
+    
+    por_operacion = {}
+    for operacion in operaciones:
+        valores = sorted(latencias.get(operacion, []))
+        if not valores:
+            continue
+        por_operacion[operacion] = {
+            'peticiones': len(valores),
+            'errores': sum(errores[operacion].values()),
+            'tipos_error': dict(errores[operacion]),
+            'rps': round(len(valores) / transcurrido, 2),
+            'p50_ms': round(percentil(valores, 50) * 1000, 2),
+            'p95_ms': round(percentil(valores, 95) * 1000, 2),
+            'p99_ms': round(percentil(valores, 99) * 1000, 2),
+            'max_ms': round(valores[-1] * 1000, 2),
+        }
+    
+    total = sum(r['peticiones'] for r in por_operacion.values())
+    total_errores = sum(r['errores'] for r in por_operacion.values())
+    todas = sorted(l for valores in latencias.values() for l in valores)
+    return {
+        'duracion_s': round(transcurrido, 2),
+        'peticiones': total,
+        'errores': total_errores,
+        'porcentaje_errores': round(total_errores / total * 100, 3) if total else 0.0,
+        'rps': round(total / transcurrido, 2) if transcurrido else 0.0,
+        'p50_ms': round(percentil(todas, 50) * 1000, 2),
+        'p95_ms': round(percentil(todas, 95) * 1000, 2),
+        'p99_ms': round(percentil(todas, 99) * 1000, 2),
+        'operaciones': por_operacion,
+        'ejemplos_error': ejemplos,
+    }
+
+
+def analizar_log(ruta):
+    """Contar en el log de gunicorn las apariciones de cada error conocido."""
+    with open(ruta, encoding='utf-8', errors='replace') as archivo:
+        contenido = archivo.read()
+    conteo = {tipo: len(patron.findall(contenido)) for tipo, patron in PATRONES_ERROR.items()}
+    conteo['tracebacks'] = contenido.count('Traceback (most recent call last)')
+    return conteo
+
+
+def parsear_mezcla(valores):
+    mezcla = {}
+    for valor in valores:
+        operacion, _, peso = valor.partition('=')
+        if operacion not in MEZCLA:
+            raise SystemExit(f"❌ Operación desconocida '{operacion}'; opciones: {', '.join(MEZCLA)}")
+        mezcla[operacion] = float(peso or 1)
+    return mezcla
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga HTTP contra gunicorn')
+    parser.add_argument('--usuarios', type=int, default=16, help='Clientes concurrentes')
+    parser.add_argument('--duracion', type=float, default=30, help='Segundos de carga')
+    parser.add_argument('--pausa', type=float, default=0.0,
+                        help='Pausa media entre peticiones de un usuario (segundos)')
+    parser.add_argument('--mezcla', nargs='+', help='Pesos operacion=peso (default: mezcla estándar)')
+    parser.add_argument('--viajes', type=int, default=500, help='Viajes del dataset temporal')
+    parser.add_argument('--generar', type=int, default=0,
+                        help='Con DATABASE_URL: viajes a agregar antes de la carga')
+    parser.add_argument('--viajes-activos', type=int, default=20,
+                        help='Viajes sobre los que operan los usuarios')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--puerto', type=int, default=8766)
+    parser.add_argument('--json', help='Archivo donde guardar los resultados')
+    parser.add_argument('--max-errores', type=float,
+                        help='Terminar con código 1 si el porcentaje de errores lo supera')
+    args = parser.parse_args()
+    
+    mezcla = parsear_mezcla(args.mezcla) if args.mezcla else dict(MEZCLA)
+    directorio = tempfile.mkdtemp(prefix='viajes_carga_')
+    if not os.environ.get('DATABASE_URL'):
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'viaje.db')}"
+        args.generar = args.viajes
+    # Geocodificación offline: sin red y con resultados estables
+    os.environ.setdefault('GEOCODIFICADOR', 'gazetteer')
+    
+    escenario = preparar_escenario(args.viajes_activos, args.generar, args.semilla)
+    
+    ruta_log = os.path.join(directorio, 'gunicorn.log')
+    entorno = dict(os.environ, PORT=str(args.puerto))
+    with open(ruta_log, 'w') as log:
+        proceso = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'app_robust:app', '-c', 'gunicorn.conf.py'],
+            cwd=RAIZ, env=entorno, stdout=log, stderr=subprocess.STDOUT
+        )
+    try:
+        url = f'http://127.0.0.1:{args.puerto}'
+        if not esperar_servidor(url):
+            raise SystemExit(f'❌ gunicorn no arrancó; ver {ruta_log}')
+        enviar(url + '/', 'GET', None)  # Calentamiento
+        print(f"🚀 {args.usuarios} usuarios durante {args.duracion:.0f} s contra {url}")
+        resultado = cargar(url, escenario, mezcla, args.usuarios, args.duracion, args.pausa, args.semilla)
+    finally:
+        proceso.send_signal(signal.SIGTERM)
+        proceso.wait(timeout=30)
+    
+    resultado['log_servidor'] = analizar_log(ruta_log)
+    resultado['configuracion'] = {
+        'usuarios': args.usuarios, 'mezcla': mezcla, 'viajes_activos': len(escenario.viajes),
+        'base_datos': os.environ['DATABASE_URL'].split(':', 1)[0],
+        'worker_class': os.environ.get('GUNICORN_WORKER_CLASS', 'gthread'),
+    }
+    
+    print()
+    print(f"{'operación':<20}{'peticiones':>11}{'errores':>9}{'req/s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for operacion, r in resultado['operaciones'].items():
+        print(f"{operacion:<20}{r['peticiones']:>11}{r['errores']:>9}{r['rps']:>9.1f}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}")
+    print(f"{'total':<20}{resultado['peticiones']:>11}{resultado['errores']:>9}{resultado['rps']:>9.1f}"
+          f"{resultado['p50_ms']:>9.1f}{resultado['p95_ms']:>9.1f}{resultado['p99_ms']:>9.1f}")
+    
+    detectados = {t: n for t, n in resultado['log_servidor'].items() if n}
+    if resultado['ejemplos_error']:
+        print("\n⚠️  Errores en las respuestas:")
+        for tipo, ejemplo in resultado['ejemplos_error'].items():
+            print(f"   [{tipo}] {ejemplo}")
+    if detectados:
+        print(f"⚠️  En el log del servidor: {detectados} (log completo en {ruta_log})")
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados guardados en {args.json}")
+    
+    if args.max_errores is not None and resultado['porcentaje_errores'] > args.max_errores:
+        print(f"❌ {resultado['porcentaje_errores']:.2f}% de errores (máximo {args.max_errores}%)")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Generar un dataset sintético en la base de datos
+================================================
+
+Crea viajes con paradas, gastos, actividades, documentos, transportes y
+alojamientos usando app.utils.datos_sinteticos. Con la misma semilla y la
+misma fecha base los datos son idénticos.
+
+Uso:
+    python benchmarks/generar_datos.py --viajes 1000
+    python benchmarks/generar_datos.py --viajes 100000 --semilla 7 --fecha-base 2025-01-01 --limpiar
+    DATABASE_URL=postgresql://... python benchmarks/generar_datos.py --viajes 50000
+
+Usa la base configurada en DATABASE_URL (por defecto la SQLite local).
+"""
+
+import argparse
+import os
+import sys
+from datetime import date
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generar datos sintéticos de viajes')
+    parser.add_argument('--viajes', type=int, default=1000, help='Cantidad de viajes a crear')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--fecha-base', type=date.fromisoformat, default=None,
+                        help='Fecha de referencia AAAA-MM-DD (default: hoy)')
+    parser.add_argument('--lote', type=int, default=500, help='Viajes por transacción')
+    parser.add_argument('--limpiar', action='store_true', help='Borrar antes los viajes existentes')
+    parser.add_argument('--sin-indice', action='store_true',
+                        help='No reconstruir el índice de búsqueda al terminar')
+    args = parser.parse_args()
+    
+    from app.factory import create_app, db, get_models
+    from app.utils.datos_sinteticos import generar_dataset
+    
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        print(f"🗄️  Generando {args.viajes} viajes (semilla {args.semilla})...")
+        resumen = generar_dataset(db, get_models(), args.viajes, semilla=args.semilla,
+                                  fecha_base=args.fecha_base, limpiar=args.limpiar,
+                                  reindexar=not args.sin_indice, viajes_por_lote=args.lote)
+    
+    for tabla, cantidad in resumen['filas'].items():
+        print(f"   {tabla:<14}{cantidad:>10}")
+    print(f"✅ {resumen['total_filas']} filas en {resumen['segundos']:.1f} s "
+          f"({resumen['filas_por_segundo']:.0f} filas/s)")
+
+
+if __name__ == '__main__':
+    main()
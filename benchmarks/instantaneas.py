@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark de carga de un viaje completo: ORM vs. instantánea
+============================================================
+
+Compara, sobre un dataset sintético (app.utils.datos_sinteticos, con semilla y
+fecha base fijas), lo que cuesta tener en memoria un viaje con todos sus
+elementos:
+
+- orm: Viaje con sus seis relaciones cargadas (lo que hacía ver_viaje)
+- instantanea: instantanea_service.obtener (una consulta y json.loads, con
+  fechas y horas convertidas)
+- instantanea_agregado: instantanea_service.obtener_agregado (diccionarios,
+  lo que devuelve /viaje/<id>/datos)
+- instantanea_bytes: instantanea_service.obtener_datos (lo que devuelve
+  /viaje/<id>/datos?formato=compacto)
+
+Cada repetición empieza con la sesión vacía, como una petición nueva. Las
+instantáneas se generan antes de medir.
+
+Uso:
+    python benchmarks/instantaneas.py
+    python benchmarks/instantaneas.py --viajes 5000 --repeticiones 200 --json instantaneas.json
+
+Usa una base SQLite temporal salvo que se defina DATABASE_URL (en ese caso la
+base se vacía antes de generar el dataset).
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+from servicios import medir_caso
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+SEMILLA = 42
+FECHA_BASE = date(2026, 1, 15)
+
+# Viajes distintos sobre los que se reparten las repeticiones
+VIAJES_MUESTRA = 50
+
+
+def definir_casos(db, models):
+    """Casos de benchmark: nombre -> función que recibe un viaje_id."""
+    from app.services import instantanea_service
+    from app.services.exportacion_service import ELEMENTOS_VIAJE
+    
+    Viaje = models['Viaje']
+    
+    def orm(viaje_id):
+        viaje = db.session.get(Viaje, viaje_id)
+        for clave in ELEMENTOS_VIAJE:
+            len(getattr(viaje, clave))
+        return viaje
+    
+    return {
+        'orm': orm,
+        'instantanea': instantanea_service.obtener,
+        'instantanea_agregado': instantanea_service.obtener_agregado,
+        'instantanea_bytes': instantanea_service.obtener_datos,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de carga de viajes: ORM vs. instantánea')
+    parser.add_argument('--viajes', type=int, default=1000, help='Cantidad de viajes del dataset')
+    parser.add_argument('--repeticiones', type=int, default=100)
+    parser.add_argument('--repeticiones-memoria', type=int, default=10)
+    parser.add_argument('--json', help='Archivo donde guardar los resultados')
+    args = parser.parse_args()
+    
+    if not os.environ.get('DATABASE_URL'):
+        directorio = tempfile.mkdtemp(prefix='viajes_benchmark_')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'viajes.db')}"
+    
+    from app.factory import create_app, db, get_models
+    from app.services import instantanea_service
+    from app.utils.datos_sinteticos import generar_dataset
+    
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        models = get_models()
+        generacion = generar_dataset(db, models, args.viajes, semilla=SEMILLA,
+                                     fecha_base=FECHA_BASE, limpiar=True)
+        print(f"📦 Dataset: {generacion['total_filas']} filas en {generacion['segundos']:.1f} s")
+        
+        viajes = random.Random(SEMILLA).sample(range(1, args.viajes + 1), min(VIAJES_MUESTRA, args.viajes))
+        inicio = time.perf_counter()
+        instantanea_service.regenerar(viajes)
+        db.session.commit()
+        tamanos = [len(instantanea_service.obtener_datos(v)) for v in viajes]
+        print(f"📸 {len(viajes)} instantáneas generadas en {time.perf_counter() - inicio:.2f} s "
+              f"(mediana {statistics.median(tamanos) / 1024:.1f} KB)")
+        db.session.remove()
+        
+        resultados = {
+            'viajes': args.viajes,
+            'semilla': SEMILLA,
+            'tamano_instantanea_kb': round(statistics.median(tamanos) / 1024, 1),
+            'casos': {}
+        }
+        print(f"   {'caso':<24}{'mediana ms':>12}{'p95 ms':>10}{'consultas':>11}{'memoria KB':>12}")
+        for nombre, funcion in definir_casos(db, models).items():
+            r = medir_caso(funcion, viajes, args.repeticiones, args.repeticiones_memoria, db)
+            resultados['casos'][nombre] = r
+            print(f"   {nombre:<24}{r['mediana_ms']:>12.2f}{r['p95_ms']:>10.2f}{r['consultas']:>11}"
+                  f"{r['pico_memoria_kb']:>12.1f}")
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados guardados en {args.json}")
+
+
+if __name__ == '__main__':
+    main()
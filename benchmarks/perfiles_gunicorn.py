@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga comparando perfiles de workers de gunicorn
+==========================================================
+
+Levanta gunicorn con cada perfil (sync, gthread, gevent), lanza peticiones
+concurrentes contra algunas rutas y compara throughput y latencias.
+
+Uso:
+    python benchmarks/perfiles_gunicorn.py
+    python benchmarks/perfiles_gunicorn.py --perfiles gthread gevent --concurrencia 32 --duracion 20
+    python benchmarks/perfiles_gunicorn.py --rutas / /viaje/1 /admin/reordenar-todos-viajes:POST
+
+Usa una base SQLite temporal salvo que se defina DATABASE_URL.
+"""
+
+import argparse
+import importlib.util
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PERFILES = {
+    'sync': {'GUNICORN_WORKER_CLASS': 'sync', 'GUNICORN_THREADS': '1'},
+    'gthread': {'GUNICORN_WORKER_CLASS': 'gthread'},
+    'gevent': {'GUNICORN_WORKER_CLASS': 'gevent'},
+}
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) de una lista ya ordenada."""
+    if not valores:
+        return 0.0
+    indice = min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))
+    return valores[indice]
+
+
+def esperar_servidor(url, timeout=30):
+    """Esperar a que el servidor responda /ping."""
+    limite = time.time() + timeout
+    while time.time() < limite:
+        try:
+            with urllib.request.urlopen(f'{url}/ping', timeout=1):
+                return True
+        except Exception:
+            time.sleep(0.2)
+    return False
+
+
+def iniciar_gunicorn(perfil, puerto, entorno_base):
+    """Iniciar gunicorn con el perfil indicado."""
+    entorno = dict(entorno_base, PORT=str(puerto), **PERFILES[perfil])
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app_robust:app', '-c', 'gunicorn.conf.py'],
+        cwd=RAIZ, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def peticion(url, metodo):
+    """Hacer una petición y devolver (latencia_segundos, ok)."""
+    inicio = time.perf_counter()
+    try:
+        req = urllib.request.Request(url, method=metodo, data=b'' if metodo == 'POST' else None)
+        with urllib.request.urlopen(req, timeout=30) as respuesta:
+            respuesta.read()
+            ok = respuesta.status < 500
+    except Exception:
+        ok = False
+    return time.perf_counter() - inicio, ok
+
+
+def cargar(url_base, rutas, concurrencia, duracion):
+    """Lanzar peticiones concurrentes durante `duracion` segundos."""
+    latencias = []
+    errores = 0
+    lock = threading.Lock()
+    fin = time.time() + duracion
+
+    def cliente(numero):
+        nonlocal errores
+        i = numero
+        while time.time() < fin:
+            ruta, metodo = rutas[i % len(rutas)]
+            latencia, ok = peticion(url_base + ruta, metodo)
+            with lock:
+                latencias.append(latencia)
+                if not ok:
+                    errores += 1
+            i += 1
+
+    inicio = time.time()
+    with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+        list(executor.map(cliente, range(concurrencia)))
+    transcurrido = time.time() - inicio
+
+    latencias.sort()
+    return {
+        'peticiones': len(latencias),
+        'errores': errores,
+        'rps': len(latencias) / transcurrido if transcurrido else 0,
+        'p50_ms': percentil(latencias, 50) * 1000,
+        'p95_ms': percentil(latencias, 95) * 1000,
+        'p99_ms': percentil(latencias, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comparar perfiles de workers de gunicorn')
+    parser.add_argument('--perfiles', nargs='+', default=['sync', 'gthread', 'gevent'], choices=list(PERFILES))
+    parser.add_argument('--rutas', nargs='+', default=['/', '/ping', '/health'],
+                        help='Rutas a probar; sufijo :POST para usar POST')
+    parser.add_argument('--concurrencia', type=int, default=16)
+    parser.add_argument('--duracion', type=float, default=10)
+    parser.add_argument('--puerto', type=int, default=8765)
+    args = parser.parse_args()
+
+    rutas = [tuple(r.split(':', 1)) if ':' in r else (r, 'GET') for r in args.rutas]
+
+    entorno = dict(os.environ)
+    if not entorno.get('DATABASE_URL'):
+        directorio = tempfile.mkdtemp(prefix='viajes_bench_')
+        entorno['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'viaje.db')}"
+
+    resultados = {}
+    for perfil in args.perfiles:
+        # Sin gevent, gunicorn.conf.py cae en gthread: el resultado no sería de gevent
+        if perfil == 'gevent' and importlib.util.find_spec('gevent') is None:
+            print("⚠️  gevent no está instalado, se omite el perfil gevent")
+            continue
+        print(f"🚀 Perfil {perfil}...")
+        proceso = iniciar_gunicorn(perfil, args.puerto, entorno)
+        try:
+            url = f'http://127.0.0.1:{args.puerto}'
+            if not esperar_servidor(url):
+                print(f"❌ El perfil {perfil} no arrancó (¿falta la dependencia?)")
+                continue
+            peticion(url + '/', 'GET')  # Calentamiento (inicializa la DB)
+            resultados[perfil] = cargar(url, rutas, args.concurrencia, args.duracion)
+        finally:
+            proceso.send_signal(signal.SIGTERM)
+            proceso.wait(timeout=30)
+
+    print()
+    print(f"{'perfil':<10}{'peticiones':>12}{'errores':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for perfil, r in resultados.items():
+        print(f"{perfil:<10}{r['peticiones']:>12}{r['errores']:>10}{r['rps']:>10.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
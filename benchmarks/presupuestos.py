@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Verificación de los presupuestos de consultas de las rutas
+==========================================================
+
+Recorre las rutas que declaran @presupuesto_consultas con la app en modo
+TESTING (presupuesto estricto) sobre un dataset sintético y falla (código de
+salida 1) si alguna ejecuta más consultas de las declaradas o si una ruta con
+presupuesto no tiene caso aquí.
+
+Casos:
+    main.index: página principal, con viajes archivados
+    viajes.ver_viaje: viaje sin instantánea (se regenera), con instantánea y archivado
+    documentos.vencimientos_globales, transportes.conexiones_criticas_proximas
+
+Uso:
+    python benchmarks/presupuestos.py
+    python benchmarks/presupuestos.py --viajes 200
+
+Usa una base SQLite temporal salvo que se defina DATABASE_URL (en ese caso la
+base se vacía antes de generar el dataset).
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+SEMILLA = 42
+FECHA_BASE = date(2026, 1, 15)
+
+# Viajes que se archivan antes de medir (para que el índice muestre tarjetas archivadas)
+VIAJES_ARCHIVADOS = 5
+
+
+def definir_casos(viaje_id, viaje_archivado_id):
+    """Casos a verificar: endpoint -> lista de (descripción, URL)."""
+    return {
+        'main.index': [('inicio', '/')],
+        'viajes.ver_viaje': [
+            ('sin instantánea', f'/viaje/{viaje_id}'),
+            ('con instantánea', f'/viaje/{viaje_id}'),
+            ('archivado', f'/viaje/{viaje_archivado_id}'),
+        ],
+        'documentos.vencimientos_globales': [('30 días', '/documentos/vencimientos?dias=30')],
+        'transportes.conexiones_criticas_proximas': [('60 minutos', '/transportes/conexiones-criticas')],
+    }
+
+
+def endpoints_con_presupuesto(app):
+    """Endpoints cuya vista declara presupuesto: endpoint -> máximo."""
+    return {
+        endpoint: vista.presupuesto_consultas
+        for endpoint, vista in app.view_functions.items()
+        if getattr(vista, 'presupuesto_consultas', None) is not None
+    }
+
+
+def verificar(cliente, casos, presupuestos):
+    """Pedir cada URL y devolver la lista de fallos (texto)."""
+    from app.utils.monitor_sql import PresupuestoConsultasExcedido
+    
+    fallos = []
+    for endpoint in sorted(presupuestos):
+        if endpoint not in casos:
+            fallos.append(f'{endpoint}: declara presupuesto pero no tiene caso en este script')
+            continue
+        for descripcion, url in casos[endpoint]:
+            try:
+                respuesta = cliente.get(url)
+            except PresupuestoConsultasExcedido as e:
+                print(f"   ❌ {endpoint:<42}{descripcion:<18}{str(e)}")
+                fallos.append(f'{endpoint} ({descripcion}): {e}')
+                continue
+            consultas = respuesta.headers.get('X-Consultas-SQL')
+            print(f"   {'✅' if respuesta.status_code == 200 else '❌'} {endpoint:<42}{descripcion:<18}"
+                  f"{consultas:>3} / {presupuestos[endpoint]}")
+            if respuesta.status_code != 200:
+                fallos.append(f'{endpoint} ({descripcion}): HTTP {respuesta.status_code}')
+    return fallos
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verificar los presupuestos de consultas de las rutas')
+    parser.add_argument('--viajes', type=int, default=50, help='Cantidad de viajes del dataset')
+    args = parser.parse_args()
+    
+    if not os.environ.get('DATABASE_URL'):
+        directorio = tempfile.mkdtemp(prefix='viajes_benchmark_')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'viajes.db')}"
+    
+    from app.factory import create_app, db, get_models
+    from app.services import archivo_service
+    from app.services.database import database_service
+    from app.utils.datos_sinteticos import generar_dataset
+    
+    app = create_app({'TESTING': True, 'SQL_PRESUPUESTO_ESTRICTO': True})
+    with app.app_context():
+        database_service.init_database()
+        models = get_models()
+        generacion = generar_dataset(db, models, args.viajes, semilla=SEMILLA,
+                                     fecha_base=FECHA_BASE, limpiar=True)
+        print(f"📦 Dataset: {generacion['total_filas']} filas en {generacion['segundos']:.1f} s")
+        
+        archivo_service.archivar_lote(archivo_service.obtener_candidatos(30, VIAJES_ARCHIVADOS))
+        archivados = archivo_service.listar_archivados(limite=1)
+        if not archivados:
+            print("❌ No se pudo archivar ningún viaje del dataset")
+            sys.exit(1)
+        
+        # El primer viaje no archivado, sin instantánea para medir también la regeneración
+        Viaje, Instantanea = models['Viaje'], models['InstantaneaViaje']
+        viaje_id = db.session.scalar(db.select(Viaje.id).order_by(Viaje.id))
+        db.session.execute(db.delete(Instantanea).where(Instantanea.viaje_id == viaje_id))
+        db.session.commit()
+        casos = definir_casos(viaje_id, archivados[0].viaje_id)
+        db.session.remove()
+    
+    presupuestos = endpoints_con_presupuesto(app)
+    print(f"   {'endpoint':<45}{'caso':<18}{'consultas':>10}")
+    fallos = verificar(app.test_client(), casos, presupuestos)
+    
+    if fallos:
+        print(f"\n❌ {len(fallos)} presupuestos de consultas excedidos o sin verificar:")
+        for fallo in fallos:
+            print(f"   - {fallo}")
+        sys.exit(1)
+    print(f"\n✅ {len(presupuestos)} rutas dentro de su presupuesto de consultas")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de serialización JSON de respuestas grandes
+===========================================================
+
+Serializa payloads de viajes completos con cada backend de
+app.utils.serializacion (y con el proveedor por defecto de Flask cuando el
+payload no tiene tipos que este no soporta), con las mismas opciones que
+jsonify (claves ordenadas, sin indentar).
+
+Payloads (sobre un dataset sintético con semilla y fecha base fijas):
+    agregados: viajes completos de exportacion_service.viajes_completos (dicts con fechas)
+    instantaneas: viajes de instantanea_service.obtener (SimpleNamespace con listas)
+    itinerarios: analizar_conexiones de cada viaje (lecturas, datetimes y timedeltas)
+    modelos: transportes como instancias del ORM
+
+Uso:
+    python benchmarks/serializacion.py
+    python benchmarks/serializacion.py --viajes 2000 --por-payload 500 --repeticiones 50 --json serializacion.json
+
+Usa una base SQLite temporal salvo que se defina DATABASE_URL (en ese caso la
+base se vacía antes de generar el dataset).
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+from servicios import percentil
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+SEMILLA = 42
+FECHA_BASE = date(2026, 1, 15)
+
+
+def construir_payloads(db, models, viaje_ids):
+    """Payloads a serializar: nombre -> valor."""
+    from app.services import exportacion_service, instantanea_service, transporte_service
+    
+    instantanea_service.regenerar(viaje_ids)
+    db.session.commit()
+    
+    Transporte = models['Transporte']
+    return {
+        'agregados': list(exportacion_service.viajes_completos(viaje_ids=viaje_ids)),
+        'instantaneas': [instantanea_service.obtener(viaje_id) for viaje_id in viaje_ids],
+        'itinerarios': {viaje_id: transporte_service.analizar_conexiones(viaje_id) for viaje_id in viaje_ids},
+        'modelos': Transporte.query.filter(Transporte.viaje_id.in_(viaje_ids)).all(),
+    }
+
+
+def serializadores(app):
+    """Serializadores a comparar: nombre -> función que devuelve bytes."""
+    from flask.json.provider import DefaultJSONProvider
+    from app.utils.serializacion import BACKENDS, a_json
+    
+    flask = DefaultJSONProvider(app)
+    funciones = {
+        'flask': lambda valor: flask.dumps(valor, separators=(',', ':')).encode('utf-8'),
+    }
+    for backend in BACKENDS:
+        funciones[backend] = lambda valor, backend=backend: a_json(valor, backend, ordenar=True)
+    return funciones
+
+
+def medir(funcion, payload, repeticiones):
+    """Latencias de serializar el payload; None si el serializador no lo soporta."""
+    try:
+        salida = funcion(payload)
+    except TypeError:
+        return None
+    
+    duraciones = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(payload)
+        duraciones.append(time.perf_counter() - inicio)
+    duraciones.sort()
+    mediana = statistics.median(duraciones)
+    return {
+        'mediana_ms': round(mediana * 1000, 3),
+        'p95_ms': round(percentil(duraciones, 95) * 1000, 3),
+        'bytes': len(salida),
+        'mb_por_segundo': round(len(salida) / mediana / 1e6, 1) if mediana else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark de serialización JSON')
+    parser.add_argument('--viajes', type=int, default=1000, help='Cantidad de viajes del dataset')
+    parser.add_argument('--por-payload', type=int, default=200, help='Viajes incluidos en cada payload')
+    parser.add_argument('--repeticiones', type=int, default=30)
+    parser.add_argument('--json', help='Archivo donde guardar los resultados')
+    args = parser.parse_args()
+    
+    if not os.environ.get('DATABASE_URL'):
+        directorio = tempfile.mkdtemp(prefix='viajes_benchmark_')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'viajes.db')}"
+    
+    from app.factory import create_app, db, get_models
+    from app.utils.datos_sinteticos import generar_dataset
+    
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        models = get_models()
+        generacion = generar_dataset(db, models, args.viajes, semilla=SEMILLA,
+                                     fecha_base=FECHA_BASE, limpiar=True)
+        print(f"📦 Dataset: {generacion['total_filas']} filas en {generacion['segundos']:.1f} s")
+        
+        viaje_ids = sorted(random.Random(SEMILLA).sample(range(1, args.viajes + 1),
+                                                         min(args.por_payload, args.viajes)))
+        payloads = construir_payloads(db, models, viaje_ids)
+        funciones = serializadores(app)
+        
+        resultados = {'viajes': args.viajes, 'por_payload': len(viaje_ids), 'payloads': {}}
+        print(f"   {'payload':<14}{'backend':<10}{'mediana ms':>12}{'p95 ms':>10}{'KB':>10}{'MB/s':>9}")
+        for nombre, payload in payloads.items():
+            resultados['payloads'][nombre] = {}
+            for backend, funcion in funciones.items():
+                r = medir(funcion, payload, args.repeticiones)
+                resultados['payloads'][nombre][backend] = r
+                if r is None:
+                    print(f"   {nombre:<14}{backend:<10}{'no soportado':>12}")
+                    continue
+                print(f"   {nombre:<14}{backend:<10}{r['mediana_ms']:>12.2f}{r['p95_ms']:>10.2f}"
+                      f"{r['bytes'] / 1024:>10.1f}{r['mb_por_segundo']:>9.1f}")
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados guardados en {args.json}")
+
+
+if __name__ == '__main__':
+    main()
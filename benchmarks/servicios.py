@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Benchmark de rutas y servicios críticos
+=======================================
+
+Mide latencia, consultas SQL y pico de memoria de las rutas y métodos de
+servicio más usados contra datasets sintéticos de tamaño creciente
+(app.utils.datos_sinteticos, con semilla y fecha base fijas para que dos
+corridas sean comparables entre commits).
+
+Casos:
+    index, ver_viaje, obtener_estadisticas_{actividades,alojamientos,documentos,transportes},
+    verificar_continuidad_alojamiento, obtener_itinerario_transportes,
+    reordenar_paradas_por_fecha, crear_gasto
+
+Cada tamaño se mide en un proceso nuevo con su propia base de datos.
+
+Uso:
+    python benchmarks/servicios.py
+    python benchmarks/servicios.py --tamanos 100 1000 10000 --repeticiones 30 --json base.json
+    python benchmarks/servicios.py --json nuevo.json --comparar base.json --umbral 20
+
+Con --comparar el proceso termina con código 1 si algún caso empeora más que
+el umbral (en latencia mediana o en cantidad de consultas).
+
+Usa una base SQLite temporal salvo que se defina DATABASE_URL (en ese caso la
+base se vacía antes de generar cada dataset).
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+SEMILLA = 42
+FECHA_BASE = date(2026, 1, 15)
+
+# Viajes distintos sobre los que se reparten las repeticiones de cada caso
+VIAJES_MUESTRA = 20
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) de una lista ya ordenada."""
+    if not valores:
+        return 0.0
+    indice = min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))
+    return valores[indice]
+
+
+def definir_casos(cliente):
+    """Casos de benchmark: nombre -> función que recibe un viaje_id."""
+    from app.services import (actividad_service, alojamiento_service, documento_service,
+                              gasto_service, transporte_service, viaje_service)
+    
+    def obtener(url):
+        respuesta = cliente.get(url)
+        if respuesta.status_code != 200:
+            raise RuntimeError(f'GET {url} devolvió {respuesta.status_code}')
+    
+    # crear_gasto va al final: es el único caso que agrega filas
+    return {
+        'index': lambda viaje_id: obtener('/'),
+        'ver_viaje': lambda viaje_id: obtener(f'/viaje/{viaje_id}'),
+        'obtener_estadisticas_actividades': actividad_service.obtener_estadisticas_actividades,
+        'obtener_estadisticas_alojamientos': alojamiento_service.obtener_estadisticas_alojamientos,
+        'obtener_estadisticas_documentos': documento_service.obtener_estadisticas_documentos,
+        'obtener_estadisticas_transportes': transporte_service.obtener_estadisticas_transportes,
+        'verificar_continuidad_alojamiento': alojamiento_service.verificar_continuidad_alojamiento,
+        'obtener_itinerario_transportes': transporte_service.obtener_itinerario_transportes,
+        'reordenar_paradas_por_fecha': viaje_service.reordenar_paradas_por_fecha,
+        'crear_gasto': lambda viaje_id: gasto_service.crear_gasto(
+            viaje_id, 'comida', 'Gasto de benchmark', 12.5, FECHA_BASE, 'USD'),
+    }
+
+
+def medir_caso(funcion, viajes, repeticiones, repeticiones_memoria, db):
+    """Ejecutar un caso y devolver latencias, consultas y pico de memoria."""
+    from app.utils.monitor_sql import contar_consultas
+    
+    # Calentamiento: plantillas compiladas, cachés de geocodificación, etc.
+    funcion(viajes[0])
+    db.session.remove()
+    
+    duraciones = []
+    consultas = []
+    for i in range(repeticiones):
+        viaje_id = viajes[i % len(viajes)]
+        with contar_consultas() as contador:
+            inicio = time.perf_counter()
+            funcion(viaje_id)
+            duraciones.append(time.perf_counter() - inicio)
+        consultas.append(contador.consultas)
+        # Cada repetición empieza con la sesión vacía, como una petición nueva
+        db.session.remove()
+    
+    # La memoria se mide aparte: tracemalloc distorsiona los tiempos
+    picos = []
+    for i in range(repeticiones_memoria):
+        tracemalloc.start()
+        funcion(viajes[i % len(viajes)])
+        picos.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        db.session.remove()
+    
+    duraciones.sort()
+    return {
+        'repeticiones': repeticiones,
+        'mediana_ms': round(statistics.median(duraciones) * 1000, 3),
+        'p95_ms': round(percentil(duraciones, 95) * 1000, 3),
+        'min_ms': round(duraciones[0] * 1000, 3),
+        'max_ms': round(duraciones[-1] * 1000, 3),
+        'consultas': int(statistics.median(consultas)),
+        'consultas_max': max(consultas),
+        'pico_memoria_kb': round(max(picos) / 1024, 1) if picos else None,
+    }
+
+
+def ejecutar_tamano(tamano, repeticiones, repeticiones_memoria, casos):
+    """Generar un dataset del tamaño indicado y medir todos los casos (proceso hijo)."""
+    from app.factory import create_app, db, get_models
+    from app.utils.datos_sinteticos import generar_dataset
+    
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        generacion = generar_dataset(db, get_models(), tamano, semilla=SEMILLA,
+                                     fecha_base=FECHA_BASE, limpiar=True)
+        cliente = app.test_client()
+        definidos = definir_casos(cliente)
+        viajes = random.Random(SEMILLA).sample(range(1, tamano + 1), min(VIAJES_MUESTRA, tamano))
+        
+        resultados = {}
+        for nombre, funcion in definidos.items():
+            if casos and nombre not in casos:
+                continue
+            resultados[nombre] = medir_caso(funcion, viajes, repeticiones, repeticiones_memoria, db)
+    
+    return {'generacion': generacion, 'casos': resultados}
+
+
+def medir_en_proceso(tamano, args, entorno):
+    """Ejecutar un tamaño en un intérprete nuevo y devolver sus resultados."""
+    comando = [sys.executable, os.path.abspath(__file__), '--hijo', str(tamano),
+               '--repeticiones', str(args.repeticiones),
+               '--repeticiones-memoria', str(args.repeticiones_memoria)]
+    if args.casos:
+        comando += ['--casos'] + args.casos
+    salida = subprocess.run(comando, env=entorno, cwd=RAIZ, capture_output=True, text=True)
+    if salida.returncode != 0:
+        raise RuntimeError(f'El benchmark de {tamano} viajes falló:\n{salida.stderr[-2000:]}')
+    # La última línea es el JSON; lo anterior son mensajes de la app
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual, anterior, umbral):
+    """
+    Comparar dos resultados e imprimir las diferencias.
+    
+    Returns:
+        list: Casos (tamano, caso, métrica) que empeoraron más que el umbral
+    """
+    regresiones = []
+    print(f"\nComparación con {anterior.get('commit') or 'resultado anterior'} (umbral {umbral:.0f}%)")
+    print(f"{'viajes':>8}  {'caso':<36}{'mediana ms':>20}{'consultas':>14}")
+    for tamano, datos in actual['tamanos'].items():
+        previos = anterior.get('tamanos', {}).get(tamano)
+        if not previos:
+            continue
+        for caso, r in datos['casos'].items():
+            p = previos['casos'].get(caso)
+            if not p:
+                continue
+            cambio = (r['mediana_ms'] - p['mediana_ms']) / p['mediana_ms'] * 100 if p['mediana_ms'] else 0.0
+            marca = ''
+            if cambio > umbral:
+                regresiones.append((tamano, caso, 'mediana_ms'))
+                marca = ' ⚠️'
+            if r['consultas'] > p['consultas']:
+                regresiones.append((tamano, caso, 'consultas'))
+                marca = ' ⚠️'
+            print(f"{tamano:>8}  {caso:<36}{p['mediana_ms']:>8.2f} → {r['mediana_ms']:>8.2f}"
+                  f"{p['consultas']:>6} → {r['consultas']:<5}{cambio:+6.1f}%{marca}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de rutas y servicios críticos')
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[100, 1000, 5000],
+                        help='Cantidades de viajes de cada dataset')
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--repeticiones-memoria', type=int, default=3)
+    parser.add_argument('--casos', nargs='+', help='Medir solo estos casos')
+    parser.add_argument('--json', help='Archivo donde guardar los resultados')
+    parser.add_argument('--comparar', help='Resultados anteriores (JSON) contra los que comparar')
+    parser.add_argument('--umbral', type=float, default=20.0,
+                        help='Empeoramiento de la mediana (%%) que se considera regresión')
+    parser.add_argument('--hijo', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.hijo is not None:
+        resultado = ejecutar_tamano(args.hijo, args.repeticiones, args.repeticiones_memoria, args.casos)
+        print(json.dumps(resultado))
+        return
+    
+    entorno = dict(os.environ)
+    # Geocodificación offline: sin red y con resultados estables
+    entorno.setdefault('GEOCODIFICADOR', 'gazetteer')
+    base_temporal = not entorno.get('DATABASE_URL')
+    directorio = tempfile.mkdtemp(prefix='viajes_benchmark_')
+    
+    resultados = {
+        'commit': commit_actual(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'base_datos': 'sqlite' if base_temporal else entorno['DATABASE_URL'].split(':', 1)[0],
+        'semilla': SEMILLA,
+        'repeticiones': args.repeticiones,
+        'tamanos': {}
+    }
+    
+    for tamano in args.tamanos:
+        if base_temporal:
+            entorno['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, f'viajes_{tamano}.db')}"
+        print(f"⏱️  {tamano} viajes...")
+        datos = medir_en_proceso(tamano, args, entorno)
+        resultados['tamanos'][str(tamano)] = datos
+        
+        generacion = datos['generacion']
+        print(f"   dataset: {generacion['total_filas']} filas en {generacion['segundos']:.1f} s")
+        print(f"   {'caso':<36}{'mediana ms':>12}{'p95 ms':>10}{'consultas':>11}{'memoria KB':>12}")
+        for caso, r in datos['casos'].items():
+            memoria = f"{r['pico_memoria_kb']:>12.1f}" if r['pico_memoria_kb'] is not None else f"{'-':>12}"
+            print(f"   {caso:<36}{r['mediana_ms']:>12.2f}{r['p95_ms']:>10.2f}{r['consultas']:>11}{memoria}")
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados guardados en {args.json}")
+    
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+        regresiones = comparar(resultados, anterior, args.umbral)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} regresiones detectadas")
+            sys.exit(1)
+        print("\n✅ Sin regresiones")
+
+
+if __name__ == '__main__':
+    main()
@@ -23,9 +23,64 @@ class Config:
         else:
             # Desarrollo (SQLite) - Usar ruta local fuera de OneDrive
             local_db_path = os.path.join(os.path.expanduser('~'), 'Documents', 'viaje_local', 'viaje.db')
-            print(f"🗄️  Usando SQLite en desarrollo: {local_db_path}")
             return f'sqlite:///{local_db_path}'
     
     @staticmethod
     def get_sqlalchemy_track_modifications():
         return False
+    
+    @staticmethod
+    def get_db_pool_size():
+        """Conexiones persistentes del pool por proceso"""
+        return int(os.environ.get('DB_POOL_SIZE', 5))
+    
+    @staticmethod
+    def get_db_max_overflow():
+        """Conexiones extra que el pool puede abrir en picos"""
+        return int(os.environ.get('DB_MAX_OVERFLOW', 5))
+    
+    @staticmethod
+    def get_sqlalchemy_engine_options(database_uri=None):
+        """Opciones del engine; el tamaño del pool solo aplica a bases de datos de servidor"""
+        if database_uri is None:
+            database_uri = os.environ.get('DATABASE_URL', '')
+        if not database_uri or database_uri.startswith('sqlite'):
+            return {}
+        return {
+            'pool_size': Config.get_db_pool_size(),
+            'max_overflow': Config.get_db_max_overflow(),
+            'pool_pre_ping': True,
+            'pool_recycle': 1800,
+            # Un servidor caído no debe bloquear peticiones ni health checks
+            'connect_args': {'connect_timeout': 5} if database_uri.startswith('postgresql') else {}
+        }
+    
+    @staticmethod
+    def get_umbral_peticion_lenta_ms():
+        """Peticiones más lentas que este umbral se registran en el log"""
+        return float(os.environ.get('SQL_UMBRAL_PETICION_MS', 500))
+    
+    @staticmethod
+    def get_umbral_consultas_peticion():
+        """Peticiones con más consultas que este umbral se registran en el log"""
+        return int(os.environ.get('SQL_UMBRAL_CONSULTAS', 30))
+    
+    @staticmethod
+    def get_umbral_consulta_lenta_ms():
+        """Consultas SQL más lentas que este umbral se cuentan como lentas"""
+        return float(os.environ.get('SQL_UMBRAL_CONSULTA_LENTA_MS', 100))
+    
+    @staticmethod
+    def get_salud_cache_segundos():
+        """Segundos durante los que se reutiliza el resultado del health check"""
+        return float(os.environ.get('SALUD_CACHE_SEGUNDOS', 5))
+    
+    @staticmethod
+    def get_salud_umbral_db_ms():
+        """Latencia de base de datos a partir de la cual el estado es degradado"""
+        return float(os.environ.get('SALUD_UMBRAL_DB_MS', 250))
+    
+    @staticmethod
+    def get_calendario_cache_segundos():
+        """Segundos máximos que un feed .ics cacheado se sirve sin regenerar"""
+        return float(os.environ.get('CALENDARIO_CACHE_SEGUNDOS', 300))
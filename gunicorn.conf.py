@@ -0,0 +1,151 @@
+"""
+Configuración de gunicorn para la aplicación de viajes
+======================================================
+
+Se carga automáticamente al ejecutar gunicorn desde la raíz del proyecto
+(o explícitamente con ``-c gunicorn.conf.py``). Todo se ajusta con variables
+de entorno:
+
+- GUNICORN_WORKER_CLASS: ``gthread`` (default), ``gevent`` o ``sync``
+- GUNICORN_WORKERS / GUNICORN_THREADS: fijan los valores calculados
+- DB_POOL_SIZE / DB_MAX_OVERFLOW: pool de SQLAlchemy por proceso
+- DB_MAX_CONNECTIONS: conexiones que la base de datos admite para esta app
+- METRICAS_DIR: directorio compartido para agregar /metrics entre workers
+- NOTIFICADOR_VENCIMIENTOS / ARCHIVADOR_VIAJES: tareas en segundo plano,
+  que corren en un solo worker (el primero que toma el lock de tareas)
+
+Guía de dimensionamiento:
+
+- Workers: 2 x CPU + 1, limitado para que workers x (pool + overflow) no
+  supere DB_MAX_CONNECTIONS.
+- Threads (gthread): uno por conexión disponible en el pool del worker; más
+  threads que conexiones solo agregan espera por el pool.
+- gevent: muchas conexiones concurrentes por worker (worker_connections),
+  útil cuando el tiempo se va en E/S externa (p.ej. geocodificación).
+- SQLite admite un solo escritor: con SQLite conviene 1 worker.
+"""
+
+import fcntl
+import multiprocessing
+import os
+import tempfile
+
+from config.settings import Config
+
+
+def _entero(nombre, default):
+    valor = os.environ.get(nombre)
+    return int(valor) if valor else default
+
+
+cpus = multiprocessing.cpu_count()
+pool_por_worker = Config.get_db_pool_size() + Config.get_db_max_overflow()
+usa_sqlite = Config.get_database_uri().startswith('sqlite')
+
+# Clase de worker
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread').lower()
+if worker_class == 'gevent':
+    try:
+        import gevent  # noqa: F401
+    except ImportError:
+        print("⚠️  gevent no está instalado, usando gthread")
+        worker_class = 'gthread'
+
+# Cantidad de workers
+if usa_sqlite:
+    workers_por_db = 1
+else:
+    workers_por_db = max(1, _entero('DB_MAX_CONNECTIONS', 20) // pool_por_worker)
+workers = _entero('GUNICORN_WORKERS', max(1, min(2 * cpus + 1, workers_por_db)))
+
+# Concurrencia dentro de cada worker
+threads = _entero('GUNICORN_THREADS', pool_por_worker if worker_class == 'gthread' else 1)
+worker_connections = _entero('GUNICORN_WORKER_CONNECTIONS', 100)
+
+# Precargar la app en el master para compartir memoria copy-on-write entre workers.
+# Con gevent no se precarga: el monkey-patching debe ocurrir antes de importar la app.
+preload_app = worker_class != 'gevent'
+
+# Reciclado gradual de workers (evita crecimiento de memoria sin reinicios bruscos)
+max_requests = _entero('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _entero('GUNICORN_MAX_REQUESTS_JITTER', 100)
+graceful_timeout = 30
+timeout = _entero('GUNICORN_TIMEOUT', 60)
+keepalive = 5
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+accesslog = os.environ.get('GUNICORN_ACCESSLOG')
+
+# La app no inicia sus tareas en segundo plano al crearse: las inicia post_worker_init
+os.environ['TAREAS_EN_WORKER_DESIGNADO'] = '1'
+_lock_tareas = None
+
+
+def on_starting(server):
+    """Descartar las métricas de una ejecución anterior."""
+    if os.environ.get('METRICAS_DIR'):
+        from app.utils.metricas import metricas
+        metricas.configurar_multiproceso(os.environ['METRICAS_DIR'])
+        metricas.limpiar_directorio()
+
+
+def worker_exit(server, worker):
+    """Volcar las métricas del worker antes de que termine."""
+    if os.environ.get('METRICAS_DIR'):
+        from app.utils.metricas import metricas
+        metricas.volcar()
+
+
+def child_exit(server, worker):
+    """Conservar los contadores del worker que terminó (p.ej. por max_requests)."""
+    if os.environ.get('METRICAS_DIR'):
+        from app.utils.metricas import metricas
+        metricas.configurar_multiproceso(os.environ['METRICAS_DIR'])
+        metricas.proceso_terminado(worker.pid)
+
+
+def post_fork(server, worker):
+    """Descartar las conexiones heredadas del master: cada worker abre las suyas."""
+    if not server.cfg.preload_app:
+        # La app se importa después en el worker (con gevent, ya parcheado):
+        # cargarla acá la importaría antes del monkey-patching y no hay nada heredado
+        return
+    app = server.app.wsgi()
+    if 'sqlalchemy' not in getattr(app, 'extensions', {}):
+        # App de respaldo de app_robust.py (sin base de datos): nada que descartar
+        return
+    from app.factory import db
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    """
+    Iniciar las tareas en segundo plano en un solo worker.
+    
+    Los workers compiten por un lock de archivo propio de este master; el que
+    lo toma lo conserva hasta terminar y, si se recicla (max_requests), lo toma
+    el worker que lo reemplaza.
+    """
+    global _lock_tareas
+    if 'sqlalchemy' not in getattr(worker.wsgi, 'extensions', {}):
+        # App de respaldo de app_robust.py: no hay tareas que iniciar
+        return
+    ruta = os.path.join(tempfile.gettempdir(), f'viajes-tareas-{worker.ppid}.lock')
+    archivo = open(ruta, 'w')
+    try:
+        fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        archivo.close()
+        return
+    _lock_tareas = archivo
+    worker.log.info(f"Worker {worker.pid}: tareas en segundo plano")
+    from app.factory import iniciar_tareas_segundo_plano
+    iniciar_tareas_segundo_plano(worker.wsgi)
+
+
+def when_ready(server):
+    server.log.info(
+        f"Perfil: worker_class={worker_class} workers={workers} threads={threads} "
+        f"preload={preload_app} max_requests={max_requests}"
+    )
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Script para importar viajes completos desde un archivo NDJSON
+(el formato de /exportar/viajes-completos.ndjson, un viaje por línea).
+
+Uso:
+    python importar_viajes.py viajes.ndjson
+    python importar_viajes.py viajes.ndjson --validar
+    cat viajes.ndjson | python importar_viajes.py -
+"""
+import argparse
+import sys
+import time
+
+from app.factory import create_app
+from app.services.database import database_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Importar viajes desde NDJSON')
+    parser.add_argument('archivo', help="Archivo NDJSON ('-' para leer de la entrada estándar)")
+    parser.add_argument('--validar', action='store_true', help='Solo validar, sin escribir')
+    parser.add_argument('--detener-en-error', action='store_true',
+                        help='Cortar en el primer viaje inválido')
+    args = parser.parse_args()
+    
+    app = create_app()
+    with app.app_context():
+        # init_database además agrega las columnas nuevas a una base ya existente
+        if not database_service.init_database():
+            sys.exit(1)
+        from app.services import importacion_service
+        
+        entrada = sys.stdin if args.archivo == '-' else open(args.archivo, encoding='utf-8')
+        inicio = time.perf_counter()
+        try:
+            resumen = importacion_service.importar_ndjson(
+                entrada, solo_validar=args.validar, detener_en_error=args.detener_en_error)
+        finally:
+            if entrada is not sys.stdin:
+                entrada.close()
+        segundos = time.perf_counter() - inicio
+    
+    accion = 'validados' if args.validar else 'importados'
+    print(f"✅ {resumen['importados']} viajes {accion} en {segundos:.1f} s")
+    for clave, cantidad in resumen['filas'].items():
+        print(f"   {clave:<14}{cantidad:>10}")
+    if resumen['con_error']:
+        print(f"❌ {resumen['con_error']} viajes con errores:")
+        for error in resumen['errores']:
+            print(f"   línea {error['linea']}: {error['error']}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,9 @@ Script para inicializar la base de datos en producción
 """
 import os
 import sys
-from app import app, db
+from app.factory import create_app, db
+
+app = create_app()
 
 def init_db():
     """Crear todas las tablas de la base de datos"""
@@ -132,7 +132,28 @@ class ViajeApp {
             console.log('Sincronizando datos offline:', data);
             localStorage.removeItem('offlineData');
         }
+
+        // Subir las mutaciones encoladas y bajar los cambios de los viajes guardados
+        if ('serviceWorker' in navigator) {
+            navigator.serviceWorker.ready.then((registration) => {
+                if ('sync' in registration) {
+                    return registration.sync.register('background-sync');
+                }
+                if (registration.active) {
+                    registration.active.postMessage({ tipo: 'sincronizar' });
+                }
+            });
+        }
+    }
+}
+
+// Encolar una mutación hecha sin conexión ({id_cliente, entidad, operacion, id, datos})
+function encolarMutacionOffline(viajeId, mutacion) {
+    if (!('serviceWorker' in navigator) || !navigator.serviceWorker.controller) {
+        return false;
     }
+    navigator.serviceWorker.controller.postMessage({ tipo: 'encolar-mutacion', viaje_id: viajeId, mutacion: mutacion });
+    return true;
 }
 
 // Funciones utilitarias globales
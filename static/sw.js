@@ -39,6 +39,12 @@ self.addEventListener('activate', function(event) {
 
 // Interceptar peticiones de red
 self.addEventListener('fetch', function(event) {
+  // Escrituras y sincronización siempre van a la red (nunca desde la caché)
+  var url = new URL(event.request.url);
+  if (event.request.method !== 'GET' || /\/cambios$/.test(url.pathname)) {
+    return;
+  }
+
   event.respondWith(
     caches.match(event.request)
       .then(function(response) {
@@ -77,11 +83,189 @@ self.addEventListener('sync', function(event) {
   }
 });
 
+// ---------------------------------------------------------------------------
+// Sincronización offline por deltas
+//
+// IndexedDB guarda cada viaje sincronizado ({viaje_id, cursor, datos}) y la
+// cola de mutaciones hechas sin conexión. Al recuperar la conexión se suben
+// las mutaciones en lote (POST /viaje/<id>/sincronizar) y después se piden
+// solo los cambios posteriores al cursor (GET /viaje/<id>/cambios).
+// ---------------------------------------------------------------------------
+
+const DB_SYNC = 'mi-viaje-sync';
+
+function abrirDbSync() {
+  return new Promise(function(resolve, reject) {
+    var peticion = indexedDB.open(DB_SYNC, 1);
+    peticion.onupgradeneeded = function() {
+      var db = peticion.result;
+      db.createObjectStore('viajes', { keyPath: 'viaje_id' });
+      db.createObjectStore('mutaciones', { keyPath: 'id_cliente' })
+        .createIndex('viaje_id', 'viaje_id');
+      db.createObjectStore('conflictos', { keyPath: 'id_cliente' });
+    };
+    peticion.onsuccess = function() { resolve(peticion.result); };
+    peticion.onerror = function() { reject(peticion.error); };
+  });
+}
+
+function operacionDb(db, almacen, modo, operacion) {
+  return new Promise(function(resolve, reject) {
+    var transaccion = db.transaction(almacen, modo);
+    var peticion = operacion(transaccion.objectStore(almacen));
+    transaccion.oncomplete = function() { resolve(peticion ? peticion.result : undefined); };
+    transaccion.onerror = function() { reject(transaccion.error); };
+  });
+}
+
+// Encolar una mutación offline: {id_cliente, entidad, operacion, id, datos}
+function encolarMutacion(viajeId, mutacion) {
+  return abrirDbSync().then(function(db) {
+    return operacionDb(db, 'viajes', 'readonly', function(store) { return store.get(viajeId); })
+      .then(function(viaje) {
+        var registro = Object.assign({ viaje_id: viajeId, cursor: viaje ? viaje.cursor : 0 }, mutacion);
+        return operacionDb(db, 'mutaciones', 'readwrite', function(store) { return store.put(registro); });
+      });
+  });
+}
+
+function subirMutaciones(db, viajeId) {
+  return operacionDb(db, 'mutaciones', 'readonly', function(store) {
+    return store.index('viaje_id').getAll(viajeId);
+  }).then(function(mutaciones) {
+    if (!mutaciones.length) {
+      return;
+    }
+    return fetch('/viaje/' + viajeId + '/sincronizar', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ mutaciones: mutaciones })
+    }).then(function(respuesta) {
+      if (respuesta.status === 404) {
+        // El viaje ya no existe: descartar su cola
+        return operacionDb(db, 'mutaciones', 'readwrite', function(store) {
+          mutaciones.forEach(function(m) { store.delete(m.id_cliente); });
+        });
+      }
+      if (!respuesta.ok && respuesta.status !== 207) {
+        throw new Error('Sincronización rechazada: ' + respuesta.status);
+      }
+      return respuesta.json().then(function(resultado) {
+        // Las pendientes quedan en la cola; los conflictos se guardan para resolverlos en la app
+        return Promise.all(resultado.resultados.map(function(r) {
+          if (r.estado === 'pendiente') {
+            return null;
+          }
+          var tareas = [operacionDb(db, 'mutaciones', 'readwrite', function(store) {
+            return store.delete(r.id_cliente);
+          })];
+          if (r.estado === 'conflicto' || r.estado === 'error') {
+            tareas.push(operacionDb(db, 'conflictos', 'readwrite', function(store) {
+              return store.put(Object.assign({ viaje_id: viajeId }, r));
+            }));
+          }
+          return Promise.all(tareas);
+        }));
+      });
+    });
+  });
+}
+
+function aplicarCambios(viaje, cambios) {
+  cambios.forEach(function(cambio) {
+    if (cambio.entidad === 'viajes') {
+      viaje.datos.viaje = cambio.datos;
+      return;
+    }
+    var lista = (viaje.datos[cambio.entidad] || []).filter(function(fila) {
+      return fila.id !== cambio.id;
+    });
+    if (cambio.operacion === 'upsert') {
+      lista.push(cambio.datos);
+    }
+    viaje.datos[cambio.entidad] = lista;
+  });
+}
+
+function descargarCambios(db, viaje) {
+  var url = '/viaje/' + viaje.viaje_id + '/cambios' + (viaje.datos ? '?cursor=' + viaje.cursor : '');
+  return fetch(url).then(function(respuesta) {
+    if (respuesta.status === 404) {
+      return operacionDb(db, 'viajes', 'readwrite', function(store) { return store.delete(viaje.viaje_id); });
+    }
+    if (!respuesta.ok) {
+      throw new Error('Error al descargar cambios: ' + respuesta.status);
+    }
+    return respuesta.json().then(function(resultado) {
+      if (resultado.eliminado) {
+        return operacionDb(db, 'viajes', 'readwrite', function(store) { return store.delete(viaje.viaje_id); });
+      }
+      if (resultado.completo) {
+        viaje.datos = resultado.viaje;
+      } else {
+        aplicarCambios(viaje, resultado.cambios);
+      }
+      viaje.cursor = resultado.cursor;
+      return operacionDb(db, 'viajes', 'readwrite', function(store) { return store.put(viaje); })
+        .then(function() {
+          if (resultado.hay_mas) {
+            return descargarCambios(db, viaje);
+          }
+        });
+    });
+  });
+}
+
 function doBackgroundSync() {
-  // Aquí implementarías la lógica de sincronización
   console.log('Ejecutando sincronización en segundo plano');
+  return abrirDbSync().then(function(db) {
+    return Promise.all([
+      operacionDb(db, 'viajes', 'readonly', function(store) { return store.getAll(); }),
+      operacionDb(db, 'mutaciones', 'readonly', function(store) { return store.getAll(); })
+    ]).then(function(resultados) {
+      var viajes = resultados[0];
+      var ids = new Set(viajes.map(function(v) { return v.viaje_id; }));
+      resultados[1].forEach(function(m) { ids.add(m.viaje_id); });
+
+      // Primero subir lo encolado y después bajar los deltas (incluyen lo recién subido)
+      return Promise.all(Array.from(ids).map(function(viajeId) {
+        var viaje = viajes.find(function(v) { return v.viaje_id === viajeId; }) ||
+                    { viaje_id: viajeId, cursor: 0, datos: null };
+        return subirMutaciones(db, viajeId).then(function() {
+          return descargarCambios(db, viaje);
+        });
+      }));
+    });
+  }).then(function() {
+    return self.clients.matchAll().then(function(clientes) {
+      clientes.forEach(function(cliente) { cliente.postMessage({ tipo: 'sincronizado' }); });
+    });
+  });
 }
 
+// Mensajes de la app: seguir un viaje, encolar mutaciones o sincronizar ya
+self.addEventListener('message', function(event) {
+  var mensaje = event.data || {};
+  var tarea;
+  if (mensaje.tipo === 'encolar-mutacion') {
+    tarea = encolarMutacion(mensaje.viaje_id, mensaje.mutacion);
+  } else if (mensaje.tipo === 'seguir-viaje') {
+    tarea = abrirDbSync().then(function(db) {
+      return operacionDb(db, 'viajes', 'readonly', function(store) { return store.get(mensaje.viaje_id); })
+        .then(function(viaje) {
+          return viaje || descargarCambios(db, { viaje_id: mensaje.viaje_id, cursor: 0, datos: null });
+        });
+    });
+  } else if (mensaje.tipo === 'sincronizar') {
+    tarea = doBackgroundSync();
+  }
+  if (tarea) {
+    event.waitUntil(tarea.catch(function(error) {
+      console.log('Error de sincronización:', error);
+    }));
+  }
+});
+
 // Push notifications (para futuras funcionalidades)
 self.addEventListener('push', function(event) {
   const options = {